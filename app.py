@@ -1,34 +1,87 @@
 """Основной файл приложения."""
+from importlib import import_module
+
 from flask import Flask
-from database import db
+from database import db, create_schema, init_db_command
+from events.commands import events_command
+from users.commands import recompute_stats_command
+from seed import seed_command
+from notifications.commands import notifications_command
+from archive.commands import archive_command
+from notifications.mailer import mailer
+from pubsub import hub
+from cache import cache
+from ratelimit import rate_limiter
+from tracing import tracer
+from slowlog import slow_query_log
+from unit_of_work import unit_of_work
+from assets import static_assets, compression
 from config import Config
 from users import login_manager
-from users.routes import user_blueprint
-from todo_list.routes import todo_list_bp
-from auth.routes import auth_blueprint
+from todo_list.sweeper import overdue_sweeper
+from todo_list.rebalancer import rank_rebalancer
+
+BLUEPRINTS = (
+    'users.routes:user_blueprint',
+    'auth.routes:auth_blueprint',
+    'todo_list.routes:todo_list_bp',
+)
+
 
+def create_app(config=Config):
+    """
+    Создает и настраивает экземпляр приложения.
 
-def create_app():
-    """Создает и настраивает экземпляр приложения."""
+    :param config: Класс конфигурации приложения.
+    :type config: type
+    :return: Экземпляр приложения.
+    :rtype: Flask
+    """
     app = Flask(__name__)
-    app.config.from_object(Config)
+    app.config.from_object(config)
     
     db.init_app(app)
     login_manager.init_app(app)
+    rate_limiter.init_app(app)
+    hub.init_app(app)
+    cache.init_app(app)
+    unit_of_work.init_app(app)
+    overdue_sweeper.init_app(app)
+    rank_rebalancer.init_app(app)
+    static_assets.init_app(app)
+    compression.init_app(app)
+    tracer.init_app(app)
+    slow_query_log.init_app(app)
+    mailer.init_app(app)
 
     register_blueprints(app)
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(events_command)
+    app.cli.add_command(recompute_stats_command)
+    app.cli.add_command(seed_command)
+    app.cli.add_command(notifications_command)
+    app.cli.add_command(archive_command)
 
-    with app.app_context():
-        db.create_all()
+    if app.config['SCHEMA_AUTO_CREATE']:
+        with app.app_context():
+            create_schema()
 
     return app
 
 def register_blueprints(app):
-    """Регистрирует blueprint-ы в приложении."""
-    app.register_blueprint(user_blueprint)
-    app.register_blueprint(auth_blueprint)
-    app.register_blueprint(todo_list_bp)
+    """
+    Регистрирует blueprint-ы в приложении.
+
+    Модули маршрутов (а вместе с ними формы и валидаторы pydantic) импортируются
+    только при создании приложения, а не при импорте модуля ``app``.
+
+    :param app: Экземпляр приложения.
+    :type app: Flask
+    """
+    for path in BLUEPRINTS:
+        module_name, attribute = path.split(':')
+        app.register_blueprint(getattr(import_module(module_name), attribute))
 
 if __name__ == '__main__':
     app = create_app()
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True)
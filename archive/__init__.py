@@ -0,0 +1 @@
+"""Инициализация приложения archive: холодный архив давно завершенных задач."""
@@ -0,0 +1,30 @@
+"""Команды CLI архива задач."""
+
+import time
+
+import click
+from flask.cli import AppGroup
+
+from archive.services import ArchiveService
+
+archive_command = AppGroup('archive', help='Архив давно завершенных задач.')
+
+
+@archive_command.command('run')
+@click.option('--days', type=click.IntRange(0), default=None,
+              help='Возраст завершенных задач в днях (по умолчанию ARCHIVE_AFTER_DAYS).')
+@click.option('--batch-size', type=click.IntRange(1), default=None,
+              help='Количество деревьев задач в одной транзакции (по умолчанию ARCHIVE_BATCH_SIZE).')
+@click.option('--loop', is_flag=True, help='Повторять проходы каждые --interval секунд.')
+@click.option('--interval', type=click.FloatRange(0), default=3600, show_default=True,
+              help='Пауза между проходами в режиме --loop (в секундах).')
+def run_command(days, batch_size, loop, interval):
+    """Переносит в архив задачи, завершенные больше --days дней назад."""
+    while True:
+        started = time.perf_counter()
+        result = ArchiveService.archive(days=days, batch_size=batch_size)
+        click.echo(f'Перенесено в архив задач: {result["tasks"]}, пачек: {result["batches"]} '
+                   f'за {time.perf_counter() - started:.2f} с.')
+        if not loop:
+            break
+        time.sleep(interval)
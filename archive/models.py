@@ -0,0 +1,72 @@
+"""Модели данных для архива задач."""
+
+from datetime import datetime
+from database import db
+
+
+class ArchivedTask(db.Model):
+    """
+    Задача, перенесенная из таблицы ``task`` в архив.
+
+    Идентификатор задачи сохраняется, поэтому журнал событий и поисковый
+    индекс продолжают на нее ссылаться. Метки задачи хранятся списком
+    идентификаторов, связи дерева подзадач - полем ``parent_id``.
+
+    :param id: Идентификатор задачи.
+    :type id: int
+    :param todo_id: Идентификатор списка задач.
+    :type todo_id: int
+    :param parent_id: Идентификатор родительской задачи; None - задача верхнего уровня.
+    :type parent_id: int, optional
+    :param title: Заголовок задачи.
+    :type title: str
+    :param description: Описание задачи.
+    :type description: str, optional
+    :param priority: Приоритет задачи.
+    :type priority: int
+    :param created_at: Дата и время создания задачи.
+    :type created_at: datetime
+    :param deadline_date: Дата и время крайнего срока выполнения задачи.
+    :type deadline_date: datetime, optional
+    :param completed_at: Дата и время завершения задачи.
+    :type completed_at: datetime
+    :param label_ids: Идентификаторы меток задачи.
+    :type label_ids: list[int]
+    :param archived_at: Дата и время переноса в архив.
+    :type archived_at: datetime
+    """
+    __tablename__ = 'archived_task'
+    __table_args__ = (
+        db.Index('ix_archived_task_todo_completed', 'todo_id', 'completed_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    todo_id = db.Column(db.Integer, nullable=False)
+    parent_id = db.Column(db.Integer, nullable=True)
+    title = db.Column(db.String(100))
+    description = db.Column(db.String(250), nullable=True)
+    priority = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime(timezone=True))
+    deadline_date = db.Column(db.DateTime(timezone=True), nullable=True)
+    completed_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    label_ids = db.Column(db.JSON, nullable=False, default=list)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+
+class ArchivedListStats(db.Model):
+    """
+    Сохраненные счетчики архивных задач списка.
+
+    Статистика, которая считается по таблице ``task``, прибавляет эти счетчики,
+    чтобы архивирование не меняло итогов. Все архивные задачи завершены, поэтому
+    хранится только их количество.
+
+    :param todo_id: Идентификатор списка задач.
+    :type todo_id: int
+    :param total: Количество архивных задач списка.
+    :type total: int
+    """
+    __tablename__ = 'archived_list_stats'
+
+    todo_id = db.Column(db.Integer, primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,215 @@
+"""
+Перенос давно завершенных задач в архив и чтение архива.
+
+Задача попадает в архив вместе со всем деревом подзадач: корень дерева
+(задача без родителя) и все его подзадачи должны быть завершены раньше
+границы ``ARCHIVE_AFTER_DAYS``. Деревья переносятся пачками по
+``ARCHIVE_BATCH_SIZE`` корней, каждая пачка - одной транзакцией: строки
+копируются в ``archived_task``, счетчики списка в ``archived_list_stats``
+увеличиваются, строки задач, их метки, ревизии и строки замыкания удаляются.
+Событий в журнал архивирование не пишет: задача не удалена, а только
+перенесена, поэтому проекции статистики и поиска продолжают ее учитывать.
+"""
+
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, delete, exists, func, insert, or_, select, union_all, update
+from sqlalchemy.orm import aliased
+
+from archive.models import ArchivedListStats, ArchivedTask
+from cache import cache
+from database import db
+from todo_list.models import Task, TaskClosure, TaskLabel, TaskRevision, TaskStatus
+
+ARCHIVE_FIELDS = ('id', 'todo_id', 'parent_id', 'title', 'description', 'priority', 'created_at',
+                  'deadline_date', 'completed_at')
+
+
+class ArchiveService:
+    """
+    Сервис архива задач.
+    """
+
+    @staticmethod
+    def cutoff(now=None, days=None):
+        """
+        Возвращает границу: задачи, завершенные раньше нее, переносятся в архив.
+
+        :param now: Текущий момент.
+        :type now: datetime, optional
+        :param days: Возраст завершенных задач в днях (по умолчанию ``ARCHIVE_AFTER_DAYS``).
+        :type days: int, optional
+        :rtype: datetime
+        """
+        if days is None:
+            days = current_app.config.get('ARCHIVE_AFTER_DAYS', 90)
+        return (now or datetime.now()) - timedelta(days=days)
+
+    @staticmethod
+    def _roots(cutoff, batch_size, after=None):
+        """
+        Выбирает корни деревьев, готовых к архивированию, по индексу ``ix_task_status_completed``.
+
+        :param cutoff: Граница времени завершения.
+        :type cutoff: datetime
+        :param batch_size: Максимальное количество корней.
+        :type batch_size: int
+        :param after: Позиция ``(completed_at, id)``, после которой продолжается выборка.
+        :type after: tuple[datetime, int], optional
+        :return: Пары ``(id, completed_at)`` по возрастанию времени завершения.
+        :rtype: list[sqlalchemy.engine.Row]
+        """
+        root = aliased(Task)
+        subtask = aliased(Task)
+        unfinished = exists(
+            select(TaskClosure.descendant_id)
+            .join(subtask, subtask.id == TaskClosure.descendant_id)
+            .where(TaskClosure.ancestor_id == root.id,
+                   or_(subtask.status != TaskStatus.COMPLETED, subtask.completed_at >= cutoff)))
+        statement = select(root.id, root.completed_at).where(
+            root.status == TaskStatus.COMPLETED,
+            root.completed_at < cutoff,
+            root.parent_id.is_(None),
+            ~unfinished)
+        if after is not None:
+            completed_at, task_id = after
+            statement = statement.where(or_(root.completed_at > completed_at,
+                                            and_(root.completed_at == completed_at, root.id > task_id)))
+        return db.session.execute(statement.order_by(root.completed_at, root.id).limit(batch_size)).all()
+
+    @staticmethod
+    def archive_batch(cutoff, batch_size, after=None):
+        """
+        Переносит в архив одну пачку деревьев задач и фиксирует транзакцию.
+
+        :param cutoff: Граница времени завершения.
+        :type cutoff: datetime
+        :param batch_size: Количество корней деревьев в пачке.
+        :type batch_size: int
+        :param after: Позиция, после которой продолжается выборка корней.
+        :type after: tuple[datetime, int], optional
+        :return: Количество перенесенных задач, количество корней и позиция последнего корня.
+        :rtype: tuple[int, int, tuple[datetime, int] or None]
+        """
+        roots = ArchiveService._roots(cutoff, batch_size, after)
+        if not roots:
+            return 0, 0, None
+        root_ids = [task_id for task_id, _ in roots]
+        task_ids = union_all(
+            select(Task.id).where(Task.id.in_(root_ids)),
+            select(TaskClosure.descendant_id).where(TaskClosure.ancestor_id.in_(root_ids)))
+        tasks = db.session.execute(
+            select(*(getattr(Task, field) for field in ARCHIVE_FIELDS)).where(Task.id.in_(task_ids))).all()
+        labels = {}
+        for task_id, label_id in db.session.execute(
+                select(TaskLabel.task_id, TaskLabel.label_id).where(TaskLabel.task_id.in_(task_ids))
+                .order_by(TaskLabel.task_id, TaskLabel.label_id)):
+            labels.setdefault(task_id, []).append(label_id)
+        now = datetime.now()
+        db.session.execute(insert(ArchivedTask).execution_options(render_nulls=True), [
+            {**row._mapping, 'label_ids': labels.get(row.id, []), 'archived_at': now} for row in tasks])
+
+        counts = {}
+        for row in tasks:
+            counts[row.todo_id] = counts.get(row.todo_id, 0) + 1
+        existing = set(db.session.scalars(
+            select(ArchivedListStats.todo_id).where(ArchivedListStats.todo_id.in_(counts))))
+        for todo_id, count in counts.items():
+            if todo_id in existing:
+                db.session.execute(update(ArchivedListStats).where(ArchivedListStats.todo_id == todo_id)
+                                   .values(total=ArchivedListStats.total + count))
+        if counts.keys() - existing:
+            db.session.execute(insert(ArchivedListStats), [
+                {'todo_id': todo_id, 'total': counts[todo_id]} for todo_id in counts.keys() - existing])
+
+        moved = [row.id for row in tasks]
+        for model, column in ((TaskLabel, TaskLabel.task_id), (TaskClosure, TaskClosure.descendant_id),
+                              (TaskRevision, TaskRevision.task_id), (Task, Task.id)):
+            db.session.execute(delete(model).where(column.in_(moved)).execution_options(synchronize_session=False))
+        db.session.commit()
+
+        from todo_list.services import invalidate_all_user_caches
+        cache.invalidate_entity(Task, *moved)
+        cache.delete(*(f'label_index:{todo_id}' for todo_id in counts))
+        invalidate_all_user_caches()
+        return len(moved), len(roots), (roots[-1].completed_at, roots[-1].id)
+
+    @staticmethod
+    def archive(now=None, days=None, batch_size=None):
+        """
+        Переносит в архив все деревья задач, завершенные раньше границы, пачками.
+
+        :param now: Текущий момент.
+        :type now: datetime, optional
+        :param days: Возраст завершенных задач в днях (по умолчанию ``ARCHIVE_AFTER_DAYS``).
+        :type days: int, optional
+        :param batch_size: Количество корней в пачке (по умолчанию ``ARCHIVE_BATCH_SIZE``).
+        :type batch_size: int, optional
+        :return: Словарь с ключами ``tasks`` (перенесено задач) и ``batches`` (пачек).
+        :rtype: dict
+        """
+        cutoff = ArchiveService.cutoff(now, days)
+        batch_size = batch_size or current_app.config.get('ARCHIVE_BATCH_SIZE', 500)
+        result = {'tasks': 0, 'batches': 0}
+        after = None
+        while True:
+            moved, roots, after = ArchiveService.archive_batch(cutoff, batch_size, after)
+            if roots:
+                result['tasks'] += moved
+                result['batches'] += 1
+            if roots < batch_size:
+                return result
+
+    @staticmethod
+    def count(todo_id):
+        """
+        Возвращает количество архивных задач списка по сохраненному счетчику.
+
+        :param todo_id: Идентификатор списка задач.
+        :type todo_id: int
+        :rtype: int
+        """
+        return db.session.scalar(select(ArchivedListStats.total).where(ArchivedListStats.todo_id == todo_id)) or 0
+
+    @staticmethod
+    def get_tasks(todo_id, query=None, page=1, per_page=50):
+        """
+        Возвращает страницу архивных задач списка, последние завершенные - первыми.
+
+        Строка поиска разбивается на слова; каждое слово должно встречаться в
+        заголовке или описании задачи (без учета регистра). Архив читается по
+        индексу ``ix_archived_task_todo_completed`` только для одного списка.
+
+        :param todo_id: Идентификатор списка задач.
+        :type todo_id: int
+        :param query: Строка поиска.
+        :type query: str, optional
+        :param page: Номер страницы, начиная с 1.
+        :type page: int
+        :param per_page: Количество задач на странице.
+        :type per_page: int
+        :return: Задачи страницы и признак того, что есть следующая страница.
+        :rtype: tuple[list[ArchivedTask], bool]
+        """
+        statement = select(ArchivedTask).where(ArchivedTask.todo_id == todo_id)
+        for term in (query or '').lower().split():
+            escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            pattern = f'%{escaped}%'
+            statement = statement.where(or_(func.lower(ArchivedTask.title).like(pattern, escape='\\'),
+                                            func.lower(ArchivedTask.description).like(pattern, escape='\\')))
+        tasks = db.session.scalars(
+            statement.order_by(ArchivedTask.completed_at.desc(), ArchivedTask.id.desc())
+            .limit(per_page + 1).offset((page - 1) * per_page)).all()
+        return tasks[:per_page], len(tasks) > per_page
+
+    @staticmethod
+    def delete_list(todo_id):
+        """
+        Удаляет архивные задачи и счетчики списка (вызывается при удалении списка, без фиксации).
+
+        :param todo_id: Идентификатор списка задач.
+        :type todo_id: int
+        """
+        db.session.execute(delete(ArchivedTask).where(ArchivedTask.todo_id == todo_id))
+        db.session.execute(delete(ArchivedListStats).where(ArchivedListStats.todo_id == todo_id))
@@ -0,0 +1,244 @@
+"""
+Доставка статических файлов и сжатие ответов.
+
+``StaticAssets`` при запуске приложения вычисляет хеш содержимого каждого
+статического файла: ``url_for('static', filename='styles.css')`` дает адрес
+вида ``/static/styles.1a2b3c4d5e6f.css``, который отдается с заголовком
+``Cache-Control: immutable`` на год. Сжатые gzip варианты текстовых файлов
+готовятся тогда же и хранятся в памяти.
+
+``Compression`` сжимает gzip HTML- и JSON-ответы больше порога, а потоковые
+HTML-страницы (см. ``streaming.stream_page``) - по блокам, по мере отправки.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import zlib
+
+from flask import Response, request, send_from_directory
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.html', '.json', '.txt')
+
+
+def accepts_gzip():
+    """
+    Проверяет, что клиент текущего запроса принимает ответы в gzip.
+
+    :return: True, если gzip указан в ``Accept-Encoding``.
+    :rtype: bool
+    """
+    return request.accept_encodings['gzip'] > 0
+
+
+def gzip_chunks(chunks, level=6):
+    """
+    Сжимает поток блоков в один gzip-поток по мере их отправки.
+
+    После каждого блока выполняется ``Z_SYNC_FLUSH``: клиент может распаковать
+    и показать все полученное, не дожидаясь конца потока.
+
+    :param chunks: Блоки ответа.
+    :type chunks: Iterable[str or bytes]
+    :param level: Степень сжатия.
+    :type level: int
+    :return: Сжатые блоки.
+    :rtype: Iterator[bytes]
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    try:
+        for chunk in chunks:
+            data = compressor.compress(chunk.encode() if isinstance(chunk, str) else chunk)
+            yield data + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+def fingerprinted_name(filename, digest):
+    """
+    Возвращает имя файла с хешем содержимого перед расширением.
+
+    :param filename: Путь к файлу относительно каталога статики.
+    :type filename: str
+    :param digest: Хеш содержимого.
+    :type digest: str
+    :return: Например, ``styles.1a2b3c4d5e6f.css``.
+    :rtype: str
+    """
+    stem, extension = os.path.splitext(filename)
+    return f'{stem}.{digest}{extension}'
+
+
+class StaticAssets:
+    """
+    Статические файлы с хешем содержимого в адресе.
+
+    Настройки: ``ASSETS_FINGERPRINT`` включает адреса с хешем, ``ASSETS_MAX_AGE`` -
+    срок кэширования таких адресов, ``COMPRESS_MIN_SIZE`` и ``COMPRESS_LEVEL`` -
+    порог и степень сжатия вариантов gzip.
+    """
+
+    def __init__(self, app=None):
+        self.manifest = {}
+        self.originals = {}
+        self.compressed = {}
+        self.max_age = 31536000
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Строит манифест статических файлов и подменяет обработчик ``static``.
+
+        :param app: Экземпляр приложения.
+        :type app: Flask
+        """
+        if not app.config.get('ASSETS_FINGERPRINT', True) or not app.has_static_folder:
+            return
+        self.max_age = app.config.get('ASSETS_MAX_AGE', self.max_age)
+        self.build(app.static_folder, app.config.get('COMPRESS_MIN_SIZE', 1024),
+                   app.config.get('COMPRESS_LEVEL', 6))
+        static_folder = app.static_folder
+        fallback = app.view_functions['static']
+
+        def static(filename):
+            original = self.originals.get(filename)
+            if original is None:
+                return fallback(filename=filename)
+            return self.send(static_folder, original)
+
+        app.view_functions['static'] = static
+        app.url_defaults(self._url_defaults)
+
+    def build(self, folder, min_size, level):
+        """
+        Вычисляет хеши статических файлов и готовит их сжатые варианты.
+
+        :param folder: Каталог статических файлов.
+        :type folder: str
+        :param min_size: Минимальный размер файла для сжатия (в байтах).
+        :type min_size: int
+        :param level: Степень сжатия gzip.
+        :type level: int
+        """
+        self.manifest, self.originals, self.compressed = {}, {}, {}
+        for root, _, files in os.walk(folder):
+            for name in files:
+                path = os.path.join(root, name)
+                filename = os.path.relpath(path, folder).replace(os.sep, '/')
+                with open(path, 'rb') as file:
+                    content = file.read()
+                digest = hashlib.sha256(content).hexdigest()[:12]
+                fingerprinted = fingerprinted_name(filename, digest)
+                self.manifest[filename] = fingerprinted
+                self.originals[fingerprinted] = filename
+                if filename.endswith(COMPRESSIBLE_EXTENSIONS) and len(content) >= min_size:
+                    self.compressed[filename] = (gzip.compress(content, level, mtime=0), digest)
+
+    def send(self, folder, filename):
+        """
+        Отдает статический файл по адресу с хешем: сжатый вариант, если клиент его принимает.
+
+        :param folder: Каталог статических файлов.
+        :type folder: str
+        :param filename: Путь к файлу без хеша.
+        :type filename: str
+        :return: Ответ с заголовками долгого кэширования.
+        :rtype: flask.Response
+        """
+        variant = self.compressed.get(filename)
+        if variant is not None and accepts_gzip():
+            body, digest = variant
+            response = Response(body, mimetype=mimetypes.guess_type(filename)[0])
+            response.headers['Content-Encoding'] = 'gzip'
+            response.set_etag(f'{digest}-gzip')
+        else:
+            response = send_from_directory(folder, filename, max_age=self.max_age)
+        response.headers['Cache-Control'] = f'public, max-age={self.max_age}, immutable'
+        if variant is not None:
+            response.vary.add('Accept-Encoding')
+        return response
+
+    def _url_defaults(self, endpoint, values):
+        """Подставляет имя файла с хешем в адреса ``url_for('static', ...)``."""
+        if endpoint == 'static' and values.get('filename') in self.manifest:
+            values['filename'] = self.manifest[values['filename']]
+
+
+class Compression:
+    """
+    Сжатие gzip HTML- и JSON-ответов.
+
+    Сжимаются ответы с типом из ``COMPRESS_MIMETYPES`` размером не меньше
+    ``COMPRESS_MIN_SIZE`` байт. Потоковые ответы (Server-Sent Events, календарь
+    по частям) сжимаются, только если их обработчик передал ответ в
+    ``compress_stream``: так сжимается потоковая страница списка задач.
+    """
+
+    def __init__(self, app=None):
+        self.mimetypes = ('text/html', 'application/json')
+        self.min_size = 1024
+        self.level = 6
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Подключает сжатие ответов к приложению.
+
+        :param app: Экземпляр приложения.
+        :type app: Flask
+        """
+        self.mimetypes = tuple(app.config.get('COMPRESS_MIMETYPES', self.mimetypes))
+        self.min_size = app.config.get('COMPRESS_MIN_SIZE', self.min_size)
+        self.level = app.config.get('COMPRESS_LEVEL', self.level)
+        if self.mimetypes:
+            app.after_request(self._compress)
+
+    def compress_stream(self, response):
+        """
+        Сжимает потоковый ответ по блокам, если клиент принимает gzip.
+
+        Каждый блок сжимается и отправляется сразу (см. ``gzip_chunks``), поэтому
+        первые байты страницы по-прежнему уходят клиенту до конца отрисовки.
+
+        :param response: Потоковый ответ.
+        :type response: flask.Response
+        :return: Тот же ответ.
+        :rtype: flask.Response
+        """
+        if response.mimetype not in self.mimetypes or 'Content-Encoding' in response.headers:
+            return response
+        response.vary.add('Accept-Encoding')
+        if accepts_gzip():
+            response.response = gzip_chunks(response.response, self.level)
+            response.headers['Content-Encoding'] = 'gzip'
+            response.headers.pop('Content-Length', None)
+        return response
+
+    def _compress(self, response):
+        """Сжимает подходящий ответ, если клиент принимает gzip."""
+        if (response.mimetype not in self.mimetypes or response.status_code < 200
+                or response.status_code in (204, 206, 304) or response.direct_passthrough
+                or response.is_streamed or 'Content-Encoding' in response.headers):
+            return response
+        response.vary.add('Accept-Encoding')
+        if not accepts_gzip():
+            return response
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+        response.set_data(gzip.compress(data, self.level))
+        response.headers['Content-Encoding'] = 'gzip'
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+
+static_assets = StaticAssets()
+compression = Compression()
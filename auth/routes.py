@@ -4,6 +4,7 @@ from flask import Blueprint, render_template, redirect, url_for, request, flash
 from flask_login import login_user, logout_user, login_required, current_user
 from users.utils import verify_password, hash_password
 from users.services import UserService
+from validation import parse_request, format_errors
 from .forms import RegistrationForm
 
 auth_blueprint = Blueprint('auth', __name__)
@@ -44,17 +45,19 @@ def register():
         return redirect(url_for('todo_list.index'))
 
     if request.method == 'POST':
-        user_form = RegistrationForm(**request.form)
+        user_form, errors = parse_request(RegistrationForm, request)
+        if errors:
+            flash(f'Check the input parameters: {format_errors(errors)}', 'error')
+            return redirect(url_for('auth.register'))
+
         if UserService.get_user(username=user_form.username):
             flash('This username already exists', 'error')
             return redirect(url_for('auth.register'))
-        
-        if user_form.model_validate(user_form):
-            user_form.password = hash_password(user_form.password)
-            UserService.register_user(**user_form.model_dump())
-            flash('You have successfully signed up!', 'success')
-            return redirect(url_for('auth.login'))
-        flash('Check the input parameters', 'error')
+
+        user_form.password = hash_password(user_form.password)
+        UserService.register_user(**user_form.model_dump())
+        flash('You have successfully signed up!', 'success')
+        return redirect(url_for('auth.login'))
 
     return render_template('auth/register.html')
 
@@ -0,0 +1,99 @@
+"""
+Бенчмарк страницы списка задач: отрисовка целиком против потоковой, без сжатия и с gzip.
+
+Для списка из N задач во временной базе SQLite (заполняется командой
+``flask seed``) измеряются время до первого байта ответа (TTFB), полное время
+ответа, размер тела и пиковый объем резидентной памяти процесса (peak RSS) при
+прогретом кэше меток списка. В режимах ``+gz`` клиент принимает gzip: страница
+целиком сжимается после отрисовки, а потоковая - по блокам. Каждый замер выполняется в отдельном процессе, потому что
+пиковый RSS процесса только растет.
+
+Запуск::
+
+    python benchmarks/bench_list_page.py [количество_задач ...]
+"""
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from config import Config
+from database import db
+from todo_list.services import LabelService
+
+MODES = {'render': (False, False), 'stream': (True, False), 'render+gz': (False, True), 'stream+gz': (True, True)}
+
+
+def make_config(path, stream):
+    """Возвращает конфигурацию с базой ``path`` и включенной или выключенной потоковой отрисовкой."""
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+        STREAM_TEMPLATES = stream
+        OVERDUE_SWEEP_INTERVAL = 0
+    return BenchConfig
+
+
+def seed(path, size):
+    """Создает пользователя с одним списком из ``size`` задач."""
+    app = create_app(make_config(path, True))
+    with app.app_context():
+        result = app.test_cli_runner().invoke(args=[
+            'seed', '--users', '1', '--lists-per-user', '1', '--tasks-per-list', str(size),
+            '--no-events', '--seed', '1'])
+        assert result.exit_code == 0, result.output
+        db.session.remove()
+
+
+def measure(path, mode):
+    """Запрашивает страницу списка и возвращает TTFB, полное время, размер ответа и пиковый RSS (в дочернем процессе)."""
+    stream, compressed = MODES[mode]
+    app = create_app(make_config(path, stream))
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = '1'
+        session['_fresh'] = True
+    with app.app_context():
+        # Индекс меток списка кэшируется после первого запроса; замеряется повторный запрос.
+        LabelService.get_index(1)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    headers = {'Accept-Encoding': 'gzip'} if compressed else {}
+    response = client.get('/todo_list/1', headers=headers, buffered=False)
+    chunks = iter(response.response)
+    size = len(next(chunks))
+    first_byte = time.perf_counter() - started
+    for chunk in chunks:
+        size += len(chunk)
+    total = time.perf_counter() - started
+    response.close()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {'ttfb': first_byte, 'total': total, 'size': size, 'baseline': baseline, 'peak': peak}
+
+
+def main(sizes):
+    """Выполняет замеры для всех размеров списка и всех способов отрисовки."""
+    print(f'{"tasks":>8} {"mode":<10} {"TTFB":>10} {"total":>10} {"body":>10} {"peak RSS":>10} {"growth":>10}')
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench.db')
+            seed(path, size)
+            for mode in MODES:
+                output = subprocess.run([sys.executable, __file__, '--measure', path, mode],
+                                        check=True, capture_output=True, text=True).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                print(f'{size:>8} {mode:<10} {result["ttfb"] * 1e3:>7.1f} ms {result["total"] * 1e3:>7.1f} ms '
+                      f'{result["size"] / 2 ** 20:>6.1f} MiB {result["peak"] / 1024:>6.1f} MiB '
+                      f'{(result["peak"] - result["baseline"]) / 1024:>6.1f} MiB')
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--measure']:
+        print(json.dumps(measure(sys.argv[2], sys.argv[3])))
+    else:
+        main([int(size) for size in sys.argv[1:]] or [10000, 100000])
@@ -0,0 +1,88 @@
+"""
+Бенчмарк ответов JSON API: полный набор полей против выборочного, JSON против MessagePack.
+
+Для списка из N задач во временной базе SQLite измеряются время выборки и
+кодирования ответа и размер тела ответа. MessagePack измеряется, если
+установлен пакет ``msgpack``.
+
+Запуск::
+
+    python benchmarks/bench_serialization.py [количество_задач]
+"""
+import json
+import os
+import sys
+import tempfile
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import insert
+
+from app import create_app
+from config import Config
+from database import db
+from serialization import _msgpack, rows_payload
+from todo_list import ranking
+from todo_list.models import Task, TodoList
+from todo_list.routes import TASK_FIELDS
+from todo_list.services import TaskService
+
+REPEAT = 5
+FIELDSETS = {
+    'all fields': None,
+    'id,title,deadline_date': 'id,title,deadline_date',
+}
+
+
+def seed(size):
+    """Создает один список с ``size`` задачами."""
+    db.session.add(TodoList(id=1, title='Benchmark', user_id=1))
+    now = datetime.now()
+    db.session.execute(insert(Task), [{
+        'title': f'Task {index}',
+        'description': 'Lorem ipsum dolor sit amet, consectetur adipiscing elit.',
+        'deadline_date': now + timedelta(hours=index),
+        'priority': index % 10,
+        'status': 'active',
+        'is_complete': False,
+        'created_at': now,
+        'todo_id': 1,
+        'rank': rank,
+    } for index, rank in enumerate(ranking.keys_between(None, None, size))])
+    db.session.commit()
+
+
+def report(name, func, size):
+    """Печатает лучшее время вызова в миллисекундах и размер ответа в килобайтах."""
+    body = func()
+    best = min(timeit.repeat(func, number=1, repeat=REPEAT))
+    print(f'{name:<44} {best * 1e3:9.2f} ms {len(body) / 1024:10.1f} KiB {best / size * 1e6:8.2f} us/task')
+
+
+def main(size):
+    """Выполняет замеры для всех наборов полей и кодировок."""
+    msgpack = _msgpack()
+    with tempfile.TemporaryDirectory() as directory:
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f'sqlite:///{os.path.join(directory, "bench.db")}'
+
+        app = create_app(BenchConfig)
+        with app.app_context():
+            db.create_all()
+            seed(size)
+            for label, fields in FIELDSETS.items():
+                columns, _ = TASK_FIELDS.parse(fields)
+                report(f'{label} / json', lambda: json.dumps(
+                    {'tasks': rows_payload(TaskService.select_tasks(1, columns))}).encode(), size)
+                if msgpack is not None:
+                    report(f'{label} / msgpack', lambda: msgpack.packb(
+                        {'tasks': rows_payload(TaskService.select_tasks(1, columns))}), size)
+            if msgpack is None:
+                print('msgpack не установлен: замеры MessagePack пропущены.')
+            db.session.remove()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,58 @@
+"""
+Бенчмарк холодного старта воркера.
+
+Каждый замер выполняется в отдельном интерпретаторе: импорт приложения,
+``create_app(ProductionConfig)`` и первый запрос к странице входа.
+
+Запуск::
+
+    python benchmarks/bench_startup.py [количество_замеров]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+PROBE = '''
+import json, time
+start = time.perf_counter()
+from app import create_app
+from config import ProductionConfig
+imported = time.perf_counter()
+app = create_app(ProductionConfig)
+created = time.perf_counter()
+response = app.test_client().get('/login')
+assert response.status_code == 200, response.status_code
+done = time.perf_counter()
+print(json.dumps({'import': imported - start, 'create_app': created - imported,
+                  'first_request': done - created, 'total': done - start}))
+'''
+
+
+def run(runs):
+    """
+    Выполняет замеры и печатает медианы по этапам в миллисекундах.
+
+    :param runs: Количество замеров.
+    :type runs: int
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        subprocess.run([sys.executable, '-m', 'flask', '--app', 'wsgi', 'init-db'],
+                       cwd=ROOT, env=env, check=True, capture_output=True)
+        samples = []
+        for _ in range(runs):
+            output = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, env=env,
+                                    check=True, capture_output=True, text=True).stdout
+            samples.append(json.loads(output))
+    for stage in ('import', 'create_app', 'first_request', 'total'):
+        median = statistics.median(sample[stage] for sample in samples)
+        print(f'{stage:<14} {median * 1000:8.1f} ms')
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
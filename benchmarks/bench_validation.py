@@ -0,0 +1,68 @@
+"""
+Микробенчмарк валидации форм.
+
+Сравнивает прежний путь маршрутов (``Form(**request.form)`` и ``form.model_validate(form)``)
+с единым слоем ``validation`` для одной формы и для пакета задач.
+
+Запуск::
+
+    python benchmarks/bench_validation.py
+"""
+import os
+import sys
+import timeit
+
+from werkzeug.datastructures import ImmutableMultiDict
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from todo_list.forms import TaskCreateForm
+from validation import parse_form, parse_many
+
+FORM = ImmutableMultiDict({
+    'title': 'Купить молоко',
+    'description': 'Обезжиренное',
+    'deadline_date': '2024-05-01T10:30',
+})
+BATCH = [dict(FORM) for _ in range(100)]
+NUMBER = 20000
+
+
+def legacy_single():
+    """Прежний путь: конструктор модели и повторная проверка экземпляра."""
+    form = TaskCreateForm(**FORM, todo_id=1)
+    form.model_validate(form)
+    return form
+
+
+def layer_single():
+    """Единый слой: один проход скомпилированного валидатора."""
+    return parse_form(TaskCreateForm, FORM, todo_id=1)
+
+
+def legacy_batch():
+    """Прежний путь для пакета: по одной модели на элемент."""
+    forms = []
+    for item in BATCH:
+        form = TaskCreateForm(**item, todo_id=1)
+        form.model_validate(form)
+        forms.append(form)
+    return forms
+
+
+def layer_batch():
+    """Единый слой для пакета: один валидатор ``list[TaskCreateForm]``."""
+    return parse_many(TaskCreateForm, BATCH, todo_id=1)
+
+
+def report(name, func, number):
+    """Печатает среднее время одного вызова в микросекундах."""
+    best = min(timeit.repeat(func, number=number, repeat=5))
+    print(f'{name:<28} {best / number * 1e6:10.2f} us/call')
+
+
+if __name__ == '__main__':
+    report('legacy single form', legacy_single, NUMBER)
+    report('validation.parse_form', layer_single, NUMBER)
+    report('legacy batch (100 items)', legacy_batch, NUMBER // 100)
+    report('validation.parse_many', layer_batch, NUMBER // 100)
@@ -0,0 +1,437 @@
+"""Кэш с подключаемыми хранилищами для результатов запросов и записей моделей."""
+
+import pickle
+import time
+import uuid
+from collections import OrderedDict
+from threading import Lock
+
+from flask import current_app
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.util import identity_key
+
+from database import db
+
+MISSING = object()
+
+
+class LocalBackend:
+    """
+    Хранилище в памяти процесса: LRU ограниченного размера со сроком жизни записей.
+
+    :param maxsize: Максимальное количество записей.
+    :type maxsize: int
+    """
+
+    shared = False
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        """
+        Возвращает значение по ключу.
+
+        :param key: Ключ.
+        :type key: str
+        :return: Значение или ``MISSING``, если записи нет или ее срок истек.
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return MISSING
+            expires_at, value = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        """
+        Сохраняет значение, вытесняя самую старую запись при переполнении.
+
+        :param key: Ключ.
+        :type key: str
+        :param value: Значение.
+        :param ttl: Срок жизни записи в секундах; None - бессрочно.
+        :type ttl: float, optional
+        """
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def add(self, key, value, ttl=None):
+        """
+        Сохраняет значение, только если ключа еще нет.
+
+        :param key: Ключ.
+        :type key: str
+        :param value: Значение.
+        :param ttl: Срок жизни записи в секундах.
+        :type ttl: float, optional
+        :return: True, если значение сохранено.
+        :rtype: bool
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and (item[0] is None or item[0] > time.monotonic()):
+                return False
+            self._data[key] = (time.monotonic() + ttl if ttl else None, value)
+            return True
+
+    def delete(self, *keys):
+        """
+        Удаляет записи, если они есть.
+
+        :param keys: Ключи.
+        :type keys: str
+        """
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        """Удаляет все записи."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisBackend:
+    """
+    Сетевое хранилище поверх Redis, общее для всех процессов приложения.
+
+    Значения сериализуются через pickle, поэтому хранилище должно быть доступно
+    только приложению.
+
+    :param url: Адрес сервера Redis.
+    :type url: str
+    :param prefix: Префикс ключей.
+    :type prefix: str
+    :param client: Готовый клиент Redis (например, локальная замена в тестах).
+    :type client: object, optional
+    """
+
+    shared = True
+
+    def __init__(self, url=None, prefix='cache:', client=None):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        """
+        Возвращает значение по ключу.
+
+        :param key: Ключ.
+        :type key: str
+        :return: Значение или ``MISSING``.
+        """
+        data = self.client.get(self.prefix + key)
+        return MISSING if data is None else pickle.loads(data)
+
+    def set(self, key, value, ttl=None):
+        """
+        Сохраняет значение.
+
+        :param key: Ключ.
+        :type key: str
+        :param value: Значение.
+        :param ttl: Срок жизни записи в секундах.
+        :type ttl: float, optional
+        """
+        self.client.set(self.prefix + key, pickle.dumps(value), px=int(ttl * 1000) if ttl else None)
+
+    def add(self, key, value, ttl=None):
+        """
+        Сохраняет значение, только если ключа еще нет (``SET NX``).
+
+        :param key: Ключ.
+        :type key: str
+        :param value: Значение.
+        :param ttl: Срок жизни записи в секундах.
+        :type ttl: float, optional
+        :return: True, если значение сохранено.
+        :rtype: bool
+        """
+        return bool(self.client.set(self.prefix + key, pickle.dumps(value), nx=True,
+                                    px=int(ttl * 1000) if ttl else None))
+
+    def delete(self, *keys):
+        """
+        Удаляет записи.
+
+        :param keys: Ключи.
+        :type keys: str
+        """
+        if keys:
+            self.client.delete(*(self.prefix + key for key in keys))
+
+    def clear(self):
+        """Удаляет все записи с префиксом хранилища."""
+        keys = list(self.client.scan_iter(match=self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+
+class Cache:
+    """
+    Кэш приложения со сквозным чтением (read-through).
+
+    Хранилище выбирается настройкой ``CACHE_BACKEND`` (``local`` или ``redis``).
+    При одновременных промахах по одному ключу загрузка выполняется один раз:
+    внутри процесса - под блокировкой ключа, между процессами - под
+    блокировкой в общем хранилище.
+
+    Удаление записи меняет версию ее ключа (``version_key``). Загруженное
+    значение сохраняется, только если версия не изменилась за время загрузки:
+    иначе читатель, загрузивший строку до фиксации параллельной записи, вернул
+    бы ее в кэш уже после сброса, и устаревшее значение жило бы до истечения срока.
+
+    :param stripes: Количество блокировок, между которыми распределяются ключи.
+    :type stripes: int
+    """
+
+    def __init__(self, stripes=64):
+        self._locks = [Lock() for _ in range(stripes)]
+
+    def init_app(self, app):
+        """
+        Подключает кэш к приложению.
+
+        Каждое приложение получает собственное хранилище, поэтому данные разных
+        экземпляров приложения (например, в тестах) не смешиваются.
+
+        :param app: Экземпляр приложения.
+        :type app: Flask
+        """
+        if app.config.get('CACHE_BACKEND', 'local') == 'redis':
+            backend = RedisBackend(app.config['CACHE_REDIS_URL'])
+        else:
+            backend = LocalBackend(app.config.get('CACHE_MAXSIZE', 10000))
+        app.extensions['cache'] = backend
+
+    @property
+    def backend(self):
+        """Хранилище текущего приложения."""
+        return current_app.extensions['cache']
+
+    @property
+    def default_ttl(self):
+        """Срок жизни записей по умолчанию в секундах."""
+        return current_app.config.get('CACHE_DEFAULT_TTL', 300)
+
+    def get(self, key, default=None):
+        """
+        Возвращает значение по ключу.
+
+        :param key: Ключ.
+        :type key: str
+        :param default: Значение, возвращаемое при промахе.
+        :return: Значение из кэша или ``default``.
+        """
+        value = self.backend.get(key)
+        return default if value is MISSING else value
+
+    def set(self, key, value, ttl=None):
+        """
+        Сохраняет значение.
+
+        :param key: Ключ.
+        :type key: str
+        :param value: Значение.
+        :param ttl: Срок жизни записи в секундах; по умолчанию ``CACHE_DEFAULT_TTL``.
+        :type ttl: float, optional
+        """
+        self.backend.set(key, value, ttl or self.default_ttl)
+
+    def delete(self, *keys):
+        """
+        Удаляет записи и меняет версии их ключей.
+
+        Новая версия не дает сохранить значения, загрузка которых началась до
+        удаления (см. ``get_or_set``).
+
+        :param keys: Ключи.
+        :type keys: str
+        """
+        backend = self.backend
+        backend.delete(*keys)
+        version = uuid.uuid4().hex
+        for key in keys:
+            backend.set(version_key(key), version, self.default_ttl)
+
+    def clear(self):
+        """Удаляет все записи."""
+        self.backend.clear()
+
+    def get_or_set(self, key, loader, ttl=None):
+        """
+        Возвращает значение из кэша, а при промахе загружает и сохраняет его.
+
+        Результат ``None`` не кэшируется, как и результат, ключ которого был
+        удален (``delete``) во время загрузки: его возвращает только этот вызов.
+
+        :param key: Ключ.
+        :type key: str
+        :param loader: Функция без аргументов, загружающая значение.
+        :type loader: callable
+        :param ttl: Срок жизни записи в секундах.
+        :type ttl: float, optional
+        :return: Значение.
+        """
+        backend = self.backend
+        value = backend.get(key)
+        if value is not MISSING:
+            return value
+        with self._locks[hash(key) % len(self._locks)]:
+            value = backend.get(key)
+            if value is not MISSING:
+                return value
+            lock_key = None
+            if backend.shared:
+                lock_key, value = self._acquire_shared(backend, key)
+                if value is not MISSING:
+                    return value
+            try:
+                version = backend.get(version_key(key))
+                value = loader()
+                if value is not None and backend.get(version_key(key)) == version:
+                    backend.set(key, value, ttl or self.default_ttl)
+            finally:
+                if lock_key is not None:
+                    backend.delete(lock_key)
+        return value
+
+    def _acquire_shared(self, backend, key):
+        """
+        Захватывает блокировку загрузки ключа в общем хранилище.
+
+        Пока блокировку держит другой процесс, ожидает появления значения.
+
+        :return: Ключ захваченной блокировки (или None) и значение, если его успел загрузить другой процесс.
+        :rtype: tuple[str or None, object]
+        """
+        timeout = current_app.config.get('CACHE_LOCK_TIMEOUT', 5)
+        lock_key = f'lock:{key}'
+        deadline = time.monotonic() + timeout
+        while not backend.add(lock_key, 1, timeout):
+            if time.monotonic() >= deadline:
+                return None, MISSING
+            time.sleep(0.01)
+            value = backend.get(key)
+            if value is not MISSING:
+                return None, value
+        return lock_key, MISSING
+
+    def get_entity(self, model, ident, ttl=None):
+        """
+        Возвращает запись модели по первичному ключу через кэш.
+
+        Сначала проверяется карта идентичности текущей сессии, затем кэш
+        (в нем хранятся значения колонок), и только потом база данных.
+        Восстановленный из кэша объект присоединяется к сессии без запроса
+        к базе; связи загружаются лениво, как обычно.
+
+        :param model: Класс модели.
+        :type model: type
+        :param ident: Значение первичного ключа.
+        :type ident: int
+        :param ttl: Срок жизни записи в секундах.
+        :type ttl: float, optional
+        :return: Экземпляр модели или None, если запись не найдена.
+        """
+        instance = db.session.identity_map.get(identity_key(model, ident))
+        if instance is not None:
+            return instance
+        row = self.get_or_set(entity_key(model, ident), lambda: _load_row(model, ident), ttl)
+        return None if row is None else attach_row(model, row)
+
+    def invalidate_entity(self, model, *idents):
+        """
+        Удаляет из кэша записи модели.
+
+        :param model: Класс модели.
+        :type model: type
+        :param idents: Значения первичного ключа.
+        :type idents: int
+        """
+        self.delete(*(entity_key(model, ident) for ident in idents))
+
+
+def version_key(key):
+    """
+    Возвращает ключ версии записи кэша.
+
+    :param key: Ключ записи.
+    :type key: str
+    :return: Ключ версии.
+    :rtype: str
+    """
+    return f'version:{key}'
+
+
+def entity_key(model, ident):
+    """
+    Возвращает ключ кэша для записи модели.
+
+    :param model: Класс модели.
+    :type model: type
+    :param ident: Значение первичного ключа.
+    :type ident: int
+    :return: Ключ.
+    :rtype: str
+    """
+    return f'{model.__tablename__}:{ident}'
+
+
+def row_of(instance):
+    """
+    Возвращает значения колонок экземпляра модели.
+
+    :param instance: Экземпляр модели.
+    :return: Словарь ``{колонка: значение}``.
+    :rtype: dict
+    """
+    return {attr.key: getattr(instance, attr.key) for attr in inspect(instance).mapper.column_attrs}
+
+
+def _load_row(model, ident):
+    """Загружает значения колонок записи из базы данных."""
+    instance = db.session.get(model, ident)
+    return None if instance is None else row_of(instance)
+
+
+def attach_row(model, row):
+    """
+    Восстанавливает экземпляр модели из значений колонок и присоединяет его к сессии.
+
+    :param model: Класс модели.
+    :type model: type
+    :param row: Значения колонок.
+    :type row: dict
+    :return: Экземпляр модели в состоянии persistent.
+    """
+    mapper = inspect(model)
+    key = identity_key(model, tuple(row[column.key] for column in mapper.primary_key))
+    instance = db.session.identity_map.get(key)
+    if instance is not None:
+        return instance
+    instance = model(**row)
+    make_transient_to_detached(instance)
+    db.session.add(instance)
+    return instance
+
+
+cache = Cache()
@@ -1,8 +1,102 @@
 """Настройки конфигурации приложения."""
 
+import os
+
 class Config:
     """Базовая конфигурация приложения."""
     
     SECRET_KEY = 'my_secret_key'  # Секретный ключ для защиты сессий и форм
     SQLALCHEMY_DATABASE_URI = 'sqlite:///database.db'  # Путь к базе данных SQLite
     SQLALCHEMY_TRACK_MODIFICATIONS = False  # Отключает отслеживание изменений объектов и сигналы SQLAlchemy
+    SCHEMA_AUTO_CREATE = True  # Создавать таблицы при запуске (в production - командой flask init-db)
+    OVERDUE_SWEEP_INTERVAL = 60  # Интервал (в секундах) между проходами по просроченным задачам
+    OVERDUE_SWEEP_ON_REQUEST = False  # Выполнять проходы перед запросами (для разработки без flask sweep-overdue --loop)
+    RANK_REBALANCE_LENGTH = 24  # Длина ключа порядка задачи, после которой ключи списка переписываются (0 - только командой)
+    PUBSUB_TRANSPORT = 'local'  # Транспорт событий между процессами: 'local' или 'redis'
+    PUBSUB_REDIS_URL = 'redis://localhost:6379/0'  # Адрес Redis для транспорта 'redis'
+    PUBSUB_QUEUE_SIZE = 100  # Размер очереди событий каждого подписчика
+    SSE_KEEPALIVE_INTERVAL = 15  # Интервал keep-alive потока событий списка (в секундах); перед ним проверяются права
+    SSE_MAX_STREAMS = 0  # Максимум одновременных потоков событий в процессе (0 - без ограничения), сверх него - 503
+    CACHE_BACKEND = 'local'  # Хранилище кэша: 'local' (память процесса) или 'redis'
+    CACHE_REDIS_URL = 'redis://localhost:6379/1'  # Адрес Redis для хранилища 'redis'
+    CACHE_MAXSIZE = 10000  # Максимальное количество записей локального кэша
+    CACHE_DEFAULT_TTL = 300  # Срок жизни записей кэша по умолчанию (в секундах)
+    CACHE_LOCK_TIMEOUT = 5  # Максимальное ожидание загрузки значения другим процессом (в секундах)
+    UNIT_OF_WORK = True  # Фиксировать изменения один раз в конце запроса
+    ASSETS_FINGERPRINT = True  # Адреса статических файлов с хешем содержимого
+    ASSETS_MAX_AGE = 31536000  # Срок кэширования статических файлов с хешем (в секундах)
+    COMPRESS_MIMETYPES = ('text/html', 'application/json')  # Типы ответов, сжимаемых gzip
+    COMPRESS_MIN_SIZE = 1024  # Минимальный размер сжимаемого ответа или файла (в байтах)
+    COMPRESS_LEVEL = 6  # Степень сжатия gzip
+    STREAM_TEMPLATES = True  # Отдавать большие страницы (список задач) потоком по мере отрисовки
+    STREAM_BUFFER_SIZE = 16384  # Размер блока потоковой страницы (в символах)
+    STREAM_BATCH_SIZE = 500  # Количество задач, читаемых из базы за раз при потоковой отрисовке
+    MAIL_BACKEND = 'local'  # Отправка писем: 'local' (в память процесса) или 'smtp'
+    MAIL_SERVER = 'localhost'  # Адрес SMTP-сервера
+    MAIL_PORT = 25  # Порт SMTP-сервера
+    MAIL_USERNAME = None  # Имя пользователя SMTP-сервера
+    MAIL_PASSWORD = None  # Пароль SMTP-сервера
+    MAIL_USE_TLS = False  # Включать STARTTLS
+    MAIL_TIMEOUT = 10  # Таймаут операций с SMTP-сервером (в секундах)
+    MAIL_POOL_SIZE = 4  # Максимальное количество одновременно открытых SMTP-соединений
+    MAIL_BATCH_SIZE = 50  # Количество писем, отправляемых по одному соединению подряд
+    MAIL_SENDER = 'noreply@localhost'  # Адрес отправителя уведомлений
+    OUTBOX_BATCH_SIZE = 500  # Максимальное количество уведомлений, забираемых за один проход
+    OUTBOX_LEASE = 300  # Время, на которое уведомления закрепляются за обработчиком (в секундах)
+    OUTBOX_MAX_ATTEMPTS = 5  # Количество попыток отправки уведомления
+    OUTBOX_RETRY_DELAY = 60  # Задержка перед первой повторной попыткой (в секундах), далее удваивается
+    OUTBOX_RETENTION_DAYS = 7  # Срок хранения отправленных уведомлений (в днях)
+    ARCHIVE_AFTER_DAYS = 90  # Через сколько дней после завершения задача переносится в архив
+    ARCHIVE_BATCH_SIZE = 500  # Количество деревьев задач, переносимых в архив одной транзакцией
+    ARCHIVE_PAGE_SIZE = 50  # Количество архивных задач на странице архива списка
+    TASK_REVISION_LIMIT = 20  # Количество последних правок, хранимых в истории задачи (0 - без ограничения)
+    RATELIMIT_ENABLED = True  # Ограничивать частоту запросов клиентов
+    RATELIMIT_BACKEND = 'local'  # Хранилище лимитов: 'local' (память процесса) или 'redis' (общее для воркеров)
+    RATELIMIT_REDIS_URL = 'redis://localhost:6379/2'  # Адрес Redis для хранилища 'redis'
+    RATELIMIT_MAXSIZE = 10000  # Максимальное количество клиентов в локальном хранилище лимитов
+    RATELIMIT_LIMITS = {  # Группа запросов: (допустимый всплеск, период пополнения в секундах)
+        'auth': (10, 60),
+        'write': (120, 60),
+        'read': (600, 60),
+    }
+    TRACING_ENABLED = False  # Записывать трассы запросов (интервалы запроса, сервисов, SQL и шаблонов)
+    TRACING_SAMPLE_RATE = 1.0  # Доля трассируемых запросов без заголовка traceparent
+    TRACING_EXPORTER = 'local'  # Экспорт трасс: 'local' (память процесса), 'file' или 'otlp'
+    TRACING_FILE = 'traces.jsonl'  # Файл для экспортера 'file' (строка OTLP/JSON на трассу)
+    TRACING_OTLP_ENDPOINT = 'http://localhost:4318/v1/traces'  # Адрес коллектора для экспортера 'otlp'
+    TRACING_SERVICE_NAME = 'task-scheduler'  # Имя сервиса в экспортируемых трассах
+    TRACING_TOOLBAR = False  # Добавлять панель со сводкой трассы на HTML-страницы
+    SLOW_QUERY_THRESHOLD = 100  # Порог медленного SQL-запроса в миллисекундах (None отключает журнал)
+    SLOW_QUERY_REPORT_INTERVAL = 3600  # Период сводки самых затратных запросов в секундах (0 - без сводки)
+    SLOW_QUERY_REPORT_TOP = 10  # Количество отпечатков запросов в сводке
+    SLOW_QUERY_MAX_FINGERPRINTS = 1000  # Максимальное количество отдельно учитываемых отпечатков запросов
+
+
+class ProductionConfig(Config):
+    """Конфигурация для запуска под production WSGI-сервером."""
+
+    SECRET_KEY = os.environ.get('SECRET_KEY', Config.SECRET_KEY)
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', Config.SQLALCHEMY_DATABASE_URI)
+    SCHEMA_AUTO_CREATE = False  # Схема создается один раз командой flask init-db, а не в каждом воркере
+    # Воркеров несколько, поэтому события, кэш и лимиты по умолчанию хранятся в общем Redis
+    PUBSUB_TRANSPORT = os.environ.get('PUBSUB_TRANSPORT', 'redis')
+    PUBSUB_REDIS_URL = os.environ.get('PUBSUB_REDIS_URL', Config.PUBSUB_REDIS_URL)
+    # Поток событий держит поток gthread-воркера все время соединения: по умолчанию
+    # потокам событий отдается не больше половины потоков воркера (THREADS в gunicorn.conf.py)
+    SSE_MAX_STREAMS = int(os.environ.get('SSE_MAX_STREAMS', max(1, int(os.environ.get('THREADS', 8)) // 2)))
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'redis')
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', Config.CACHE_REDIS_URL)
+    RATELIMIT_BACKEND = os.environ.get('RATELIMIT_BACKEND', 'redis')
+    RATELIMIT_REDIS_URL = os.environ.get('RATELIMIT_REDIS_URL', Config.RATELIMIT_REDIS_URL)
+    MAIL_BACKEND = os.environ.get('MAIL_BACKEND', 'smtp')
+    MAIL_SERVER = os.environ.get('MAIL_SERVER', Config.MAIL_SERVER)
+    MAIL_PORT = int(os.environ.get('MAIL_PORT', Config.MAIL_PORT))
+    MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
+    MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
+    MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS') == '1'
+    MAIL_SENDER = os.environ.get('MAIL_SENDER', Config.MAIL_SENDER)
+    TRACING_ENABLED = os.environ.get('TRACING_ENABLED') == '1'
+    TRACING_SAMPLE_RATE = float(os.environ.get('TRACING_SAMPLE_RATE', 0.01))
+    TRACING_EXPORTER = os.environ.get('TRACING_EXPORTER', 'otlp')
+    TRACING_OTLP_ENDPOINT = os.environ.get('TRACING_OTLP_ENDPOINT', Config.TRACING_OTLP_ENDPOINT)
+    SLOW_QUERY_THRESHOLD = float(os.environ.get('SLOW_QUERY_THRESHOLD', Config.SLOW_QUERY_THRESHOLD))
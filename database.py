@@ -1,5 +1,109 @@
 """Настройки базы данных."""
 
+import click
+from flask.cli import with_appcontext
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import MetaData, inspect
+from sqlalchemy.schema import CreateIndex, CreateTable, DropTable
 
-db = SQLAlchemy()
\ No newline at end of file
+db = SQLAlchemy()
+
+# Таблицы, в которые переносятся строки с прежними идентификаторами: новые
+# идентификаторы не должны совпадать с перенесенными (задачи в архиве).
+AUTOINCREMENT_FLOORS = {'task': ('archived_task',)}
+
+
+def dispose_engines(app):
+    """
+    Сбрасывает пулы соединений приложения.
+
+    Вызывается в дочернем процессе после fork, чтобы воркеры не использовали
+    соединения SQLite, открытые в родительском процессе. Сами соединения
+    родителя не закрываются (``close=False``).
+
+    :param app: Экземпляр приложения.
+    :type app: Flask
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+def create_schema():
+    """
+    Создает недостающие таблицы и их индексы.
+
+    В отличие от ``db.create_all`` индексы каждой таблицы создаются в порядке
+    имен. Если несколько индексов оцениваются SQLite одинаково (например, все
+    индексы задач начинаются с ``todo_id``), планировщик выбирает первый из них,
+    поэтому планы запросов совпадают во всех базах (см. ``tests/test_query_plans.py``).
+
+    Таблицы SQLite, созданные до появления в модели ``sqlite_autoincrement``,
+    пересоздаются с AUTOINCREMENT (см. ``_migrate_autoincrement``).
+    """
+    with db.engine.begin() as connection:
+        existing = set(inspect(connection).get_table_names())
+        for table in db.metadata.sorted_tables:
+            if table.name in existing:
+                continue
+            _create_table(connection, table)
+        if connection.dialect.name == 'sqlite':
+            for table in db.metadata.sorted_tables:
+                if table.name in existing and table.dialect_options['sqlite']['autoincrement']:
+                    _migrate_autoincrement(connection, table)
+
+
+def _create_table(connection, table):
+    """Создает таблицу и ее индексы в порядке имен."""
+    connection.execute(CreateTable(table))
+    for index in sorted(table.indexes, key=lambda index: index.name):
+        connection.execute(CreateIndex(index))
+
+
+def _migrate_autoincrement(connection, table):
+    """
+    Пересоздает таблицу SQLite с AUTOINCREMENT, если она создана без него.
+
+    Без AUTOINCREMENT SQLite выдает новой строке наибольший идентификатор
+    удаленной строки, и, например, новая задача получала бы идентификатор
+    задачи, перенесенной в архив. Строки копируются с прежними
+    идентификаторами, а счетчик ``sqlite_sequence`` начинается не ниже
+    наибольшего идентификатора в таблицах из ``AUTOINCREMENT_FLOORS``.
+    Внешние ключи SQLite в приложении не включаются, поэтому удаление
+    старой таблицы не затрагивает ссылающиеся на нее строки.
+
+    :param connection: Соединение в открытой транзакции.
+    :type connection: sqlalchemy.engine.Connection
+    :param table: Таблица модели.
+    :type table: sqlalchemy.Table
+    """
+    sql = connection.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table.name,)).scalar()
+    if sql is None or 'AUTOINCREMENT' in sql.upper():
+        return
+    metadata = MetaData()
+    for other in table.metadata.sorted_tables:
+        other.to_metadata(metadata)
+    rebuilt = table.to_metadata(metadata, name=f'{table.name}_rebuild')
+    columns = ', '.join(f'"{column.name}"' for column in table.columns)
+    connection.execute(CreateTable(rebuilt))
+    connection.exec_driver_sql(f'INSERT INTO "{rebuilt.name}" ({columns}) SELECT {columns} FROM "{table.name}"')
+    connection.execute(DropTable(table))
+    connection.exec_driver_sql(f'ALTER TABLE "{rebuilt.name}" RENAME TO "{table.name}"')
+    for index in sorted(table.indexes, key=lambda index: index.name):
+        connection.execute(CreateIndex(index))
+    floor = max([0, *(connection.exec_driver_sql(f'SELECT MAX(id) FROM "{name}"').scalar() or 0
+                      for name in AUTOINCREMENT_FLOORS.get(table.name, ()))])
+    connection.exec_driver_sql(
+        "INSERT INTO sqlite_sequence (name, seq) SELECT ?, 0 "
+        "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = ?)", (table.name, table.name))
+    connection.exec_driver_sql(
+        'UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?', (floor, table.name))
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Создает таблицы базы данных."""
+    create_schema()
+    click.echo('Схема базы данных создана.')
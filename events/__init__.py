@@ -0,0 +1 @@
+"""Инициализация приложения events: журнал событий задач и построенные по нему проекции."""
@@ -0,0 +1,49 @@
+"""Команды CLI журнала событий."""
+
+import time
+
+import click
+from flask.cli import AppGroup
+
+from events.projections import PROJECTIONS, ProjectionService
+from events.services import EventLog
+
+events_command = AppGroup('events', help='Журнал событий задач и проекции.')
+
+
+@events_command.command('project')
+@click.option('--batch-size', default=1000, show_default=True, help='Количество событий в пачке.')
+@click.option('--loop', is_flag=True, help='Работать постоянно, проверяя журнал каждые --interval секунд.')
+@click.option('--interval', type=click.FloatRange(0), default=5, show_default=True,
+              help='Пауза между проверками журнала в режиме --loop (в секундах).')
+def project_command(batch_size, loop, interval):
+    """Догоняет журнал во всех проекциях от их контрольных точек."""
+    while True:
+        result = ProjectionService.catch_up_all(batch_size)
+        if any(result.values()) or not loop:
+            for name, processed in result.items():
+                click.echo(f'{name}: учтено событий - {processed}.')
+        if not loop:
+            break
+        time.sleep(interval)
+
+
+@events_command.command('replay')
+@click.argument('name', type=click.Choice(sorted(PROJECTIONS) + ['all']))
+@click.option('--batch-size', default=10000, show_default=True, help='Количество событий в пачке.')
+def replay_command(name, batch_size):
+    """Строит проекцию NAME (или все проекции) заново с начала журнала."""
+    for projection in (sorted(PROJECTIONS) if name == 'all' else [name]):
+        processed = ProjectionService.replay(projection, batch_size)
+        click.echo(f'{projection}: построена заново, учтено событий - {processed}.')
+
+
+@events_command.command('backfill')
+@click.option('--batch-size', default=1000, show_default=True, help='Количество записей в пачке.')
+def backfill_command(batch_size):
+    """Заполняет пустой журнал событиями создания существующих списков и задач."""
+    try:
+        added = EventLog.backfill(batch_size)
+    except RuntimeError as exc:
+        raise click.ClickException(str(exc))
+    click.echo(f'Добавлено событий: {added}.')
@@ -0,0 +1,163 @@
+"""Модели данных для журнала событий и его проекций."""
+
+from datetime import datetime
+from database import db
+
+
+class EventType:
+    """
+    Типы событий журнала.
+
+    В журнале тип хранится числовым кодом, чтобы строки оставались компактными.
+    """
+    TODO_CREATED = 1
+    TODO_UPDATED = 2
+    TODO_DELETED = 3
+    TASK_CREATED = 4
+    TASK_UPDATED = 5
+    TASK_COMPLETED = 6
+    TASK_DELETED = 7
+    MEMBER_ADDED = 8
+    MEMBER_REMOVED = 9
+
+    NAMES = {
+        TODO_CREATED: 'todo_created',
+        TODO_UPDATED: 'todo_updated',
+        TODO_DELETED: 'todo_deleted',
+        TASK_CREATED: 'task_created',
+        TASK_UPDATED: 'task_updated',
+        TASK_COMPLETED: 'task_completed',
+        TASK_DELETED: 'task_deleted',
+        MEMBER_ADDED: 'member_added',
+        MEMBER_REMOVED: 'member_removed',
+    }
+
+
+class TaskEvent(db.Model):
+    """
+    Запись журнала событий.
+
+    Журнал только дополняется. Номер ``seq`` выдается автоинкрементом и никогда
+    не переиспользуется, поэтому проекции читают журнал по возрастанию ``seq``
+    от сохраненной контрольной точки.
+
+    :param seq: Порядковый номер события.
+    :type seq: int
+    :param type: Код типа события (см. ``EventType``).
+    :type type: int
+    :param user_id: Идентификатор владельца списка задач.
+    :type user_id: int
+    :param todo_id: Идентификатор списка задач.
+    :type todo_id: int
+    :param task_id: Идентификатор задачи (для событий списка - None).
+    :type task_id: int, optional
+    :param data: Поля записи при создании и удалении или пары ``[было, стало]`` изменившихся полей.
+    :type data: dict
+    :param created_at: Дата и время события.
+    :type created_at: datetime
+    """
+    __tablename__ = 'task_event'
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    seq = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    type = db.Column(db.SmallInteger, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    todo_id = db.Column(db.Integer, nullable=False)
+    task_id = db.Column(db.Integer, nullable=True)
+    data = db.Column(db.JSON, nullable=False, default=dict)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+    @property
+    def name(self):
+        """Имя типа события."""
+        return EventType.NAMES[self.type]
+
+
+class ProjectionCheckpoint(db.Model):
+    """
+    Контрольная точка проекции: номер последнего учтенного события журнала.
+
+    :param name: Имя проекции.
+    :type name: str
+    :param seq: Номер последнего обработанного события.
+    :type seq: int
+    """
+    __tablename__ = 'projection_checkpoint'
+
+    name = db.Column(db.String(50), primary_key=True)
+    seq = db.Column(db.Integer, nullable=False, default=0)
+
+
+class TodoListStats(db.Model):
+    """
+    Счетчики задач одного списка, построенные по журналу событий.
+
+    Статистика пользователя складывается из счетчиков всех доступных ему
+    списков, поэтому общие списки учитываются у каждого участника.
+
+    :param todo_id: Идентификатор списка задач.
+    :type todo_id: int
+    :param total: Количество задач.
+    :type total: int
+    :param active: Количество активных задач.
+    :type active: int
+    :param completed: Количество завершенных задач.
+    :type completed: int
+    :param overdue: Количество просроченных задач.
+    :type overdue: int
+    """
+    __tablename__ = 'todo_list_stats'
+
+    todo_id = db.Column(db.Integer, primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    active = db.Column(db.Integer, nullable=False, default=0)
+    completed = db.Column(db.Integer, nullable=False, default=0)
+    overdue = db.Column(db.Integer, nullable=False, default=0)
+
+
+class TaskDailyRollup(db.Model):
+    """
+    Дневная сводка задач пользователя: сколько задач создано и завершено за день.
+
+    :param user_id: Идентификатор пользователя.
+    :type user_id: int
+    :param day: День.
+    :type day: date
+    :param created: Количество созданных задач.
+    :type created: int
+    :param completed: Количество завершенных задач.
+    :type completed: int
+    """
+    __tablename__ = 'task_daily_rollup'
+
+    user_id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    created = db.Column(db.Integer, nullable=False, default=0)
+    completed = db.Column(db.Integer, nullable=False, default=0)
+
+
+class TaskSearchEntry(db.Model):
+    """
+    Запись поискового индекса задач.
+
+    :param task_id: Идентификатор задачи.
+    :type task_id: int
+    :param user_id: Идентификатор владельца задачи.
+    :type user_id: int
+    :param todo_id: Идентификатор списка задач.
+    :type todo_id: int
+    :param title: Заголовок задачи.
+    :type title: str
+    :param description: Описание задачи.
+    :type description: str, optional
+    :param document: Текст для поиска в нижнем регистре.
+    :type document: str
+    """
+    __tablename__ = 'task_search'
+
+    task_id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    todo_id = db.Column(db.Integer, nullable=False, index=True)
+    title = db.Column(db.String(100))
+    description = db.Column(db.String(250), nullable=True)
+    document = db.Column(db.Text, nullable=False, default='')
@@ -0,0 +1,354 @@
+"""Проекции журнала событий: статистика, дневные сводки и поисковый индекс задач."""
+
+from collections import defaultdict
+
+from sqlalchemy import func, select, update, delete
+
+from database import db
+from events.models import EventType, ProjectionCheckpoint, TaskDailyRollup, TaskSearchEntry, TodoListStats
+from events.services import EventLog
+from todo_list.models import TaskLabel, TodoMember
+from todo_list.permissions import accessible_todo_ids
+from unit_of_work import unit_of_work
+from users.models import UserStats
+from users.services import StatisticService
+
+class Projection:
+    """
+    Базовый класс проекции.
+
+    Проекция получает события пачками в порядке журнала и обновляет свои
+    таблицы в той же транзакции, что и контрольную точку.
+    """
+
+    name = None
+
+    def apply(self, events):
+        """
+        Учитывает пачку событий.
+
+        :param events: События по возрастанию номера.
+        :type events: list[TaskEvent]
+        """
+        raise NotImplementedError
+
+    def reset(self):
+        """Удаляет все данные проекции перед повторным построением."""
+        raise NotImplementedError
+
+
+class StatsProjection(Projection):
+    """
+    Счетчики задач списков (``TodoListStats``) и статистика пользователей (``UserStats``).
+
+    События пачки применяются к счетчикам затронутых списков, после чего
+    статистика всех пользователей с доступом к этим спискам пересчитывается
+    одним запросом по счетчикам доступных им списков. Так общие списки
+    учитываются у каждого участника без проверки прав для каждого списка.
+    """
+
+    name = 'stats'
+
+    def apply(self, events):
+        todo_ids = {event.todo_id for event in events}
+        users = {event.user_id for event in events}
+        lists = {stats.todo_id: stats for stats in
+                 TodoListStats.query.filter(TodoListStats.todo_id.in_(todo_ids))}
+
+        def counters(todo_id):
+            stats = lists.get(todo_id)
+            if stats is None:
+                stats = lists[todo_id] = TodoListStats(todo_id=todo_id, total=0, active=0, completed=0, overdue=0)
+                db.session.add(stats)
+            return stats
+
+        for event in events:
+            if event.type == EventType.TODO_CREATED:
+                counters(event.todo_id)
+            elif event.type == EventType.TODO_DELETED:
+                stats = lists.pop(event.todo_id, None)
+                if stats in db.session.new:
+                    db.session.expunge(stats)
+                elif stats is not None:
+                    db.session.delete(stats)
+                users.update(event.data.get('members', ()))
+            elif event.type in (EventType.MEMBER_ADDED, EventType.MEMBER_REMOVED):
+                users.add(event.data['member_id'])
+            elif event.type == EventType.TASK_CREATED:
+                stats = counters(event.todo_id)
+                stats.total += 1
+                setattr(stats, event.data['status'], getattr(stats, event.data['status']) + 1)
+            elif event.type == EventType.TASK_DELETED:
+                stats = counters(event.todo_id)
+                stats.total -= 1
+                setattr(stats, event.data['status'], getattr(stats, event.data['status']) - 1)
+            elif 'status' in event.data:
+                stats = counters(event.todo_id)
+                old, new = event.data['status']
+                setattr(stats, old, getattr(stats, old) - 1)
+                setattr(stats, new, getattr(stats, new) + 1)
+        db.session.flush()
+        users.update(db.session.scalars(
+            select(TodoMember.user_id).where(TodoMember.todo_id.in_(todo_ids))))
+        StatisticService.save_user_stats(StatisticService.summarize_list_stats(users))
+
+    def reset(self):
+        db.session.execute(delete(TodoListStats))
+        db.session.execute(update(UserStats).values(
+            total_todo=0, total_tasks=0, active_tasks=0, completed_tasks=0,
+            incomplete_tasks=0, completion_percentage=0))
+
+
+class DailyRollupProjection(Projection):
+    """Количество созданных и завершенных задач пользователя по дням."""
+
+    name = 'daily_rollup'
+
+    def apply(self, events):
+        deltas = defaultdict(lambda: [0, 0])
+        for event in events:
+            key = (event.user_id, event.created_at.date())
+            if event.type == EventType.TASK_CREATED:
+                deltas[key][0] += 1
+                if event.data.get('is_complete'):
+                    deltas[key][1] += 1
+            elif event.type == EventType.TASK_COMPLETED:
+                deltas[key][1] += 1
+        if not deltas:
+            return
+        existing = {
+            (rollup.user_id, rollup.day): rollup
+            for rollup in TaskDailyRollup.query.filter(
+                TaskDailyRollup.user_id.in_({user_id for user_id, _ in deltas}),
+                TaskDailyRollup.day.in_({day for _, day in deltas}))
+        }
+        for (user_id, day), (created, completed) in deltas.items():
+            rollup = existing.get((user_id, day))
+            if rollup is None:
+                rollup = TaskDailyRollup(user_id=user_id, day=day, created=0, completed=0)
+                db.session.add(rollup)
+            rollup.created += created
+            rollup.completed += completed
+
+    def reset(self):
+        db.session.execute(delete(TaskDailyRollup))
+
+
+class SearchProjection(Projection):
+    """
+    Поисковый индекс задач.
+
+    Для каждой задачи хранится последнее состояние, поэтому из пачки событий
+    применяется только итог по каждой задаче.
+    """
+
+    name = 'search'
+
+    def apply(self, events):
+        latest = {}
+        for event in events:
+            if event.task_id is None:
+                continue
+            if event.type == EventType.TASK_DELETED:
+                latest[event.task_id] = None
+                continue
+            entry = latest.get(event.task_id) or {'user_id': event.user_id, 'todo_id': event.todo_id}
+            for field in ('title', 'description'):
+                if field not in event.data:
+                    continue
+                value = event.data[field]
+                entry[field] = value[1] if event.type != EventType.TASK_CREATED else value
+            latest[event.task_id] = entry
+        if not latest:
+            return
+        entries = {entry.task_id: entry for entry in
+                   TaskSearchEntry.query.filter(TaskSearchEntry.task_id.in_(latest))}
+        for task_id, fields in latest.items():
+            entry = entries.get(task_id)
+            if fields is None:
+                if entry is not None:
+                    db.session.delete(entry)
+                continue
+            if entry is None:
+                entry = TaskSearchEntry(task_id=task_id, user_id=fields['user_id'], todo_id=fields['todo_id'])
+                db.session.add(entry)
+            entry.title = fields.get('title', entry.title)
+            entry.description = fields.get('description', entry.description)
+            entry.document = search_document(entry.title, entry.description)
+
+    def reset(self):
+        db.session.execute(delete(TaskSearchEntry))
+
+
+def search_document(title, description):
+    """
+    Формирует текст поисковой записи.
+
+    :param title: Заголовок задачи.
+    :type title: str
+    :param description: Описание задачи.
+    :type description: str, optional
+    :return: Заголовок и описание в нижнем регистре через перевод строки.
+    :rtype: str
+    """
+    return f'{title or ""}\n{description or ""}'.lower()
+
+
+PROJECTIONS = {projection.name: projection for projection in
+               (StatsProjection(), DailyRollupProjection(), SearchProjection())}
+
+
+class ProjectionService:
+    """
+    Сервис построения проекций по журналу событий.
+    """
+
+    @staticmethod
+    def get_checkpoint(name):
+        """
+        Возвращает контрольную точку проекции.
+
+        :param name: Имя проекции.
+        :type name: str
+        :return: Номер последнего учтенного события.
+        :rtype: int
+        """
+        return db.session.scalar(
+            select(ProjectionCheckpoint.seq).where(ProjectionCheckpoint.name == name)) or 0
+
+    @staticmethod
+    def set_checkpoint(name, seq):
+        """
+        Устанавливает контрольную точку проекции, построенной в обход журнала.
+
+        :param name: Имя проекции.
+        :type name: str
+        :param seq: Номер события, до которого проекция считается построенной.
+        :type seq: int
+        """
+        checkpoint = db.session.get(ProjectionCheckpoint, name)
+        if checkpoint is None:
+            db.session.add(ProjectionCheckpoint(name=name, seq=seq))
+        else:
+            checkpoint.seq = seq
+        unit_of_work.commit()
+
+    @staticmethod
+    def _advance(name, old_seq, new_seq):
+        """
+        Сдвигает контрольную точку, если ее не сдвинул параллельный процесс.
+
+        :return: True, если контрольная точка сдвинута.
+        :rtype: bool
+        """
+        if old_seq == 0 and db.session.get(ProjectionCheckpoint, name) is None:
+            db.session.add(ProjectionCheckpoint(name=name, seq=new_seq))
+            return True
+        result = db.session.execute(
+            update(ProjectionCheckpoint)
+            .where(ProjectionCheckpoint.name == name, ProjectionCheckpoint.seq == old_seq)
+            .values(seq=new_seq))
+        return result.rowcount == 1
+
+    @staticmethod
+    def catch_up(name, batch_size=1000):
+        """
+        Учитывает в проекции все события после ее контрольной точки.
+
+        События обрабатываются пачками; каждая пачка фиксируется вместе с новой
+        контрольной точкой. Если контрольную точку уже сдвинул другой процесс,
+        пачка откатывается и построение прекращается.
+
+        :param name: Имя проекции.
+        :type name: str
+        :param batch_size: Количество событий в пачке.
+        :type batch_size: int
+        :return: Количество учтенных событий.
+        :rtype: int
+        """
+        projection = PROJECTIONS[name]
+        processed = 0
+        while True:
+            checkpoint = ProjectionService.get_checkpoint(name)
+            events = EventLog.read(checkpoint, batch_size)
+            if not events:
+                return processed
+            projection.apply(events)
+            if not ProjectionService._advance(name, checkpoint, events[-1].seq):
+                db.session.rollback()
+                return processed
+            unit_of_work.commit()
+            processed += len(events)
+            if len(events) < batch_size:
+                return processed
+
+    @staticmethod
+    def catch_up_all(batch_size=1000):
+        """
+        Догоняет журнал во всех проекциях.
+
+        :param batch_size: Количество событий в пачке.
+        :type batch_size: int
+        :return: Количество учтенных событий по имени проекции.
+        :rtype: dict[str, int]
+        """
+        return {name: ProjectionService.catch_up(name, batch_size) for name in PROJECTIONS}
+
+    @staticmethod
+    def replay(name, batch_size=10000):
+        """
+        Строит проекцию заново с начала журнала.
+
+        :param name: Имя проекции.
+        :type name: str
+        :param batch_size: Количество событий в пачке.
+        :type batch_size: int
+        :return: Количество учтенных событий.
+        :rtype: int
+        """
+        PROJECTIONS[name].reset()
+        checkpoint = db.session.get(ProjectionCheckpoint, name)
+        if checkpoint is not None:
+            checkpoint.seq = 0
+        unit_of_work.commit()
+        return ProjectionService.catch_up(name, batch_size)
+
+
+class SearchService:
+    """
+    Сервис поиска задач по поисковому индексу.
+    """
+
+    @staticmethod
+    def search(user_id, query, limit=50, label_ids=(), match='any'):
+        """
+        Ищет задачи доступных пользователю списков по заголовку и описанию в поисковом индексе.
+
+        Фильтр по меткам - один подзапрос к индексу ``ix_task_label_label`` с
+        группировкой по задаче: для ``all`` задача должна иметь все метки.
+
+        :param user_id: Идентификатор пользователя.
+        :type user_id: int
+        :param query: Строка поиска.
+        :type query: str
+        :param limit: Максимальное количество результатов.
+        :type limit: int
+        :param label_ids: Идентификаторы меток для фильтра.
+        :type label_ids: list[int]
+        :param match: ``any`` - хотя бы одна из меток, ``all`` - все метки.
+        :type match: str
+        :return: Найденные записи индекса.
+        :rtype: list[TaskSearchEntry]
+        """
+        terms = query.lower().split()
+        statement = select(TaskSearchEntry).where(TaskSearchEntry.todo_id.in_(accessible_todo_ids(user_id)))
+        for term in terms:
+            escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            statement = statement.where(TaskSearchEntry.document.like(f'%{escaped}%', escape='\\'))
+        label_ids = set(label_ids)
+        if label_ids:
+            labelled = select(TaskLabel.task_id).where(TaskLabel.label_id.in_(label_ids)).group_by(TaskLabel.task_id)
+            if match == 'all':
+                labelled = labelled.having(func.count() == len(label_ids))
+            statement = statement.where(TaskSearchEntry.task_id.in_(labelled))
+        return db.session.scalars(statement.order_by(TaskSearchEntry.task_id.desc()).limit(limit)).all()
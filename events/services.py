@@ -0,0 +1,207 @@
+"""Сервисы журнала событий задач и списков задач."""
+
+from datetime import date, datetime
+
+from sqlalchemy import inspect, insert, select, func
+
+from database import db
+from events.models import TaskEvent, EventType
+from notifications.services import OutboxService
+from todo_list.models import Task, TodoList
+
+TASK_FIELDS = ('title', 'description', 'is_complete', 'status', 'priority', 'deadline_date', 'parent_id')
+TODO_FIELDS = ('title',)
+
+
+def _plain(value):
+    """Приводит значение поля к виду, пригодному для JSON."""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def snapshot(instance, fields):
+    """
+    Возвращает значения полей записи.
+
+    :param instance: Экземпляр модели.
+    :param fields: Имена полей.
+    :type fields: tuple[str]
+    :return: Словарь ``{поле: значение}``.
+    :rtype: dict
+    """
+    return {field: _plain(getattr(instance, field)) for field in fields}
+
+
+def changes(instance, fields):
+    """
+    Возвращает изменения полей записи, еще не отправленные в базу.
+
+    Вызывается до ``flush``: после него история изменений атрибутов сбрасывается.
+
+    :param instance: Экземпляр модели.
+    :param fields: Имена отслеживаемых полей.
+    :type fields: tuple[str]
+    :return: Словарь ``{поле: [было, стало]}`` только для изменившихся полей.
+    :rtype: dict
+    """
+    state = inspect(instance)
+    result = {}
+    for field in fields:
+        history = state.attrs[field].history
+        if history.has_changes():
+            old = history.deleted[0] if history.deleted else None
+            new = history.added[0] if history.added else None
+            result[field] = [_plain(old), _plain(new)]
+    return result
+
+
+class EventLog:
+    """
+    Сервис журнала событий.
+
+    События добавляются в текущую сессию и фиксируются той же транзакцией,
+    что и изменение, которое они описывают.
+    """
+
+    @staticmethod
+    def append(event_type, user_id, todo_id, task_id=None, data=None):
+        """
+        Добавляет событие в журнал.
+
+        Вместе с событием задачи в ту же транзакцию записываются уведомления
+        пользователям (см. ``OutboxService.enqueue_event``).
+
+        :param event_type: Код типа события (см. ``EventType``).
+        :type event_type: int
+        :param user_id: Идентификатор владельца списка задач.
+        :type user_id: int
+        :param todo_id: Идентификатор списка задач.
+        :type todo_id: int
+        :param task_id: Идентификатор задачи.
+        :type task_id: int, optional
+        :param data: Данные события.
+        :type data: dict, optional
+        """
+        db.session.add(TaskEvent(type=event_type, user_id=user_id, todo_id=todo_id,
+                                 task_id=task_id, data=data or {}))
+        OutboxService.enqueue_event(event_type, todo_id, task_id, data or {})
+
+    @staticmethod
+    def append_many(rows):
+        """
+        Добавляет в журнал несколько событий одним запросом.
+
+        :param rows: Словари с полями ``type``, ``user_id``, ``todo_id``, ``task_id`` и ``data``.
+        :type rows: list[dict]
+        """
+        if rows:
+            now = datetime.now()
+            db.session.execute(insert(TaskEvent), [{'created_at': now, **row} for row in rows])
+
+    @staticmethod
+    def task_created(task, user_id):
+        """
+        Записывает создание задачи. Идентификатор задачи уже должен быть назначен (после ``flush``).
+
+        :param task: Задача.
+        :type task: Task
+        :param user_id: Идентификатор владельца списка задач.
+        :type user_id: int
+        """
+        EventLog.append(EventType.TASK_CREATED, user_id, task.todo_id, task.id, snapshot(task, TASK_FIELDS))
+
+    @staticmethod
+    def task_changed(task, user_id):
+        """
+        Записывает изменение задачи, если поля действительно изменились.
+
+        Завершение задачи записывается отдельным типом события ``task_completed``.
+
+        :param task: Задача с еще не отправленными в базу изменениями.
+        :type task: Task
+        :param user_id: Идентификатор владельца списка задач.
+        :type user_id: int
+        """
+        task.status = task.compute_status()
+        data = changes(task, TASK_FIELDS)
+        if not data:
+            return
+        event_type = EventType.TASK_COMPLETED if data.get('is_complete') == [False, True] else EventType.TASK_UPDATED
+        EventLog.append(event_type, user_id, task.todo_id, task.id, data)
+
+    @staticmethod
+    def task_deleted(task, user_id):
+        """
+        Записывает удаление задачи вместе с последним состоянием ее полей.
+
+        :param task: Задача.
+        :type task: Task
+        :param user_id: Идентификатор владельца списка задач.
+        :type user_id: int
+        """
+        EventLog.append(EventType.TASK_DELETED, user_id, task.todo_id, task.id, snapshot(task, TASK_FIELDS))
+
+    @staticmethod
+    def read(after_seq, limit):
+        """
+        Возвращает события журнала после указанного номера.
+
+        :param after_seq: Номер последнего уже обработанного события.
+        :type after_seq: int
+        :param limit: Максимальное количество событий.
+        :type limit: int
+        :return: События по возрастанию номера.
+        :rtype: list[TaskEvent]
+        """
+        return db.session.scalars(
+            select(TaskEvent).where(TaskEvent.seq > after_seq).order_by(TaskEvent.seq).limit(limit)
+        ).all()
+
+    @staticmethod
+    def last_seq():
+        """
+        Возвращает номер последнего события журнала.
+
+        :return: Номер события или 0, если журнал пуст.
+        :rtype: int
+        """
+        return db.session.scalar(select(func.max(TaskEvent.seq))) or 0
+
+    @staticmethod
+    def backfill(batch_size=1000):
+        """
+        Заполняет пустой журнал событиями создания существующих списков и задач.
+
+        Нужен один раз для базы, данные в которой появились раньше журнала:
+        после этого проекции можно построить командой ``flask events replay``.
+
+        :param batch_size: Количество записей, читаемых и записываемых за раз.
+        :type batch_size: int
+        :return: Количество добавленных событий.
+        :rtype: int
+        :raises RuntimeError: Если журнал уже не пуст.
+        """
+        if EventLog.last_seq():
+            raise RuntimeError('Журнал событий уже заполнен.')
+        owners = {}
+        rows = []
+        added = 0
+        todo_lists = select(TodoList).order_by(TodoList.id).execution_options(yield_per=batch_size)
+        tasks = select(Task).order_by(Task.id).execution_options(yield_per=batch_size)
+        for todo_list in db.session.scalars(todo_lists):
+            owners[todo_list.id] = todo_list.user_id
+            rows.append({'type': EventType.TODO_CREATED, 'user_id': todo_list.user_id, 'todo_id': todo_list.id,
+                         'task_id': None, 'data': snapshot(todo_list, TODO_FIELDS)})
+        for task in db.session.scalars(tasks):
+            if task.todo_id not in owners:
+                continue
+            rows.append({'type': EventType.TASK_CREATED, 'user_id': owners[task.todo_id], 'todo_id': task.todo_id,
+                         'task_id': task.id, 'data': snapshot(task, TASK_FIELDS)})
+            if len(rows) >= batch_size:
+                EventLog.append_many(rows)
+                added += len(rows)
+                rows = []
+        EventLog.append_many(rows)
+        db.session.commit()
+        return added + len(rows)
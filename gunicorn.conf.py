@@ -0,0 +1,41 @@
+"""Настройки gunicorn для запуска приложения в production."""
+import multiprocessing
+import os
+
+wsgi_app = 'wsgi:app'
+bind = os.environ.get('BIND', '127.0.0.1:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# Потоки нужны для долгих соединений Server-Sent Events: каждый открытый поток
+# событий списка занимает поток воркера на все время соединения. Таких потоков
+# в воркере не больше SSE_MAX_STREAMS (по умолчанию половина THREADS), остальные
+# подключения получают 503 с Retry-After, а оставшиеся потоки обслуживают обычные
+# запросы. Для большого числа открытых списков увеличьте THREADS вместе с
+# SSE_MAX_STREAMS или выделите для /todo_list/<id>/events отдельный экземпляр
+# gunicorn за обратным прокси.
+worker_class = 'gthread'
+threads = int(os.environ.get('THREADS', 8))
+# Приложение загружается один раз в мастере; пулы соединений сбрасываются
+# в воркерах после fork (см. wsgi.py), а поток доставки событий Redis
+# запускается в каждом воркере при первой подписке (см. pubsub.RedisTransport).
+preload_app = True
+
+# Хранилища в памяти процесса не видят изменений, сделанных другими воркерами.
+PROCESS_LOCAL_BACKENDS = ('PUBSUB_TRANSPORT', 'CACHE_BACKEND', 'RATELIMIT_BACKEND')
+
+
+def on_starting(server):
+    """
+    Проверяет настройки перед запуском.
+
+    Не дает запустить несколько воркеров, если события, кэш или лимиты хранятся
+    в памяти процесса, и потоки событий без свободных потоков для обычных запросов.
+    """
+    from config import ProductionConfig
+
+    local = [name for name in PROCESS_LOCAL_BACKENDS if getattr(ProductionConfig, name) == 'local']
+    if server.cfg.workers > 1 and local:
+        raise RuntimeError(f'{", ".join(local)} = local несовместимо с workers = {server.cfg.workers}: '
+                           f'используйте redis или WEB_CONCURRENCY=1')
+    if not 0 < ProductionConfig.SSE_MAX_STREAMS < server.cfg.threads:
+        raise RuntimeError(f'SSE_MAX_STREAMS = {ProductionConfig.SSE_MAX_STREAMS} должно быть от 1 до '
+                           f'threads - 1 = {server.cfg.threads - 1}: иначе потоки событий займут все потоки воркера')
@@ -0,0 +1 @@
+"""Инициализация приложения notifications: уведомления о задачах через outbox и рассылка дайджестов."""
@@ -0,0 +1,34 @@
+"""Команды CLI уведомлений."""
+
+import time
+
+import click
+from flask.cli import AppGroup
+
+from notifications.mailer import mailer
+from notifications.services import OutboxService
+
+notifications_command = AppGroup('notifications', help='Уведомления о задачах.')
+
+
+@notifications_command.command('deliver')
+@click.option('--batch-size', type=click.IntRange(1), default=None,
+              help='Количество сообщений за проход (по умолчанию OUTBOX_BATCH_SIZE).')
+@click.option('--loop', is_flag=True, help='Работать постоянно, проверяя outbox каждые --interval секунд.')
+@click.option('--interval', type=click.FloatRange(0), default=10, show_default=True,
+              help='Пауза между проверками outbox в режиме --loop (в секундах).')
+def deliver_command(batch_size, loop, interval):
+    """Отправляет готовые уведомления дайджестами по пользователям."""
+    try:
+        while True:
+            result = OutboxService.deliver(batch_size=batch_size)
+            if result['claimed'] or not loop:
+                click.echo(f'Писем: {result["digests"]}, сообщений: {result["sent"]}, '
+                           f'отложено: {result["retried"]}, ошибок: {result["failed"]}, '
+                           f'отменено: {result["cancelled"]}.')
+            if not loop:
+                break
+            if not result['claimed']:
+                time.sleep(interval)
+    finally:
+        mailer.close()
@@ -0,0 +1,249 @@
+"""
+Отправка писем.
+
+Способ отправки выбирается настройкой ``MAIL_BACKEND``: ``local`` сохраняет
+письма в памяти процесса (для разработки и тестов), ``smtp`` отправляет их
+через пул SMTP-соединений. Письма отправляются пачками: каждая пачка из
+``MAIL_BATCH_SIZE`` писем уходит по одному соединению пула, пачки - параллельно
+по ``MAIL_POOL_SIZE`` соединениям. Соединения переиспользуются между вызовами.
+"""
+
+import smtplib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from queue import Empty, LifoQueue
+from threading import Lock
+
+from flask import current_app
+
+
+class LocalMailBackend:
+    """
+    Хранилище писем в памяти процесса вместо отправки.
+
+    :param maxsize: Количество последних писем, которые хранятся.
+    :type maxsize: int
+    """
+
+    def __init__(self, maxsize=1000):
+        self.sent = deque(maxlen=maxsize)
+
+    def send_many(self, messages):
+        """
+        Сохраняет письма.
+
+        :param messages: Письма.
+        :type messages: list[email.message.EmailMessage]
+        :return: Ошибка отправки каждого письма (None - отправлено).
+        :rtype: list[Exception or None]
+        """
+        self.sent.extend(messages)
+        return [None] * len(messages)
+
+    def close(self):
+        """Ничего не делает: соединений нет."""
+
+
+class SMTPMailBackend:
+    """
+    Отправка писем через пул SMTP-соединений.
+
+    :param host: Адрес SMTP-сервера.
+    :type host: str
+    :param port: Порт SMTP-сервера.
+    :type port: int
+    :param username: Имя пользователя для входа на сервер.
+    :type username: str, optional
+    :param password: Пароль для входа на сервер.
+    :type password: str, optional
+    :param use_tls: Включать ли STARTTLS.
+    :type use_tls: bool
+    :param timeout: Таймаут операций с сервером (в секундах).
+    :type timeout: float
+    :param pool_size: Максимальное количество одновременно открытых соединений.
+    :type pool_size: int
+    :param batch_size: Количество писем, отправляемых по одному соединению подряд.
+    :type batch_size: int
+    """
+
+    def __init__(self, host, port, username=None, password=None, use_tls=False, timeout=10,
+                 pool_size=4, batch_size=50):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.batch_size = batch_size
+        self._idle = LifoQueue()
+        self._lock = Lock()
+        self._opened = 0
+        self.connections_opened = 0
+
+    def _connect(self):
+        """Открывает новое соединение с сервером."""
+        connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.use_tls:
+            connection.starttls()
+        if self.username:
+            connection.login(self.username, self.password)
+        with self._lock:
+            self.connections_opened += 1
+        return connection
+
+    def _acquire(self):
+        """Берет свободное соединение из пула или открывает новое, если пул не заполнен."""
+        try:
+            return self._idle.get_nowait()
+        except Empty:
+            pass
+        with self._lock:
+            if self._opened < self.pool_size:
+                self._opened += 1
+                opened = True
+            else:
+                opened = False
+        if not opened:
+            return self._idle.get()
+        try:
+            return self._connect()
+        except Exception:
+            with self._lock:
+                self._opened -= 1
+            raise
+
+    def _release(self, connection):
+        """Возвращает соединение в пул или, если оно закрыто (None), освобождает место в пуле."""
+        if connection is None:
+            with self._lock:
+                self._opened -= 1
+        else:
+            self._idle.put(connection)
+
+    def _send(self, connection, message):
+        """
+        Отправляет письмо; если сервер закрыл соединение, открывает новое и отправляет еще раз.
+
+        :return: Соединение, по которому письмо ушло.
+        :rtype: smtplib.SMTP
+        """
+        try:
+            connection.send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            connection.close()
+            connection = self._connect()
+            connection.send_message(message)
+        return connection
+
+    def _send_batch(self, batch):
+        """
+        Отправляет пачку писем по одному соединению.
+
+        Отказ сервера принять конкретное письмо относится только к нему; если
+        соединение восстановить не удалось, ошибкой отмечаются все оставшиеся письма.
+
+        :param batch: Письма.
+        :type batch: list[email.message.EmailMessage]
+        :return: Ошибка отправки каждого письма (None - отправлено).
+        :rtype: list[Exception or None]
+        """
+        try:
+            connection = self._acquire()
+        except (OSError, smtplib.SMTPException) as exc:
+            return [exc] * len(batch)
+        results = []
+        for message in batch:
+            try:
+                connection = self._send(connection, message)
+                results.append(None)
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException) as exc:
+                results.append(exc)
+            except (OSError, smtplib.SMTPException) as exc:
+                connection.close()
+                connection = None
+                results.extend([exc] * (len(batch) - len(results)))
+                break
+        self._release(connection)
+        return results
+
+    def send_many(self, messages):
+        """
+        Отправляет письма пачками параллельно по соединениям пула.
+
+        :param messages: Письма.
+        :type messages: list[email.message.EmailMessage]
+        :return: Ошибка отправки каждого письма (None - отправлено) в порядке писем.
+        :rtype: list[Exception or None]
+        """
+        batches = [messages[start:start + self.batch_size] for start in range(0, len(messages), self.batch_size)]
+        if len(batches) <= 1:
+            return self._send_batch(batches[0]) if batches else []
+        with ThreadPoolExecutor(max_workers=min(self.pool_size, len(batches))) as executor:
+            return [result for results in executor.map(self._send_batch, batches) for result in results]
+
+    def close(self):
+        """Закрывает все свободные соединения пула."""
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except Empty:
+                return
+            with self._lock:
+                self._opened -= 1
+            try:
+                connection.quit()
+            except (OSError, smtplib.SMTPException):
+                connection.close()
+
+
+class Mailer:
+    """
+    Отправка писем приложения.
+
+    Настройки: ``MAIL_BACKEND`` (``local`` или ``smtp``), ``MAIL_SERVER``, ``MAIL_PORT``,
+    ``MAIL_USERNAME``, ``MAIL_PASSWORD``, ``MAIL_USE_TLS``, ``MAIL_TIMEOUT``,
+    ``MAIL_POOL_SIZE`` и ``MAIL_BATCH_SIZE``.
+    """
+
+    def init_app(self, app):
+        """
+        Подключает отправку писем к приложению.
+
+        Каждое приложение получает собственный пул соединений.
+
+        :param app: Экземпляр приложения.
+        :type app: Flask
+        """
+        if app.config.get('MAIL_BACKEND', 'local') == 'smtp':
+            backend = SMTPMailBackend(
+                app.config.get('MAIL_SERVER', 'localhost'), app.config.get('MAIL_PORT', 25),
+                app.config.get('MAIL_USERNAME'), app.config.get('MAIL_PASSWORD'),
+                app.config.get('MAIL_USE_TLS', False), app.config.get('MAIL_TIMEOUT', 10),
+                app.config.get('MAIL_POOL_SIZE', 4), app.config.get('MAIL_BATCH_SIZE', 50))
+        else:
+            backend = LocalMailBackend()
+        app.extensions['mailer'] = backend
+
+    @property
+    def backend(self):
+        """Способ отправки текущего приложения."""
+        return current_app.extensions['mailer']
+
+    def send_many(self, messages):
+        """
+        Отправляет письма.
+
+        :param messages: Письма.
+        :type messages: list[email.message.EmailMessage]
+        :return: Ошибка отправки каждого письма (None - отправлено) в порядке писем.
+        :rtype: list[Exception or None]
+        """
+        return self.backend.send_many(messages)
+
+    def close(self):
+        """Закрывает соединения пула текущего приложения."""
+        self.backend.close()
+
+
+mailer = Mailer()
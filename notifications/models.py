@@ -0,0 +1,84 @@
+"""Модели данных для уведомлений."""
+
+from datetime import datetime
+from database import db
+
+
+class OutboxStatus:
+    """
+    Состояния сообщения outbox.
+
+    Сообщение, забранное обработчиком, находится в состоянии ``sending``: новые
+    изменения той же задачи в это время записываются отдельным ожидающим сообщением.
+    """
+    PENDING = 'pending'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+
+
+class OutboxMessage(db.Model):
+    """
+    Сообщение outbox: уведомление пользователя, ожидающее отправки.
+
+    Сообщения записываются той же транзакцией, что и изменение задачи, и
+    отправляются позже командой ``flask notifications deliver`` дайджестами по
+    пользователям. Среди ожидающих сообщений пара ``(user_id, dedup_key)``
+    уникальна: повторное изменение той же задачи обновляет уже ожидающее
+    сообщение, а не добавляет новое.
+
+    :param id: Идентификатор сообщения.
+    :type id: int
+    :param user_id: Идентификатор получателя.
+    :type user_id: int
+    :param kind: Вид уведомления: ``change`` (изменение задачи) или ``deadline`` (приближается дедлайн).
+    :type kind: str
+    :param dedup_key: Ключ, по которому ожидающие сообщения объединяются.
+    :type dedup_key: str
+    :param todo_id: Идентификатор списка задач.
+    :type todo_id: int
+    :param task_id: Идентификатор задачи.
+    :type task_id: int, optional
+    :param data: Данные для текста уведомления.
+    :type data: dict
+    :param created_at: Дата и время создания сообщения.
+    :type created_at: datetime
+    :param available_at: Момент, начиная с которого сообщение можно отправить.
+    :type available_at: datetime
+    :param status: Состояние сообщения (см. ``OutboxStatus``).
+    :type status: str
+    :param attempts: Количество неудачных попыток отправки.
+    :type attempts: int
+    :param claim: Метка обработчика, забравшего сообщение.
+    :type claim: str, optional
+    :param locked_until: Момент, до которого сообщение закреплено за обработчиком.
+    :type locked_until: datetime, optional
+    :param sent_at: Дата и время отправки.
+    :type sent_at: datetime, optional
+    :param error: Последняя ошибка отправки.
+    :type error: str, optional
+    """
+    __tablename__ = 'notification_outbox'
+    __table_args__ = (
+        db.Index('ix_outbox_due', 'status', 'available_at'),
+        db.Index('ix_outbox_claim', 'claim'),
+        db.Index('uq_outbox_pending', 'user_id', 'dedup_key', unique=True,
+                 sqlite_where=db.text("status = 'pending'"), postgresql_where=db.text("status = 'pending'")),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    kind = db.Column(db.String(20), nullable=False)
+    dedup_key = db.Column(db.String(100), nullable=False)
+    todo_id = db.Column(db.Integer, nullable=False)
+    task_id = db.Column(db.Integer, nullable=True)
+    data = db.Column(db.JSON, nullable=False, default=dict)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    available_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    status = db.Column(db.String(10), nullable=False, default=OutboxStatus.PENDING)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    claim = db.Column(db.String(32), nullable=True)
+    locked_until = db.Column(db.DateTime, nullable=True)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    error = db.Column(db.String(250), nullable=True)
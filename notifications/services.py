@@ -0,0 +1,375 @@
+"""Сервисы уведомлений: запись в outbox и рассылка дайджестов."""
+
+import hashlib
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from uuid import uuid4
+
+from flask import current_app, has_request_context
+from flask_login import current_user
+from sqlalchemy import and_, delete, event, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from cache import cache
+from database import db
+from events.models import EventType
+from notifications.mailer import mailer
+from notifications.models import OutboxMessage, OutboxStatus
+from todo_list.models import Task, TodoList
+from todo_list.permissions import PermissionService
+from users.models import User
+
+NOTIFICATION_DEFAULTS = {
+    'email': False,
+    'task_changes': False,
+    'deadline_reminders': False,
+    'remind_before_hours': 24,
+}
+CHANGE_EVENTS = {
+    EventType.TASK_CREATED: 'новая задача',
+    EventType.TASK_UPDATED: 'задача изменена',
+    EventType.TASK_COMPLETED: 'задача выполнена',
+    EventType.TASK_DELETED: 'задача удалена',
+}
+CHANGE_TEXT = {EventType.NAMES[event_type]: text for event_type, text in CHANGE_EVENTS.items()}
+# Настройка, которая включает уведомления каждого вида.
+KIND_SETTINGS = {'change': 'task_changes', 'deadline': 'deadline_reminders'}
+# Ключ ``session.info`` со строками outbox, еще не отправленными в базу.
+PENDING_KEY = 'notification_outbox'
+
+
+def notification_settings(raw):
+    """
+    Возвращает настройки уведомлений пользователя, дополненные значениями по умолчанию.
+
+    :param raw: Сохраненные настройки пользователя.
+    :type raw: dict or None
+    :return: Полные настройки (см. ``NOTIFICATION_DEFAULTS``).
+    :rtype: dict
+    """
+    return {**NOTIFICATION_DEFAULTS, **(raw or {})}
+
+
+def get_user_settings(user_id):
+    """
+    Возвращает настройки уведомлений пользователя через кэш.
+
+    :param user_id: Идентификатор пользователя.
+    :type user_id: int
+    :return: Полные настройки (см. ``NOTIFICATION_DEFAULTS``).
+    :rtype: dict
+    """
+    raw = cache.get_or_set(f'notification_settings:{user_id}', lambda: db.session.scalar(
+        select(User.notification_settings).where(User.id == user_id)))
+    return notification_settings(raw)
+
+
+def _actor_id():
+    """Идентификатор пользователя, выполняющего текущий запрос, или None."""
+    if has_request_context() and current_user.is_authenticated:
+        return current_user.id
+    return None
+
+
+def _naive(value):
+    """Приводит дату со смещением к локальному времени без смещения, как в колонках outbox."""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone().replace(tzinfo=None)
+    return value
+
+
+def _upsert(rows):
+    """
+    Добавляет сообщения в outbox; ожидающее сообщение с тем же ``(user_id, dedup_key)`` обновляется.
+
+    :param rows: Строки таблицы ``notification_outbox``.
+    :type rows: list[dict]
+    """
+    # Из нескольких строк с одним ключом остается последняя: INSERT ... ON CONFLICT
+    # не может дважды обновить одну и ту же запись.
+    rows = list({(row['user_id'], row['dedup_key']): row for row in rows}.values())
+    dialect = postgresql if db.session.get_bind().dialect.name == 'postgresql' else sqlite
+    statement = dialect.insert(OutboxMessage)
+    statement = statement.on_conflict_do_update(
+        index_elements=['user_id', 'dedup_key'],
+        index_where=OutboxMessage.status == OutboxStatus.PENDING,
+        set_={'data': statement.excluded.data, 'available_at': statement.excluded.available_at})
+    db.session.connection().execute(statement, rows)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _write_pending(session, flush_context):
+    """Записывает накопленные строки outbox той же транзакцией сразу после отправки событий в базу."""
+    rows = session.info.pop(PENDING_KEY, None)
+    if rows:
+        _upsert(rows)
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _discard_pending(session, previous_transaction):
+    """Отбрасывает строки outbox отмененной транзакции."""
+    session.info.pop(PENDING_KEY, None)
+
+
+def build_digest(user, messages, sender):
+    """
+    Составляет письмо-дайджест из сообщений outbox одного пользователя.
+
+    Message-ID письма зависит только от входящих в него сообщений, поэтому
+    повторная отправка того же дайджеста получает тот же Message-ID.
+
+    :param user: Получатель.
+    :type user: User
+    :param messages: Сообщения пользователя.
+    :type messages: list[OutboxMessage]
+    :param sender: Адрес отправителя.
+    :type sender: str
+    :return: Письмо.
+    :rtype: email.message.EmailMessage
+    """
+    changes = [message for message in messages if message.kind == 'change']
+    reminders = [message for message in messages if message.kind == 'deadline']
+    lines = [f'Здравствуйте, {user.username}!', '']
+    if changes:
+        lines.append('Изменения в задачах:')
+        lines.extend(f'- «{message.data["title"]}» в списке «{message.data["todo_title"]}»: '
+                     f'{CHANGE_TEXT.get(message.data["event"], "задача изменена")}' for message in changes)
+        lines.append('')
+    if reminders:
+        lines.append('Приближается дедлайн:')
+        lines.extend(f'- «{message.data["title"]}» в списке «{message.data["todo_title"]}»: '
+                     f'до {datetime.fromisoformat(message.data["deadline"]):%d.%m.%Y %H:%M}'
+                     for message in reminders)
+    digest = hashlib.sha1(','.join(str(message.id) for message in messages).encode()).hexdigest()[:20]
+    email = EmailMessage()
+    email['From'] = sender
+    email['To'] = user.email
+    email['Subject'] = f'Уведомления о задачах ({len(messages)})'
+    email['Message-ID'] = f'<digest.{user.id}.{digest}@{sender.rpartition("@")[2] or "localhost"}>'
+    email.set_content('\n'.join(lines).rstrip() + '\n')
+    return email
+
+
+class OutboxService:
+    """
+    Сервис outbox уведомлений.
+
+    ``enqueue_event`` записывает уведомления в текущую сессию вместе с событием
+    журнала, то есть той же транзакцией, что и изменение задачи: уведомление
+    появляется тогда и только тогда, когда изменение зафиксировано. ``deliver``
+    забирает готовые к отправке сообщения, объединяет их в дайджесты по
+    пользователям и отправляет пачкой через ``mailer``.
+    """
+
+    @staticmethod
+    def enqueue_event(event_type, todo_id, task_id, data):
+        """
+        Записывает уведомления о событии задачи пользователям с доступом к списку.
+
+        Строки копятся в сессии и записываются одним запросом при ближайшей
+        отправке изменений в базу (``flush``), вместе с событиями журнала.
+
+        Об изменении уведомляются все, кроме автора изменения; повторные изменения
+        той же задачи до отправки объединяются в одно сообщение. Напоминание о
+        дедлайне ставится на ``remind_before_hours`` часов до дедлайна и
+        переставляется при изменении дедлайна или повторном открытии задачи.
+
+        :param event_type: Код типа события (см. ``EventType``).
+        :type event_type: int
+        :param todo_id: Идентификатор списка задач.
+        :type todo_id: int
+        :param task_id: Идентификатор задачи.
+        :type task_id: int, optional
+        :param data: Данные события.
+        :type data: dict
+        """
+        if event_type not in CHANGE_EVENTS or task_id is None:
+            return
+        # Чтение настроек не должно отправлять в базу события журнала по одному.
+        with db.session.no_autoflush:
+            recipients = [(user_id, settings) for user_id in PermissionService.get_user_ids(todo_id)
+                          for settings in [get_user_settings(user_id)] if settings['email']]
+            if not recipients:
+                return
+            # Задача и список берутся из сессии (или из базы той же транзакцией), а не из кэша:
+            # кэш другого процесса может быть устаревшим.
+            task = db.session.get(Task, task_id)
+            todo_list = db.session.get(TodoList, todo_id)
+        if task is None or todo_list is None:
+            return
+        now = datetime.now()
+        actor_id = _actor_id()
+        deadline = _naive(task.deadline_date)
+        remind = (event_type == EventType.TASK_CREATED
+                  or (event_type == EventType.TASK_UPDATED and ('deadline_date' in data or 'is_complete' in data)))
+        remind = remind and not task.is_complete and deadline is not None and deadline > now
+        common = {'todo_id': todo_id, 'task_id': task_id, 'created_at': now, 'status': OutboxStatus.PENDING,
+                  'attempts': 0}
+        rows = []
+        for user_id, settings in recipients:
+            if settings['task_changes'] and user_id != actor_id:
+                rows.append({**common, 'user_id': user_id, 'kind': 'change', 'dedup_key': f'change:{task_id}',
+                             'available_at': now,
+                             'data': {'event': EventType.NAMES[event_type], 'title': task.title,
+                                      'todo_title': todo_list.title}})
+            if remind and settings['deadline_reminders']:
+                rows.append({**common, 'user_id': user_id, 'kind': 'deadline', 'dedup_key': f'deadline:{task_id}',
+                             'available_at': max(now, deadline - timedelta(hours=settings['remind_before_hours'])),
+                             'data': {'title': task.title, 'todo_title': todo_list.title,
+                                      'deadline': deadline.isoformat()}})
+        if rows:
+            db.session.info.setdefault(PENDING_KEY, []).extend(rows)
+
+    @staticmethod
+    def _claim(now, batch_size, lease):
+        """
+        Закрепляет за обработчиком готовые к отправке сообщения.
+
+        Забираются ожидающие сообщения, время отправки которых наступило, и
+        сообщения, закрепление которых истекло (обработчик завершился аварийно).
+
+        :return: Закрепленные сообщения по пользователям и возрастанию идентификатора.
+        :rtype: list[OutboxMessage]
+        """
+        claim = uuid4().hex
+        due = (select(OutboxMessage.id)
+               .where(or_(and_(OutboxMessage.status == OutboxStatus.PENDING, OutboxMessage.available_at <= now),
+                          and_(OutboxMessage.status == OutboxStatus.SENDING, OutboxMessage.locked_until < now)))
+               .order_by(OutboxMessage.available_at)
+               .limit(batch_size))
+        db.session.execute(update(OutboxMessage).where(OutboxMessage.id.in_(due)).values(
+            status=OutboxStatus.SENDING, claim=claim, locked_until=now + timedelta(seconds=lease)))
+        db.session.commit()
+        return db.session.scalars(select(OutboxMessage).where(OutboxMessage.claim == claim)
+                                  .order_by(OutboxMessage.user_id, OutboxMessage.id)).all()
+
+    @staticmethod
+    def _stale_reminders(messages):
+        """
+        Возвращает идентификаторы напоминаний о задачах, которые удалены или уже выполнены.
+
+        :param messages: Сообщения.
+        :type messages: list[OutboxMessage]
+        :rtype: set[int]
+        """
+        task_ids = {message.task_id for message in messages if message.kind == 'deadline'}
+        if not task_ids:
+            return set()
+        open_ids = set(db.session.scalars(select(Task.id).where(Task.id.in_(task_ids), Task.is_complete.is_(False))))
+        return {message.id for message in messages if message.kind == 'deadline' and message.task_id not in open_ids}
+
+    @staticmethod
+    def _fail(messages, error, now, max_attempts, retry_delay):
+        """
+        Возвращает неотправленные сообщения в очередь с экспоненциальной задержкой.
+
+        После ``max_attempts`` попыток сообщение помечается как ``failed``. Если
+        за время отправки появилось новое ожидающее сообщение с тем же ключом, оно
+        уже содержит актуальные данные, и старое отменяется.
+
+        :return: Количества сообщений, возвращенных в очередь и отмеченных ошибкой.
+        :rtype: tuple[int, int]
+        """
+        user_id = messages[0].user_id
+        pending = set(db.session.scalars(select(OutboxMessage.dedup_key).where(
+            OutboxMessage.user_id == user_id, OutboxMessage.status == OutboxStatus.PENDING,
+            OutboxMessage.dedup_key.in_([message.dedup_key for message in messages]))))
+        retried = failed = 0
+        for message in messages:
+            message.attempts += 1
+            message.error = str(error)[:250]
+            message.claim = message.locked_until = None
+            if message.attempts >= max_attempts:
+                message.status = OutboxStatus.FAILED
+                failed += 1
+            elif message.dedup_key in pending:
+                message.status = OutboxStatus.CANCELLED
+            else:
+                message.status = OutboxStatus.PENDING
+                message.available_at = now + timedelta(seconds=retry_delay * 2 ** (message.attempts - 1))
+                retried += 1
+        return retried, failed
+
+    @staticmethod
+    def deliver(now=None, batch_size=None):
+        """
+        Отправляет готовые уведомления дайджестами: одно письмо на пользователя.
+
+        Сообщения пользователей, отключивших уведомления, и напоминания о
+        выполненных или удаленных задачах отменяются. Отправленные и отмененные
+        сообщения удаляются через ``OUTBOX_RETENTION_DAYS`` дней.
+
+        :param now: Текущий момент (для тестов).
+        :type now: datetime, optional
+        :param batch_size: Максимальное количество сообщений за проход (по умолчанию ``OUTBOX_BATCH_SIZE``).
+        :type batch_size: int, optional
+        :return: Количества отправленных писем и сообщений, возвращенных в очередь, отмеченных ошибкой и отмененных.
+        :rtype: dict
+        """
+        config = current_app.config
+        now = now or datetime.now()
+        result = {'claimed': 0, 'digests': 0, 'sent': 0, 'retried': 0, 'failed': 0, 'cancelled': 0}
+        messages = OutboxService._claim(now, batch_size or config.get('OUTBOX_BATCH_SIZE', 500),
+                                        config.get('OUTBOX_LEASE', 300))
+        result['claimed'] = len(messages)
+        by_user = {}
+        for message in messages:
+            by_user.setdefault(message.user_id, []).append(message)
+        users = {user.id: user for user in db.session.scalars(select(User).where(User.id.in_(by_user)))}
+        stale = OutboxService._stale_reminders(messages)
+        sender = config.get('MAIL_SENDER', 'noreply@localhost')
+        cancelled, digests = [], []
+        for user_id, group in by_user.items():
+            user = users.get(user_id)
+            settings = notification_settings(user.notification_settings if user else None)
+            latest = {}
+            for message in group:
+                if user is None or not settings['email'] or not settings[KIND_SETTINGS[message.kind]] \
+                        or message.id in stale:
+                    cancelled.append(message)
+                    continue
+                if message.dedup_key in latest:
+                    # Старое сообщение, забранное повторно после сбоя обработчика, заменяется новым.
+                    cancelled.append(latest[message.dedup_key])
+                latest[message.dedup_key] = message
+            if latest:
+                group = list(latest.values())
+                digests.append((group, build_digest(user, group, sender)))
+        for message in cancelled:
+            message.status = OutboxStatus.CANCELLED
+            message.claim = message.locked_until = None
+        result['cancelled'] = len(cancelled)
+
+        errors = mailer.send_many([email for _, email in digests])
+        for (group, _), error in zip(digests, errors):
+            if error is None:
+                for message in group:
+                    message.status = OutboxStatus.SENT
+                    message.sent_at = now
+                    message.claim = message.locked_until = None
+                result['digests'] += 1
+                result['sent'] += len(group)
+            else:
+                retried, failed = OutboxService._fail(group, error, now, config.get('OUTBOX_MAX_ATTEMPTS', 5),
+                                                      config.get('OUTBOX_RETRY_DELAY', 60))
+                result['retried'] += retried
+                result['failed'] += failed
+        db.session.commit()
+        OutboxService.purge(now - timedelta(days=config.get('OUTBOX_RETENTION_DAYS', 7)))
+        return result
+
+    @staticmethod
+    def purge(before):
+        """
+        Удаляет отправленные и отмененные сообщения, время отправки которых наступило раньше ``before``.
+
+        :param before: Граница по времени.
+        :type before: datetime
+        :return: Количество удаленных сообщений.
+        :rtype: int
+        """
+        deleted = db.session.execute(delete(OutboxMessage).where(
+            OutboxMessage.status.in_([OutboxStatus.SENT, OutboxStatus.CANCELLED]),
+            OutboxMessage.available_at < before)).rowcount
+        db.session.commit()
+        return deleted
@@ -0,0 +1,413 @@
+"""Внутрипроцессная шина публикации/подписки для живого обновления списков задач."""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+
+logger = logging.getLogger('pubsub')
+
+RESYNC_EVENT = {'type': 'resync'}
+RECONNECT_DELAY = 0.5
+RECONNECT_MAX_DELAY = 30
+
+
+class Subscription:
+    """
+    Подписка на канал шины.
+
+    Очередь подписки ограничена: если клиент не успевает забирать события,
+    накопленные события отбрасываются и вместо них ставится одно событие
+    ``resync``, по которому клиент перезагружает список целиком. Публикующая
+    сторона при этом никогда не блокируется.
+
+    :param hub: Шина, к которой относится подписка.
+    :type hub: PubSubHub
+    :param channel: Имя канала.
+    :type channel: str
+    :param maxsize: Максимальное количество событий в очереди.
+    :type maxsize: int
+    """
+
+    def __init__(self, hub, channel, maxsize):
+        self.hub = hub
+        self.channel = channel
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def put(self, event):
+        """
+        Ставит событие в очередь подписки, не блокируя публикующую сторону.
+
+        :param event: Событие.
+        :type event: dict
+        """
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self._overflow()
+
+    def get(self, timeout=None):
+        """
+        Возвращает следующее событие.
+
+        :param timeout: Время ожидания в секундах.
+        :type timeout: float, optional
+        :return: Событие или None, если за время ожидания событий не было.
+        :rtype: dict or None
+        """
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        """Отписывается от канала."""
+        self.hub.unsubscribe(self)
+
+    def _overflow(self):
+        """Заменяет переполненную очередь одним событием ``resync``."""
+        while True:
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+            except queue.Empty:
+                break
+        try:
+            self.queue.put_nowait(RESYNC_EVENT)
+        except queue.Full:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class LocalTransport:
+    """
+    Транспорт в пределах одного процесса.
+
+    Используется по умолчанию и как локальная замена межпроцессного транспорта в тестах.
+    """
+
+    def __init__(self):
+        self._handler = None
+
+    def start(self, handler):
+        """
+        Начинает доставку сообщений.
+
+        :param handler: Функция ``handler(channel, event)``, раздающая событие подписчикам.
+        :type handler: callable
+        """
+        self._handler = handler
+
+    def listen(self):
+        """Доставка внутри процесса не требует фонового потока."""
+
+    def publish(self, channel, event):
+        """
+        Публикует событие в канал.
+
+        :param channel: Имя канала.
+        :type channel: str
+        :param event: Событие.
+        :type event: dict
+        """
+        if self._handler is not None:
+            self._handler(channel, event)
+
+    def close(self):
+        """Останавливает доставку сообщений."""
+        self._handler = None
+
+
+class RedisTransport:
+    """
+    Межпроцессный транспорт поверх Redis Pub/Sub.
+
+    Нужен, когда приложение запущено в нескольких процессах: событие,
+    опубликованное в одном воркере, доставляется подписчикам во всех.
+
+    Поток доставки запускается при первой подписке в процессе (``listen``), а
+    не при создании приложения: под preforking-сервером с ``preload_app``
+    приложение создается в мастере, а поток и соединение подписки не
+    переживают fork. Поэтому каждый воркер запускает собственный поток.
+
+    :param url: Адрес сервера Redis.
+    :type url: str
+    :param prefix: Префикс имен каналов.
+    :type prefix: str
+    :param client: Готовый клиент Redis (например, локальная замена в тестах).
+    :type client: object, optional
+    """
+
+    def __init__(self, url, prefix='pubsub:', client=None):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self._handler = None
+        self._pubsub = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def start(self, handler):
+        """
+        Запоминает функцию доставки; поток доставки запускается при первой подписке в процессе.
+
+        :param handler: Функция ``handler(channel, event)``, раздающая событие подписчикам.
+        :type handler: callable
+        """
+        self._handler = handler
+
+    def listen(self):
+        """
+        Подписывается на все каналы с префиксом и запускает фоновый поток доставки,
+        если в текущем процессе он еще не запущен.
+
+        Подписка, унаследованная от родительского процесса, не закрывается: ее
+        соединение общее с родителем.
+        """
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._pubsub = self._subscribe()
+            self._thread = threading.Thread(target=self._run, args=(self._pubsub,), name='pubsub-redis', daemon=True)
+            self._pid = pid
+            self._thread.start()
+
+    def _subscribe(self):
+        """Открывает подписку Redis на все каналы с префиксом."""
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.psubscribe(self.prefix + '*')
+        return pubsub
+
+    def _run(self, pubsub):
+        """
+        Цикл фонового потока доставки.
+
+        При обрыве соединения поток записывает ошибку в журнал и подписывается
+        заново с удваивающейся паузой (от ``RECONNECT_DELAY`` до
+        ``RECONNECT_MAX_DELAY`` секунд). Если поток все же завершился, следующая
+        подписка в процессе запускает новый (см. ``listen``).
+
+        :param pubsub: Открытая подписка Redis.
+        """
+        current = threading.current_thread()
+        delay = RECONNECT_DELAY
+        try:
+            while self._thread is current:
+                try:
+                    if pubsub is None:
+                        pubsub = self._subscribe()
+                        with self._lock:
+                            if self._thread is not current:
+                                pubsub.close()
+                                return
+                            self._pubsub = pubsub
+                    for message in pubsub.listen():
+                        delay = RECONNECT_DELAY
+                        self._dispatch(message)
+                    return
+                except Exception:
+                    if self._thread is not current:
+                        return
+                    logger.exception('Подписка Redis прервана, повторное подключение через %.1f с', delay)
+                pubsub = None
+                time.sleep(delay)
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+        finally:
+            with self._lock:
+                if self._thread is current:
+                    self._thread = None
+                    self._pubsub = None
+                    self._pid = None
+
+    def _dispatch(self, message):
+        """Раздает подписчикам событие из сообщения Redis; ошибочное сообщение пропускается."""
+        try:
+            channel = message['channel']
+            if isinstance(channel, bytes):
+                channel = channel.decode()
+            self._handler(channel[len(self.prefix):], json.loads(message['data']))
+        except Exception:
+            logger.exception('Сообщение Redis пропущено: %r', message)
+
+    def publish(self, channel, event):
+        """
+        Публикует событие в канал.
+
+        :param channel: Имя канала.
+        :type channel: str
+        :param event: Событие.
+        :type event: dict
+        """
+        self.client.publish(self.prefix + channel, json.dumps(event, separators=(',', ':')))
+
+    def close(self):
+        """Отписывается от каналов Redis и останавливает поток доставки этого процесса."""
+        with self._lock:
+            pubsub, owned = self._pubsub, self._pid == os.getpid()
+            self._thread = None
+            self._pubsub = None
+            self._pid = None
+        if pubsub is not None and owned:
+            pubsub.close()
+
+
+class PubSubHub:
+    """
+    Шина публикации/подписки.
+
+    Подписчики регистрируются в процессе, а доставка между процессами
+    выполняется подключаемым транспортом.
+
+    :param transport: Транспорт сообщений.
+    :type transport: LocalTransport or RedisTransport, optional
+    :param queue_size: Размер очереди каждой подписки.
+    :type queue_size: int
+    """
+
+    def __init__(self, transport=None, queue_size=100):
+        self.queue_size = queue_size
+        self._subscribers = defaultdict(set)
+        self._streams = 0
+        self._lock = threading.Lock()
+        self.transport = None
+        self.set_transport(transport or LocalTransport())
+
+    def init_app(self, app):
+        """
+        Настраивает шину по конфигурации приложения.
+
+        :param app: Экземпляр приложения.
+        :type app: Flask
+        """
+        self.queue_size = app.config.get('PUBSUB_QUEUE_SIZE', self.queue_size)
+        if app.config.get('PUBSUB_TRANSPORT', 'local') == 'redis':
+            self.set_transport(RedisTransport(app.config['PUBSUB_REDIS_URL']))
+        else:
+            self.set_transport(LocalTransport())
+        app.extensions['pubsub'] = self
+
+    def set_transport(self, transport):
+        """
+        Заменяет транспорт сообщений.
+
+        :param transport: Новый транспорт.
+        :type transport: LocalTransport or RedisTransport
+        """
+        if self.transport is not None:
+            self.transport.close()
+        self.transport = transport
+        transport.start(self._deliver)
+
+    def publish(self, channel, event):
+        """
+        Публикует событие в канал.
+
+        :param channel: Имя канала.
+        :type channel: str
+        :param event: Событие; должно сериализоваться в JSON.
+        :type event: dict
+        """
+        self.transport.publish(channel, event)
+
+    def subscribe(self, channel):
+        """
+        Подписывается на канал.
+
+        :param channel: Имя канала.
+        :type channel: str
+        :return: Подписка.
+        :rtype: Subscription
+        """
+        self.transport.listen()
+        subscription = Subscription(self, channel, self.queue_size)
+        with self._lock:
+            self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """
+        Отменяет подписку.
+
+        :param subscription: Подписка.
+        :type subscription: Subscription
+        """
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def subscriber_count(self, channel):
+        """
+        Возвращает количество подписчиков канала.
+
+        :param channel: Имя канала.
+        :type channel: str
+        :return: Количество подписчиков.
+        :rtype: int
+        """
+        with self._lock:
+            return len(self._subscribers.get(channel, ()))
+
+    def acquire_stream(self, limit):
+        """
+        Занимает место для долгого потока событий в этом процессе.
+
+        Каждый открытый поток Server-Sent Events занимает поток воркера на все
+        время соединения, поэтому их количество ограничивается, чтобы воркеру
+        оставались потоки для обычных запросов.
+
+        :param limit: Максимальное количество одновременных потоков (0 - без ограничения).
+        :type limit: int
+        :return: True, если место занято; False, если все места заняты.
+        :rtype: bool
+        """
+        with self._lock:
+            if limit and self._streams >= limit:
+                return False
+            self._streams += 1
+            return True
+
+    def release_stream(self):
+        """Освобождает место, занятое ``acquire_stream``."""
+        with self._lock:
+            self._streams -= 1
+
+    def _deliver(self, channel, event):
+        """Раздает событие всем подписчикам канала в этом процессе."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.put(event)
+
+
+def format_sse(event):
+    """
+    Форматирует событие для потока Server-Sent Events.
+
+    :param event: Событие с обязательным ключом ``type``.
+    :type event: dict
+    :return: Кадр SSE.
+    :rtype: str
+    """
+    data = json.dumps(event, ensure_ascii=False, separators=(',', ':'))
+    return f"event: {event['type']}\ndata: {data}\n\n"
+
+
+hub = PubSubHub()
@@ -0,0 +1,280 @@
+"""Ограничение частоты запросов алгоритмом token bucket с подключаемыми хранилищами."""
+
+import math
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from flask import current_app, jsonify, request
+from flask_login import current_user
+from werkzeug.exceptions import TooManyRequests
+
+SAFE_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+AUTH_ENDPOINTS = frozenset(('auth.login', 'auth.register'))
+
+
+def take(tokens, updated, now, rate, capacity, cost=1):
+    """
+    Пополняет корзину за прошедшее время и пытается забрать из нее маркеры.
+
+    :param tokens: Количество маркеров на момент ``updated``; None - новая (полная) корзина.
+    :type tokens: float or None
+    :param updated: Момент последнего обращения к корзине в секундах.
+    :type updated: float
+    :param now: Текущий момент в секундах.
+    :type now: float
+    :param rate: Скорость пополнения в маркерах в секунду.
+    :type rate: float
+    :param capacity: Емкость корзины (допустимый всплеск запросов).
+    :type capacity: float
+    :param cost: Стоимость запроса в маркерах.
+    :type cost: float
+    :return: Новое количество маркеров и время ожидания в секундах (0, если запрос разрешен).
+    :rtype: tuple[float, float]
+    """
+    if tokens is None:
+        tokens = capacity
+    else:
+        tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+    if tokens >= cost:
+        return tokens - cost, 0.0
+    return tokens, (cost - tokens) / rate
+
+
+class LocalBucketStore:
+    """
+    Хранилище корзин в памяти процесса.
+
+    Корзины лежат в ``OrderedDict`` в порядке последнего обращения, поэтому
+    обращение к корзине и вытеснение выполняются за O(1). Корзина, к которой
+    не обращались дольше времени ее полного пополнения, ничем не отличается от
+    новой, поэтому такие корзины удаляются с начала словаря при каждом
+    обращении; при переполнении ``maxsize`` вытесняется самая давняя корзина.
+
+    :param maxsize: Максимальное количество корзин.
+    :type maxsize: int
+    :param clock: Функция, возвращающая текущий момент в секундах.
+    :type clock: callable
+    """
+
+    shared = False
+
+    def __init__(self, maxsize=10000, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.clock = clock
+        self._buckets = OrderedDict()
+        self._lock = Lock()
+
+    def consume(self, key, rate, capacity, cost=1):
+        """
+        Забирает маркеры из корзины ключа.
+
+        :param key: Ключ корзины.
+        :type key: str
+        :param rate: Скорость пополнения в маркерах в секунду.
+        :type rate: float
+        :param capacity: Емкость корзины.
+        :type capacity: float
+        :param cost: Стоимость запроса в маркерах.
+        :type cost: float
+        :return: Время ожидания в секундах; 0, если запрос разрешен.
+        :rtype: float
+        """
+        now = self.clock()
+        with self._lock:
+            self._evict(now)
+            item = self._buckets.pop(key, None)
+            tokens, wait = take(*(item[:2] if item else (None, now)), now, rate, capacity, cost)
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+            if len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def _evict(self, now):
+        """Удаляет с начала словаря корзины, успевшие пополниться полностью."""
+        while self._buckets:
+            key, (_, _, full_at) = next(iter(self._buckets.items()))
+            if full_at > now:
+                break
+            del self._buckets[key]
+
+    def clear(self):
+        """Удаляет все корзины."""
+        with self._lock:
+            self._buckets.clear()
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+# Скрипт выполняется в Redis атомарно и повторяет функцию take: корзина
+# хранится хешем {tokens, updated} со сроком жизни, равным времени полного
+# пополнения. Время берется с сервера Redis, чтобы часы процессов не влияли на лимиты.
+CONSUME_SCRIPT = """
+local rate, capacity, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1])
+if tokens == nil then
+    tokens = capacity
+else
+    tokens = math.min(capacity, tokens + math.max(0, now - tonumber(state[2])) * rate)
+end
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('PEXPIRE', KEYS[1], math.max(1, math.ceil((capacity - tokens) / rate * 1000)))
+return tostring(wait)
+"""
+
+
+class RedisBucketStore:
+    """
+    Хранилище корзин в Redis, общее для всех процессов приложения.
+
+    Каждое обращение - один вызов скрипта ``CONSUME_SCRIPT``; простаивающие
+    корзины удаляет сам Redis по сроку жизни ключа.
+
+    :param url: Адрес сервера Redis.
+    :type url: str
+    :param prefix: Префикс ключей.
+    :type prefix: str
+    :param client: Готовый клиент Redis (например, локальная замена в тестах).
+    :type client: object, optional
+    """
+
+    shared = True
+
+    def __init__(self, url=None, prefix='ratelimit:', client=None):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self._script = client.register_script(CONSUME_SCRIPT)
+
+    def consume(self, key, rate, capacity, cost=1):
+        """
+        Забирает маркеры из корзины ключа.
+
+        :param key: Ключ корзины.
+        :type key: str
+        :param rate: Скорость пополнения в маркерах в секунду.
+        :type rate: float
+        :param capacity: Емкость корзины.
+        :type capacity: float
+        :param cost: Стоимость запроса в маркерах.
+        :type cost: float
+        :return: Время ожидания в секундах; 0, если запрос разрешен.
+        :rtype: float
+        """
+        return float(self._script(keys=[self.prefix + key], args=[rate, capacity, cost]))
+
+    def clear(self):
+        """Удаляет все корзины с префиксом хранилища."""
+        keys = list(self.client.scan_iter(match=self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+
+class RateLimiter:
+    """
+    Ограничение частоты запросов по группам маршрутов.
+
+    Запрос относится к одной из групп: ``auth`` - отправка форм входа и
+    регистрации, ``write`` - остальные изменяющие запросы, ``read`` - чтение.
+    Для каждой группы в ``RATELIMIT_LIMITS`` задана пара ``(емкость, период)``:
+    клиент может сделать всплеск из ``емкость`` запросов, после чего получает
+    ``емкость`` запросов за ``период`` секунд. Клиент определяется по
+    пользователю, а если вход не выполнен (и всегда для группы ``auth``) -
+    по IP-адресу. Превысивший лимит запрос получает ответ 429 с заголовком
+    ``Retry-After`` до выполнения обработчика маршрута.
+    """
+
+    def init_app(self, app):
+        """
+        Подключает ограничение к приложению.
+
+        Хранилище выбирается настройкой ``RATELIMIT_BACKEND`` (``local`` или
+        ``redis``); ``RATELIMIT_ENABLED = False`` отключает ограничение.
+
+        :param app: Экземпляр приложения.
+        :type app: Flask
+        """
+        if not app.config.get('RATELIMIT_ENABLED', True):
+            return
+        if app.config.get('RATELIMIT_BACKEND', 'local') == 'redis':
+            store = RedisBucketStore(app.config['RATELIMIT_REDIS_URL'])
+        else:
+            store = LocalBucketStore(app.config.get('RATELIMIT_MAXSIZE', 10000))
+        app.extensions['ratelimit'] = store
+        app.before_request(self._before_request)
+
+    @property
+    def store(self):
+        """Хранилище корзин текущего приложения."""
+        return current_app.extensions['ratelimit']
+
+    @staticmethod
+    def group():
+        """
+        Возвращает группу текущего запроса или None, если запрос не ограничивается.
+
+        :rtype: str or None
+        """
+        if request.endpoint in (None, 'static'):
+            return None
+        if request.method in SAFE_METHODS:
+            return 'read'
+        return 'auth' if request.endpoint in AUTH_ENDPOINTS else 'write'
+
+    @staticmethod
+    def client_key(group):
+        """
+        Возвращает ключ клиента текущего запроса.
+
+        :param group: Группа запроса.
+        :type group: str
+        :rtype: str
+        """
+        if group != 'auth' and current_user.is_authenticated:
+            return f'user:{current_user.id}'
+        return f'ip:{request.remote_addr}'
+
+    def hit(self, group, client):
+        """
+        Учитывает запрос клиента в корзине группы.
+
+        :param group: Группа запроса.
+        :type group: str
+        :param client: Ключ клиента.
+        :type client: str
+        :return: Время ожидания в секундах; 0, если запрос разрешен.
+        :rtype: float
+        """
+        capacity, period = current_app.config['RATELIMIT_LIMITS'][group]
+        return self.store.consume(f'{group}:{client}', capacity / period, capacity)
+
+    def _before_request(self):
+        """Отклоняет запрос, превысивший лимит своей группы."""
+        group = self.group()
+        if group is None or group not in current_app.config['RATELIMIT_LIMITS']:
+            return None
+        wait = self.hit(group, self.client_key(group))
+        if not wait:
+            return None
+        retry_after = max(1, math.ceil(wait))
+        if request.is_json or request.accept_mimetypes.best == 'application/json':
+            response = jsonify(errors=['Слишком много запросов, повторите позже.'], retry_after=retry_after)
+            response.status_code = 429
+            response.headers['Retry-After'] = str(retry_after)
+            return response
+        raise TooManyRequests(retry_after=retry_after)
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,251 @@
+"""
+Генератор синтетических данных для нагрузочного тестирования.
+
+Пользователи, списки и задачи создаются пакетными INSERT ядра SQLAlchemy
+(по ``--batch-size`` строк) в крупных транзакциях (по ``--transaction-size``
+строк), минуя ORM и сервисы. Все случайные значения берутся из
+``random.Random(--seed)``, а даты отсчитываются от ``--base-date``, поэтому
+одинаковые параметры дают одинаковую базу данных (кроме соли хеша пароля:
+у всех сгенерированных пользователей пароль ``password``).
+"""
+
+import random
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, insert, select
+
+from database import db
+from events.models import EventType, TaskEvent
+from events.services import TASK_FIELDS
+from serialization import plain
+from todo_list import ranking
+from todo_list.models import Task, TaskStatus, TodoList
+from users.models import User
+from users.utils import hash_password
+
+DISTRIBUTIONS = ('uniform', 'exponential')
+# Порядок записи таблиц: строки ссылаются только на таблицы левее.
+TABLES = (User, TodoList, Task, TaskEvent)
+
+
+class CountRange(click.ParamType):
+    """Параметр CLI: число ``N`` или диапазон ``MIN-MAX``."""
+
+    name = 'range'
+
+    def convert(self, value, param, ctx):
+        if isinstance(value, tuple):
+            return value
+        try:
+            low, _, high = str(value).partition('-')
+            low, high = int(low), int(high or low)
+        except ValueError:
+            self.fail(f'{value!r} - не число и не диапазон MIN-MAX.', param, ctx)
+        if low < 0 or high < low:
+            self.fail(f'{value!r} - неверный диапазон.', param, ctx)
+        return low, high
+
+
+def draw_count(rng, bounds, distribution):
+    """
+    Выбирает количество из диапазона по распределению.
+
+    :param rng: Генератор случайных чисел.
+    :type rng: random.Random
+    :param bounds: Границы ``(MIN, MAX)`` включительно.
+    :type bounds: tuple[int, int]
+    :param distribution: ``uniform`` - равномерно, ``exponential`` - экспоненциально
+        со средним в середине диапазона (много маленьких значений и длинный хвост).
+    :type distribution: str
+    :return: Количество.
+    :rtype: int
+    """
+    low, high = bounds
+    if distribution == 'exponential' and high > low:
+        return min(high, low + int(rng.expovariate(2 / (high - low))))
+    return rng.randint(low, high)
+
+
+def next_id(model):
+    """Возвращает первый свободный идентификатор таблицы."""
+    return (db.session.scalar(select(func.max(model.id))) or 0) + 1
+
+
+class Seeder:
+    """
+    Пакетная запись сгенерированных строк.
+
+    Строки каждой таблицы копятся в буфере и записываются executemany по
+    ``batch_size`` штук; транзакция фиксируется после ``transaction_size`` строк.
+    Перед записью буфера записываются буферы таблиц, на которые он ссылается.
+
+    :param connection: Соединение с базой данных.
+    :type connection: sqlalchemy.engine.Connection
+    :param batch_size: Количество строк в одном INSERT.
+    :type batch_size: int
+    :param transaction_size: Количество строк в одной транзакции.
+    :type transaction_size: int
+    """
+
+    def __init__(self, connection, batch_size, transaction_size):
+        self.connection = connection
+        self.batch_size = batch_size
+        self.transaction_size = transaction_size
+        self.buffers = {}
+        self.counts = {}
+        self.uncommitted = 0
+        self.transaction = connection.begin()
+
+    def add(self, model, row):
+        """Добавляет строку в буфер таблицы и записывает буфер, когда он заполнен."""
+        buffer = self.buffers.setdefault(model, [])
+        buffer.append(row)
+        if len(buffer) >= self.batch_size:
+            for table in TABLES[:TABLES.index(model) + 1]:
+                self.flush(table)
+
+    def flush(self, model):
+        """Записывает буфер таблицы одним пакетным INSERT."""
+        buffer = self.buffers.get(model)
+        if not buffer:
+            return
+        self.connection.execute(insert(model), buffer)
+        self.counts[model] = self.counts.get(model, 0) + len(buffer)
+        self.uncommitted += len(buffer)
+        self.buffers[model] = []
+        if self.uncommitted >= self.transaction_size:
+            self.commit()
+
+    def commit(self):
+        """Фиксирует текущую транзакцию и начинает новую."""
+        self.transaction.commit()
+        self.uncommitted = 0
+        self.transaction = self.connection.begin()
+
+    def close(self):
+        """Записывает остатки буферов в порядке зависимостей таблиц и фиксирует транзакцию."""
+        for model in TABLES:
+            self.flush(model)
+        self.transaction.commit()
+
+
+def task_row(rng, task_id, todo_id, rank, base, completion_ratio, deadline_days, no_deadline_ratio):
+    """
+    Генерирует строку задачи.
+
+    :param rng: Генератор случайных чисел.
+    :type rng: random.Random
+    :param task_id: Идентификатор задачи.
+    :type task_id: int
+    :param todo_id: Идентификатор списка задач.
+    :type todo_id: int
+    :param rank: Ключ порядка задачи в списке.
+    :type rank: str
+    :param base: Момент, от которого отсчитываются даты.
+    :type base: datetime
+    :param completion_ratio: Доля завершенных задач.
+    :type completion_ratio: float
+    :param deadline_days: Разброс дедлайнов в днях в обе стороны от ``base``.
+    :type deadline_days: int
+    :param no_deadline_ratio: Доля задач без дедлайна.
+    :type no_deadline_ratio: float
+    :return: Строка таблицы ``task``.
+    :rtype: dict
+    """
+    created_at = base - timedelta(seconds=rng.randrange(deadline_days * 86400 + 1))
+    deadline = None
+    if rng.random() >= no_deadline_ratio:
+        deadline = base + timedelta(seconds=rng.randint(-deadline_days * 86400, deadline_days * 86400))
+    is_complete = rng.random() < completion_ratio
+    if is_complete:
+        status = TaskStatus.COMPLETED
+    elif deadline is not None and deadline <= base:
+        status = TaskStatus.OVERDUE
+    else:
+        status = TaskStatus.ACTIVE
+    return {
+        'id': task_id,
+        'title': f'Задача {task_id}',
+        'description': f'Описание задачи {task_id}' if rng.random() < 0.5 else None,
+        'is_complete': is_complete,
+        'created_at': created_at,
+        'deadline_date': deadline,
+        'completed_at': created_at + (base - created_at) * rng.random() if is_complete else None,
+        'status': status,
+        'priority': min(10, int(rng.expovariate(0.5))),
+        'todo_id': todo_id,
+        'parent_id': None,
+        'rank': rank,
+    }
+
+
+@click.command('seed')
+@click.option('--users', default=100, show_default=True, help='Количество пользователей.')
+@click.option('--lists-per-user', type=CountRange(), default='1-5', show_default=True,
+              help='Списков у пользователя: N или MIN-MAX.')
+@click.option('--tasks-per-list', type=CountRange(), default='0-50', show_default=True,
+              help='Задач в списке: N или MIN-MAX.')
+@click.option('--distribution', type=click.Choice(DISTRIBUTIONS), default='uniform', show_default=True,
+              help='Распределение количества списков и задач в диапазоне.')
+@click.option('--completion-ratio', type=click.FloatRange(0, 1), default=0.3, show_default=True,
+              help='Доля завершенных задач.')
+@click.option('--deadline-days', type=click.IntRange(0), default=30, show_default=True,
+              help='Разброс дедлайнов в днях в обе стороны от базовой даты.')
+@click.option('--no-deadline-ratio', type=click.FloatRange(0, 1), default=0.2, show_default=True,
+              help='Доля задач без дедлайна.')
+@click.option('--seed', default=0, show_default=True, help='Начальное значение генератора случайных чисел.')
+@click.option('--base-date', type=click.DateTime(['%Y-%m-%d']), default=None,
+              help='Дата, от которой отсчитываются даты задач (по умолчанию - сегодня).')
+@click.option('--events/--no-events', default=True, show_default=True,
+              help='Записывать события создания в журнал, чтобы проекции строились командой events project.')
+@click.option('--batch-size', type=click.IntRange(1), default=10000, show_default=True,
+              help='Количество строк в одном INSERT.')
+@click.option('--transaction-size', type=click.IntRange(1), default=500000, show_default=True,
+              help='Количество строк в одной транзакции.')
+@with_appcontext
+def seed_command(users, lists_per_user, tasks_per_list, distribution, completion_ratio, deadline_days,
+                 no_deadline_ratio, seed, base_date, events, batch_size, transaction_size):
+    """Заполняет базу данных синтетическими пользователями, списками и задачами."""
+    rng = random.Random(seed)
+    base = base_date or datetime.combine(datetime.now().date(), datetime.min.time())
+    first_user_id, todo_id, task_id = next_id(User), next_id(TodoList), next_id(Task)
+    password = hash_password('password')
+    db.session.remove()
+    started = time.perf_counter()
+
+    with db.engine.connect() as connection:
+        seeder = Seeder(connection, batch_size, transaction_size)
+        for user_id in range(first_user_id, first_user_id + users):
+            seeder.add(User, {'id': user_id, 'email': f'seed{user_id}@example.com',
+                              'username': f'seed{user_id}', 'password': password, 'notification_settings': {}})
+            for _ in range(draw_count(rng, lists_per_user, distribution)):
+                seeder.add(TodoList, {'id': todo_id, 'title': f'Список {todo_id}', 'user_id': user_id})
+                if events:
+                    seeder.add(TaskEvent, {'type': EventType.TODO_CREATED, 'user_id': user_id, 'todo_id': todo_id,
+                                           'task_id': None, 'data': {'title': f'Список {todo_id}'},
+                                           'created_at': base})
+                for rank in ranking.keys_between(None, None, draw_count(rng, tasks_per_list, distribution)):
+                    row = task_row(rng, task_id, todo_id, rank, base, completion_ratio, deadline_days,
+                                   no_deadline_ratio)
+                    seeder.add(Task, row)
+                    if events:
+                        seeder.add(TaskEvent, {'type': EventType.TASK_CREATED, 'user_id': user_id,
+                                               'todo_id': todo_id, 'task_id': task_id,
+                                               'data': {field: plain(row[field]) for field in TASK_FIELDS},
+                                               'created_at': row['created_at']})
+                    task_id += 1
+                todo_id += 1
+        seeder.close()
+
+    elapsed = time.perf_counter() - started
+    counts = seeder.counts
+    click.echo(f'Создано пользователей: {counts.get(User, 0)}, списков: {counts.get(TodoList, 0)}, '
+               f'задач: {counts.get(Task, 0)} за {elapsed:.2f} с '
+               f'({counts.get(Task, 0) / elapsed if elapsed else 0:.0f} задач/с).')
+    if events:
+        click.echo('Постройте проекции: flask events project.')
+    else:
+        click.echo('Журнал событий не заполнялся: статистика пересчитывается командой flask recompute-stats.')
@@ -0,0 +1,114 @@
+"""
+Ответы JSON API: выборочные наборы полей и выбор кодировки.
+
+Клиент перечисляет нужные поля параметром ``fields``; из базы данных
+выбираются только соответствующие колонки. Кодировка ответа выбирается по
+заголовку ``Accept``: JSON по умолчанию или MessagePack (``application/msgpack``),
+если установлен пакет ``msgpack``.
+"""
+
+from datetime import date, datetime
+
+from flask import Response, jsonify, request
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+
+
+def _msgpack():
+    """Возвращает модуль ``msgpack`` или None, если пакет не установлен."""
+    try:
+        import msgpack
+    except ImportError:
+        return None
+    return msgpack
+
+
+class FieldSet:
+    """
+    Набор полей ресурса, доступных для выборочного ответа.
+
+    :param columns: Колонки SQL по имени поля в ответе.
+    :type columns: dict[str, sqlalchemy.sql.ColumnElement]
+    :param default: Поля ответа, если параметр ``fields`` не передан (по умолчанию - все).
+    :type default: tuple[str], optional
+    """
+
+    def __init__(self, columns, default=None):
+        self.columns = columns
+        self.default = tuple(default or columns)
+
+    def parse(self, value):
+        """
+        Разбирает значение параметра ``fields``.
+
+        :param value: Имена полей через запятую или None.
+        :type value: str, optional
+        :return: Колонки SQL с метками полей и пустой список ошибок либо None и список ошибок
+            в формате ``validation`` (неизвестное поле или значение без единого поля, например ``,``).
+        :rtype: tuple[list or None, list[dict]]
+        """
+        names = [name.strip() for name in value.split(',') if name.strip()] if value else self.default
+        if not names:
+            return None, [{'field': 'fields', 'message': 'At least one field is required', 'type': 'value_error'}]
+        unknown = [name for name in names if name not in self.columns]
+        if unknown:
+            return None, [{'field': 'fields', 'message': f'Unknown field: {name}', 'type': 'value_error'}
+                          for name in unknown]
+        return [self.columns[name].label(name) for name in dict.fromkeys(names)], []
+
+
+def plain(value):
+    """
+    Приводит значение колонки к типу, который кодируется в JSON и MessagePack одинаково.
+
+    :param value: Значение колонки.
+    :return: Дата в формате ISO 8601 или исходное значение.
+    """
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def rows_payload(rows):
+    """
+    Преобразует строки результата запроса в словари.
+
+    :param rows: Строки результата.
+    :type rows: Iterable[sqlalchemy.engine.Row]
+    :return: Словари поле - значение.
+    :rtype: list[dict]
+    """
+    return [{key: plain(value) for key, value in row._mapping.items()} for row in rows]
+
+
+def negotiate():
+    """
+    Выбирает кодировку ответа по заголовку ``Accept`` текущего запроса.
+
+    :return: MIME-тип ответа.
+    :rtype: str
+    """
+    offered = [JSON_MIMETYPE, *(MSGPACK_MIMETYPES if _msgpack() else ())]
+    return request.accept_mimetypes.best_match(offered, default=JSON_MIMETYPE)
+
+
+def api_response(payload, status=200):
+    """
+    Кодирует ответ API в согласованной с клиентом кодировке.
+
+    :param payload: Данные ответа.
+    :type payload: dict
+    :param status: Код ответа.
+    :type status: int
+    :return: Ответ.
+    :rtype: flask.Response
+    """
+    mimetype = negotiate()
+    if mimetype in MSGPACK_MIMETYPES:
+        response = Response(_msgpack().packb(payload), status=status, mimetype=mimetype)
+    else:
+        response = jsonify(payload)
+        response.status_code = status
+    response.vary.add('Accept')
+    return response
@@ -0,0 +1,279 @@
+"""
+Журнал медленных SQL-запросов и периодическая сводка по времени базы данных.
+
+Каждый запрос, выполненный движком приложения, приводится к отпечатку
+(``fingerprint``): литералы и параметры заменяются на ``?``, списки ``IN`` и
+многострочные ``VALUES`` сворачиваются, пробелы схлопываются. По отпечатку
+копятся количество выполнений и суммарное время, поэтому сводка показывает,
+какие запросы занимают базу дольше всего, даже если каждый по отдельности
+быстрый. Запросы дольше ``SLOW_QUERY_THRESHOLD`` миллисекунд записываются в
+журнал ``slow_queries`` сразу, вместе с маршрутом, пользователем, методом
+сервиса, из которого выполнен запрос, количеством строк и длительностью.
+Раз в ``SLOW_QUERY_REPORT_INTERVAL`` секунд перед очередным запросом в журнал
+выводится сводка ``SLOW_QUERY_REPORT_TOP`` отпечатков с наибольшим суммарным
+временем, после чего счетчики начинают копиться заново.
+"""
+
+import functools
+import hashlib
+import logging
+import re
+import sys
+import time
+from threading import Lock
+
+from flask import g, has_request_context, request
+from sqlalchemy import event, inspect
+
+from database import db
+
+logger = logging.getLogger('slow_queries')
+
+OTHER = '<other>'
+SOURCE_MAX_DEPTH = 60
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+_ROWS = re.compile(r'(\([^()]*\))(?:\s*,\s*\([^()]*\))+')
+_SPACE = re.compile(r'\s+')
+
+
+@functools.lru_cache(maxsize=2048)
+def fingerprint(statement):
+    """
+    Возвращает отпечаток SQL-запроса: текст без конкретных значений.
+
+    :param statement: Текст запроса.
+    :type statement: str
+    :return: Нормализованный текст запроса.
+    :rtype: str
+    """
+    text = _STRING.sub('?', statement)
+    text = _NUMBER.sub('?', text)
+    text = _IN_LIST.sub('IN (?...)', text)
+    text = _ROWS.sub(r'\1, ...', text)
+    return _SPACE.sub(' ', text).strip()
+
+
+def fingerprint_id(text):
+    """
+    Возвращает короткий идентификатор отпечатка для поиска по журналу.
+
+    :param text: Отпечаток запроса.
+    :type text: str
+    :rtype: str
+    """
+    return hashlib.sha1(text.encode()).hexdigest()[:12]
+
+
+def query_source():
+    """
+    Возвращает метод сервиса, ближайший к месту выполнения запроса в стеке вызовов.
+
+    :return: Имя вида ``TaskService.get_task`` или None, если запрос выполнен не из сервиса.
+    :rtype: str or None
+    """
+    frame = sys._getframe(1)
+    for _ in range(SOURCE_MAX_DEPTH):
+        if frame is None:
+            return None
+        name = getattr(frame.f_code, 'co_qualname', frame.f_code.co_name)
+        if 'Service.' in name and '<' not in name:
+            return name
+        frame = frame.f_back
+    return None
+
+
+def request_context():
+    """
+    Возвращает маршрут и пользователя текущего запроса.
+
+    Пользователь берется только если он уже загружен, а его идентификатор -
+    из ключа identity, чтобы не выполнять запрос к базе (обновление
+    устаревшего объекта) внутри обработчика события движка.
+
+    :return: Имя маршрута (``-`` вне запроса) и идентификатор пользователя.
+    :rtype: tuple[str, int or None]
+    """
+    if not has_request_context():
+        return '-', None
+    state = inspect(g.get('_login_user'), raiseerr=False)
+    user_id = state.identity[0] if state is not None and state.identity else None
+    return request.endpoint or request.path, user_id
+
+
+class QueryStats:
+    """
+    Счетчики одного отпечатка за текущий период сводки.
+
+    :param text: Отпечаток запроса.
+    :type text: str
+    :param source: Метод сервиса, выполнивший запрос.
+    :type source: str, optional
+    """
+
+    __slots__ = ('text', 'source', 'count', 'total', 'max', 'slow', 'endpoint')
+
+    def __init__(self, text, source=None):
+        self.text = text
+        self.source = source
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.slow = 0
+        self.endpoint = None
+
+    def as_dict(self):
+        """Возвращает счетчики в виде словаря (длительности в миллисекундах)."""
+        return {'id': fingerprint_id(self.text), 'fingerprint': self.text, 'source': self.source,
+                'count': self.count, 'total_ms': round(self.total, 3), 'max_ms': round(self.max, 3),
+                'slow': self.slow, 'endpoint': self.endpoint}
+
+
+class SlowQueryLog:
+    """
+    Журнал медленных запросов с накоплением времени по отпечаткам.
+
+    :param threshold: Порог медленного запроса в миллисекундах.
+    :type threshold: float
+    :param max_fingerprints: Максимальное количество отдельно учитываемых отпечатков;
+        остальные запросы учитываются вместе под отпечатком ``<other>``.
+    :type max_fingerprints: int
+    """
+
+    def __init__(self, threshold=100, max_fingerprints=1000):
+        self.threshold = threshold
+        self.max_fingerprints = max_fingerprints
+        self.interval = 0
+        self.top = 10
+        self.started_at = time.time()
+        self._last_report = time.monotonic()
+        self._stats = {}
+        self._lock = Lock()
+
+    def init_app(self, app):
+        """
+        Подключает журнал к движку базы данных приложения.
+
+        Порог берется из ``SLOW_QUERY_THRESHOLD``; ``None`` отключает журнал.
+        Каждое приложение получает собственные счетчики.
+
+        :param app: Экземпляр приложения.
+        :type app: Flask
+        """
+        threshold = app.config.get('SLOW_QUERY_THRESHOLD', 100)
+        if threshold is None:
+            return
+        log = SlowQueryLog(threshold, app.config.get('SLOW_QUERY_MAX_FINGERPRINTS', 1000))
+        log.interval = app.config.get('SLOW_QUERY_REPORT_INTERVAL', 3600)
+        log.top = app.config.get('SLOW_QUERY_REPORT_TOP', 10)
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', log._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', log._after_cursor_execute)
+        if log.interval:
+            app.before_request(log._before_request)
+        app.extensions['slow_queries'] = log
+
+    def record(self, statement, duration, rowcount=None):
+        """
+        Учитывает выполненный запрос и записывает его в журнал, если он медленный.
+
+        :param statement: Текст запроса.
+        :type statement: str
+        :param duration: Длительность в миллисекундах.
+        :type duration: float
+        :param rowcount: Количество затронутых строк, если драйвер его сообщает.
+        :type rowcount: int, optional
+        """
+        text = fingerprint(statement)
+        slow = duration >= self.threshold
+        with self._lock:
+            stats = self._stats.get(text)
+            new = stats is None
+            if new and len(self._stats) >= self.max_fingerprints:
+                stats = self._stats.get(OTHER)
+                new = stats is None
+                text = OTHER
+        if new or slow:
+            source = query_source()
+            endpoint, user_id = request_context()
+        with self._lock:
+            if new:
+                stats = self._stats.setdefault(text, QueryStats(text, source))
+            stats.count += 1
+            stats.total += duration
+            stats.max = max(stats.max, duration)
+            if slow:
+                stats.slow += 1
+                stats.endpoint = endpoint
+        if slow:
+            logger.warning('Медленный запрос %.1f мс [%s] маршрут=%s пользователь=%s источник=%s строк=%s: %s',
+                           duration, fingerprint_id(text), endpoint, user_id if user_id is not None else '-',
+                           source or '-', rowcount if rowcount is not None else '-', text)
+
+    def report(self, top=None):
+        """
+        Возвращает отпечатки с наибольшим суммарным временем за текущий период.
+
+        :param top: Количество отпечатков; по умолчанию ``SLOW_QUERY_REPORT_TOP``.
+        :type top: int, optional
+        :return: Словари со счетчиками (см. ``QueryStats.as_dict``) по убыванию суммарного времени.
+        :rtype: list[dict]
+        """
+        with self._lock:
+            stats = sorted(self._stats.values(), key=lambda item: item.total, reverse=True)
+            return [item.as_dict() for item in stats[:top or self.top]]
+
+    def reset(self):
+        """Обнуляет счетчики и начинает новый период сводки."""
+        with self._lock:
+            self._stats = {}
+            self.started_at = time.time()
+            self._last_report = time.monotonic()
+
+    def log_report(self):
+        """
+        Записывает сводку за период в журнал и начинает новый период.
+
+        :return: Выведенная сводка.
+        :rtype: list[dict]
+        """
+        rows = self.report()
+        with self._lock:
+            total = sum(item.total for item in self._stats.values())
+        period = time.time() - self.started_at
+        self.reset()
+        lines = [f'Сводка запросов за {period:.0f} с: всего {total:.1f} мс']
+        for row in rows:
+            share = row['total_ms'] / total * 100 if total else 0
+            lines.append(f"{row['total_ms']:.1f} мс ({share:.0f}%) x{row['count']} max={row['max_ms']:.1f} мс "
+                         f"медленных={row['slow']} [{row['id']}] {row['source'] or '-'}: {row['fingerprint']}")
+        logger.info('\n'.join(lines))
+        return rows
+
+    def _before_cursor_execute(self, connection, cursor, statement, parameters, context, executemany):
+        """Запоминает время начала запроса."""
+        if context is not None:
+            context._slow_query_start = time.perf_counter()
+
+    def _after_cursor_execute(self, connection, cursor, statement, parameters, context, executemany):
+        """Учитывает длительность выполненного запроса."""
+        start = getattr(context, '_slow_query_start', None)
+        if start is not None:
+            rowcount = cursor.rowcount if cursor.rowcount is not None and cursor.rowcount >= 0 else None
+            self.record(statement, (time.perf_counter() - start) * 1000, rowcount)
+
+    def _before_request(self):
+        """Выводит сводку, если с предыдущей прошло ``SLOW_QUERY_REPORT_INTERVAL`` секунд."""
+        if time.monotonic() - self._last_report >= self.interval:
+            with self._lock:
+                due = time.monotonic() - self._last_report >= self.interval
+                if due:
+                    self._last_report = time.monotonic()
+            if due:
+                self.log_report()
+
+
+slow_query_log = SlowQueryLog()
@@ -1,21 +1,200 @@
-// Функция для отображения/скрытия формы обновления списка задач
-function toggleUpdateForm(todoId) {
-    const updateForm = document.getElementById(`update-form-${todoId}`);
+// Функция для отображения/скрытия формы обновления списка задач или задачи
+function toggleUpdateForm(itemId) {
+    const updateForm = document.getElementById(`update-form-${itemId}`);
     updateForm.style.display = updateForm.style.display === 'none' ? 'block' : 'none';
 }
 
 // Делегирование событий для кнопок "Редактировать"
 document.addEventListener('click', function(event) {
     if (event.target.classList.contains('edit-button')) {
-        const todoId = event.target.getAttribute('data-todo-id');
-        toggleUpdateForm(todoId);
+        const itemId = event.target.getAttribute('data-todo-id') || event.target.getAttribute('data-task-id');
+        toggleUpdateForm(itemId);
     }
 });
 
 // Показать форму для создания нового списка задач при нажатии на кнопку
 const createTodoBtn = document.getElementById('create-todo-btn');
 const createTodoForm = document.getElementById('create-todo-form');
-createTodoBtn.addEventListener('click', function() {
-    createTodoForm.style.display = 'block';
-});
+if (createTodoBtn) {
+    createTodoBtn.addEventListener('click', function() {
+        createTodoForm.style.display = 'block';
+    });
+}
+
+// Живое обновление страницы списка задач по событиям сервера (Server-Sent Events)
+const todoListContainer = document.getElementById('todo-list');
+if (todoListContainer && window.EventSource) {
+    const taskCards = document.getElementById('task-cards');
+    const cardTemplate = document.getElementById('task-card-template');
+
+    function formatDate(value) {
+        return value ? value.replace('T', ' ') : 'None';
+    }
+
+    function statusBadge(task) {
+        const badge = document.createElement('span');
+        if (task.is_complete) {
+            badge.className = 'badge badge-success';
+            badge.textContent = `Завершена. Выполнено: ${formatDate(task.completed_at)}`;
+        } else if (task.status === 'overdue') {
+            badge.className = 'badge badge-danger';
+            badge.textContent = 'Просрочена';
+        } else {
+            badge.className = 'badge badge-secondary';
+            badge.textContent = 'Не завершена';
+        }
+        return badge;
+    }
+
+    function fillCard(card, task) {
+        card.dataset.complete = task.is_complete ? '1' : '0';
+        card.querySelector('.task-title').textContent = task.title;
+        card.querySelector('.task-description').textContent = task.description || 'None';
+        card.querySelector('.task-deadline').textContent = formatDate(task.deadline_date);
+        card.querySelector('.task-status').replaceChildren(statusBadge(task));
+        card.querySelector('input[name="title"]').value = task.title;
+        card.querySelector('input[name="description"]').value = task.description || '';
+    }
+
+    function createCard(task) {
+        const html = cardTemplate.innerHTML.replaceAll('__ID__', String(task.id));
+        const wrapper = document.createElement('div');
+        wrapper.innerHTML = html.trim();
+        return wrapper.firstElementChild;
+    }
+
+    function refreshCounts() {
+        const cards = taskCards.querySelectorAll('.card[data-task-id]');
+        const completed = taskCards.querySelectorAll('.card[data-complete="1"]').length;
+        document.getElementById('all-tasks-count').textContent = cards.length;
+        document.getElementById('active-tasks-count').textContent = cards.length - completed;
+        document.getElementById('completed-tasks-count').textContent = completed;
+        document.getElementById('no-tasks').style.display = cards.length ? 'none' : 'block';
+    }
+
+    const source = new EventSource(todoListContainer.dataset.eventsUrl);
 
+    // Сервер отказал в потоке (например, 503: заняты все места) - EventSource не переподключается сам,
+    // поэтому страница перезагружается через случайную паузу, чтобы клиенты не пришли одновременно
+    source.addEventListener('error', function() {
+        if (source.readyState === EventSource.CLOSED) {
+            setTimeout(function() {
+                window.location.reload();
+            }, 5000 + Math.random() * 5000);
+        }
+    });
+
+    source.addEventListener('task_created', function(event) {
+        const task = JSON.parse(event.data).task;
+        if (document.getElementById(`task-${task.id}`)) {
+            return;
+        }
+        const card = createCard(task);
+        fillCard(card, task);
+        taskCards.appendChild(card);
+        refreshCounts();
+    });
+
+    source.addEventListener('task_updated', function(event) {
+        const task = JSON.parse(event.data).task;
+        const card = document.getElementById(`task-${task.id}`);
+        if (card) {
+            fillCard(card, task);
+            refreshCounts();
+        }
+    });
+
+    source.addEventListener('task_deleted', function(event) {
+        const card = document.getElementById(`task-${JSON.parse(event.data).id}`);
+        if (card) {
+            card.remove();
+            refreshCounts();
+        }
+    });
+
+    source.addEventListener('task_reordered', function(event) {
+        const data = JSON.parse(event.data);
+        const card = document.getElementById(`task-${data.id}`);
+        const after = data.after_id === null ? null : document.getElementById(`task-${data.after_id}`);
+        if (!card || (data.after_id !== null && !after)) {
+            return;
+        }
+        if (after) {
+            after.after(card);
+        } else {
+            taskCards.prepend(card);
+        }
+    });
+
+    // Перетаскивание карточек: задача встает после карточки, оказавшейся над ней
+    if (taskCards.dataset.reorderUrl) {
+        let dragged = null;
+        let originalPrevious = null;
+
+        taskCards.addEventListener('dragstart', function(event) {
+            dragged = event.target.closest('.card[data-task-id]');
+            if (dragged) {
+                originalPrevious = dragged.previousElementSibling;
+                event.dataTransfer.effectAllowed = 'move';
+            }
+        });
+
+        taskCards.addEventListener('dragover', function(event) {
+            const target = event.target.closest('.card[data-task-id]');
+            if (!dragged || !target || target === dragged) {
+                return;
+            }
+            event.preventDefault();
+            const box = target.getBoundingClientRect();
+            if (event.clientY > box.top + box.height / 2) {
+                target.after(dragged);
+            } else {
+                target.before(dragged);
+            }
+        });
+
+        taskCards.addEventListener('dragend', function() {
+            if (!dragged) {
+                return;
+            }
+            const previous = dragged.previousElementSibling;
+            if (previous === originalPrevious) {
+                dragged = null;
+                return;
+            }
+            fetch(taskCards.dataset.reorderUrl, {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify({
+                    task_id: Number(dragged.dataset.taskId),
+                    after_id: previous ? Number(previous.dataset.taskId) : null,
+                }),
+            }).then(function(response) {
+                if (!response.ok) {
+                    window.location.reload();
+                }
+            });
+            dragged = null;
+        });
+    }
+
+    source.addEventListener('todo_updated', function(event) {
+        document.getElementById('todo-title').textContent = JSON.parse(event.data).title;
+    });
+
+    source.addEventListener('todo_deleted', function() {
+        source.close();
+        window.location.reload();
+    });
+
+    // Доступ к списку закрыт: сервер завершил поток, страница списка больше недоступна
+    source.addEventListener('access_revoked', function() {
+        source.close();
+        window.location.reload();
+    });
+
+    // Очередь событий на сервере переполнилась: часть изменений потеряна, перезагружаем список
+    source.addEventListener('resync', function() {
+        window.location.reload();
+    });
+}
@@ -0,0 +1,77 @@
+"""
+Потоковая отрисовка HTML-страниц.
+
+``stream_page`` отдает шаблон по мере отрисовки, а не собирает весь документ
+в памяти: первые байты уходят клиенту сразу, а память запроса не растет с
+размером страницы, если шаблон перебирает данные из генератора (например,
+задачи, читаемые из базы пачками через ``yield_per``).
+
+Мелкие фрагменты Jinja склеиваются в блоки по ``STREAM_BUFFER_SIZE`` байт.
+Шаблон может отправить накопленное досрочно вызовом ``{{ stream_flush() }}`` -
+например, после заголовка страницы, перед долгим перебором строк.
+
+Если клиент принимает gzip, каждый блок сжимается и отправляется сразу
+(``Compression.compress_stream``), так что сжатие не задерживает первые байты.
+
+Заголовки ответа и cookie сессии отправляются до отрисовки, поэтому потоковый
+шаблон не должен менять сессию (например, забирать flash-сообщения).
+"""
+
+from flask import Response, current_app, render_template, stream_template
+
+from assets import compression
+
+
+def _buffered(chunks, size, flushes):
+    """
+    Склеивает фрагменты шаблона в блоки не меньше ``size`` символов.
+
+    :param chunks: Фрагменты, которые выдает шаблон.
+    :type chunks: Iterator[str]
+    :param size: Размер блока.
+    :type size: int
+    :param flushes: Список, в который ``stream_flush`` добавляет отметку досрочной отправки.
+    :type flushes: list
+    :return: Блоки HTML.
+    :rtype: Iterator[str]
+    """
+    buffer, length = [], 0
+    try:
+        for chunk in chunks:
+            buffer.append(chunk)
+            length += len(chunk)
+            if length >= size or flushes:
+                yield ''.join(buffer)
+                buffer, length = [], 0
+                flushes.clear()
+        if buffer:
+            yield ''.join(buffer)
+    finally:
+        # Закрывает шаблон и контекст запроса, если клиент отключился раньше конца страницы.
+        chunks.close()
+
+
+def stream_page(template_name, **context):
+    """
+    Отрисовывает HTML-страницу потоком.
+
+    При ``STREAM_TEMPLATES = False`` страница отрисовывается целиком, как
+    ``render_template``; шаблон при этом не меняется.
+
+    :param template_name: Имя шаблона.
+    :type template_name: str
+    :param context: Переменные шаблона.
+    :return: Потоковый ответ ``text/html``, сжатый gzip по блокам, если клиент его принимает.
+    :rtype: flask.Response
+    """
+    if not current_app.config.get('STREAM_TEMPLATES', True):
+        return Response(render_template(template_name, stream_flush=lambda: '', **context), mimetype='text/html')
+    flushes = []
+
+    def stream_flush():
+        flushes.append(True)
+        return ''
+
+    chunks = stream_template(template_name, stream_flush=stream_flush, **context)
+    size = current_app.config.get('STREAM_BUFFER_SIZE', 16384)
+    return compression.compress_stream(Response(_buffered(chunks, size, flushes), mimetype='text/html'))
@@ -0,0 +1,182 @@
+"""
+Модуль содержит тесты JSON API с выборочными полями.
+
+TestFixtures:
+    - app: Фикстура для создания экземпляра приложения.
+    - client: Фикстура для создания авторизованного клиента с тестовыми данными.
+
+Test Functions:
+    - test_lists_api: Тест списков задач с выборочными полями.
+    - test_tasks_api_selects_only_requested_columns: Тест выборки из базы только запрошенных колонок.
+    - test_task_api: Тест получения одной задачи.
+    - test_unknown_field: Тест отклонения неизвестного поля.
+    - test_empty_fields: Тест отклонения параметра fields без единого поля.
+    - test_stats_api: Тест статистики пользователя.
+    - test_msgpack_negotiation: Тест выбора кодировки MessagePack по заголовку Accept.
+"""
+import os
+import sys
+import pytest
+from datetime import datetime
+from flask import g
+from sqlalchemy import event
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from database import db
+from events.projections import ProjectionService
+from todo_list.services import TodoService, TaskService
+from users.services import UserService
+
+
+@pytest.fixture
+def app():
+    """
+    Фикстура для создания экземпляра приложения.
+
+    Returns:
+        Flask app: Экземпляр приложения Flask.
+
+    """
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    """
+    Фикстура для создания авторизованного клиента с тестовыми данными.
+
+    Args:
+        app: Экземпляр приложения Flask.
+
+    Returns:
+        Flask test client: Тестовый клиент Flask.
+
+    """
+    UserService.register_user(email='test@example.com', username='test_user', password='password')
+    TodoService.create_todo(title='Work', user_id=1)
+    TaskService.add_task(title='Report', description='Quarterly', deadline_date=datetime(2030, 1, 2, 10, 0),
+                         todo_id=1, priority=3)
+    TaskService.add_task(title='Slides', description=None, deadline_date=None, todo_id=1)
+    g.pop('_login_user', None)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = '1'
+        session['_fresh'] = True
+    return client
+
+
+def test_lists_api(client):
+    """
+    Тест списков задач с выборочными полями.
+
+    Args:
+        client: Авторизованный тестовый клиент Flask.
+
+    """
+    assert client.get('/todo_list/api/lists').get_json() == {'lists': [{'id': 1, 'title': 'Work', 'user_id': 1}]}
+    response = client.get('/todo_list/api/lists?fields=title')
+    assert response.get_json() == {'lists': [{'title': 'Work'}]}
+    assert 'Accept' in response.vary
+
+
+def test_tasks_api_selects_only_requested_columns(app, client):
+    """
+    Тест выборки из базы данных только запрошенных колонок.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        client: Авторизованный тестовый клиент Flask.
+
+    """
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        response = client.get('/todo_list/api/lists/1/tasks?fields=id,deadline_date')
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    assert response.get_json() == {'tasks': [
+        {'id': 1, 'deadline_date': '2030-01-02T10:00:00'},
+        {'id': 2, 'deadline_date': None},
+    ]}
+    task_selects = [statement for statement in statements if 'FROM task' in statement]
+    assert len(task_selects) == 1
+    assert 'description' not in task_selects[0] and 'title' not in task_selects[0]
+
+
+def test_task_api(client):
+    """
+    Тест получения одной задачи списка.
+
+    Args:
+        client: Авторизованный тестовый клиент Flask.
+
+    """
+    response = client.get('/todo_list/api/lists/1/tasks/1?fields=title,priority,status')
+    assert response.get_json() == {'task': {'title': 'Report', 'priority': 3, 'status': 'active'}}
+    assert client.get('/todo_list/api/lists/1/tasks/5').status_code == 404
+
+
+def test_unknown_field(client):
+    """
+    Тест отклонения неизвестного поля.
+
+    Args:
+        client: Авторизованный тестовый клиент Flask.
+
+    """
+    response = client.get('/todo_list/api/lists/1/tasks?fields=id,password')
+    assert response.status_code == 400
+    assert response.get_json()['errors'][0]['message'] == 'Unknown field: password'
+
+
+def test_empty_fields(client):
+    """
+    Тест отклонения параметра fields, в котором нет ни одного поля.
+
+    Args:
+        client: Авторизованный тестовый клиент Flask.
+
+    """
+    for url in ('/todo_list/api/lists?fields=,', '/todo_list/api/lists/1/tasks?fields=%20',
+                '/profile/api/stats?fields=,%20,'):
+        response = client.get(url)
+        assert response.status_code == 400
+        assert response.get_json()['errors'][0]['type'] == 'value_error'
+
+
+def test_stats_api(client):
+    """
+    Тест статистики пользователя с выборочными полями.
+
+    Args:
+        client: Авторизованный тестовый клиент Flask.
+
+    """
+    ProjectionService.catch_up('stats')
+    response = client.get('/profile/api/stats?fields=total_tasks,active_tasks')
+    assert response.get_json() == {'stats': {'total_tasks': 2, 'active_tasks': 2}}
+
+
+def test_msgpack_negotiation(client):
+    """
+    Тест выбора кодировки MessagePack по заголовку Accept.
+
+    Args:
+        client: Авторизованный тестовый клиент Flask.
+
+    """
+    msgpack = pytest.importorskip('msgpack')
+    response = client.get('/todo_list/api/lists/1/tasks?fields=id,title',
+                          headers={'Accept': 'application/msgpack'})
+    assert response.mimetype == 'application/msgpack'
+    assert msgpack.unpackb(response.data) == {'tasks': [{'id': 1, 'title': 'Report'}, {'id': 2, 'title': 'Slides'}]}
+    response = client.get('/todo_list/api/lists', headers={'Accept': 'application/msgpack;q=0.5, application/json'})
+    assert response.mimetype == 'application/json'
@@ -0,0 +1,262 @@
+"""
+Модуль содержит тесты архива давно завершенных задач.
+
+TestFixtures:
+    - app: Фикстура для создания экземпляра приложения.
+    - old_tasks: Фикстура для создания списка с давно и недавно завершенными задачами.
+
+Test Functions:
+    - test_archive_moves_finished_trees: Тест переноса в архив деревьев задач, завершенных целиком.
+    - test_archive_task_edited_after_completion: Тест архивирования задачи, измененной после завершения.
+    - test_new_task_ids_not_reused_after_archive: Тест новых идентификаторов задач после архивирования.
+    - test_schema_migrates_task_autoincrement: Тест перестройки таблицы задач, созданной без AUTOINCREMENT.
+    - test_statistics_unchanged_by_archive: Тест неизменности статистики после архивирования.
+    - test_archive_browse_and_search: Тест просмотра и поиска архивных задач списка.
+    - test_delete_todo_removes_archive: Тест удаления архива вместе со списком.
+"""
+import os
+import sys
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import MetaData, select, text, update
+from sqlalchemy.schema import CreateTable
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from archive.models import ArchivedListStats, ArchivedTask
+from archive.services import ArchiveService
+from database import create_schema, db
+from events.projections import ProjectionService
+from todo_list.models import Task, TaskClosure
+from todo_list.services import LabelService, TaskService, TodoService
+from users.models import UserStats
+from users.services import UserService, StatisticService
+
+NOW = datetime(2026, 6, 1)
+
+
+@pytest.fixture
+def app():
+    """
+    Фикстура для создания экземпляра приложения.
+
+    Returns:
+        Flask app: Экземпляр приложения Flask.
+
+    """
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def old_tasks(app):
+    """
+    Фикстура для создания списка 1 с задачами, завершенными в разное время, и пустого списка 2.
+
+    Задача 1 и ее подзадача 2 завершены давно; у давно завершенной задачи 3 есть
+    незавершенная подзадача 4; задачи 5 и 6 завершены давно, задача 7 - недавно,
+    задача 8 не завершена.
+
+    Args:
+        app: Экземпляр приложения Flask.
+
+    """
+    UserService.register_user(email='alice@example.com', username='alice', password='password')
+    TodoService.create_todo('Project', 1)
+    TodoService.create_todo('Empty', 1)
+    titles = ['Release notes', 'Changelog', 'Migration', 'Backfill', 'Old report', 'Old invoice',
+              'Fresh report', 'Open task']
+    parents = {2: 1, 4: 3}
+    for task_id, title in enumerate(titles, start=1):
+        TaskService.add_task(title, f'Description {task_id}', None, 1, parent_id=parents.get(task_id))
+    for task_id in (1, 2, 3, 5, 6, 7):
+        TaskService.complete_task(task_id)
+    for task_id, days in ((1, 100), (2, 120), (3, 100), (5, 200), (6, 95), (7, 10)):
+        db.session.execute(update(Task).where(Task.id == task_id).values(completed_at=NOW - timedelta(days=days)))
+    label = LabelService.create_label(1, 'release')
+    LabelService.set_task_labels(2, 1, 1, [label.id])
+    db.session.commit()
+
+
+def statistics(user_id=1):
+    """Возвращает все показатели статистики пользователя, которые считаются по таблице задач."""
+    return (StatisticService.get_user_total_tasks(user_id), StatisticService.get_user_completed_tasks(user_id),
+            StatisticService.get_user_active_tasks(user_id), StatisticService.get_user_incompleted_tasks(user_id),
+            StatisticService.calculate_completion_percentage(user_id))
+
+
+def test_archive_moves_finished_trees(app, old_tasks):
+    """
+    Тест переноса: деревья, завершенные целиком раньше границы, переносятся пачками с метками и связями.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        old_tasks: Фикстура со списком задач.
+
+    """
+    result = ArchiveService.archive(now=NOW, days=30, batch_size=1)
+
+    assert result == {'tasks': 4, 'batches': 3}
+    assert sorted(db.session.scalars(select(Task.id))) == [3, 4, 7, 8]
+    archived = {task.id: task for task in db.session.scalars(select(ArchivedTask))}
+    assert sorted(archived) == [1, 2, 5, 6]
+    assert archived[2].parent_id == 1 and archived[2].label_ids == [1] and archived[2].title == 'Changelog'
+    assert db.session.scalars(select(TaskClosure.descendant_id)).all() == [4]
+    assert ArchiveService.count(1) == 4 and ArchiveService.count(2) == 0
+    assert ArchiveService.archive(now=NOW, days=30) == {'tasks': 0, 'batches': 0}
+
+
+def test_archive_task_edited_after_completion(app, old_tasks):
+    """
+    Тест архивирования: правка давно завершенной задачи не сбрасывает время завершения.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        old_tasks: Фикстура со списком задач.
+
+    """
+    completed_at = db.session.get(Task, 5).completed_at
+    TaskService.update_task(5, 'Old report v2', 'Edited later', None, 1)
+    db.session.expire_all()
+
+    assert db.session.get(Task, 5).completed_at == completed_at
+    assert ArchiveService.archive(now=NOW, days=30)['tasks'] == 4
+    assert db.session.get(ArchivedTask, 5).title == 'Old report v2'
+
+
+def test_new_task_ids_not_reused_after_archive(app):
+    """
+    Тест идентификаторов: задача, добавленная после архивирования последней задачи, получает новый идентификатор,
+    и следующее архивирование проходит без конфликта.
+
+    Args:
+        app: Экземпляр приложения Flask.
+
+    """
+    UserService.register_user(email='alice@example.com', username='alice', password='password')
+    TodoService.create_todo('Project', 1)
+    for title in ('First', 'Second'):
+        TaskService.add_task(title, None, None, 1)
+        TaskService.complete_task(db.session.scalar(select(Task.id)))
+        db.session.execute(update(Task).values(completed_at=NOW - timedelta(days=100)))
+        db.session.commit()
+        assert ArchiveService.archive(now=NOW, days=30) == {'tasks': 1, 'batches': 1}
+
+    assert [(task.id, task.title) for task in db.session.scalars(select(ArchivedTask).order_by(ArchivedTask.id))] == \
+        [(1, 'First'), (2, 'Second')]
+
+
+def test_schema_migrates_task_autoincrement(app, old_tasks):
+    """
+    Тест миграции: таблица задач без AUTOINCREMENT пересоздается с сохранением строк и индексов,
+    а счетчик идентификаторов не ниже идентификаторов архива.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        old_tasks: Фикстура со списком задач.
+
+    """
+    TaskService.complete_task(8)
+    db.session.execute(update(Task).where(Task.id == 8).values(completed_at=NOW - timedelta(days=100)))
+    db.session.commit()
+    ArchiveService.archive(now=NOW, days=30)
+    metadata = MetaData()
+    for table in db.metadata.sorted_tables:
+        table.to_metadata(metadata)
+    legacy = metadata.tables['task']
+    legacy.dialect_options['sqlite']['autoincrement'] = False
+    rows = db.session.execute(select(Task.id, Task.title).order_by(Task.id)).all()
+    db.session.execute(text('CREATE TABLE task_copy AS SELECT * FROM task'))
+    db.session.execute(text('DROP TABLE task'))
+    db.session.execute(CreateTable(legacy))
+    db.session.execute(text('INSERT INTO task SELECT * FROM task_copy'))
+    db.session.execute(text('DROP TABLE task_copy'))
+    db.session.execute(text("DELETE FROM sqlite_sequence WHERE name = 'task'"))
+    db.session.commit()
+
+    create_schema()
+
+    sql = db.session.scalar(text("SELECT sql FROM sqlite_master WHERE name = 'task'"))
+    assert 'AUTOINCREMENT' in sql
+    assert db.session.execute(select(Task.id, Task.title).order_by(Task.id)).all() == rows
+    indexes = db.session.scalars(text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'task' "
+                                      "AND name LIKE 'ix_%'")).all()
+    assert sorted(indexes) == sorted(index.name for index in Task.__table__.indexes)
+    TaskService.add_task('After migration', None, None, 1)
+    assert db.session.scalar(select(Task.id).where(Task.title == 'After migration')) == 9
+
+
+def test_statistics_unchanged_by_archive(app, old_tasks):
+    """
+    Тест неизменности статистики: запросы по таблице задач, проекция и пересчет учитывают архивные задачи.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        old_tasks: Фикстура со списком задач.
+
+    """
+    ProjectionService.catch_up('stats')
+    before = statistics()
+    projected = UserService.get_user_stats(1).total_tasks, UserService.get_user_stats(1).completed_tasks
+
+    ArchiveService.archive(now=NOW, days=30)
+
+    assert statistics() == before == (8, 6, 2, 0, 75.0)
+    assert ProjectionService.catch_up('stats') == 0
+    assert (UserService.get_user_stats(1).total_tasks, UserService.get_user_stats(1).completed_tasks) == projected
+    app.test_cli_runner().invoke(args=['recompute-stats', '--workers', '0'])
+    stats = db.session.scalars(select(UserStats).where(UserStats.user_id == 1)).one()
+    db.session.refresh(stats)
+    assert (stats.total_tasks, stats.completed_tasks, stats.completion_percentage) == (8, 6, 75.0)
+    assert TodoService.count_tasks(1) == (4, 2, 2)
+
+
+def test_archive_browse_and_search(app, old_tasks):
+    """
+    Тест просмотра архива: страницы по времени завершения, поиск по словам, страница архива и ссылка на нее.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        old_tasks: Фикстура со списком задач.
+
+    """
+    ArchiveService.archive(now=NOW, days=30)
+
+    tasks, has_next = ArchiveService.get_tasks(1, per_page=3)
+    assert [task.id for task in tasks] == [6, 1, 2] and has_next
+    assert [task.id for task in ArchiveService.get_tasks(1, page=2, per_page=3)[0]] == [5]
+    assert [task.id for task in ArchiveService.get_tasks(1, 'OLD')[0]] == [6, 5]
+    assert [task.id for task in ArchiveService.get_tasks(1, 'old description 5')[0]] == [5]
+    assert ArchiveService.get_tasks(1, '100%')[0] == []
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = '1'
+        session['_fresh'] = True
+    html = client.get('/todo_list/1/archive?q=report').get_data(as_text=True)
+    assert 'id="archived-task-5"' in html and 'id="archived-task-6"' not in html
+    assert 'Задач в архиве: 4' in html
+    assert 'В архиве: 4' in client.get('/todo_list/1').get_data(as_text=True)
+
+
+def test_delete_todo_removes_archive(app, old_tasks):
+    """
+    Тест удаления списка: архивные задачи и счетчики списка удаляются вместе с ним.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        old_tasks: Фикстура со списком задач.
+
+    """
+    result = app.test_cli_runner().invoke(args=['archive', 'run', '--days', '0'])
+    assert 'Перенесено в архив задач: 5' in result.output
+
+    TodoService.delete_todo(1)
+
+    assert db.session.scalars(select(ArchivedTask)).all() == []
+    assert db.session.scalars(select(ArchivedListStats)).all() == []
@@ -0,0 +1,152 @@
+"""
+Модуль содержит тесты доставки статических файлов и сжатия ответов.
+
+TestFixtures:
+    - app: Фикстура для создания экземпляра приложения.
+    - client: Фикстура для создания клиента.
+
+Test Functions:
+    - test_fingerprinted_static_url: Тест адресов статических файлов с хешем и долгого кэширования.
+    - test_precompressed_static_variant: Тест отдачи заранее сжатого варианта файла.
+    - test_large_html_compressed: Тест сжатия больших HTML-ответов.
+    - test_small_and_streamed_responses_not_compressed: Тест пропуска маленьких и потоковых ответов.
+"""
+import gzip
+import os
+import sys
+import pytest
+from flask import url_for
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from database import db
+
+
+@pytest.fixture
+def app():
+    """
+    Фикстура для создания экземпляра приложения.
+
+    Returns:
+        Flask app: Экземпляр приложения Flask.
+
+    """
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    """
+    Фикстура для создания клиента.
+
+    Args:
+        app: Экземпляр приложения Flask.
+
+    Returns:
+        Flask test client: Тестовый клиент Flask.
+
+    """
+    return app.test_client()
+
+
+def static_url(app, filename):
+    """
+    Возвращает адрес статического файла.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        filename: Имя файла в каталоге статики.
+
+    """
+    with app.test_request_context():
+        return url_for('static', filename=filename)
+
+
+def test_fingerprinted_static_url(app, client):
+    """
+    Тест адресов статических файлов с хешем содержимого и заголовков долгого кэширования.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        client: Тестовый клиент Flask.
+
+    """
+    url = static_url(app, 'styles.css')
+    assert url.startswith('/static/styles.') and url.endswith('.css') and url != '/static/styles.css'
+    assert url in client.get('/login').data.decode('utf-8')
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert 'immutable' in response.headers['Cache-Control']
+    with open(os.path.join(app.static_folder, 'styles.css'), 'rb') as file:
+        assert response.data == file.read()
+    response.close()
+
+    response = client.get('/static/styles.css')
+    assert response.status_code == 200
+    assert 'immutable' not in response.headers.get('Cache-Control', '')
+    response.close()
+
+
+def test_precompressed_static_variant(app, client):
+    """
+    Тест отдачи сжатого варианта статического файла клиенту, который принимает gzip.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        client: Тестовый клиент Flask.
+
+    """
+    url = static_url(app, 'scripts.js')
+    response = client.get(url, headers={'Accept-Encoding': 'gzip, deflate'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.vary
+    with open(os.path.join(app.static_folder, 'scripts.js'), 'rb') as file:
+        assert gzip.decompress(response.data) == file.read()
+
+    response = client.get(url, headers={'Accept-Encoding': 'gzip;q=0'})
+    assert 'Content-Encoding' not in response.headers
+    response.close()
+
+
+def test_large_html_compressed(client):
+    """
+    Тест сжатия HTML-ответа больше порога.
+
+    Args:
+        client: Тестовый клиент Flask.
+
+    """
+    plain = client.get('/login')
+    assert 'Content-Encoding' not in plain.headers
+    response = client.get('/login', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data) == plain.data
+    assert int(response.headers['Content-Length']) == len(response.data) < len(plain.data)
+
+
+def test_small_and_streamed_responses_not_compressed(app, client):
+    """
+    Тест пропуска ответов меньше порога и потоковых ответов.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        client: Тестовый клиент Flask.
+
+    """
+    @app.get('/_test/small')
+    def small():
+        return {'ok': True}
+
+    @app.get('/_test/stream')
+    def stream():
+        return app.response_class((chunk for chunk in ['{"a":', '1}' * 2000]), mimetype='application/json')
+
+    assert 'Content-Encoding' not in client.get('/_test/small', headers={'Accept-Encoding': 'gzip'}).headers
+    assert 'Content-Encoding' not in client.get('/_test/stream', headers={'Accept-Encoding': 'gzip'}).headers
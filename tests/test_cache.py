@@ -0,0 +1,250 @@
+"""
+Модуль содержит тесты кэша со сквозным чтением и его хранилищ.
+
+TestFixtures:
+    - app: Фикстура для создания экземпляра приложения.
+
+Test Functions:
+    - test_local_backend_lru_and_ttl: Тест вытеснения и срока жизни записей локального хранилища.
+    - test_redis_backend_with_local_stand_in: Тест сетевого хранилища на локальной замене Redis.
+    - test_get_or_set_loads_once_under_contention: Тест защиты от одновременной загрузки одного ключа.
+    - test_get_or_set_skips_value_invalidated_during_load: Тест отказа сохранять значение, сброшенное во время загрузки.
+    - test_entity_cache_invalidated_on_write: Тест кэширования записей и их сброса при изменении.
+    - test_writes_ignore_stale_entity_cache: Тест изменения задачи, устаревшей в кэше другого процесса.
+"""
+import os
+import sys
+import threading
+import time
+import pytest
+from sqlalchemy import select, update
+from werkzeug.exceptions import NotFound
+from datetime import datetime
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from cache import LocalBackend, RedisBackend, MISSING, cache, entity_key
+from database import db
+from events.models import TaskEvent
+from todo_list.models import TodoList, Task
+from todo_list.services import TodoService, TaskService
+
+
+class FakeRedis:
+    """Локальная замена клиента Redis с командами, которые использует хранилище кэша."""
+
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.data.get(key)
+            if item is None or (item[0] is not None and item[0] <= time.monotonic()):
+                return None
+            return item[1]
+
+    def set(self, key, value, px=None, nx=False):
+        with self.lock:
+            item = self.data.get(key)
+            if nx and item is not None and (item[0] is None or item[0] > time.monotonic()):
+                return None
+            self.data[key] = (time.monotonic() + px / 1000 if px else None, value)
+            return True
+
+    def delete(self, *keys):
+        with self.lock:
+            for key in keys:
+                self.data.pop(key, None)
+
+    def scan_iter(self, match):
+        prefix = match.rstrip('*')
+        return [key for key in list(self.data) if key.startswith(prefix)]
+
+
+@pytest.fixture
+def app():
+    """
+    Фикстура для создания экземпляра приложения.
+
+    Returns:
+        Flask app: Экземпляр приложения Flask.
+
+    """
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def test_local_backend_lru_and_ttl():
+    """Тест вытеснения давно не использованных и просроченных записей."""
+    backend = LocalBackend(maxsize=2)
+    backend.set('a', 1)
+    backend.set('b', 2)
+    backend.get('a')
+    backend.set('c', 3)
+    assert backend.get('b') is MISSING
+    assert backend.get('a') == 1
+
+    backend.set('short', 'value', ttl=0.01)
+    time.sleep(0.02)
+    assert backend.get('short') is MISSING
+    assert backend.add('lock', 1) is True
+    assert backend.add('lock', 1) is False
+
+
+def test_redis_backend_with_local_stand_in():
+    """Тест сетевого хранилища: сериализация, атомарное добавление и очистка по префиксу."""
+    client = FakeRedis()
+    backend = RedisBackend(client=client)
+    backend.set('todo_list:1', {'id': 1, 'title': 'Test'}, ttl=60)
+    assert backend.get('todo_list:1') == {'id': 1, 'title': 'Test'}
+    assert backend.add('lock:x', 1, ttl=1) is True
+    assert backend.add('lock:x', 1, ttl=1) is False
+
+    client.data['other:key'] = (None, b'1')
+    backend.clear()
+    assert backend.get('todo_list:1') is MISSING
+    assert 'other:key' in client.data
+
+
+@pytest.mark.parametrize('backend', ['local', 'redis'])
+def test_get_or_set_loads_once_under_contention(app, backend):
+    """
+    Тест однократной загрузки значения при одновременных промахах.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        backend: Тип хранилища кэша.
+
+    """
+    if backend == 'redis':
+        app.extensions['cache'] = RedisBackend(client=FakeRedis())
+    calls = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.05)
+        return 'value'
+
+    results = []
+
+    def worker():
+        with app.app_context():
+            results.append(cache.get_or_set('slow', loader))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ['value'] * 8
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize('backend', ['local', 'redis'])
+def test_get_or_set_skips_value_invalidated_during_load(app, backend):
+    """
+    Тест чтения, пересекшегося с записью: строка загружена до фиксации, а сброс кэша пришел во время загрузки.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        backend: Тип хранилища кэша.
+
+    """
+    if backend == 'redis':
+        app.extensions['cache'] = RedisBackend(client=FakeRedis())
+    loaded = threading.Event()
+    invalidated = threading.Event()
+    results = []
+
+    def stale_loader():
+        loaded.set()
+        invalidated.wait(timeout=1)
+        return 'old'
+
+    def reader():
+        with app.app_context():
+            results.append(cache.get_or_set('todo_list:1', stale_loader))
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    assert loaded.wait(timeout=1)
+    cache.delete('todo_list:1')
+    invalidated.set()
+    thread.join()
+
+    assert results == ['old']
+    assert cache.get('todo_list:1') is None
+    assert cache.get_or_set('todo_list:1', lambda: 'new') == 'new'
+    assert cache.get('todo_list:1') == 'new'
+
+
+def test_entity_cache_invalidated_on_write(app):
+    """
+    Тест чтения списков и задач через кэш и сброса записей при изменении.
+
+    Args:
+        app: Экземпляр приложения Flask.
+
+    """
+    TodoService.create_todo(title='Test Todo List', user_id=1)
+    TaskService.add_task(title='Test Task', description=None,
+                         deadline_date=datetime(2023, 12, 20), todo_id=1)
+    db.session.remove()
+
+    assert TodoService.get_todo(1).title == 'Test Todo List'
+    assert TaskService.get_task(1).title == 'Test Task'
+    assert cache.get(entity_key(TodoList, 1))['title'] == 'Test Todo List'
+    assert [todo.id for todo in TodoService.get_all_todo(1)] == [1]
+
+    TodoService.update_todo(1, 'Renamed')
+    TaskService.update_task(1, 'Renamed Task', None)
+    assert cache.get(entity_key(TodoList, 1)) in (None, {'id': 1, 'title': 'Renamed', 'user_id': 1})
+    assert cache.get(entity_key(Task, 1)) is None
+    db.session.remove()
+
+    assert TodoService.get_todo(1).title == 'Renamed'
+    assert TaskService.get_task(1).title == 'Renamed Task'
+    assert TodoService.get_all_todo(1)[0].title == 'Renamed'
+
+    TodoService.delete_todo(1)
+    db.session.remove()
+    assert TodoService.get_all_todo(1) == []
+    with pytest.raises(NotFound):
+        TaskService.get_task(1)
+
+
+def test_writes_ignore_stale_entity_cache(app):
+    """
+    Тест записи: задача, завершенная другим процессом, переключается от значения в базе, а не в кэше.
+
+    Args:
+        app: Экземпляр приложения Flask.
+
+    """
+    TodoService.create_todo(title='Test Todo List', user_id=1)
+    TaskService.add_task(title='Test Task', description=None, deadline_date=None, todo_id=1)
+    db.session.remove()
+    assert TaskService.get_task(1).is_complete is False
+    # Другой процесс завершает задачу; локальный кэш этого процесса о записи не знает.
+    db.session.execute(update(Task).where(Task.id == 1).values(is_complete=True, status='completed'))
+    db.session.commit()
+    db.session.remove()
+    assert cache.get(entity_key(Task, 1))['is_complete'] is False
+
+    TaskService.complete_task(1)
+    db.session.remove()
+    task = db.session.get(Task, 1)
+    assert (task.is_complete, task.status, task.completed_at) == (False, 'active', None)
+    assert db.session.scalars(select(TaskEvent.data).order_by(TaskEvent.seq.desc()).limit(1)).one() == \
+        {'is_complete': [True, False], 'status': ['completed', 'active']}
+
+    TaskService.complete_task(1)
+    task = db.session.get(Task, 1)
+    assert task.is_complete and task.status == 'completed' and task.completed_at is not None
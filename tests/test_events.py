@@ -0,0 +1,183 @@
+"""
+Модуль содержит тесты журнала событий задач и проекций.
+
+TestFixtures:
+    - app: Фикстура для создания экземпляра приложения.
+    - create_tasks_and_todo: Фикстура для создания тестовых задач и списков дел.
+
+Test Functions:
+    - test_service_writes_append_events: Тест записи событий сервисами.
+    - test_stats_projection_matches_scan: Тест совпадения проекции статистики с подсчетом по таблицам.
+    - test_catch_up_is_incremental: Тест обработки журнала от контрольной точки.
+    - test_replay_rebuilds_projection: Тест повторного построения проекций и поиска.
+    - test_backfill_command: Тест заполнения журнала для существующих данных.
+"""
+import os
+import sys
+import pytest
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from database import db
+from events.models import TaskEvent, EventType, TaskDailyRollup
+from events.projections import ProjectionService, SearchService
+from events.services import EventLog
+from todo_list.models import Task, TodoList
+from todo_list.services import TodoService, TaskService
+from todo_list.sweeper import OverdueSweeper
+from users.services import UserService, StatisticService
+
+
+@pytest.fixture
+def app():
+    """
+    Фикстура для создания экземпляра приложения.
+
+    Returns:
+        Flask app: Экземпляр приложения Flask.
+
+    """
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def create_tasks_and_todo(app):
+    """
+    Фикстура для создания тестовых задач и списков дел.
+
+    Args:
+        app: Экземпляр приложения Flask.
+
+    """
+    TodoService.create_todo(title='Test Todo List', user_id=1)
+    TaskService.add_task(title='Buy milk', description='Whole milk',
+                         deadline_date=datetime.now() + timedelta(days=1), todo_id=1)
+    TaskService.add_task(title='Write report', description=None,
+                         deadline_date=datetime.now() - timedelta(days=1), todo_id=1)
+    TaskService.add_task(title='Call mom', description=None,
+                         deadline_date=None, todo_id=1)
+
+
+def test_service_writes_append_events(app, create_tasks_and_todo):
+    """
+    Тест записи событий сервисами: типы, порядок и изменившиеся поля.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        create_tasks_and_todo: Фикстура с тестовыми данными.
+
+    """
+    TaskService.complete_task(1)
+    TaskService.update_task(3, 'Call dad', None)
+    TaskService.delete_task(2)
+
+    events = TaskEvent.query.order_by(TaskEvent.seq).all()
+    assert [event.name for event in events] == [
+        'todo_created', 'task_created', 'task_created', 'task_created',
+        'task_completed', 'task_updated', 'task_deleted']
+    assert [event.seq for event in events] == sorted({event.seq for event in events})
+    assert events[4].data == {'is_complete': [False, True], 'status': ['active', 'completed']}
+    assert events[5].data == {'title': ['Call mom', 'Call dad']}
+    assert events[6].data['status'] == 'overdue'
+    assert all(event.user_id == 1 for event in events)
+
+
+def test_stats_projection_matches_scan(app, create_tasks_and_todo):
+    """
+    Тест совпадения статистики из проекции с подсчетом по таблицам задач.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        create_tasks_and_todo: Фикстура с тестовыми данными.
+
+    """
+    TaskService.add_task(title='Expired soon', description=None,
+                         deadline_date=datetime.now() + timedelta(seconds=1), todo_id=1)
+    OverdueSweeper().sweep(now=datetime.now() + timedelta(minutes=1))
+    TaskService.complete_task(1)
+    TodoService.create_todo(title='Second', user_id=1)
+    TaskService.add_task(title='Gone', description=None, deadline_date=None, todo_id=2)
+    TodoService.delete_todo(2)
+
+    ProjectionService.catch_up('stats')
+    stats = UserService.get_user_stats(1)
+    assert stats.total_todo == StatisticService.get_user_total_todo_lists(1) == 1
+    assert stats.total_tasks == StatisticService.get_user_total_tasks(1) == 4
+    assert stats.active_tasks == StatisticService.get_user_active_tasks(1) == 1
+    assert stats.completed_tasks == StatisticService.get_user_completed_tasks(1) == 1
+    assert stats.incomplete_tasks == StatisticService.get_user_incompleted_tasks(1) == 2
+    assert stats.completion_percentage == StatisticService.calculate_completion_percentage(1) == 25
+
+
+def test_catch_up_is_incremental(app, create_tasks_and_todo):
+    """
+    Тест обработки только новых событий от контрольной точки.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        create_tasks_and_todo: Фикстура с тестовыми данными.
+
+    """
+    assert ProjectionService.catch_up('stats', batch_size=3) == 4
+    assert ProjectionService.catch_up('stats') == 0
+    TaskService.complete_task(3)
+    assert ProjectionService.catch_up('stats') == 1
+    assert ProjectionService.get_checkpoint('stats') == EventLog.last_seq()
+    assert UserService.get_user_stats(1).completed_tasks == 1
+
+
+def test_replay_rebuilds_projection(app, create_tasks_and_todo):
+    """
+    Тест повторного построения проекций и поиска по индексу.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        create_tasks_and_todo: Фикстура с тестовыми данными.
+
+    """
+    TaskService.update_task(1, 'Buy oat milk', 'Barista edition')
+    TaskService.complete_task(1)
+    ProjectionService.catch_up_all()
+    stats = UserService.get_user_stats(1)
+    stats.total_tasks = 100
+    db.session.commit()
+
+    assert ProjectionService.replay('stats') == EventLog.last_seq()
+    assert UserService.get_user_stats(1).total_tasks == 3
+    assert ProjectionService.replay('search') == EventLog.last_seq()
+    assert [entry.task_id for entry in SearchService.search(1, 'OAT barista')] == [1]
+    assert SearchService.search(1, 'milk whole') == []
+    assert SearchService.search(2, 'milk') == []
+
+    rollup = TaskDailyRollup.query.one()
+    assert (rollup.created, rollup.completed) == (3, 1)
+
+
+def test_backfill_command(app):
+    """
+    Тест заполнения журнала для данных, созданных раньше журнала.
+
+    Args:
+        app: Экземпляр приложения Flask.
+
+    """
+    db.session.add(TodoList(id=1, title='Legacy', user_id=1))
+    db.session.add(Task(title='Legacy task', todo_id=1, is_complete=True))
+    db.session.commit()
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['events', 'backfill'])
+    assert 'Добавлено событий: 2.' in result.output
+    assert [event.type for event in TaskEvent.query.order_by(TaskEvent.seq)] == [
+        EventType.TODO_CREATED, EventType.TASK_CREATED]
+    assert runner.invoke(args=['events', 'backfill']).exit_code != 0
+
+    runner.invoke(args=['events', 'replay', 'all'])
+    assert UserService.get_user_stats(1).completed_tasks == 1
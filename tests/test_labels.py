@@ -0,0 +1,185 @@
+"""
+Модуль содержит тесты меток задач и фильтрации по меткам.
+
+TestFixtures:
+    - app: Фикстура для создания экземпляра приложения.
+    - labelled_tasks: Фикстура для создания задач с метками.
+
+Test Functions:
+    - test_filter_any_and_all: Тест фильтров «любая из меток» и «все метки» и счетчиков меток.
+    - test_label_index_cached_and_invalidated: Тест кэширования индекса меток списка.
+    - test_labels_are_per_user: Тест независимости меток разных пользователей.
+    - test_todo_page_filter: Тест фильтра задач по меткам на странице списка.
+    - test_search_by_labels: Тест поиска задач с фильтром по меткам.
+"""
+import os
+import sys
+import pytest
+from flask import g
+from sqlalchemy import event
+from werkzeug.exceptions import NotFound
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from database import db
+from events.projections import ProjectionService, SearchService
+from todo_list.models import Role, TaskLabel
+from todo_list.services import TodoService, TaskService, MemberService, LabelService
+from users.services import UserService
+
+
+@pytest.fixture
+def app():
+    """
+    Фикстура для создания экземпляра приложения.
+
+    Returns:
+        Flask app: Экземпляр приложения Flask.
+
+    """
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def labelled_tasks(app):
+    """
+    Фикстура для создания задач с метками.
+
+    Задача 1 - метки work и urgent, задача 2 - work, задача 3 - без меток.
+
+    Args:
+        app: Экземпляр приложения Flask.
+
+    Returns:
+        dict: Идентификаторы меток по названию.
+
+    """
+    UserService.register_user(email='owner@example.com', username='owner', password='password')
+    TodoService.create_todo(title='Labelled', user_id=1)
+    for title in ('Report', 'Slides', 'Groceries'):
+        TaskService.add_task(title=title, description=None, deadline_date=None, todo_id=1)
+    labels = {name: LabelService.create_label(1, name).id for name in ('work', 'urgent', 'home')}
+    LabelService.set_task_labels(1, 1, 1, [labels['work'], labels['urgent']])
+    LabelService.set_task_labels(2, 1, 1, [labels['work']])
+    return labels
+
+
+def test_filter_any_and_all(app, labelled_tasks):
+    """
+    Тест фильтров «любая из меток» и «все метки» и счетчиков задач по меткам.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        labelled_tasks: Фикстура с тестовыми данными.
+
+    """
+    work, urgent, home = labelled_tasks['work'], labelled_tasks['urgent'], labelled_tasks['home']
+    assert LabelService.filter_tasks(1, [work, urgent], 'any') == [1, 2]
+    assert LabelService.filter_tasks(1, [work, urgent], 'all') == [1]
+    assert LabelService.filter_tasks(1, [home], 'any') == []
+    assert LabelService.filter_tasks(1, [], 'all') == [1, 2, 3]
+
+    counts, task_labels = LabelService.get_list_labels(1, 1)
+    assert [(label.name, count) for label, count in counts] == [('home', 0), ('urgent', 1), ('work', 2)]
+    assert task_labels == {1: [urgent, work], 2: [work]}
+
+
+def test_label_index_cached_and_invalidated(app, labelled_tasks):
+    """
+    Тест построения индекса меток одним запросом и его сброса при изменениях списка.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        labelled_tasks: Фикстура с тестовыми данными.
+
+    """
+    work = labelled_tasks['work']
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        LabelService.filter_tasks(1, [work], 'any')
+        LabelService.filter_tasks(1, [work, labelled_tasks['urgent']], 'all')
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    assert len(statements) == 1
+
+    LabelService.set_task_labels(3, 1, 1, [work])
+    assert LabelService.filter_tasks(1, [work]) == [1, 2, 3]
+    TaskService.delete_task(2)
+    assert LabelService.filter_tasks(1, [work]) == [1, 3]
+    assert TaskLabel.query.filter_by(task_id=2).count() == 0
+    LabelService.delete_label(1, work)
+    assert LabelService.filter_tasks(1, [work]) == []
+
+
+def test_labels_are_per_user(app, labelled_tasks):
+    """
+    Тест независимости меток разных пользователей на задачах общего списка.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        labelled_tasks: Фикстура с тестовыми данными.
+
+    """
+    UserService.register_user(email='editor@example.com', username='editor', password='password')
+    MemberService.set_member(1, 2, Role.EDITOR)
+    mine = LabelService.create_label(2, 'work').id
+    with pytest.raises(NotFound):
+        LabelService.set_task_labels(1, 1, 2, [labelled_tasks['home']])
+    with pytest.raises(ValueError):
+        LabelService.create_label(2, 'work')
+
+    LabelService.set_task_labels(1, 1, 2, [mine])
+    LabelService.set_task_labels(1, 1, 1, [])
+    assert LabelService.filter_tasks(1, [mine]) == [1]
+    assert LabelService.filter_tasks(1, [labelled_tasks['work']]) == [2]
+    assert [label.name for label, _ in LabelService.get_list_labels(1, 2)[0]] == ['work']
+
+
+def test_todo_page_filter(app, labelled_tasks):
+    """
+    Тест фильтра задач по меткам на странице списка задач.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        labelled_tasks: Фикстура с тестовыми данными.
+
+    """
+    g.pop('_login_user', None)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = '1'
+        session['_fresh'] = True
+
+    query = f"labels={labelled_tasks['work']}&labels={labelled_tasks['urgent']}"
+    page = client.get(f'/todo_list/1?{query}&match=all').data.decode('utf-8')
+    assert 'Report' in page and 'Slides' not in page and 'Groceries' not in page
+    page = client.get(f'/todo_list/1?{query}&match=any').data.decode('utf-8')
+    assert 'Slides' in page and 'Groceries' not in page
+    assert 'work (2)' in page
+
+    client.post('/todo_list/1/task-labels', data={'task_id': 3, 'labels': [labelled_tasks['home']]})
+    assert LabelService.filter_tasks(1, [labelled_tasks['home']]) == [3]
+
+
+def test_search_by_labels(app, labelled_tasks):
+    """
+    Тест поиска задач с фильтром по меткам.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        labelled_tasks: Фикстура с тестовыми данными.
+
+    """
+    ProjectionService.catch_up('search')
+    work, urgent = labelled_tasks['work'], labelled_tasks['urgent']
+    assert [entry.task_id for entry in SearchService.search(1, '', 50, [work, urgent], 'any')] == [2, 1]
+    assert [entry.task_id for entry in SearchService.search(1, '', 50, [work, urgent], 'all')] == [1]
+    assert [entry.task_id for entry in SearchService.search(1, 'slides', 50, [work])] == [2]
@@ -0,0 +1,430 @@
+"""
+Модуль содержит тесты уведомлений через outbox.
+
+Отправка по SMTP проверяется на локальном SMTP-сервере-заглушке (``SMTPStandIn``),
+который принимает письма в память и может отклонить очередные письма заданным кодом.
+
+TestFixtures:
+    - app: Фикстура для создания экземпляра приложения.
+    - shared_list: Фикстура для создания общего списка с подписанными на уведомления участниками.
+    - smtp_server: Фикстура для запуска SMTP-сервера-заглушки.
+    - smtp_app: Фикстура для создания экземпляра приложения, отправляющего письма на заглушку.
+
+Test Functions:
+    - test_changes_enqueued_with_task_write: Тест записи уведомлений вместе с изменением задачи.
+    - test_pending_messages_are_coalesced: Тест объединения повторных изменений задачи.
+    - test_message_uses_task_from_database: Тест уведомления о задаче, устаревшей в кэше.
+    - test_rollback_discards_messages: Тест отбрасывания уведомлений отмененной транзакции.
+    - test_actor_is_not_notified: Тест уведомления участников, кроме автора изменения.
+    - test_deliver_sends_digest_per_user: Тест отправки одного дайджеста на пользователя.
+    - test_deadline_reminder: Тест напоминания о дедлайне и его отмены.
+    - test_disabled_user_is_skipped: Тест отмены уведомлений пользователя, отключившего их.
+    - test_settings_route: Тест изменения настроек уведомлений в профиле.
+    - test_smtp_pool_and_retry: Тест отправки через пул SMTP-соединений и повторной попытки.
+"""
+import os
+import sys
+import socketserver
+import threading
+from datetime import datetime, timedelta
+from email import message_from_bytes
+
+import pytest
+from sqlalchemy import select, update
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from config import Config
+from database import db
+from events.models import EventType
+from events.services import EventLog
+from notifications.mailer import mailer
+from notifications.models import OutboxMessage, OutboxStatus
+from notifications.services import OutboxService
+from todo_list.models import Role, Task
+from todo_list.services import MemberService, TaskService, TodoService
+from users.services import UserService
+
+ENABLED = {'email': True, 'task_changes': True, 'deadline_reminders': True, 'remind_before_hours': 24}
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """Обработчик сеанса SMTP-заглушки: минимальное подмножество команд SMTP."""
+
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        self.reply('220 stand-in ESMTP')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            verb = line.decode().strip()[:4].upper()
+            if verb in ('EHLO', 'HELO', 'MAIL', 'RCPT', 'RSET', 'NOOP'):
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                lines = []
+                while True:
+                    data = self.rfile.readline()
+                    if data in (b'.\r\n', b''):
+                        break
+                    lines.append(data)
+                with server.lock:
+                    code = server.reject.pop(0) if server.reject else None
+                    if code is None:
+                        server.messages.append(message_from_bytes(b''.join(lines)))
+                self.reply(f'{code} Try again later' if code else '250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Not implemented')
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """
+    SMTP-сервер-заглушка на случайном локальном порту.
+
+    ``messages`` - принятые письма, ``connections`` - количество открытых
+    соединений, ``reject`` - коды ответа на DATA для очередных писем.
+    """
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.lock = threading.Lock()
+        self.messages = []
+        self.connections = 0
+        self.reject = []
+
+
+@pytest.fixture
+def app():
+    """
+    Фикстура для создания экземпляра приложения.
+
+    Returns:
+        Flask app: Экземпляр приложения Flask.
+
+    """
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def shared_list(app):
+    """
+    Фикстура для создания списка пользователя alice, в котором bob и carol - редакторы.
+
+    bob и carol получают уведомления, alice - нет (настройки по умолчанию).
+
+    Args:
+        app: Экземпляр приложения Flask.
+
+    """
+    for name in ('alice', 'bob', 'carol'):
+        UserService.register_user(email=f'{name}@example.com', username=name, password='password')
+    TodoService.create_todo('Shared', 1)
+    MemberService.set_member(1, 2, Role.EDITOR)
+    MemberService.set_member(1, 3, Role.EDITOR)
+    UserService.update_notification_settings(2, ENABLED)
+    UserService.update_notification_settings(3, ENABLED)
+
+
+@pytest.fixture
+def smtp_server():
+    """
+    Фикстура для запуска SMTP-сервера-заглушки в отдельном потоке.
+
+    Returns:
+        SMTPStandIn: Запущенный сервер.
+
+    """
+    server = SMTPStandIn()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def smtp_app(smtp_server):
+    """
+    Фикстура для создания экземпляра приложения, отправляющего письма на SMTP-заглушку.
+
+    Args:
+        smtp_server: SMTP-сервер-заглушка.
+
+    """
+    class SMTPConfig(Config):
+        MAIL_BACKEND = 'smtp'
+        MAIL_PORT = smtp_server.server_address[1]
+        MAIL_POOL_SIZE = 2
+        MAIL_BATCH_SIZE = 2
+
+    app = create_app(SMTPConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        mailer.close()
+        db.session.remove()
+        db.drop_all()
+
+
+def outbox(**filters):
+    """Возвращает сообщения outbox с указанными значениями полей по возрастанию идентификатора."""
+    return db.session.scalars(select(OutboxMessage).filter_by(**filters).order_by(OutboxMessage.id)).all()
+
+
+def test_changes_enqueued_with_task_write(app, shared_list):
+    """
+    Тест записи уведомлений той же транзакцией, что и задача: изменения и напоминания подписанным участникам.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        shared_list: Фикстура с общим списком.
+
+    """
+    TaskService.add_task('Buy milk', None, datetime.now() + timedelta(days=3), 1)
+
+    messages = outbox()
+    assert {(message.user_id, message.kind) for message in messages} == {
+        (2, 'change'), (3, 'change'), (2, 'deadline'), (3, 'deadline')}
+    change = outbox(user_id=2, kind='change')[0]
+    assert change.dedup_key == 'change:1'
+    assert change.data == {'event': 'task_created', 'title': 'Buy milk', 'todo_title': 'Shared'}
+    reminder = outbox(user_id=2, kind='deadline')[0]
+    assert reminder.available_at > datetime.now() + timedelta(days=1, hours=23)
+
+
+def test_pending_messages_are_coalesced(app, shared_list):
+    """
+    Тест объединения повторных изменений задачи в одно ожидающее сообщение на получателя.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        shared_list: Фикстура с общим списком.
+
+    """
+    TaskService.add_task('Buy milk', None, None, 1)
+    TaskService.update_task(1, 'Buy oat milk', None)
+    TaskService.complete_task(1)
+
+    messages = outbox(user_id=2)
+    assert len(messages) == 1
+    assert messages[0].data['event'] == 'task_completed'
+    assert messages[0].data['title'] == 'Buy oat milk'
+
+    OutboxService.deliver()
+    TaskService.update_task(1, 'Buy soy milk', None)
+    assert [message.status for message in outbox(user_id=2)] == [OutboxStatus.SENT, OutboxStatus.PENDING]
+
+
+def test_message_uses_task_from_database(app, shared_list):
+    """
+    Тест уведомления: заголовок задачи берется из базы той же транзакцией, а не из устаревшего кэша.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        shared_list: Фикстура с общим списком.
+
+    """
+    TaskService.add_task('Buy milk', None, None, 1)
+    db.session.remove()
+    assert TaskService.get_task(1).title == 'Buy milk'
+    # Другой процесс меняет заголовок; локальный кэш этого процесса о записи не знает.
+    db.session.execute(update(Task).where(Task.id == 1).values(title='Buy oat milk'))
+    db.session.commit()
+    db.session.remove()
+
+    EventLog.append(EventType.TASK_UPDATED, 1, 1, 1, {'priority': [0, 1]})
+    db.session.commit()
+    assert outbox(user_id=2)[0].data['title'] == 'Buy oat milk'
+
+
+def test_rollback_discards_messages(app, shared_list):
+    """
+    Тест отбрасывания уведомлений, если транзакция изменения отменена.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        shared_list: Фикстура с общим списком.
+
+    """
+    TaskService.add_task('Buy milk', None, None, 1)
+    db.session.execute(OutboxMessage.__table__.delete())
+    db.session.commit()
+
+    OutboxService.enqueue_event(EventType.TASK_UPDATED, 1, 1, {'title': ['Buy milk', 'Buy tea']})
+    db.session.rollback()
+    UserService.password_update('other', 1)
+
+    assert outbox() == []
+
+
+def test_actor_is_not_notified(app, shared_list):
+    """
+    Тест уведомления участников списка, кроме пользователя, который изменил задачу.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        shared_list: Фикстура с общим списком.
+
+    """
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = '2'
+        session['_fresh'] = True
+
+    response = client.post('/todo_list/1/task-add', data={'title': 'Buy milk'})
+
+    assert response.status_code == 302
+    assert [(message.user_id, message.kind) for message in outbox()] == [(3, 'change')]
+
+
+def test_deliver_sends_digest_per_user(app, shared_list):
+    """
+    Тест отправки одного письма на пользователя со всеми его уведомлениями.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        shared_list: Фикстура с общим списком.
+
+    """
+    TaskService.add_task('Buy milk', None, None, 1)
+    TaskService.add_task('Write report', None, None, 1)
+
+    result = OutboxService.deliver()
+
+    assert result['digests'] == 2 and result['sent'] == 4
+    sent = list(app.extensions['mailer'].sent)
+    assert sorted(email['To'] for email in sent) == ['bob@example.com', 'carol@example.com']
+    body = sent[0].get_content()
+    assert '«Buy milk» в списке «Shared»: новая задача' in body
+    assert '«Write report» в списке «Shared»: новая задача' in body
+    assert {message.status for message in outbox()} == {OutboxStatus.SENT}
+    assert OutboxService.deliver()['claimed'] == 0
+
+
+def test_deadline_reminder(app, shared_list):
+    """
+    Тест отправки напоминания о дедлайне в срок и его отмены для выполненной задачи.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        shared_list: Фикстура с общим списком.
+
+    """
+    deadline = datetime.now() + timedelta(days=3)
+    TaskService.add_task('Buy milk', None, deadline, 1)
+    TaskService.add_task('Write report', None, deadline, 1)
+    OutboxService.deliver()
+    app.extensions['mailer'].sent.clear()
+
+    assert OutboxService.deliver()['claimed'] == 0
+    TaskService.complete_task(2)
+    OutboxService.deliver()
+    app.extensions['mailer'].sent.clear()
+
+    result = OutboxService.deliver(now=deadline - timedelta(hours=12))
+
+    assert result['sent'] == 2 and result['cancelled'] == 2
+    body = app.extensions['mailer'].sent[0].get_content()
+    assert 'Приближается дедлайн' in body and 'Buy milk' in body and 'Write report' not in body
+
+
+def test_disabled_user_is_skipped(app, shared_list):
+    """
+    Тест отмены ожидающих уведомлений пользователя, который отключил их до отправки.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        shared_list: Фикстура с общим списком.
+
+    """
+    TaskService.add_task('Buy milk', None, None, 1)
+    UserService.update_notification_settings(3, {**ENABLED, 'email': False})
+
+    result = OutboxService.deliver()
+
+    assert result['sent'] == 1 and result['cancelled'] == 1
+    assert [email['To'] for email in app.extensions['mailer'].sent] == ['bob@example.com']
+    TaskService.update_task(1, 'Buy tea', None)
+    assert outbox(user_id=3, status=OutboxStatus.PENDING) == []
+
+
+def test_settings_route(app, shared_list):
+    """
+    Тест изменения настроек уведомлений через форму профиля.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        shared_list: Фикстура с общим списком.
+
+    """
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = '1'
+        session['_fresh'] = True
+
+    response = client.post('/profile/notifications', data={'email': 'on', 'task_changes': 'on',
+                                                           'remind_before_hours': '6'})
+
+    assert response.status_code == 302
+    assert UserService.get_user_by_id(1).notification_settings == {
+        'email': True, 'task_changes': True, 'deadline_reminders': False, 'remind_before_hours': 6}
+    assert 'checked' in client.get('/profile/').get_data(as_text=True)
+    TaskService.add_task('Buy milk', None, None, 1)
+    assert outbox(user_id=1, kind='change')
+
+
+def test_smtp_pool_and_retry(smtp_app, smtp_server):
+    """
+    Тест отправки дайджестов пачками через пул SMTP-соединений и повторной отправки после отказа 451.
+
+    Args:
+        smtp_app: Экземпляр приложения Flask, отправляющий письма на заглушку.
+        smtp_server: SMTP-сервер-заглушка.
+
+    """
+    for index in range(6):
+        UserService.register_user(email=f'user{index}@example.com', username=f'user{index}', password='password')
+        if index:
+            UserService.update_notification_settings(index + 1, ENABLED)
+    TodoService.create_todo('Shared', 1)
+    for user_id in range(2, 7):
+        MemberService.set_member(1, user_id, Role.EDITOR)
+    TaskService.add_task('Buy milk', None, None, 1)
+    smtp_server.reject.append(451)
+
+    now = datetime.now()
+    result = OutboxService.deliver(now=now)
+
+    assert result['digests'] == 4 and result['retried'] == 1
+    assert len(smtp_server.messages) == 4
+    assert smtp_server.connections <= 2
+    failed = outbox(status=OutboxStatus.PENDING)
+    assert len(failed) == 1 and failed[0].attempts == 1 and failed[0].error.startswith('(451')
+    assert failed[0].available_at == now + timedelta(seconds=60)
+
+    assert OutboxService.deliver(now=now + timedelta(seconds=30))['claimed'] == 0
+    connections = smtp_server.connections
+    result = OutboxService.deliver(now=now + timedelta(seconds=61))
+
+    assert result['digests'] == 1
+    assert len(smtp_server.messages) == 5
+    assert len({message['Message-ID'] for message in smtp_server.messages}) == 5
+    assert smtp_server.connections == connections
@@ -0,0 +1,242 @@
+"""
+Модуль содержит тесты ручного порядка задач на ключах дробной индексации.
+
+TestFixtures:
+    - app: Фикстура для создания экземпляра приложения.
+    - todo: Фикстура для создания списка с пятью задачами.
+
+Test Functions:
+    - test_keys_between_keep_order: Тест упорядоченности ключей при случайных вставках.
+    - test_new_tasks_appended: Тест добавления новых задач в конец списка.
+    - test_reorder_updates_one_row: Тест перестановки задачи одним обновлением строки.
+    - test_reorder_rejects_foreign_tasks: Тест запрета перестановки относительно чужой задачи или самой себя.
+    - test_rebalance_long_keys: Тест перебалансировки длинных ключей после отправки ответа.
+    - test_rebalance_error_logged: Тест записи ошибки перебалансировки в журнал без влияния на ответ.
+    - test_reorder_route: Тест перестановки через маршрут и порядка карточек на странице списка.
+"""
+import logging
+import os
+import random
+import sys
+import pytest
+from sqlalchemy import event, func, select
+from sqlalchemy.exc import OperationalError
+from werkzeug.exceptions import BadRequest, NotFound
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from database import db
+from todo_list import ranking
+from todo_list.forms import TaskCreateForm
+from todo_list.models import Task
+from todo_list.rebalancer import rank_rebalancer
+from todo_list.services import TaskService, TodoService
+from users.services import UserService
+
+
+@pytest.fixture
+def app():
+    """
+    Фикстура для создания экземпляра приложения.
+
+    Returns:
+        Flask app: Экземпляр приложения Flask.
+
+    """
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def todo(app):
+    """
+    Фикстура для создания списка 1 с задачами 1-5 и списка 2 с задачей 6.
+
+    Args:
+        app: Экземпляр приложения Flask.
+
+    """
+    UserService.register_user(email='alice@example.com', username='alice', password='password')
+    TodoService.create_todo('Project', 1)
+    TodoService.create_todo('Other', 1)
+    for index in range(1, 6):
+        TaskService.add_task(f'Task {index}', None, None, 1)
+    TaskService.add_task('Elsewhere', None, None, 2)
+
+
+def order(todo_id=1):
+    """Возвращает идентификаторы задач списка в порядке отображения."""
+    return [task.id for task in TaskService.iter_tasks(todo_id)]
+
+
+def test_keys_between_keep_order():
+    """
+    Тест упорядоченности ключей: вставка в случайное место дает ключ строго между соседями.
+    """
+    rng = random.Random(0)
+    keys = [ranking.ZERO]
+    for _ in range(2000):
+        position = rng.randint(0, len(keys))
+        lower = keys[position - 1] if position else None
+        upper = keys[position] if position < len(keys) else None
+        keys.insert(position, ranking.key_between(lower, upper))
+    assert keys == sorted(keys) and len(set(keys)) == len(keys)
+    assert all(not key.endswith('0') or len(key) == 2 for key in keys)
+
+    assert ranking.keys_between(None, None, 3) == ['a0', 'a1', 'a2']
+    batch = ranking.keys_between('a0', 'a1', 100)
+    assert batch == sorted(batch) and len(set(batch)) == 100 and 'a0' < batch[0] and batch[-1] < 'a1'
+    with pytest.raises(ValueError):
+        ranking.key_between('a1', 'a0')
+
+
+def test_new_tasks_appended(app, todo):
+    """
+    Тест добавления новых задач в конец списка: сервисами, пачкой и напрямую через ORM.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        todo: Фикстура со списком задач.
+
+    """
+    TaskService.add_tasks([TaskCreateForm(title=f'Batch {index}', todo_id=1) for index in range(2)], 1)
+    db.session.add(Task(title='Direct', todo_id=1))
+    db.session.commit()
+
+    assert order() == [1, 2, 3, 4, 5, 7, 8, 9]
+    assert db.session.get(Task, 6).rank == ranking.ZERO
+
+
+def test_reorder_updates_one_row(app, todo):
+    """
+    Тест перестановки задачи: в начало, в середину и в конец списка, каждый раз одним UPDATE.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        todo: Фикстура со списком задач.
+
+    """
+    updates = []
+
+    def capture(connection, cursor, statement, parameters, context, executemany):
+        if statement.startswith('UPDATE task '):
+            updates.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        TaskService.reorder_task(5, None, 1)
+        assert order() == [5, 1, 2, 3, 4]
+        TaskService.reorder_task(1, 3, 1)
+        assert order() == [5, 2, 3, 1, 4]
+        TaskService.reorder_task(5, 4, 1)
+        assert order() == [2, 3, 1, 4, 5]
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+    assert updates == ['UPDATE task SET rank=? WHERE task.id = ?'] * 3
+    assert order(2) == [6]
+
+
+def test_reorder_rejects_foreign_tasks(app, todo):
+    """
+    Тест запрета перестановки после самой себя и относительно задачи другого списка.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        todo: Фикстура со списком задач.
+
+    """
+    with pytest.raises(BadRequest):
+        TaskService.reorder_task(2, 2, 1)
+    with pytest.raises(NotFound):
+        TaskService.reorder_task(2, 6, 1)
+    with pytest.raises(NotFound):
+        TaskService.reorder_task(6, None, 1)
+    assert order() == [1, 2, 3, 4, 5]
+
+
+def test_rebalance_long_keys(app, todo, monkeypatch):
+    """
+    Тест перебалансировки: вставки в одно место удлиняют ключи, список переписывается после отправки ответа.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        todo: Фикстура со списком задач.
+        monkeypatch: Фикстура pytest для временной подмены атрибутов.
+
+    """
+    monkeypatch.setattr(rank_rebalancer, 'max_length', 6)
+    for task_id in (5, 4, 3) * 10:
+        TaskService.reorder_task(task_id, 1, 1)
+    expected = order()
+    assert db.session.scalar(select(func.max(func.length(Task.rank)))) > 6
+    assert rank_rebalancer.find_long() == [1]
+
+    client = app.test_client()
+    response = client.get('/login')
+    assert rank_rebalancer.find_long() == [1]
+    response.close()
+
+    assert order() == expected
+    assert [task.rank for task in TaskService.iter_tasks(1)] == ['a0', 'a1', 'a2', 'a3', 'a4']
+    assert rank_rebalancer.find_long() == []
+    result = app.test_cli_runner().invoke(args=['rebalance-ranks', '--todo-id', '1'])
+    assert 'ключей изменено: 0' in result.output
+
+
+def test_rebalance_error_logged(app, todo, monkeypatch, caplog):
+    """
+    Тест ошибки перебалансировки: ответ не меняется, ошибка записывается в журнал, ключи остаются для команды.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        todo: Фикстура со списком задач.
+        monkeypatch: Фикстура pytest для временной подмены атрибутов.
+        caplog: Перехват журнала pytest.
+
+    """
+    def fail(todo_id):
+        raise OperationalError('UPDATE task', {}, Exception('database is locked'))
+
+    monkeypatch.setattr(rank_rebalancer, 'max_length', 6)
+    for task_id in (5, 4, 3) * 10:
+        TaskService.reorder_task(task_id, 1, 1)
+    monkeypatch.setattr(rank_rebalancer, 'rebalance', fail)
+
+    response = app.test_client().get('/login')
+    with caplog.at_level(logging.ERROR):
+        response.close()
+
+    assert response.status_code == 200
+    assert 'Ошибка перебалансировки' in caplog.text
+    assert rank_rebalancer.find_long() == [1]
+
+
+def test_reorder_route(app, todo):
+    """
+    Тест перестановки перетаскиванием (JSON) и формой и порядка карточек на странице.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        todo: Фикстура со списком задач.
+
+    """
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = '1'
+        session['_fresh'] = True
+
+    response = client.post('/todo_list/1/task-reorder', json={'task_id': 4, 'after_id': None})
+    assert response.status_code == 200 and response.get_json()['rank'] < db.session.get(Task, 1).rank
+    assert client.post('/todo_list/1/task-reorder', json={'task_id': 'x'}).status_code == 400
+    response = client.post('/todo_list/1/task-reorder', data={'task_id': '2', 'after_id': '5'})
+    assert response.status_code == 302
+
+    html = client.get('/todo_list/1').get_data(as_text=True)
+    positions = [html.index(f'id="task-{task_id}"') for task_id in (4, 1, 3, 5, 2)]
+    assert positions == sorted(positions)
+    assert 'data-reorder-url="/todo_list/1/task-reorder"' in html and 'draggable="true"' in html
@@ -0,0 +1,203 @@
+"""
+Модуль содержит тесты шины публикации/подписки для живого обновления списков задач.
+
+TestFixtures:
+    - app: Фикстура для создания экземпляра приложения.
+
+Test Functions:
+    - test_publish_delivers_to_channel_subscribers: Тест доставки события подписчикам канала.
+    - test_slow_subscriber_gets_resync: Тест ограниченной очереди медленного подписчика.
+    - test_redis_listener_started_per_process: Тест запуска потока доставки Redis в каждом процессе при подписке.
+    - test_redis_listener_recovers: Тест пропуска ошибочных сообщений и переподключения потока доставки Redis.
+    - test_service_writes_publish_events: Тест публикации событий при изменении задач.
+"""
+import json
+import logging
+import os
+import queue
+import sys
+import time
+import pytest
+from datetime import datetime
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from database import db
+import pubsub
+from pubsub import PubSubHub, RedisTransport, RESYNC_EVENT, hub
+from todo_list.services import TodoService, TaskService, todo_channel
+
+
+class FakePubSub:
+    """
+    Локальная замена подписки Redis: сообщения по шаблону ``prefix*`` из очереди.
+
+    ``None`` в очереди завершает подписку, исключение - имитирует обрыв соединения.
+    """
+
+    def __init__(self):
+        self.messages = queue.Queue()
+        self.pattern = None
+
+    def psubscribe(self, pattern):
+        self.pattern = pattern
+
+    def listen(self):
+        while True:
+            message = self.messages.get()
+            if message is None:
+                return
+            if isinstance(message, Exception):
+                raise message
+            yield message
+
+    def close(self):
+        self.pattern = None
+
+
+class FakeRedis:
+    """Локальная замена клиента Redis для публикации и подписки."""
+
+    def __init__(self):
+        self.pubsubs = []
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        self.pubsubs.append(FakePubSub())
+        return self.pubsubs[-1]
+
+    def publish(self, channel, data):
+        for subscriber in self.pubsubs:
+            if subscriber.pattern and channel.startswith(subscriber.pattern[:-1]):
+                subscriber.messages.put({'channel': channel.encode(), 'data': data})
+
+
+@pytest.fixture
+def app():
+    """
+    Фикстура для создания экземпляра приложения.
+
+    Returns:
+        Flask app: Экземпляр приложения Flask.
+
+    """
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def test_publish_delivers_to_channel_subscribers():
+    """Тест доставки события только подписчикам канала."""
+    local_hub = PubSubHub()
+    with local_hub.subscribe('todo:1') as first, local_hub.subscribe('todo:2') as second:
+        local_hub.publish('todo:1', {'type': 'task_deleted', 'id': 5})
+
+        assert first.get(timeout=0) == {'type': 'task_deleted', 'id': 5}
+        assert second.get(timeout=0) is None
+
+    assert local_hub.subscriber_count('todo:1') == 0
+
+
+def test_slow_subscriber_gets_resync():
+    """Тест замены переполненной очереди событием resync."""
+    local_hub = PubSubHub(queue_size=2)
+    with local_hub.subscribe('todo:1') as subscription:
+        for task_id in range(3):
+            local_hub.publish('todo:1', {'type': 'task_deleted', 'id': task_id})
+
+        assert subscription.get(timeout=0) == RESYNC_EVENT
+        assert subscription.get(timeout=0) is None
+        assert subscription.dropped == 2
+
+
+def test_redis_listener_started_per_process(monkeypatch):
+    """
+    Тест потока доставки Redis: он не запускается при создании шины (в мастере preforking-сервера),
+    а запускается при первой подписке и заново в дочернем процессе.
+
+    Args:
+        monkeypatch: Фикстура pytest для временной подмены атрибутов.
+
+    """
+    client = FakeRedis()
+    redis_hub = PubSubHub(RedisTransport(None, client=client))
+    assert client.pubsubs == []
+
+    with redis_hub.subscribe('todo:1') as subscription:
+        redis_hub.subscribe('todo:2').close()
+        redis_hub.publish('todo:1', {'type': 'task_deleted', 'id': 5})
+        assert len(client.pubsubs) == 1
+        assert subscription.get(timeout=1) == {'type': 'task_deleted', 'id': 5}
+
+        monkeypatch.setattr(pubsub.os, 'getpid', lambda: -1)
+        with redis_hub.subscribe('todo:1') as child:
+            client.publish('pubsub:todo:1', json.dumps({'type': 'resync'}))
+            assert len(client.pubsubs) == 2
+            assert child.get(timeout=1) == {'type': 'resync'}
+
+
+def test_redis_listener_recovers(monkeypatch, caplog):
+    """
+    Тест потока доставки Redis: сообщение не в JSON пропускается, после обрыва соединения
+    поток подписывается заново, а после завершения подписки запускается при следующей подписке.
+
+    Args:
+        monkeypatch: Фикстура pytest для временной подмены атрибутов.
+        caplog: Перехват журнала pytest.
+
+    """
+    def wait_for(condition):
+        deadline = time.monotonic() + 2
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return condition()
+
+    monkeypatch.setattr(pubsub, 'RECONNECT_DELAY', 0.01)
+    client = FakeRedis()
+    transport = RedisTransport(None, client=client)
+    redis_hub = PubSubHub(transport)
+    event = {'type': 'task_deleted', 'id': 5}
+
+    with caplog.at_level(logging.ERROR, logger='pubsub'), redis_hub.subscribe('todo:1') as subscription:
+        client.pubsubs[0].messages.put({'channel': b'pubsub:todo:1', 'data': b'not json'})
+        redis_hub.publish('todo:1', event)
+        assert subscription.get(timeout=1) == event
+        assert 'Сообщение Redis пропущено' in caplog.text
+
+        client.pubsubs[0].messages.put(ConnectionError('Connection reset by peer'))
+        assert wait_for(lambda: len(client.pubsubs) == 2)
+        redis_hub.publish('todo:1', event)
+        assert subscription.get(timeout=1) == event
+        assert 'Подписка Redis прервана' in caplog.text
+
+        client.pubsubs[1].messages.put(None)
+        assert wait_for(lambda: transport._pid is None)
+        with redis_hub.subscribe('todo:1') as resubscribed:
+            redis_hub.publish('todo:1', event)
+            assert len(client.pubsubs) == 3 and resubscribed.get(timeout=1) == event
+
+
+def test_service_writes_publish_events(app):
+    """
+    Тест публикации событий при изменении задач.
+
+    Args:
+        app: Экземпляр приложения Flask.
+
+    """
+    TodoService.create_todo(title='Test Todo List', user_id=1)
+    with hub.subscribe(todo_channel(1)) as subscription:
+        TaskService.add_task(title='Test Task', description=None,
+                             deadline_date=datetime(2023, 12, 20), todo_id=1)
+        TaskService.complete_task(1)
+        TaskService.delete_task(1)
+
+        created = subscription.get(timeout=0)
+        assert created['type'] == 'task_created'
+        assert created['task']['title'] == 'Test Task'
+        assert created['task']['status'] == 'overdue'
+        assert subscription.get(timeout=0)['task']['is_complete'] is True
+        assert subscription.get(timeout=0) == {'type': 'task_deleted', 'id': 1}
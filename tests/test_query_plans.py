@@ -0,0 +1,335 @@
+"""
+Модуль содержит регрессионные тесты планов запросов сервисов.
+
+Каждый публичный метод сервисов (классов ``*Service``; а также перебалансировка ключей
+порядка задач) вызывается на заполненной командой
+``flask seed`` базе SQLite; все выполненные им SQL-запросы перехватываются, и для каждого выполняется EXPLAIN QUERY PLAN.
+Тест падает, если план содержит полный обход таблицы (``SCAN <таблица>``) или
+временное B-дерево (``USE TEMP B-TREE``), и сравнивает планы со снимками в
+каталоге ``tests/query_plans``. Статистика ANALYZE не собирается: на маленькой
+базе SQLite справедливо предпочел бы полный обход, а без статистики план
+зависит только от схемы и запроса. После намеренного изменения запросов снимки
+обновляются запуском::
+
+    UPDATE_QUERY_PLANS=1 python -m pytest tests/test_query_plans.py
+
+TestFixtures:
+    - app: Фикстура для создания экземпляра приложения с заполненной базой данных.
+
+Test Functions:
+    - test_query_plan: Тест планов всех запросов одного метода сервиса.
+    - test_plan_problems_detects_scans: Тест обнаружения полного обхода и временного B-дерева.
+    - test_cases_cover_services: Тест наличия в CASES каждого публичного метода сервисов.
+"""
+import inspect
+import os
+import re
+import sys
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import event, update
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+import archive.services
+import events.projections
+import notifications.services
+import todo_list.permissions
+import todo_list.services
+import users.services
+from archive.services import ArchiveService
+from cache import cache
+from database import db, create_schema
+from events.models import EventType
+from events.projections import ProjectionService, SearchService
+from notifications.services import OutboxService
+from todo_list.forms import TaskCreateForm
+from todo_list.models import Role, Task, TaskStatus, TodoList
+from todo_list.permissions import PermissionService
+from todo_list.rebalancer import rank_rebalancer
+from todo_list.services import (TodoService, TaskService, MemberService, LabelService, NextUpService,
+                                CalendarService)
+from users.models import User, UserStats
+from users.services import UserService, StatisticService
+
+SNAPSHOTS = os.path.join(os.path.dirname(__file__), 'query_plans')
+UPDATE = os.environ.get('UPDATE_QUERY_PLANS') == '1'
+SEED = ['seed', '--users', '5', '--lists-per-user', '2', '--tasks-per-list', '5',
+        '--seed', '1', '--base-date', '2025-01-01']
+DEADLINE = datetime(2099, 2, 1)
+ARCHIVE_CUTOFF = datetime(2025, 1, 1)
+NOTIFY = {'email': True, 'task_changes': True, 'deadline_reminders': True}
+STATS = dict(total_todo=2, total_tasks=10, completed_tasks=3, active_tasks=5,
+             incomplete_tasks=2, completion_percentage=30.0)
+# Сгруппированные строки объединения двух источников (UNION ALL) всегда
+# собираются во временном B-дереве; его размер ограничен пакетом пользователей.
+GROUP_BY_UNION = ('USE TEMP B-TREE FOR GROUP BY',)
+CALENDAR = (datetime(2025, 1, 1), datetime(2025, 2, 1))
+# Сортировки, размер которых ограничен одним списком, пакетом outbox или
+# диапазоном дат календаря: задачи нескольких доступных списков или строки
+# пакета, выбранные по другому индексу, упорядочиваются во временном B-дереве.
+ORDER_BY = ('USE TEMP B-TREE FOR ORDER BY',)
+CALENDAR_GROUPS = ('USE TEMP B-TREE FOR GROUP BY', 'USE TEMP B-TREE FOR ORDER BY')
+# Модули с сервисами: каждый публичный статический метод их классов ``*Service`` должен быть в CASES.
+SERVICE_MODULES = (todo_list.services, todo_list.permissions, users.services, archive.services,
+                   notifications.services, events.projections)
+# Методы, которые не обращаются к базе данных.
+NO_QUERIES = {'ArchiveService.cutoff', 'PermissionService.invalidate'}
+
+CASES = {
+    'TodoService.create_todo': (lambda: TodoService.create_todo('Новый список', 1), ()),
+    'TodoService.get_todo': (lambda: TodoService.get_todo(1), ()),
+    'TodoService.get_owner_id': (lambda: TodoService.get_owner_id(1), ()),
+    'TodoService.get_all_todo': (lambda: TodoService.get_all_todo(1), ()),
+    'TodoService.select_todo_lists': (lambda: TodoService.select_todo_lists(1, [TodoList.id, TodoList.title]), ()),
+    'TodoService.update_todo': (lambda: TodoService.update_todo(1, 'Переименованный список'), ()),
+    'TodoService.delete_todo': (lambda: TodoService.delete_todo(2), ()),
+    'TodoService.count_tasks': (lambda: TodoService.count_tasks(1), ()),
+    'TodoService.get_tasks_by_status': (lambda: TodoService.get_tasks_by_status(1, TaskStatus.ACTIVE), ()),
+    'TodoService.get_tasks_from_todo_list': (lambda: TodoService.get_tasks_from_todo_list(1), ()),
+    'TaskService.get_task': (lambda: TaskService.get_task(1, 1), ()),
+    'TaskService.select_tasks': (lambda: TaskService.select_tasks(1, [Task.id, Task.title]), ()),
+    'TaskService.select_tasks.one': (lambda: TaskService.select_tasks(1, [Task.id, Task.title], task_id=1), ()),
+    'TaskService.iter_tasks': (lambda: list(TaskService.iter_tasks(1, batch_size=2)), ()),
+    'TaskService.add_task': (lambda: TaskService.add_task('Задача', 'Описание', DEADLINE, 1), ()),
+    'TaskService.add_tasks': (lambda: TaskService.add_tasks(
+        [TaskCreateForm(title=f'Задача {index}', deadline_date=DEADLINE, todo_id=1) for index in range(3)],
+        1), ()),
+    'TaskService.complete_task': (lambda: TaskService.complete_task(1, 1), ()),
+    'TaskService.update_task': (lambda: TaskService.update_task(1, 'Задача', 'Описание', 1, 1), ()),
+    'TaskService.undo_task': (lambda: TaskService.undo_task(1, 1), ()),
+    'TaskService.get_task_history': (lambda: TaskService.get_task_history(1, 1, before=5), ()),
+    'TaskService.delete_task': (lambda: TaskService.delete_task(2, 1), ()),
+    'TaskService.move_task': (lambda: TaskService.move_task(2, 5, 1), ()),
+    'TaskService.move_task.root': (lambda: TaskService.move_task(2, None, 1), ()),
+    'TaskService.get_progress': (lambda: TaskService.get_progress(1), ()),
+    'TaskService.reorder_task': (lambda: TaskService.reorder_task(1, 3, 1), ()),
+    'TaskService.reorder_task.first': (lambda: TaskService.reorder_task(3, None, 1), ()),
+    'RankRebalancer.rebalance': (lambda: rank_rebalancer.rebalance(1), ()),
+    'ArchiveService.archive_batch': (lambda: ArchiveService.archive_batch(ARCHIVE_CUTOFF, 2), ()),
+    'ArchiveService.count': (lambda: ArchiveService.count(1), ()),
+    'ArchiveService.get_tasks': (lambda: ArchiveService.get_tasks(1), ()),
+    'ArchiveService.get_tasks.search': (lambda: ArchiveService.get_tasks(1, 'задача 1', page=2), ()),
+    'ArchiveService.archive': (lambda: ArchiveService.archive(now=ARCHIVE_CUTOFF, days=0, batch_size=2), ()),
+    'ArchiveService.delete_list': (lambda: ArchiveService.delete_list(1), ()),
+    'MemberService.get_members': (lambda: MemberService.get_members(3), ORDER_BY),
+    'MemberService.set_member': (lambda: MemberService.set_member(3, 4, Role.VIEWER), ()),
+    'MemberService.remove_member': (lambda: MemberService.remove_member(3, 1), ()),
+    'PermissionService.get_role': (lambda: PermissionService.get_role(3, 1), ()),
+    'PermissionService.get_user_ids': (lambda: PermissionService.get_user_ids(3), ()),
+    'LabelService.get_labels': (lambda: LabelService.get_labels(1), ()),
+    'LabelService.create_label': (lambda: LabelService.create_label(1, 'Работа'), ()),
+    'LabelService.delete_label': (lambda: LabelService.delete_label(1, 1), ('USE TEMP B-TREE FOR DISTINCT',)),
+    'LabelService.set_task_labels': (lambda: LabelService.set_task_labels(2, 1, 1, [1]), ()),
+    'LabelService.get_index': (lambda: LabelService.get_index(1), ()),
+    'LabelService.filter_tasks': (lambda: LabelService.filter_tasks(1, [1]), ()),
+    'LabelService.get_list_labels': (lambda: LabelService.get_list_labels(1, 1), ()),
+    'NextUpService.get_next_up': (lambda: NextUpService.get_next_up(1), ()),
+    'CalendarService.get_day_counts': (lambda: CalendarService.get_day_counts(1, *CALENDAR), CALENDAR_GROUPS),
+    'CalendarService.iter_tasks': (
+        lambda: list(CalendarService.iter_tasks(1, *CALENDAR, batch_size=2)), CALENDAR_GROUPS),
+    'CalendarService.get_calendar': (lambda: CalendarService.get_calendar(1, *CALENDAR), CALENDAR_GROUPS),
+    'OutboxService.enqueue_event': (lambda: OutboxService.enqueue_event(EventType.TASK_UPDATED, 1, 1, {}), ()),
+    'OutboxService.deliver': (lambda: OutboxService.deliver(), ORDER_BY),
+    'OutboxService.purge': (lambda: OutboxService.purge(datetime.now() + timedelta(days=1)), ()),
+    'ProjectionService.get_checkpoint': (lambda: ProjectionService.get_checkpoint('stats'), ()),
+    'ProjectionService.set_checkpoint': (lambda: ProjectionService.set_checkpoint('stats', 1), ()),
+    'ProjectionService.catch_up': (lambda: ProjectionService.catch_up('stats'), GROUP_BY_UNION),
+    'ProjectionService.catch_up_all': (lambda: ProjectionService.catch_up_all(), GROUP_BY_UNION),
+    # Пересборка проекции с нуля сбрасывает все строки статистики одним UPDATE.
+    'ProjectionService.replay': (lambda: ProjectionService.replay('stats'), GROUP_BY_UNION + ('SCAN user_stats',)),
+    'SearchService.search': (lambda: SearchService.search(1, 'задача'), ORDER_BY),
+    'UserService.get_user_by_id': (lambda: UserService.get_user_by_id(1), ()),
+    'UserService.get_user': (lambda: UserService.get_user('seed1'), ()),
+    'UserService.register_user': (lambda: UserService.register_user('new@example.com', 'new', 'hash'), ()),
+    'UserService.authenticate_user': (lambda: UserService.authenticate_user('seed1', 'hash'), ()),
+    'UserService.password_update': (lambda: UserService.password_update('hash', 1), ()),
+    'UserService.update_notification_settings': (
+        lambda: UserService.update_notification_settings(1, {**NOTIFY, 'remind_before_hours': 12}), ()),
+    'UserService.get_user_stats': (lambda: UserService.get_user_stats(1), ()),
+    'UserService.select_user_stats': (lambda: UserService.select_user_stats(1, [UserStats.total_tasks]), ()),
+    'UserService.user_stats_create': (lambda: UserService.user_stats_create(1, **STATS), ()),
+    'UserService.user_stats_update': (lambda: UserService.user_stats_update(1, **STATS), ()),
+    'StatisticService.get_user_total_todo_lists': (lambda: StatisticService.get_user_total_todo_lists(1), ()),
+    'StatisticService.get_user_archived_tasks': (lambda: StatisticService.get_user_archived_tasks(1), ()),
+    'StatisticService.get_user_total_tasks': (lambda: StatisticService.get_user_total_tasks(1), ()),
+    'StatisticService.get_user_active_tasks': (lambda: StatisticService.get_user_active_tasks(1), ()),
+    'StatisticService.get_user_completed_tasks': (lambda: StatisticService.get_user_completed_tasks(1), ()),
+    'StatisticService.get_user_incompleted_tasks': (lambda: StatisticService.get_user_incompleted_tasks(1), ()),
+    'StatisticService.calculate_completion_percentage': (
+        lambda: StatisticService.calculate_completion_percentage(1), ()),
+    'StatisticService.aggregate_users': (
+        lambda: StatisticService.aggregate_users(db.session.connection(), 1, 3), GROUP_BY_UNION),
+    'StatisticService.save_user_stats': (
+        lambda: StatisticService.save_user_stats(StatisticService.summarize_list_stats({1, 2})), GROUP_BY_UNION),
+    'StatisticService.summarize_list_stats': (lambda: StatisticService.summarize_list_stats({1, 2}), GROUP_BY_UNION),
+    'StatisticService.aggregate_lists': (lambda: StatisticService.aggregate_lists(db.session.connection(), 1, 3), ()),
+    'StatisticService.save_list_stats': (lambda: StatisticService.save_list_stats(
+        StatisticService.aggregate_lists(db.session.connection(), 1, 3)), ()),
+}
+
+
+@pytest.fixture
+def app():
+    """
+    Фикстура для создания экземпляра приложения с заполненной базой данных и построенной статистикой.
+
+    Returns:
+        Flask app: Экземпляр приложения Flask.
+
+    """
+    app = create_app()
+    with app.app_context():
+        create_schema()
+        result = app.test_cli_runner().invoke(args=SEED)
+        assert result.exit_code == 0, result.output
+        ProjectionService.catch_up('stats')
+        # Владелец первых списков получает уведомления: запросы outbox тоже проверяются.
+        db.session.execute(update(User).where(User.id == 1).values(notification_settings=NOTIFY))
+        db.session.commit()
+        # Задачи 2 и 3 - подзадачи задачи 1, задача 4 - подзадача задачи 2.
+        for task_id, parent_id in ((2, 1), (3, 1), (4, 2)):
+            TaskService.move_task(task_id, parent_id)
+        # У задачи 1 есть правка, которую можно отменить.
+        TaskService.update_task(1, 'Первая правка', None, user_id=1)
+        # Пользователь 1 - редактор списка 3 пользователя 2, на задаче 1 стоит метка 1 пользователя 1.
+        MemberService.set_member(3, 1, Role.EDITOR)
+        LabelService.set_task_labels(1, 1, 1, [LabelService.create_label(1, 'Дом').id])
+        cache.clear()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@contextmanager
+def captured_statements():
+    """
+    Перехватывает SQL-запросы, выполненные внутри блока.
+
+    Yields:
+        list: Пары (текст запроса, параметры); для executemany - параметры первой строки.
+
+    """
+    statements = []
+
+    def capture(connection, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')):
+            statements.append((statement, parameters[0] if isinstance(parameters, list) else parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+
+
+def explain(statement, parameters):
+    """
+    Возвращает план запроса строками с отступами по вложенности.
+
+    Args:
+        statement: Текст запроса.
+        parameters: Параметры запроса.
+
+    """
+    rows = db.session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+    depth = {0: -1}
+    lines = []
+    for node, parent, _, detail in rows:
+        depth[node] = depth.get(parent, -1) + 1
+        lines.append('  ' * depth[node] + detail)
+    return lines
+
+
+def plan_problems(plan, allowed=()):
+    """
+    Возвращает строки плана с полным обходом таблицы или временным B-деревом.
+
+    Обход подзапроса (``SCAN access``) полным обходом таблицы не считается.
+
+    Args:
+        plan: Строки плана (см. ``explain``).
+        allowed: Допустимые для запроса фрагменты строк плана.
+
+    """
+    tables = set(db.metadata.tables)
+    problems = []
+    for line in plan:
+        detail = line.strip()
+        scan = re.match(r'SCAN (\w+)', detail)
+        if ((scan and scan.group(1) in tables) or 'TEMP B-TREE' in detail) \
+                and not any(fragment in detail for fragment in allowed):
+            problems.append(detail)
+    return problems
+
+
+def render(statements):
+    """
+    Возвращает снимок: текст каждого запроса и его план.
+
+    Args:
+        statements: Пары (текст запроса, план).
+
+    """
+    blocks = ['\n'.join([' '.join(statement.split())] + ['    ' + line for line in plan])
+              for statement, plan in statements]
+    return '\n\n'.join(blocks) + '\n'
+
+
+@pytest.mark.parametrize('name', list(CASES))
+def test_query_plan(app, name):
+    """
+    Тест планов всех запросов метода: без полных обходов и временных B-деревьев, как в снимке.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        name: Имя метода сервиса.
+
+    """
+    call, allowed = CASES[name]
+    with app.test_request_context():
+        with captured_statements() as statements:
+            call()
+        assert statements, f'{name} не выполнил ни одного запроса'
+        plans = [(statement, explain(statement, parameters)) for statement, parameters in statements]
+
+    problems = {' '.join(statement.split()): plan_problems(plan, allowed) for statement, plan in plans}
+    assert not {statement: found for statement, found in problems.items() if found}
+
+    path = os.path.join(SNAPSHOTS, f'{name}.txt')
+    snapshot = render(plans)
+    if UPDATE or not os.path.exists(path):
+        os.makedirs(SNAPSHOTS, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(snapshot)
+    with open(path, encoding='utf-8') as file:
+        assert snapshot == file.read(), f'План {name} изменился; обновите снимок: UPDATE_QUERY_PLANS=1'
+
+
+def test_plan_problems_detects_scans(app):
+    """
+    Тест обнаружения полного обхода таблицы и сортировки во временном B-дереве.
+
+    Args:
+        app: Экземпляр приложения Flask.
+
+    """
+    plan = explain('SELECT id FROM task WHERE title = ? ORDER BY priority', ('Задача',))
+    assert plan_problems(plan) == ['SCAN task', 'USE TEMP B-TREE FOR ORDER BY']
+    assert plan_problems(plan, allowed=('SCAN task', 'ORDER BY')) == []
+    assert plan_problems(explain('SELECT id FROM task WHERE todo_id = ? ORDER BY id', (1,))) == []
+
+
+def test_cases_cover_services():
+    """
+    Тест полноты CASES: новый публичный метод сервиса не выпадает из проверки планов незаметно.
+    """
+    methods = {f'{name}.{method}'
+               for module in SERVICE_MODULES
+               for name, cls in vars(module).items()
+               if inspect.isclass(cls) and name.endswith('Service') and cls.__module__ == module.__name__
+               for method, value in vars(cls).items()
+               if isinstance(value, staticmethod) and not method.startswith('_')}
+    assert not methods - set(CASES) - NO_QUERIES, 'Добавьте в CASES методы сервисов без проверки планов'
@@ -0,0 +1,179 @@
+"""
+Модуль содержит тесты ограничения частоты запросов.
+
+TestFixtures:
+    - app: Фикстура для создания экземпляра приложения.
+
+Test Functions:
+    - test_local_store_refill_and_eviction: Тест пополнения корзин и вытеснения простаивающих корзин.
+    - test_redis_store_with_local_stand_in: Тест общего хранилища корзин на локальной замене Redis.
+    - test_login_limited_by_ip: Тест ограничения попыток входа по IP-адресу.
+    - test_writes_limited_per_user: Тест раздельных лимитов изменяющих запросов разных пользователей.
+"""
+import os
+import sys
+import threading
+import pytest
+from flask import g
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from database import db
+from ratelimit import LocalBucketStore, RedisBucketStore, take
+from todo_list.services import TodoService
+from users.services import UserService
+
+
+class Clock:
+    """Управляемые часы для хранилищ корзин."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeRedis:
+    """Локальная замена клиента Redis: скрипт корзины выполняется функцией take по часам Clock."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def register_script(self, script):
+        def run(keys, args):
+            with self.lock:
+                now = self.clock()
+                item = self.data.get(keys[0])
+                if item is not None and item[0] <= now:
+                    item = None
+                rate, capacity, cost = (float(arg) for arg in args)
+                tokens, wait = take(*(item[1:] if item else (None, now)), now, rate, capacity, cost)
+                self.data[keys[0]] = (now + (capacity - tokens) / rate, tokens, now)
+                return str(wait).encode()
+        return run
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def scan_iter(self, match):
+        prefix = match.rstrip('*')
+        return [key for key in list(self.data) if key.startswith(prefix)]
+
+
+def client_for(app, user_id):
+    """
+    Возвращает тестовый клиент, авторизованный от имени пользователя.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        user_id: Идентификатор пользователя.
+
+    """
+    g.pop('_login_user', None)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return client
+
+
+@pytest.fixture
+def app():
+    """
+    Фикстура для создания экземпляра приложения.
+
+    Returns:
+        Flask app: Экземпляр приложения Flask.
+
+    """
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def test_local_store_refill_and_eviction():
+    """Тест корзины: всплеск, ожидание до пополнения, удаление пополнившихся корзин и предел размера."""
+    clock = Clock()
+    store = LocalBucketStore(maxsize=3, clock=clock)
+    assert [store.consume('a', 1, 3) for _ in range(3)] == [0, 0, 0]
+    assert store.consume('a', 1, 3) == pytest.approx(1)
+    clock.now += 0.5
+    assert store.consume('a', 1, 3) == pytest.approx(0.5)
+    clock.now += 0.5
+    assert store.consume('a', 1, 3) == 0
+
+    for key in 'bcd':
+        store.consume(key, 1, 3)
+    assert len(store) == 3 and store.consume('a', 1, 3) == 0
+
+    clock.now += 10
+    store.consume('e', 1, 3)
+    assert len(store) == 1
+
+
+def test_redis_store_with_local_stand_in():
+    """Тест общего хранилища: корзина общая для процессов, ключи с префиксом истекают и очищаются."""
+    clock = Clock()
+    client = FakeRedis(clock)
+    first, second = RedisBucketStore(client=client), RedisBucketStore(client=client)
+    assert first.consume('auth:ip:1', 0.5, 2) == 0
+    assert second.consume('auth:ip:1', 0.5, 2) == 0
+    assert first.consume('auth:ip:1', 0.5, 2) == pytest.approx(2)
+    assert client.data['ratelimit:auth:ip:1'][0] == pytest.approx(clock.now + 4)
+
+    client.data['other:key'] = (None, 0, 0)
+    first.clear()
+    assert list(client.data) == ['other:key']
+
+
+def test_login_limited_by_ip(app):
+    """
+    Тест ограничения входа: после всплеска попытки с того же адреса получают 429, с другого - нет.
+
+    Args:
+        app: Экземпляр приложения Flask.
+
+    """
+    app.config['RATELIMIT_LIMITS'] = {**app.config['RATELIMIT_LIMITS'], 'auth': (3, 60)}
+    client = app.test_client()
+    for _ in range(3):
+        assert client.post('/login', data={'username': 'alice', 'password': 'wrong'}).status_code == 302
+
+    response = client.post('/login', data={'username': 'alice', 'password': 'wrong'})
+    assert response.status_code == 429 and response.headers['Retry-After'] == '20'
+    assert client.get('/login').status_code == 200
+    other = client.post('/login', data={'username': 'alice', 'password': 'wrong'},
+                        environ_base={'REMOTE_ADDR': '10.0.0.2'})
+    assert other.status_code == 302
+
+
+def test_writes_limited_per_user(app):
+    """
+    Тест изменяющих запросов: у каждого пользователя своя корзина, JSON-клиент получает JSON с ошибкой.
+
+    Args:
+        app: Экземпляр приложения Flask.
+
+    """
+    for name in ('alice', 'bob'):
+        UserService.register_user(email=f'{name}@example.com', username=name, password='password')
+        TodoService.create_todo('Project', UserService.get_user(username=name).id)
+    app.config['RATELIMIT_LIMITS'] = {**app.config['RATELIMIT_LIMITS'], 'write': (2, 10)}
+
+    client = client_for(app, 1)
+    for index in range(2):
+        assert client.post('/todo_list/1/task-add', data={'title': f'Task {index}'}).status_code == 302
+    response = client.post('/todo_list/1/tasks/batch', json={'tasks': [{'title': 'Late'}]})
+    assert response.status_code == 429 and response.headers['Retry-After'] == '5'
+    assert response.get_json()['retry_after'] == 5
+    assert client.get('/todo_list/1').status_code == 200
+
+    assert client_for(app, 2).post('/todo_list/2/task-add', data={'title': 'Task'}).status_code == 302
@@ -0,0 +1,192 @@
+"""
+Модуль содержит тесты истории правок задач и отмены правок.
+
+TestFixtures:
+    - app: Фикстура для создания экземпляра приложения.
+    - task: Фикстура для создания списка с одной задачей.
+
+Test Functions:
+    - test_update_records_changed_fields: Тест записи в ревизию только изменившихся полей.
+    - test_retention_per_task: Тест ограничения количества ревизий задачи.
+    - test_undo_applies_inverse_changes: Тест пошаговой отмены правок и отказа при конфликте.
+    - test_history_and_undo_routes: Тест маршрутов истории и отмены правки.
+    - test_revision_ignores_stale_cache: Тест ревизии задачи, устаревшей в кэше другого процесса.
+"""
+import os
+import sys
+import pytest
+from sqlalchemy import select, update
+from werkzeug.exceptions import Conflict
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from cache import cache, entity_key
+from database import db
+from events.models import TaskEvent
+from todo_list.models import Task, TaskRevision
+from todo_list.services import TaskService, TodoService
+from users.services import UserService
+
+
+@pytest.fixture
+def app():
+    """
+    Фикстура для создания экземпляра приложения.
+
+    Returns:
+        Flask app: Экземпляр приложения Flask.
+
+    """
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def task(app):
+    """
+    Фикстура для создания списка 1 с задачей 1 «Buy milk».
+
+    Args:
+        app: Экземпляр приложения Flask.
+
+    """
+    UserService.register_user(email='alice@example.com', username='alice', password='password')
+    TodoService.create_todo('Shopping', 1)
+    TaskService.add_task('Buy milk', '2 bottles', None, 1)
+
+
+def revisions(task_id=1):
+    """Возвращает пары (номер ревизии, изменения) задачи по возрастанию номера."""
+    return [(item.revision, item.changes) for item in
+            db.session.scalars(select(TaskRevision).where(TaskRevision.task_id == task_id)
+                               .order_by(TaskRevision.revision))]
+
+
+def test_update_records_changed_fields(app, task):
+    """
+    Тест ревизий: хранятся только изменившиеся поля и автор правки, правка без изменений не записывается.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        task: Фикстура с задачей.
+
+    """
+    TaskService.update_task(1, 'Buy oat milk', '2 bottles', 1, 1)
+    TaskService.update_task(1, 'Buy oat milk', '2 bottles', 1, 1)
+    TaskService.update_task(1, 'Buy oat milk', None)
+
+    assert revisions() == [(1, {'title': ['Buy milk', 'Buy oat milk']}),
+                           (2, {'description': ['2 bottles', None]})]
+    assert [item.user_id for item in TaskService.get_task_history(1)] == [None, 1]
+
+
+def test_retention_per_task(app, task):
+    """
+    Тест ограничения истории: у задачи остаются только последние TASK_REVISION_LIMIT ревизий.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        task: Фикстура с задачей.
+
+    """
+    app.config['TASK_REVISION_LIMIT'] = 3
+    TaskService.add_task('Other', None, None, 1)
+    TaskService.update_task(2, 'Other task', None)
+    for index in range(5):
+        TaskService.update_task(1, f'Edit {index}', None)
+
+    assert [revision for revision, _ in revisions()] == [3, 4, 5]
+    assert revisions(2) == [(1, {'title': ['Other', 'Other task']})]
+    assert [item.revision for item in TaskService.get_task_history(1, before=5, limit=1)] == [4]
+
+    TaskService.delete_task(1)
+    assert revisions() == []
+
+
+def test_undo_applies_inverse_changes(app, task):
+    """
+    Тест отмены: правки отменяются по одной с конца, а изменение задачи в обход истории делает отмену конфликтом.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        task: Фикстура с задачей.
+
+    """
+    TaskService.update_task(1, 'Buy oat milk', '2 bottles')
+    TaskService.update_task(1, 'Buy oat milk', '1 bottle')
+
+    assert TaskService.undo_task(1, 1) == {'description': ['1 bottle', '2 bottles']}
+    assert TaskService.undo_task(1) == {'title': ['Buy oat milk', 'Buy milk']}
+    assert TaskService.undo_task(1) is None
+    task = db.session.get(Task, 1)
+    assert (task.title, task.description) == ('Buy milk', '2 bottles')
+    assert db.session.scalars(select(TaskEvent.data).order_by(TaskEvent.seq.desc()).limit(1)).one() == \
+        {'title': ['Buy oat milk', 'Buy milk']}
+
+    TaskService.update_task(1, 'Buy tea', '2 bottles')
+    db.session.execute(update(Task).where(Task.id == 1).values(title='Buy coffee'))
+    db.session.commit()
+    with pytest.raises(Conflict):
+        TaskService.undo_task(1)
+    db.session.rollback()
+    assert db.session.get(Task, 1).title == 'Buy coffee' and len(revisions()) == 1
+
+
+def test_history_and_undo_routes(app, task):
+    """
+    Тест маршрутов: история читается страницами, отмена работает из формы и через JSON.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        task: Фикстура с задачей.
+
+    """
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = '1'
+        session['_fresh'] = True
+    for title in ('First', 'Second', 'Third'):
+        client.post('/todo_list/1/task-update', data={'id': '1', 'title': title, 'description': '2 bottles'})
+
+    page = client.get('/todo_list/1/tasks/1/history?limit=2').get_json()
+    assert [item['revision'] for item in page['revisions']] == [3, 2] and page['next_before'] == 2
+    assert page['revisions'][0] == {**page['revisions'][0], 'user_id': 1, 'changes': {'title': ['Second', 'Third']}}
+    page = client.get('/todo_list/1/tasks/1/history?limit=2&before=2').get_json()
+    assert [item['revision'] for item in page['revisions']] == [1] and page['next_before'] is None
+    assert client.get('/todo_list/1/tasks/9/history').status_code == 302
+
+    response = client.post('/todo_list/1/task-undo', json={'task_id': 1})
+    assert response.get_json() == {'changes': {'title': ['Third', 'Second']}}
+    assert client.post('/todo_list/1/task-undo', data={'task_id': '1'}).status_code == 302
+    assert client.post('/todo_list/1/task-undo', data={'task_id': '1'}).status_code == 302
+    assert client.post('/todo_list/1/task-undo', json={'task_id': 1}).status_code == 404
+    assert db.session.get(Task, 1).title == 'Buy milk'
+    assert 'action="/todo_list/1/task-undo"' in client.get('/todo_list/1').get_data(as_text=True)
+
+
+def test_revision_ignores_stale_cache(app, task):
+    """
+    Тест ревизии: прежнее значение берется из базы, поэтому отмена не возвращает значение из устаревшего кэша.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        task: Фикстура с задачей.
+
+    """
+    db.session.remove()
+    assert TaskService.get_task(1).title == 'Buy milk'
+    # Другой процесс меняет заголовок; локальный кэш этого процесса о записи не знает.
+    db.session.execute(update(Task).where(Task.id == 1).values(title='Buy oat milk'))
+    db.session.commit()
+    db.session.remove()
+    assert cache.get(entity_key(Task, 1))['title'] == 'Buy milk'
+
+    TaskService.update_task(1, 'Buy tea', '2 bottles')
+    assert revisions() == [(1, {'title': ['Buy oat milk', 'Buy tea']})]
+    assert TaskService.undo_task(1) == {'title': ['Buy tea', 'Buy oat milk']}
+    assert db.session.get(Task, 1).title == 'Buy oat milk'
@@ -0,0 +1,116 @@
+"""
+Модуль содержит тесты генератора синтетических данных.
+
+TestFixtures:
+    - app: Фикстура для создания экземпляра приложения.
+
+Test Functions:
+    - test_seed_is_deterministic: Тест воспроизводимости данных при одинаковых параметрах.
+    - test_seed_distributions: Тест соблюдения заданных распределений.
+    - test_seed_events_build_projections: Тест построения проекций по событиям генератора.
+"""
+import os
+import sys
+import pytest
+from sqlalchemy import func, select
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from database import db
+from events.projections import ProjectionService
+from todo_list.models import Task, TaskStatus, TodoList
+from users.models import User
+from users.services import UserService, StatisticService
+
+ARGS = ['seed', '--users', '20', '--lists-per-user', '1-3', '--tasks-per-list', '0-30',
+        '--seed', '7', '--base-date', '2025-01-01', '--batch-size', '50', '--transaction-size', '200']
+
+
+@pytest.fixture
+def app():
+    """
+    Фикстура для создания экземпляра приложения.
+
+    Returns:
+        Flask app: Экземпляр приложения Flask.
+
+    """
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def dump():
+    """Возвращает все строки пользователей (кроме хеша пароля со случайной солью), списков и задач."""
+    users = db.session.execute(select(User.id, User.email, User.username).order_by(User.id)).all()
+    return [users] + [db.session.execute(select(model.__table__).order_by(model.id)).all()
+                      for model in (TodoList, Task)]
+
+
+def test_seed_is_deterministic(app):
+    """
+    Тест воспроизводимости: одинаковые параметры дают одинаковые данные, другое зерно - другие.
+
+    Args:
+        app: Экземпляр приложения Flask.
+
+    """
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=ARGS)
+    assert result.exit_code == 0, result.output
+    assert 'Создано пользователей: 20' in result.output
+    first = dump()
+
+    db.drop_all()
+    db.create_all()
+    runner.invoke(args=ARGS)
+    assert dump() == first
+
+    db.drop_all()
+    db.create_all()
+    runner.invoke(args=ARGS[:-6] + ['8'] + ARGS[-5:])
+    assert dump() != first
+
+
+def test_seed_distributions(app):
+    """
+    Тест соблюдения диапазонов количества, доли завершенных задач и разброса дедлайнов.
+
+    Args:
+        app: Экземпляр приложения Flask.
+
+    """
+    result = app.test_cli_runner().invoke(args=[
+        'seed', '--users', '50', '--lists-per-user', '2', '--tasks-per-list', '10-20',
+        '--completion-ratio', '0.5', '--deadline-days', '3', '--no-deadline-ratio', '0', '--no-events',
+        '--base-date', '2025-01-01'])
+    assert result.exit_code == 0, result.output
+    assert db.session.scalar(select(func.count()).select_from(TodoList)) == 100
+    per_list = db.session.scalars(select(func.count()).select_from(Task).group_by(Task.todo_id)).all()
+    assert min(per_list) >= 10 and max(per_list) <= 20
+    total = sum(per_list)
+    completed = db.session.scalar(select(func.count()).where(Task.status == TaskStatus.COMPLETED))
+    assert 0.4 < completed / total < 0.6
+    low, high = db.session.execute(select(func.min(Task.deadline_date), func.max(Task.deadline_date))).one()
+    assert str(low) >= '2024-12-29' and str(high) <= '2025-01-04'
+    assert app.test_cli_runner().invoke(args=['seed', '--tasks-per-list', '5-1']).exit_code != 0
+
+
+def test_seed_events_build_projections(app):
+    """
+    Тест построения статистики по событиям, записанным генератором.
+
+    Args:
+        app: Экземпляр приложения Flask.
+
+    """
+    app.test_cli_runner().invoke(args=ARGS)
+    ProjectionService.catch_up('stats')
+    for user_id in (1, 10, 20):
+        stats = UserService.get_user_stats(user_id)
+        assert stats.total_tasks == StatisticService.get_user_total_tasks(user_id)
+        assert stats.incomplete_tasks == StatisticService.get_user_incompleted_tasks(user_id)
@@ -0,0 +1,293 @@
+"""
+Модуль содержит тесты общих списков задач и проверки прав доступа.
+
+TestFixtures:
+    - app: Фикстура для создания экземпляра приложения.
+    - shared_todo: Фикстура для создания пользователей и общего списка задач.
+
+Test Functions:
+    - test_viewer_can_only_read: Тест доступа читателя только на чтение.
+    - test_event_stream_closed_after_removal: Тест закрытия потока событий удаленного участника.
+    - test_event_streams_capped: Тест ограничения количества одновременных потоков событий.
+    - test_editor_can_edit_tasks: Тест изменения задач редактором.
+    - test_foreign_task_not_found: Тест отклонения задачи из другого списка.
+    - test_owner_manages_members: Тест открытия и закрытия доступа владельцем.
+    - test_shared_lists_in_listing_and_stats: Тест учета общих списков в перечне, поиске и статистике.
+    - test_role_lookup_reads_database: Тест чтения роли из базы и кэширования только в общем кэше.
+"""
+import os
+import sys
+import pytest
+from flask import g
+from sqlalchemy import delete, event
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from cache import LocalBackend
+from database import db
+from events.projections import ProjectionService, SearchService
+from todo_list.models import Role, Task, TodoMember
+from todo_list.permissions import PermissionService
+from todo_list.services import TodoService, TaskService, MemberService
+from users.services import UserService, StatisticService
+
+
+@pytest.fixture
+def app():
+    """
+    Фикстура для создания экземпляра приложения.
+
+    Returns:
+        Flask app: Экземпляр приложения Flask.
+
+    """
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def shared_todo(app):
+    """
+    Фикстура для создания пользователей и общего списка задач.
+
+    Пользователь 1 - владелец списков 1 и 2, пользователь 2 - редактор списка 1,
+    пользователь 3 - читатель списка 1, пользователь 4 доступа не имеет.
+
+    Args:
+        app: Экземпляр приложения Flask.
+
+    """
+    for name in ('owner', 'editor', 'viewer', 'stranger'):
+        UserService.register_user(email=f'{name}@example.com', username=name, password='password')
+    TodoService.create_todo(title='Shared', user_id=1)
+    TodoService.create_todo(title='Private', user_id=1)
+    TaskService.add_task(title='Shared task', description=None, deadline_date=None, todo_id=1)
+    TaskService.add_task(title='Private task', description=None, deadline_date=None, todo_id=2)
+    MemberService.set_member(1, 2, Role.EDITOR)
+    MemberService.set_member(1, 3, Role.VIEWER)
+
+
+def client_for(app, user_id):
+    """
+    Возвращает тестовый клиент, авторизованный от имени пользователя.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        user_id: Идентификатор пользователя.
+
+    """
+    g.pop('_login_user', None)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return client
+
+
+def test_viewer_can_only_read(app, shared_todo):
+    """
+    Тест доступа читателя: список виден, изменения запрещены, чужие списки недоступны.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        shared_todo: Фикстура с тестовыми данными.
+
+    """
+    client = client_for(app, 3)
+    response = client.get('/todo_list/1')
+    assert response.status_code == 200
+    page = response.data.decode('utf-8')
+    assert 'Shared task' in page
+    assert 'Добавить новую задачу' not in page
+
+    response = client.post('/todo_list/1/task-completed', data={'task_id': 1})
+    assert response.location == '/todo_list/'
+    assert not db.session.get(Task, 1).is_complete
+    assert client.post('/todo_list/1/task-add', data={'title': 'Nope'}).location == '/todo_list/'
+    assert Task.query.count() == 2
+
+    client = client_for(app, 4)
+    assert client.get('/todo_list/1').location == '/todo_list/'
+    assert client.get('/todo_list/1/events').status_code == 302
+
+
+def test_event_stream_closed_after_removal(app, shared_todo):
+    """
+    Тест закрытия открытого потока событий участника, которого удалили из списка:
+    по событию удаления и по проверке прав перед keep-alive.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        shared_todo: Фикстура с тестовыми данными.
+
+    """
+    def next_event(stream):
+        chunk = next(stream, None)
+        while chunk == b': keep-alive\n\n':
+            chunk = next(stream, None)
+        return chunk
+
+    app.config['SSE_KEEPALIVE_INTERVAL'] = 0.01
+    streams = {user_id: client_for(app, user_id).get('/todo_list/1/events', buffered=False) for user_id in (2, 3)}
+    chunks = {user_id: iter(response.response) for user_id, response in streams.items()}
+    assert all(next_event(stream) == b'retry: 3000\n\n' for stream in chunks.values())
+
+    MemberService.remove_member(1, 3)
+    assert next_event(chunks[3]).startswith(b'event: access_revoked\n')
+    assert next_event(chunks[3]) is None
+    TaskService.complete_task(1)
+    assert next_event(chunks[2]).startswith(b'event: task_updated\n')
+
+    db.session.execute(delete(TodoMember).where(TodoMember.user_id == 2))
+    db.session.commit()
+    assert next_event(chunks[2]).startswith(b'event: access_revoked\n')
+    for response in streams.values():
+        response.close()
+
+
+def test_event_streams_capped(app, shared_todo):
+    """
+    Тест ограничения потоков событий: сверх SSE_MAX_STREAMS - 503 с повтором, место освобождается при закрытии.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        shared_todo: Фикстура с тестовыми данными.
+
+    """
+    app.config['SSE_MAX_STREAMS'] = 1
+    first = client_for(app, 2).get('/todo_list/1/events', buffered=False)
+    assert first.status_code == 200
+
+    rejected = client_for(app, 3).get('/todo_list/1/events')
+    assert rejected.status_code == 503
+    assert rejected.headers['Retry-After'] == '5'
+    assert rejected.data == b'retry: 5000\n\n'
+
+    first.close()
+    second = client_for(app, 3).get('/todo_list/1/events', buffered=False)
+    assert second.status_code == 200
+    second.close()
+
+
+def test_editor_can_edit_tasks(app, shared_todo):
+    """
+    Тест изменения задач редактором без права удалять список.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        shared_todo: Фикстура с тестовыми данными.
+
+    """
+    client = client_for(app, 2)
+    assert client.post('/todo_list/1/task-completed', data={'task_id': 1}).location == '/todo_list/1'
+    assert client.post('/todo_list/1/task-add', data={'title': 'From editor'}).location == '/todo_list/1'
+    assert db.session.get(Task, 1).is_complete
+    assert Task.query.filter_by(title='From editor').one().todo_id == 1
+
+    assert client.post('/todo_list/delete/1').location == '/todo_list/'
+    assert TodoService.get_todo(1) is not None
+
+
+def test_foreign_task_not_found(app, shared_todo):
+    """
+    Тест отклонения задачи, которая не принадлежит списку из адреса запроса.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        shared_todo: Фикстура с тестовыми данными.
+
+    """
+    client = client_for(app, 2)
+    response = client.post('/todo_list/1/task-delete', data={'task_id': 2})
+    assert response.location == '/todo_list/'
+    assert db.session.get(Task, 2) is not None
+
+
+def test_owner_manages_members(app, shared_todo):
+    """
+    Тест открытия и закрытия доступа владельцем списка.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        shared_todo: Фикстура с тестовыми данными.
+
+    """
+    client = client_for(app, 2)
+    client.post('/todo_list/1/members', data={'username': 'stranger', 'role': 'viewer'})
+    assert db.session.get(TodoMember, (1, 4)) is None
+
+    client = client_for(app, 1)
+    page = client.get('/todo_list/1').data.decode('utf-8')
+    assert 'editor - редактор' in page and 'viewer - читатель' in page
+    client.post('/todo_list/1/members', data={'username': 'stranger', 'role': 'editor'})
+    assert PermissionService.get_role(1, 4) == Role.EDITOR
+    client.post('/todo_list/1/members/4/delete')
+    assert PermissionService.get_role(1, 4) == ''
+    client.post('/todo_list/1/members', data={'username': 'owner', 'role': 'viewer'})
+    assert PermissionService.get_role(1, 1) == Role.OWNER
+
+
+def test_shared_lists_in_listing_and_stats(app, shared_todo):
+    """
+    Тест учета общих списков в перечне списков, поиске и статистике участников.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        shared_todo: Фикстура с тестовыми данными.
+
+    """
+    assert [todo.title for todo in TodoService.get_all_todo(2)] == ['Shared']
+    assert [todo.title for todo in TodoService.get_all_todo(4)] == []
+    TaskService.complete_task(1)
+
+    ProjectionService.catch_up_all()
+    assert [entry.task_id for entry in SearchService.search(3, 'task')] == [1]
+    for user_id, tasks in ((1, 2), (2, 1), (3, 1)):
+        stats = UserService.get_user_stats(user_id)
+        assert stats.total_tasks == StatisticService.get_user_total_tasks(user_id) == tasks
+        assert stats.total_todo == StatisticService.get_user_total_todo_lists(user_id)
+        assert stats.completed_tasks == StatisticService.get_user_completed_tasks(user_id) == 1
+
+    MemberService.remove_member(1, 3)
+    ProjectionService.catch_up('stats')
+    assert UserService.get_user_stats(3).total_tasks == 0
+    assert ProjectionService.replay('stats')
+    assert UserService.get_user_stats(2).completion_percentage == 100
+
+
+def test_role_lookup_reads_database(app, shared_todo):
+    """
+    Тест определения роли одним запросом: с кэшем процесса роль всегда читается из базы,
+    а с общим кэшем - из кэша до сброса при изменении участников.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        shared_todo: Фикстура с тестовыми данными.
+
+    """
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        assert PermissionService.get_role(2, 2) == ''
+        assert PermissionService.get_role(99, 2) is None
+        assert len(statements) == 2
+        assert PermissionService.get_role(1, 2) == Role.EDITOR
+        db.session.execute(delete(TodoMember).where(TodoMember.user_id == 2))
+        db.session.commit()
+        assert PermissionService.get_role(1, 2) == ''
+
+        backend = LocalBackend()
+        backend.shared = True
+        app.extensions['cache'] = backend
+        statements.clear()
+        assert PermissionService.get_role(2, 2) == ''
+        assert PermissionService.get_role(2, 2) == ''
+        assert len(statements) == 1
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
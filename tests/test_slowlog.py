@@ -0,0 +1,131 @@
+"""
+Модуль содержит тесты журнала медленных запросов.
+
+TestFixtures:
+    - app: Фикстура для создания экземпляра приложения, в котором медленным считается любой запрос.
+
+Test Functions:
+    - test_fingerprint_normalizes_values: Тест приведения запросов с разными значениями к одному отпечатку.
+    - test_slow_query_logged_with_context: Тест записи медленного запроса с маршрутом, пользователем и сервисом.
+    - test_report_orders_by_total_time: Тест сводки по суммарному времени и ограничения количества отпечатков.
+"""
+import logging
+import os
+import sys
+import pytest
+from flask import g
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from config import Config
+from database import db
+from slowlog import OTHER, fingerprint
+from todo_list.services import TaskService, TodoService
+from users.services import UserService
+
+
+class SlowQueryConfig(Config):
+    """Конфигурация, в которой медленным считается любой запрос."""
+
+    SLOW_QUERY_THRESHOLD = 0
+    SLOW_QUERY_REPORT_INTERVAL = 0
+
+
+@pytest.fixture
+def app():
+    """
+    Фикстура для создания экземпляра приложения, в котором медленным считается любой запрос.
+
+    Returns:
+        Flask app: Экземпляр приложения Flask.
+
+    """
+    app = create_app(SlowQueryConfig)
+    with app.app_context():
+        db.create_all()
+        UserService.register_user(email='alice@example.com', username='alice', password='password')
+        TodoService.create_todo('Shopping', 1)
+        TaskService.add_task('Buy milk', None, None, 1)
+        app.extensions['slow_queries'].reset()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def test_fingerprint_normalizes_values():
+    """
+    Тест отпечатка: литералы, списки IN и многострочные VALUES не различают запросы.
+    """
+    assert fingerprint("SELECT * FROM task WHERE id = 5 AND title = 'it''s'") == \
+        fingerprint("SELECT *\n  FROM task WHERE id = 12 AND title = 'milk'") == \
+        'SELECT * FROM task WHERE id = ? AND title = ?'
+    assert fingerprint('SELECT id FROM task WHERE todo_id IN (?, ?, ?) LIMIT ?') == \
+        fingerprint('SELECT id FROM task WHERE todo_id IN (?) LIMIT ?') == \
+        'SELECT id FROM task WHERE todo_id IN (?...) LIMIT ?'
+    assert fingerprint('INSERT INTO tag (name, owner_id) VALUES (?, ?), (?, ?), (?, ?)') == \
+        'INSERT INTO tag (name, owner_id) VALUES (?, ?), ...'
+    assert fingerprint('SELECT anon_1.id FROM todo_list AS anon_1') == 'SELECT anon_1.id FROM todo_list AS anon_1'
+
+
+def test_slow_query_logged_with_context(app, caplog):
+    """
+    Тест журнала: медленный запрос записывается с маршрутом, пользователем, методом сервиса и отпечатком.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        caplog: Перехват журнала pytest.
+
+    """
+    g.pop('_login_user', None)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = '1'
+        session['_fresh'] = True
+    with caplog.at_level(logging.WARNING, logger='slow_queries'):
+        client.post('/todo_list/1/task-update', data={'id': '1', 'title': 'Buy tea', 'description': ''})
+
+    messages = [record.getMessage() for record in caplog.records]
+    update = [message for message in messages if 'UPDATE task SET title' in message]
+    assert update and 'маршрут=todo_list.task_update' in update[0] and 'пользователь=1' in update[0]
+    assert 'источник=TaskService.update_task' in update[0] and 'строк=1' in update[0]
+    assert any('источник=UserService.get_user_by_id' in message for message in messages)
+
+    rows = app.extensions['slow_queries'].report(top=100)
+    row = next(row for row in rows if row['fingerprint'].startswith('UPDATE task SET title'))
+    assert row['source'] == 'TaskService.update_task' and row['endpoint'] == 'todo_list.task_update'
+    assert row['count'] == row['slow'] == 1 and f"[{row['id']}]" in update[0]
+
+
+def test_report_orders_by_total_time(app, caplog):
+    """
+    Тест сводки: отпечатки упорядочены по суммарному времени, лишние учитываются вместе, сводка начинает новый период.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        caplog: Перехват журнала pytest.
+
+    """
+    log = app.extensions['slow_queries']
+    log.threshold = 50
+    log.record('SELECT * FROM task WHERE id = 1', 10)
+    log.record('SELECT * FROM task WHERE id = 2', 15)
+    log.record('SELECT * FROM todo_list WHERE id = 1', 60, 1)
+    log.record('DELETE FROM task WHERE id = 3', 1, 1)
+
+    rows = log.report()
+    assert [(row['fingerprint'], row['count'], row['total_ms'], row['slow']) for row in rows] == [
+        ('SELECT * FROM todo_list WHERE id = ?', 1, 60, 1),
+        ('SELECT * FROM task WHERE id = ?', 2, 25, 0),
+        ('DELETE FROM task WHERE id = ?', 1, 1, 0)]
+    assert rows[1]['max_ms'] == 15 and [row['fingerprint'] for row in log.report(top=1)] == [rows[0]['fingerprint']]
+
+    log.max_fingerprints = 3
+    log.record('UPDATE task SET title = ? WHERE id = ?', 5)
+    log.record('UPDATE todo_list SET title = ? WHERE id = ?', 5)
+    assert {row['fingerprint']: row['count'] for row in log.report(top=5)}[OTHER] == 2
+
+    with caplog.at_level(logging.INFO, logger='slow_queries'):
+        assert log.log_report()[0]['total_ms'] == 60
+    assert 'всего 96.0 мс' in caplog.text and '(62%) x1' in caplog.text
+    assert log.report() == []
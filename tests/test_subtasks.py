@@ -0,0 +1,223 @@
+"""
+Модуль содержит тесты подзадач и таблицы замыкания дерева задач.
+
+TestFixtures:
+    - app: Фикстура для создания экземпляра приложения.
+    - task_tree: Фикстура для создания списка с деревом задач.
+
+Test Functions:
+    - test_closure_rows_for_nested_tasks: Тест строк замыкания для вложенных задач.
+    - test_progress_rollup: Тест сводного прогресса подзадач.
+    - test_move_subtree: Тест перемещения поддерева.
+    - test_move_into_own_subtree_rejected: Тест запрета перемещения задачи в собственное поддерево.
+    - test_moves_match_rebuilt_closure: Тест совпадения замыкания после перемещений с построенным заново.
+    - test_delete_subtree: Тест удаления задачи вместе с подзадачами.
+    - test_todo_page_shows_progress: Тест отображения прогресса и перемещения через страницу списка.
+"""
+import os
+import sys
+import pytest
+from sqlalchemy import select
+from werkzeug.exceptions import BadRequest, NotFound
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from database import db
+from events.models import EventType, TaskEvent
+from events.projections import ProjectionService
+from todo_list.models import Task, TaskClosure, TaskLabel
+from todo_list.services import LabelService, TaskService, TodoService
+from users.services import UserService, StatisticService
+
+
+@pytest.fixture
+def app():
+    """
+    Фикстура для создания экземпляра приложения.
+
+    Returns:
+        Flask app: Экземпляр приложения Flask.
+
+    """
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def task_tree(app):
+    """
+    Фикстура для создания списка с деревом задач: 1 -> 2 -> 3, 1 -> 4, 5 и задачи 6 в другом списке.
+
+    Args:
+        app: Экземпляр приложения Flask.
+
+    """
+    UserService.register_user(email='alice@example.com', username='alice', password='password')
+    TodoService.create_todo('Project', 1)
+    TodoService.create_todo('Other', 1)
+    TaskService.add_task('Release', None, None, 1)
+    TaskService.add_task('Build', None, None, 1, parent_id=1)
+    TaskService.add_task('Compile', None, None, 1, parent_id=2)
+    TaskService.add_task('Docs', None, None, 1, parent_id=1)
+    TaskService.add_task('Retro', None, None, 1)
+    TaskService.add_task('Elsewhere', None, None, 2)
+
+
+def closure():
+    """Возвращает строки таблицы замыкания как множество (предок, потомок, глубина)."""
+    return set(db.session.execute(select(TaskClosure.ancestor_id, TaskClosure.descendant_id, TaskClosure.depth)))
+
+
+def rebuilt_closure():
+    """Строит замыкание заново обходом ``parent_id`` от каждой задачи вверх."""
+    parents = dict(db.session.execute(select(Task.id, Task.parent_id)).all())
+    rows = set()
+    for task_id in parents:
+        ancestor, depth = parents[task_id], 1
+        while ancestor is not None:
+            rows.add((ancestor, task_id, depth))
+            ancestor, depth = parents[ancestor], depth + 1
+    return rows
+
+
+def test_closure_rows_for_nested_tasks(app, task_tree):
+    """
+    Тест строк замыкания: пара на каждого предка с расстоянием до него, без пар задачи с собой.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        task_tree: Фикстура с деревом задач.
+
+    """
+    assert closure() == {(1, 2, 1), (1, 3, 2), (2, 3, 1), (1, 4, 1)}
+    assert db.session.get(Task, 3).parent_id == 2
+    with pytest.raises(NotFound):
+        TaskService.add_task('Wrong list', None, None, 1, parent_id=6)
+
+
+def test_progress_rollup(app, task_tree):
+    """
+    Тест сводного прогресса: подзадачи на любой глубине считаются для каждого предка.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        task_tree: Фикстура с деревом задач.
+
+    """
+    TaskService.complete_task(3)
+
+    assert TaskService.get_progress(1) == {1: (3, 1), 2: (1, 1)}
+    assert TaskService.get_progress(2) == {}
+
+
+def test_move_subtree(app, task_tree):
+    """
+    Тест перемещения поддерева под другую задачу и на верхний уровень.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        task_tree: Фикстура с деревом задач.
+
+    """
+    TaskService.move_task(2, 5)
+
+    assert closure() == {(1, 4, 1), (5, 2, 1), (5, 3, 2), (2, 3, 1)}
+    assert db.session.get(Task, 2).parent_id == 5
+    event = db.session.scalars(select(TaskEvent).order_by(TaskEvent.seq.desc())).first()
+    assert event.type == EventType.TASK_UPDATED and event.data == {'parent_id': [1, 5]}
+
+    TaskService.move_task(2, None)
+
+    assert closure() == {(1, 4, 1), (2, 3, 1)}
+    assert db.session.get(Task, 2).parent_id is None
+
+
+def test_move_into_own_subtree_rejected(app, task_tree):
+    """
+    Тест запрета перемещения задачи под себя, свою подзадачу или задачу другого списка.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        task_tree: Фикстура с деревом задач.
+
+    """
+    with pytest.raises(BadRequest):
+        TaskService.move_task(1, 3)
+    with pytest.raises(BadRequest):
+        TaskService.move_task(2, 2)
+    with pytest.raises(NotFound):
+        TaskService.move_task(2, 6)
+    assert closure() == {(1, 2, 1), (1, 3, 2), (2, 3, 1), (1, 4, 1)}
+
+
+def test_moves_match_rebuilt_closure(app, task_tree):
+    """
+    Тест совпадения замыкания после серии перемещений с замыканием, построенным заново по ``parent_id``.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        task_tree: Фикстура с деревом задач.
+
+    """
+    for task_id, parent_id in ((4, 3), (5, 4), (2, None), (1, 5), (3, None), (1, None), (4, 1), (2, 4)):
+        TaskService.move_task(task_id, parent_id)
+        assert closure() == rebuilt_closure()
+
+
+def test_delete_subtree(app, task_tree):
+    """
+    Тест удаления задачи вместе с подзадачами, их метками и строками замыкания.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        task_tree: Фикстура с деревом задач.
+
+    """
+    label = LabelService.create_label(1, 'urgent')
+    LabelService.set_task_labels(3, 1, 1, [label.id])
+
+    TaskService.delete_task(2)
+
+    assert sorted(db.session.scalars(select(Task.id))) == [1, 4, 5, 6]
+    assert closure() == {(1, 4, 1)}
+    assert db.session.scalars(select(TaskLabel)).all() == []
+    deleted = db.session.scalars(select(TaskEvent.task_id).where(TaskEvent.type == EventType.TASK_DELETED)).all()
+    assert sorted(deleted) == [2, 3]
+    ProjectionService.catch_up('stats')
+    assert UserService.get_user_stats(1).total_tasks == StatisticService.get_user_total_tasks(1) == 4
+
+    TodoService.delete_todo(1)
+    assert closure() == set()
+
+
+def test_todo_page_shows_progress(app, task_tree):
+    """
+    Тест отображения сводного прогресса на странице списка и перемещения задачи через форму.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        task_tree: Фикстура с деревом задач.
+
+    """
+    TaskService.complete_task(4)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = '1'
+        session['_fresh'] = True
+
+    html = client.get('/todo_list/1').get_data(as_text=True)
+
+    assert 'title="Подзадачи: 1 из 3"' in html
+    assert 'title="Подзадачи: 0 из 1"' in html
+    assert 'подзадача #2' in html
+
+    response = client.post('/todo_list/1/task-move', data={'task_id': '4', 'parent_id': ''})
+
+    assert response.status_code == 302
+    assert db.session.get(Task, 4).parent_id is None
+    assert client.post('/todo_list/1/task-move', data={'task_id': '1', 'parent_id': '2'}).status_code == 400
@@ -16,11 +16,21 @@ Test Functions:
     - test_task_complete: Тест выполнения задачи.
     - test_task_update: Тест обновления задачи.
     - test_task_delete: Тест удаления задачи.
+    - test_task_status_on_write: Тест вычисления состояния задачи при записи.
+    - test_overdue_sweep: Тест перевода задач с истекшим дедлайном в состояние «просрочена».
+    - test_task_add_invalid_form: Тест отклонения некорректной формы задачи.
+    - test_task_add_non_object_json: Тест отклонения JSON, который не является объектом.
+    - test_task_action_invalid_id: Тест отклонения завершения и удаления задачи без корректного идентификатора.
+    - test_task_batch_add: Тест пакетного добавления задач.
+    - test_next_up: Тест выбора ближайших задач по всем спискам пользователя.
+    - test_calendar_api: Тест календаря задач по дням дедлайна.
+    - test_todo_page_streamed: Тест потоковой отрисовки страницы списка задач.
 """
 import os
 import sys
+import zlib
 import pytest
-from datetime import datetime
+from datetime import datetime, timedelta
 from flask_login import login_user
 from werkzeug.datastructures import MultiDict
 # Добавляем путь к модулям приложения
@@ -30,8 +40,12 @@ from app import create_app
 from database import db
 from users.models import User
 from users.services import UserService
-from todo_list.models import TodoList, Task
-from todo_list.services import TodoService, TaskService
+from todo_list.models import TodoList, Task, TaskStatus
+from pubsub import hub
+from todo_list.services import TodoService, TaskService, NextUpService, get_data_version, todo_channel
+from todo_list.forms import TaskCreateForm
+from todo_list.sweeper import OverdueSweeper, overdue_sweeper
+from validation import parse_form
 
 
 @pytest.fixture
@@ -85,6 +99,9 @@ def authenticated_client(client, app):
     with app.test_request_context():
         user = User.query.filter_by(username='test_user').first()
         login_user(user)
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+        session['_fresh'] = True
     
     return client
 
@@ -306,4 +323,253 @@ def test_task_delete(app, authenticated_client, create_tasks_and_todo):
 
     with app.app_context():
         deleted_task = Task.query.filter_by(id=task_ids[0]).first()
-        assert deleted_task is None
\ No newline at end of file
+        assert deleted_task is None
+
+
+def test_task_status_on_write(app, create_tasks_and_todo):
+    """
+    Тест вычисления состояния задачи при записи.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        create_tasks_and_todo: Фикстура для создания тестовых задач и списков дел.
+
+    """
+    TaskService.add_task(title='Future Task', description=None,
+                         deadline_date=datetime.now() + timedelta(days=1), todo_id=2)
+    TaskService.add_task(title='No Deadline', description=None, deadline_date=None, todo_id=2)
+
+    assert Task.query.filter_by(id=1).first().status == TaskStatus.OVERDUE
+    assert Task.query.filter_by(title='Future Task').first().status == TaskStatus.ACTIVE
+    assert Task.query.filter_by(title='No Deadline').first().status == TaskStatus.ACTIVE
+
+    TaskService.complete_task(1)
+    assert Task.query.filter_by(id=1).first().status == TaskStatus.COMPLETED
+
+    TaskService.complete_task(1)
+    assert Task.query.filter_by(id=1).first().status == TaskStatus.OVERDUE
+    assert TodoService.count_tasks(2) == (4, 4, 0)
+
+
+def test_overdue_sweep(app, create_tasks_and_todo):
+    """
+    Тест перевода задач с истекшим дедлайном в состояние «просрочена».
+
+    Args:
+        app: Экземпляр приложения Flask.
+        create_tasks_and_todo: Фикстура для создания тестовых задач и списков дел.
+
+    """
+    deadline = datetime.now() + timedelta(hours=1)
+    TaskService.add_task(title='Soon', description=None, deadline_date=deadline, todo_id=1)
+    TodoService.create_todo(title='Other user', user_id=2)
+    sweeper = OverdueSweeper()
+    assert overdue_sweeper._before_request not in app.before_request_funcs.get(None, [])
+
+    assert sweeper.sweep(now=deadline - timedelta(minutes=1)) == 0
+    versions = {user_id: get_data_version(user_id) for user_id in (1, 2)}
+    with hub.subscribe(todo_channel(1)) as subscription:
+        assert sweeper.sweep(now=deadline + timedelta(minutes=1)) == 1
+        event = subscription.get(timeout=0)
+    assert event['type'] == 'task_updated'
+    assert event['task']['title'] == 'Soon' and event['task']['status'] == TaskStatus.OVERDUE
+    assert get_data_version(1) != versions[1]
+    assert get_data_version(2) == versions[2]
+    assert Task.query.filter_by(title='Soon').first().status == TaskStatus.OVERDUE
+    assert sweeper.sweep(now=deadline + timedelta(minutes=2)) == 0
+
+
+def test_task_add_invalid_form(app, authenticated_client, create_tasks_and_todo):
+    """
+    Тест отклонения некорректной формы задачи без ошибки сервера.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        authenticated_client: Аутентифицированный тестовый клиент Flask.
+        create_tasks_and_todo: Фикстура для создания тестовых задач и списков дел.
+
+    """
+    form_data = MultiDict({'title': '', 'deadline_date': 'not a date'})
+
+    response = authenticated_client.post('/todo_list/2/task-add', data=form_data)
+
+    assert response.status_code == 302
+    assert response.location == '/todo_list/2'
+    assert Task.query.filter_by(todo_id=2).count() == 2
+
+
+def test_task_add_non_object_json(app, authenticated_client, create_tasks_and_todo):
+    """
+    Тест отклонения JSON-массива, null и строки вместо объекта задачи без ошибки сервера.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        authenticated_client: Аутентифицированный тестовый клиент Flask.
+        create_tasks_and_todo: Фикстура для создания тестовых задач и списков дел.
+
+    """
+    assert parse_form(TaskCreateForm, '[]', todo_id=2)[1][0]['type'] == 'model_type'
+
+    for body in ([], None, 'x'):
+        response = authenticated_client.post('/todo_list/2/task-add', json=body)
+
+        assert response.status_code == 302
+        assert response.location == '/todo_list/2'
+        with authenticated_client.session_transaction() as session:
+            assert session.pop('_flashes')[0][0] == 'error'
+    assert Task.query.filter_by(todo_id=2).count() == 2
+
+
+def test_task_action_invalid_id(app, authenticated_client, create_tasks_and_todo):
+    """
+    Тест отклонения завершения и удаления задачи с пустым или нечисловым идентификатором.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        authenticated_client: Аутентифицированный тестовый клиент Flask.
+        create_tasks_and_todo: Фикстура для создания тестовых задач и списков дел.
+
+    """
+    for action in ('task-completed', 'task-delete'):
+        for data in ({}, {'task_id': 'abc'}):
+            response = authenticated_client.post(f'/todo_list/2/{action}', data=data)
+
+            assert response.status_code == 302
+            assert response.location == '/todo_list/2'
+    assert Task.query.filter_by(todo_id=2, is_complete=True).count() == 0
+    assert Task.query.filter_by(todo_id=2).count() == 2
+
+
+def test_task_batch_add(app, authenticated_client, create_tasks_and_todo):
+    """
+    Тест пакетного добавления задач.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        authenticated_client: Аутентифицированный тестовый клиент Flask.
+        create_tasks_and_todo: Фикстура для создания тестовых задач и списков дел.
+
+    """
+    response = authenticated_client.post('/todo_list/1/tasks/batch', json=[
+        {'title': 'Batch Task 1'},
+        {'title': 'Batch Task 2', 'deadline_date': 'tomorrow'},
+    ])
+
+    assert response.status_code == 400
+    assert response.json['errors'][0]['field'] == '1.deadline_date'
+    assert Task.query.filter_by(todo_id=1).count() == 0
+
+    response = authenticated_client.post('/todo_list/1/tasks/batch', json=[
+        {'title': 'Batch Task 1'},
+        {'title': 'Batch Task 2', 'deadline_date': '2030-01-01T10:00'},
+    ])
+
+    assert response.status_code == 201
+    assert response.json['ids'] == [3, 4]
+    assert Task.query.filter_by(todo_id=1).count() == 2
+
+
+def test_next_up(app, authenticated_client, create_tasks_and_todo):
+    """
+    Тест выбора ближайших задач по всем спискам пользователя.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        authenticated_client: Аутентифицированный тестовый клиент Flask.
+        create_tasks_and_todo: Фикстура для создания тестовых задач и списков дел.
+
+    """
+    TaskService.add_task(title='Urgent', description=None,
+                         deadline_date=datetime(2023, 12, 21), todo_id=1, priority=5)
+    TaskService.add_task(title='Someday', description=None, deadline_date=None, todo_id=1)
+    TaskService.complete_task(1)
+
+    titles = [task['title'] for task in NextUpService.get_next_up(1, k=3)]
+    assert titles == ['Urgent', 'Test Task_2', 'Someday']
+
+    TaskService.add_task(title='Earliest', description=None,
+                         deadline_date=datetime(2023, 1, 1), todo_id=2)
+
+    response = authenticated_client.get('/todo_list/api/next-up?k=2')
+    assert response.status_code == 200
+    assert [task['title'] for task in response.json['tasks']] == ['Earliest', 'Urgent']
+    assert response.json['tasks'][0]['todo_title'] == 'Test Todo List 2'
+
+
+def test_calendar_api(app, authenticated_client, create_tasks_and_todo):
+    """
+    Тест календаря задач по дням дедлайна.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        authenticated_client: Аутентифицированный тестовый клиент Flask.
+        create_tasks_and_todo: Фикстура для создания тестовых задач и списков дел.
+
+    """
+    TaskService.add_task(title='Same Day', description=None,
+                         deadline_date=datetime(2023, 12, 21, 18, 0), todo_id=1)
+    TaskService.complete_task(2)
+
+    response = authenticated_client.get('/todo_list/api/calendar?start=2023-12-01&end=2023-12-31')
+    assert response.status_code == 200
+    days = response.json['days']
+    assert [(day['date'], day['total'], day['done'], day['overdue']) for day in days] == [
+        ('2023-12-20', 1, 0, 1),
+        ('2023-12-21', 2, 1, 1),
+    ]
+    assert [task['title'] for task in days[1]['tasks']] == ['Test Task_2', 'Same Day']
+
+    etag = response.headers['ETag']
+    response = authenticated_client.get('/todo_list/api/calendar?start=2023-12-01&end=2023-12-31',
+                                        headers={'If-None-Match': etag})
+    assert response.status_code == 304
+
+    TaskService.delete_task(3)
+    response = authenticated_client.get('/todo_list/api/calendar?start=2023-01-01&end=2023-12-31',
+                                        headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert [day['total'] for day in response.json['days']] == [1, 1]
+
+    response = authenticated_client.get('/todo_list/api/calendar?start=2023-12-31&end=2023-12-01')
+    assert response.status_code == 400
+
+
+def test_todo_page_streamed(app, authenticated_client, create_tasks_and_todo):
+    """
+    Тест потоковой отрисовки страницы списка: заголовок и счетчики отправляются до задач, в том числе в gzip.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        authenticated_client: Аутентифицированный тестовый клиент Flask.
+        create_tasks_and_todo: Фикстура для создания тестовых задач и списков дел.
+
+    """
+    for index in range(5):
+        TaskService.add_task(title=f'Streamed {index}', description=None, deadline_date=None, todo_id=1)
+    app.config.update(STREAM_BUFFER_SIZE=1 << 20, STREAM_BATCH_SIZE=2)
+
+    response = authenticated_client.get('/todo_list/1', buffered=False)
+    assert response.status_code == 200
+    assert 'Content-Length' not in response.headers
+    chunks = iter(response.response)
+    head = next(chunks).decode('utf-8')
+    assert '<span id="all-tasks-count">5</span>' in head and 'task-cards' not in head
+    body = head + b''.join(chunks).decode('utf-8')
+    response.close()
+    positions = [body.index(f'Streamed {index}') for index in range(5)]
+    assert positions == sorted(positions) and body.rstrip().endswith('</html>')
+
+    response = authenticated_client.get('/todo_list/1', headers={'Accept-Encoding': 'gzip'}, buffered=False)
+    assert response.headers['Content-Encoding'] == 'gzip' and 'Accept-Encoding' in response.vary
+    assert 'Content-Length' not in response.headers
+    decompressor = zlib.decompressobj(31)
+    chunks = iter(response.response)
+    assert decompressor.decompress(next(chunks)).decode('utf-8') == head
+    assert (head + decompressor.decompress(b''.join(chunks)).decode('utf-8')) == body and decompressor.eof
+    response.close()
+
+    app.config['STREAM_TEMPLATES'] = False
+    response = authenticated_client.get('/todo_list/1')
+    assert 'Content-Length' in response.headers
+    assert response.get_data(as_text=True) == body
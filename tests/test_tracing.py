@@ -0,0 +1,174 @@
+"""
+Модуль содержит тесты трассировки запросов.
+
+TestFixtures:
+    - app: Фикстура для создания экземпляра приложения с включенной трассировкой.
+    - client: Фикстура для создания тестового клиента, авторизованного от имени пользователя 1.
+
+Test Functions:
+    - test_request_trace_spans: Тест интервалов запроса, загрузки пользователя, сервисов, SQL и шаблонов.
+    - test_sampling_and_traceparent: Тест выборки запросов и продолжения трассы вызывающей стороны.
+    - test_file_export_otlp_json: Тест экспорта трассы в файл в формате OTLP/JSON.
+    - test_toolbar_summary: Тест панели со сводкой трассы на HTML-странице.
+"""
+import json
+import os
+import sys
+import pytest
+from flask import g
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from config import Config
+from database import db
+from todo_list.services import TaskService, TodoService
+from tracing import FileExporter, SPAN_KIND_CLIENT, SPAN_KIND_SERVER
+from users.services import UserService
+
+TRACEPARENT = '00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01'
+
+
+class TracingConfig(Config):
+    """Конфигурация с трассировкой всех запросов."""
+
+    TRACING_ENABLED = True
+
+
+@pytest.fixture
+def app():
+    """
+    Фикстура для создания экземпляра приложения с включенной трассировкой.
+
+    Returns:
+        Flask app: Экземпляр приложения Flask.
+
+    """
+    app = create_app(TracingConfig)
+    with app.app_context():
+        db.create_all()
+        UserService.register_user(email='alice@example.com', username='alice', password='password')
+        TodoService.create_todo('Shopping', 1)
+        TaskService.add_task('Buy milk', None, None, 1)
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    """
+    Фикстура для создания тестового клиента, авторизованного от имени пользователя 1.
+
+    Пользователь, загруженный предыдущими запросами теста, сбрасывается, чтобы
+    каждый запрос загружал его заново.
+
+    Args:
+        app: Экземпляр приложения Flask.
+
+    """
+    g.pop('_login_user', None)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = '1'
+        session['_fresh'] = True
+    return client
+
+
+def test_request_trace_spans(app, client):
+    """
+    Тест трассы: интервалы вложены в интервал запроса, сводка передается заголовком Server-Timing.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        client: Авторизованный тестовый клиент.
+
+    """
+    response = client.get('/todo_list/')
+
+    trace = app.extensions['tracing'].traces[-1]
+    root = trace.spans[0]
+    assert root.name == 'GET /todo_list/' and root.kind == SPAN_KIND_SERVER and root.parent_id is None
+    assert root.attributes['http.response.status_code'] == 200 and root.end is not None
+    span_ids = {span.span_id for span in trace.spans}
+    assert all(span.parent_id in span_ids for span in trace.spans[1:])
+    assert all(span.end is not None and span.end >= span.start for span in trace.spans)
+    names = [span.name for span in trace.spans]
+    assert 'login_manager.user_loader' in names and 'UserService.get_user_by_id' in names
+    assert 'TodoService.get_all_todo' in names and 'render todo_list/index.html' in names
+    sql = [span for span in trace.spans if span.category == 'sql']
+    assert sql and all(span.kind == SPAN_KIND_CLIENT and span.attributes['db.system'] == 'sqlite' for span in sql)
+
+    assert response.headers['X-Trace-Id'] == trace.trace_id
+    timing = response.headers['Server-Timing']
+    assert timing.startswith('total;dur=') and 'sql;desc="sql x' in timing and 'template;' in timing
+
+
+def test_sampling_and_traceparent(app, client):
+    """
+    Тест выборки: без выборки трасса не заводится, решение из traceparent имеет приоритет.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        client: Авторизованный тестовый клиент.
+
+    """
+    traces = app.extensions['tracing'].traces
+    app.config['TRACING_SAMPLE_RATE'] = 0
+    response = client.get('/todo_list/')
+    assert not traces and 'Server-Timing' not in response.headers
+
+    client.get('/todo_list/', headers={'traceparent': TRACEPARENT})
+    assert len(traces) == 1
+    assert traces[0].trace_id == '0af7651916cd43dd8448eb211c80319c'
+    assert traces[0].spans[0].parent_id == 'b7ad6b7169203331'
+
+    client.get('/todo_list/', headers={'traceparent': TRACEPARENT[:-2] + '00'})
+    app.config['TRACING_SAMPLE_RATE'] = 1
+    client.post('/todo_list/1/task-add', data={'title': 'Buy tea'})
+    assert len(traces) == 2 and traces[1].spans[0].name == 'POST /todo_list/<int:todo_id>/task-add'
+
+
+def test_file_export_otlp_json(app, client, tmp_path):
+    """
+    Тест экспорта в файл: одна строка OTLP/JSON на трассу.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        client: Авторизованный тестовый клиент.
+        tmp_path: Временный каталог pytest.
+
+    """
+    path = tmp_path / 'traces.jsonl'
+    app.extensions['tracing'] = FileExporter(str(path), 'test-service')
+    client.get('/todo_list/1')
+    client.get('/todo_list/api/next-up')
+
+    lines = path.read_text(encoding='utf-8').splitlines()
+    assert len(lines) == 2
+    payload = json.loads(lines[0])['resourceSpans'][0]
+    assert payload['resource']['attributes'] == [{'key': 'service.name', 'value': {'stringValue': 'test-service'}}]
+    spans = payload['scopeSpans'][0]['spans']
+    root = spans[0]
+    assert root['name'] == 'GET /todo_list/<int:todo_id>' and root['kind'] == SPAN_KIND_SERVER
+    assert 'parentSpanId' not in root and int(root['endTimeUnixNano']) >= int(root['startTimeUnixNano'])
+    assert {'key': 'http.response.status_code', 'value': {'intValue': '200'}} in root['attributes']
+    assert all(span['traceId'] == root['traceId'] and span['parentSpanId'] for span in spans[1:])
+    assert any(span['name'] == 'render todo_list/todo_list.html' for span in spans)
+
+
+def test_toolbar_summary(app, client):
+    """
+    Тест панели: сводка добавляется в обычную HTML-страницу, но не в JSON-ответ.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        client: Авторизованный тестовый клиент.
+
+    """
+    app.config['TRACING_TOOLBAR'] = True
+    html = client.get('/todo_list/').get_data(as_text=True)
+    trace = app.extensions['tracing'].traces[-1]
+    assert f'Трасса {trace.trace_id}' in html and html.index('id="trace-toolbar"') < html.index('</body>')
+    assert 'TodoService.get_all_todo' in html
+    assert 'trace-toolbar' not in client.get('/todo_list/api/next-up').get_data(as_text=True)
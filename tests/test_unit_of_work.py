@@ -0,0 +1,222 @@
+"""
+Модуль содержит тесты единицы работы: одной фиксации транзакции на запрос.
+
+TestFixtures:
+    - app: Фикстура для создания экземпляра приложения.
+    - client: Фикстура для создания клиента.
+    - commits: Фикстура, считающая фиксации транзакций в базе данных.
+
+Test Functions:
+    - test_request_commits_once: Тест одной фиксации для нескольких изменений в запросе.
+    - test_request_rolls_back_on_error: Тест отката всех изменений запроса при ошибке.
+    - test_autocommit_opt_out: Тест немедленной фиксации внутри autocommit.
+    - test_failed_callback_does_not_skip_others: Тест выполнения всех действий после фиксации при ошибке одного из них.
+    - test_profile_view_does_not_commit: Тест чтения профиля без построения проекции и фиксаций.
+"""
+import os
+import sys
+import pytest
+from datetime import datetime
+from flask_login import login_user
+from sqlalchemy import event
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from database import db
+from events.projections import ProjectionService
+from pubsub import hub
+from unit_of_work import unit_of_work
+from users.models import User
+from users.services import UserService
+from todo_list.models import TodoList, Task
+from todo_list.services import TodoService, TaskService, todo_channel
+
+
+@pytest.fixture
+def app():
+    """
+    Фикстура для создания экземпляра приложения.
+
+    Returns:
+        Flask app: Экземпляр приложения Flask.
+
+    """
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    """
+    Фикстура для создания клиента.
+
+    Args:
+        app: Экземпляр приложения Flask.
+
+    Returns:
+        Flask test client: Тестовый клиент Flask.
+
+    """
+    return app.test_client()
+
+
+@pytest.fixture
+def commits(app):
+    """
+    Фикстура, считающая фиксации транзакций в базе данных.
+
+    Args:
+        app: Экземпляр приложения Flask.
+
+    Returns:
+        list: Список, пополняемый при каждой фиксации.
+
+    """
+    counter = []
+
+    def on_commit(connection):
+        counter.append(1)
+
+    event.listen(db.engine, 'commit', on_commit)
+    yield counter
+    event.remove(db.engine, 'commit', on_commit)
+
+
+def test_request_commits_once(app, client, commits):
+    """
+    Тест одной фиксации для нескольких изменений в запросе.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        client: Тестовый клиент Flask.
+        commits: Счетчик фиксаций.
+
+    """
+    @app.post('/compose')
+    def compose():
+        TodoService.create_todo(title='Composed', user_id=1)
+        TaskService.add_task(title='First', description=None, deadline_date=None, todo_id=1)
+        TaskService.add_task(title='Second', description=None, deadline_date=None, todo_id=1)
+        TaskService.complete_task(1)
+        return 'ok'
+
+    with hub.subscribe(todo_channel(1)) as subscription:
+        assert client.post('/compose').status_code == 200
+        assert [subscription.get(timeout=0)['type'] for _ in range(3)] == [
+            'task_created', 'task_created', 'task_updated']
+
+    assert len(commits) == 1
+    db.session.remove()
+    assert TodoList.query.count() == 1
+    assert TaskService.get_task(1).is_complete
+
+
+def test_request_rolls_back_on_error(app, client, commits):
+    """
+    Тест отката всех изменений запроса и отмены событий при ошибке.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        client: Тестовый клиент Flask.
+        commits: Счетчик фиксаций.
+
+    """
+    @app.post('/compose')
+    def compose():
+        TodoService.create_todo(title='Composed', user_id=1)
+        TaskService.add_task(title='First', description=None, deadline_date=None, todo_id=1)
+        raise RuntimeError('failure after writes')
+
+    with hub.subscribe(todo_channel(1)) as subscription:
+        assert client.post('/compose').status_code == 500
+        assert subscription.get(timeout=0) is None
+
+    assert commits == []
+    db.session.remove()
+    assert TodoList.query.count() == 0
+    assert Task.query.count() == 0
+
+
+def test_autocommit_opt_out(app, client, commits):
+    """
+    Тест немедленной фиксации изменений внутри autocommit.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        client: Тестовый клиент Flask.
+        commits: Счетчик фиксаций.
+
+    """
+    @app.post('/long-job')
+    @unit_of_work.autocommit()
+    def long_job():
+        TodoService.create_todo(title='First', user_id=1)
+        TodoService.create_todo(title='Second', user_id=1)
+        raise RuntimeError('failure after writes')
+
+    assert client.post('/long-job').status_code == 500
+    assert len(commits) == 2
+    db.session.remove()
+    assert TodoList.query.count() == 2
+
+
+def test_failed_callback_does_not_skip_others(app, client, commits):
+    """
+    Тест ошибки действия после фиксации: остальные действия выполняются, запрос завершается успешно.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        client: Тестовый клиент Flask.
+        commits: Счетчик фиксаций.
+
+    """
+    calls = []
+
+    def failing():
+        raise ConnectionError('redis unavailable')
+
+    @app.post('/compose')
+    def compose():
+        TodoService.create_todo(title='Composed', user_id=1)
+        unit_of_work.after_commit(failing)
+        unit_of_work.after_commit(lambda: calls.append('invalidated'))
+        return 'ok'
+
+    assert client.post('/compose').status_code == 200
+    assert calls == ['invalidated']
+    assert len(commits) == 1
+    db.session.remove()
+    assert TodoList.query.count() == 1
+
+
+def test_profile_view_does_not_commit(app, client, commits):
+    """
+    Тест чтения профиля: статистика отдается из проекции как есть, без ее построения и фиксаций.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        client: Тестовый клиент Flask.
+        commits: Счетчик фиксаций.
+
+    """
+    UserService.register_user(email='test@example.com', username='test_user', password='password')
+    TodoService.create_todo(title='Test Todo List', user_id=1)
+    with app.test_request_context():
+        login_user(User.query.filter_by(username='test_user').first())
+    ProjectionService.catch_up_all()
+    TaskService.add_task(title='Test Task', description=None,
+                         deadline_date=datetime(2023, 12, 20), todo_id=1)
+    commits.clear()
+
+    assert client.get('/profile/').status_code == 200
+    assert client.get('/profile/').status_code == 200
+    assert len(commits) == 0
+    assert UserService.get_user_stats(1).total_tasks == 0
+
+    assert app.test_cli_runner().invoke(args=['events', 'project']).exit_code == 0
+    assert UserService.get_user_stats(1).total_tasks == 1
@@ -6,7 +6,10 @@ from flask_login import login_user
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from app import create_app
 from database import db
-from users.models import User
+from events.projections import ProjectionService
+from todo_list.services import TodoService, TaskService
+from users.models import User, UserStats
+from users.services import UserService
 
 
 @pytest.fixture
@@ -77,3 +80,37 @@ def test_profile_authenticated(authenticated_client):
     response_data = response.get_data(as_text=True)
     assert 'test@example.com' in response_data
     assert 'test_user' in response_data
+
+
+@pytest.mark.parametrize('workers', [0, 2])
+def test_recompute_stats_command(app, workers):
+    """
+    Тест пересчета статистики всех пользователей пачками.
+
+    Args:
+        app: Экземпляр приложения Flask.
+        workers: Количество процессов пула.
+
+    """
+    for user_id in range(1, 6):
+        db.session.add(User(id=user_id, email=f'user{user_id}@example.com',
+                            username=f'user{user_id}', password='password123'))
+    db.session.commit()
+    TodoService.create_todo(title='First', user_id=1)
+    TaskService.add_task(title='Done', description=None, deadline_date=None, todo_id=1)
+    TaskService.add_task(title='Open', description=None, deadline_date=None, todo_id=1)
+    TaskService.complete_task(1)
+    TodoService.create_todo(title='Second', user_id=4)
+    UserService.user_stats_create(2, 9, 9, 9, 9, 9, 9)
+
+    result = app.test_cli_runner().invoke(
+        args=['recompute-stats', '--workers', str(workers), '--chunk-size', '2'])
+
+    assert 'Пересчитана статистика 5 пользователей (3 пачек)' in result.output
+    assert UserStats.query.count() == 5
+    first = UserService.get_user_stats(1)
+    assert (first.total_todo, first.total_tasks, first.completed_tasks, first.active_tasks) == (1, 2, 1, 1)
+    assert first.completion_percentage == 50
+    assert UserService.get_user_stats(2).total_tasks == 0
+    assert UserService.get_user_stats(4).total_todo == 1
+    assert ProjectionService.catch_up('stats') == 0
@@ -1,8 +1,8 @@
 """Формы для приложения todo_list."""
 
-from datetime import datetime
-from pydantic import BaseModel
-from typing import List, Union
+from datetime import date, datetime
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Literal, Union
 
 class TodoCreateForm(BaseModel):
     """
@@ -67,8 +67,128 @@ class TaskCreateForm(TaskBaseForm):
 
     :param deadline_date: Дата и время крайнего срока выполнения задачи.
     :type deadline_date: datetime, optional
+    :param priority: Приоритет задачи; чем больше значение, тем важнее задача.
+    :type priority: int, optional
     :param todo_id: Идентификатор списка задач, к которому принадлежит задача.
     :type todo_id: int
+    :param parent_id: Идентификатор родительской задачи того же списка.
+    :type parent_id: int, optional
     """
     deadline_date: datetime = None
-    todo_id: int
\ No newline at end of file
+    priority: int = Field(0, ge=0, le=10)
+    todo_id: int
+    parent_id: int = None
+
+class TaskIdForm(BaseModel):
+    """
+    Форма действия над одной задачей (завершение, удаление).
+
+    :param task_id: Идентификатор задачи.
+    :type task_id: int
+    """
+    task_id: int
+
+class TaskMoveForm(BaseModel):
+    """
+    Форма перемещения задачи с подзадачами.
+
+    :param task_id: Идентификатор задачи.
+    :type task_id: int
+    :param parent_id: Идентификатор нового родителя; пусто - верхний уровень.
+    :type parent_id: int, optional
+    """
+    task_id: int
+    parent_id: int = None
+
+class TaskReorderForm(BaseModel):
+    """
+    Форма перестановки задачи в списке.
+
+    :param task_id: Идентификатор задачи.
+    :type task_id: int
+    :param after_id: Идентификатор задачи, после которой встает задача; пусто - начало списка.
+    :type after_id: int, optional
+    """
+    task_id: int
+    after_id: Union[int, None] = None
+
+class TaskUndoForm(BaseModel):
+    """
+    Форма отмены последней правки задачи.
+
+    :param task_id: Идентификатор задачи.
+    :type task_id: int
+    """
+    task_id: int
+
+class MemberForm(BaseModel):
+    """
+    Форма открытия списка задач другому пользователю.
+
+    :param username: Имя пользователя.
+    :type username: str
+    :param role: Роль пользователя в списке.
+    :type role: str
+    """
+    username: str
+    role: Literal['owner', 'editor', 'viewer'] = 'viewer'
+
+class LabelForm(BaseModel):
+    """
+    Форма создания метки.
+
+    :param name: Название метки.
+    :type name: str
+    :param todo_id: Список задач, на страницу которого вернуться после создания.
+    :type todo_id: int, optional
+    """
+    name: str = Field(min_length=1, max_length=50)
+    todo_id: int = None
+
+class LabelFilterForm(BaseModel):
+    """
+    Форма фильтра задач по меткам.
+
+    :param labels: Идентификаторы меток.
+    :type labels: List[int]
+    :param match: ``any`` - задачи хотя бы с одной из меток, ``all`` - со всеми метками.
+    :type match: str
+    """
+    labels: List[int] = []
+    match: Literal['any', 'all'] = 'any'
+
+class TaskLabelsForm(BaseModel):
+    """
+    Форма назначения меток задаче.
+
+    :param task_id: Идентификатор задачи.
+    :type task_id: int
+    :param labels: Идентификаторы меток пользователя; пустой список снимает все его метки.
+    :type labels: List[int]
+    """
+    task_id: int
+    labels: List[int] = []
+
+class CalendarRangeForm(BaseModel):
+    """
+    Форма диапазона дат для календаря задач.
+
+    :param start: Первый день диапазона.
+    :type start: date
+    :param end: Последний день диапазона (включительно).
+    :type end: date
+    :param tasks: Включать ли в ответ сами задачи, а не только счетчики по дням.
+    :type tasks: bool
+    """
+    start: date
+    end: date
+    tasks: bool = True
+
+    @model_validator(mode='after')
+    def check_range(self):
+        """Проверяет, что диапазон не пуст и не длиннее десяти лет."""
+        if self.end < self.start:
+            raise ValueError('end must not be earlier than start')
+        if (self.end - self.start).days > 3660:
+            raise ValueError('range must not exceed 3660 days')
+        return self
@@ -1,8 +1,22 @@
 """Модели данных для приложения todo_list."""
 
 from datetime import datetime
-from sqlalchemy import DateTime, event
+from sqlalchemy import DateTime, String, event, func, inspect, select
 from database import db
+from todo_list import ranking
+
+
+class TaskStatus:
+    """
+    Возможные состояния задачи.
+
+    Состояние хранится в колонке ``task.status`` и поддерживается событиями
+    модели и периодическим обходом просроченных задач (см. ``todo_list.sweeper``).
+    """
+    ACTIVE = 'active'
+    OVERDUE = 'overdue'
+    COMPLETED = 'completed'
+
 
 class Task(db.Model):
     """
@@ -22,10 +36,30 @@ class Task(db.Model):
     :type deadline_date: datetime, optional
     :param completed_at: Дата и время завершения задачи.
     :type completed_at: datetime, optional
+    :param status: Состояние задачи (активна, просрочена, завершена).
+    :type status: str
+    :param priority: Приоритет задачи; чем больше значение, тем важнее задача.
+    :type priority: int
     :param todo_id: Идентификатор списка задач, к которому принадлежит задача.
     :type todo_id: int
+    :param parent_id: Идентификатор родительской задачи; None - задача верхнего уровня.
+    :type parent_id: int, optional
+    :param rank: Ключ ручного порядка задачи в списке (см. ``todo_list.ranking``).
+    :type rank: str
     """
     __tablename__ = 'task'
+    __table_args__ = (
+        db.Index('ix_task_status_deadline', 'status', 'deadline_date'),
+        db.Index('ix_task_status_completed', 'status', 'completed_at'),
+        db.Index('ix_task_todo_status', 'todo_id', 'status'),
+        db.Index('ix_task_todo_id', 'todo_id', 'id'),
+        db.Index('ix_task_todo_deadline', 'todo_id', 'deadline_date'),
+        db.Index('ix_task_next_up', 'todo_id', 'is_complete', 'deadline_date', db.text('priority DESC')),
+        db.Index('ix_task_parent', 'parent_id'),
+        db.Index('ix_task_todo_rank', 'todo_id', 'rank'),
+        # Идентификаторы не переиспользуются после удаления: по ним задачи попадают в архив и журнал событий
+        {'sqlite_autoincrement': True},
+    )
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100))
     description = db.Column(db.String(250), nullable=True)
@@ -33,12 +67,38 @@ class Task(db.Model):
     created_at = db.Column(DateTime(timezone=True), default=datetime.now)
     deadline_date = db.Column(DateTime(timezone=True), nullable=True)
     completed_at = db.Column(DateTime(timezone=True), nullable=True)
+    status = db.Column(db.String(10), nullable=False, default=TaskStatus.ACTIVE)
+    priority = db.Column(db.Integer, nullable=False, default=0)
     todo_id = db.Column(db.Integer, db.ForeignKey('todo_list.id'), nullable=False)
+    parent_id = db.Column(db.Integer, db.ForeignKey('task.id', ondelete='CASCADE'), nullable=True)
+    # Ключи сравниваются побайтно: в PostgreSQL и MySQL нужна двоичная сортировка
+    rank = db.Column(String(255).with_variant(String(255, collation='C'), 'postgresql')
+                     .with_variant(String(255, collation='utf8mb4_bin'), 'mysql'), nullable=False)
+
+    def compute_status(self, now=None):
+        """
+        Вычисляет состояние задачи по флагу завершенности и дедлайну.
+
+        :param now: Момент времени, относительно которого проверяется дедлайн.
+        :type now: datetime, optional
+        :return: Состояние задачи.
+        :rtype: str
+        """
+        if self.is_complete:
+            return TaskStatus.COMPLETED
+        if self.deadline_date is not None:
+            now = now or datetime.now(self.deadline_date.tzinfo)
+            if self.deadline_date <= now:
+                return TaskStatus.OVERDUE
+        return TaskStatus.ACTIVE
 
 @event.listens_for(Task, 'before_update')
 def update_timestamp(mapper, connection, target):
     """
-    Обновляет временную метку при завершении задачи.
+    Ставит время завершения при завершении задачи и сбрасывает его при возобновлении.
+
+    Метка меняется, только если в этом обновлении изменился флаг ``is_complete``:
+    правка заголовка или описания завершенной задачи сохраняет время ее завершения.
 
     :param mapper: Mapper.
     :type mapper: Mapper
@@ -47,10 +107,83 @@ def update_timestamp(mapper, connection, target):
     :param target: Экземпляр задачи.
     :type target: Task
     """
-    if target.is_complete and not target.completed_at:
-        target.completed_at = datetime.now()
-    else:
-        target.completed_at = None
+    if not inspect(target).attrs.is_complete.history.has_changes():
+        return
+    target.completed_at = datetime.now() if target.is_complete else None
+
+@event.listens_for(Task, 'before_insert')
+@event.listens_for(Task, 'before_update')
+def refresh_status(mapper, connection, target):
+    """
+    Пересчитывает состояние задачи при каждой записи через ORM.
+
+    :param mapper: Mapper.
+    :type mapper: Mapper
+    :param connection: Соединение с базой данных.
+    :type connection: Connection
+    :param target: Экземпляр задачи.
+    :type target: Task
+    """
+    target.status = target.compute_status()
+
+@event.listens_for(db.session, 'before_flush')
+def assign_ranks(session, flush_context, instances):
+    """
+    Ставит новые задачи без ключа порядка в конец их списков.
+
+    Наибольший ключ списка читается одним запросом по индексу ``ix_task_todo_rank``;
+    задачи одного сброса получают последовательные ключи в порядке добавления в сессию.
+
+    :param session: Сессия.
+    :type session: Session
+    :param flush_context: Контекст сброса.
+    :type flush_context: UOWTransaction
+    :param instances: Не используется.
+    :type instances: None
+    """
+    by_todo = {}
+    for instance in session.new:
+        if isinstance(instance, Task) and instance.rank is None:
+            todo_id = instance.todo_id
+            if todo_id is None and instance.todo_list is not None:
+                todo_id = instance.todo_list.id
+            by_todo.setdefault(todo_id, []).append(instance)
+    with session.no_autoflush:
+        for todo_id, tasks in by_todo.items():
+            last = None
+            if todo_id is not None:
+                last = session.scalar(select(func.max(Task.rank)).where(Task.todo_id == todo_id))
+            for task, key in zip(tasks, ranking.keys_between(last, None, len(tasks))):
+                task.rank = key
+
+class TaskClosure(db.Model):
+    """
+    Таблица замыкания дерева подзадач: все пары (предок, потомок) с расстоянием между ними.
+
+    Хранятся только пары разных задач (``depth >= 1``), поэтому задачи без
+    подзадач и без родителя строк в таблице не имеют. Поддеревья читаются,
+    перемещаются и удаляются несколькими запросами независимо от глубины
+    (см. ``todo_list.tree``).
+
+    :param ancestor_id: Идентификатор задачи-предка.
+    :type ancestor_id: int
+    :param descendant_id: Идентификатор задачи-потомка.
+    :type descendant_id: int
+    :param depth: Расстояние от предка до потомка (1 - непосредственная подзадача).
+    :type depth: int
+    :param todo_id: Идентификатор списка задач, которому принадлежат обе задачи.
+    :type todo_id: int
+    """
+    __tablename__ = 'task_closure'
+    __table_args__ = (
+        db.Index('ix_task_closure_descendant', 'descendant_id', 'ancestor_id', 'depth'),
+        db.Index('ix_task_closure_todo', 'todo_id', 'ancestor_id', 'descendant_id'),
+    )
+
+    ancestor_id = db.Column(db.Integer, db.ForeignKey('task.id', ondelete='CASCADE'), primary_key=True)
+    descendant_id = db.Column(db.Integer, db.ForeignKey('task.id', ondelete='CASCADE'), primary_key=True)
+    depth = db.Column(db.Integer, nullable=False)
+    todo_id = db.Column(db.Integer, nullable=False)
 
 class TodoList(db.Model):
     """
@@ -64,9 +197,134 @@ class TodoList(db.Model):
     :type user_id: int
     :param tasks: Список задач, принадлежащих данному списку задач.
     :type tasks: RelationshipProperty
+    :param members: Пользователи, которым открыт список (см. ``TodoMember``).
+    :type members: RelationshipProperty
     """
     __tablename__ = 'todo_list'
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    tasks = db.relationship('Task', backref='todo_list', lazy=True, cascade='all, delete-orphan')
+    members = db.relationship('TodoMember', lazy=True, cascade='all, delete-orphan')
+
+class Role:
+    """
+    Роли участников списка задач.
+
+    Владелец может удалять список и управлять участниками, редактор - менять
+    задачи и заголовок списка, наблюдатель - только просматривать список.
+    Создатель списка (``TodoList.user_id``) всегда является его владельцем.
+    """
+    OWNER = 'owner'
+    EDITOR = 'editor'
+    VIEWER = 'viewer'
+
+    RANKS = {VIEWER: 1, EDITOR: 2, OWNER: 3}
+
+    @staticmethod
+    def allows(role, required):
+        """
+        Проверяет, что роль дает права не меньше требуемых.
+
+        :param role: Роль пользователя или None, если доступа нет.
+        :type role: str, optional
+        :param required: Требуемая роль.
+        :type required: str
+        :return: True, если прав достаточно.
+        :rtype: bool
+        """
+        return Role.RANKS.get(role, 0) >= Role.RANKS[required]
+
+
+class TodoMember(db.Model):
+    """
+    Участник общего списка задач.
+
+    :param todo_id: Идентификатор списка задач.
+    :type todo_id: int
+    :param user_id: Идентификатор пользователя, которому открыт список.
+    :type user_id: int
+    :param role: Роль пользователя в списке (см. ``Role``).
+    :type role: str
+    """
+    __tablename__ = 'todo_member'
+    __table_args__ = (
+        db.Index('ix_todo_member_user', 'user_id', 'todo_id'),
+    )
+    todo_id = db.Column(db.Integer, db.ForeignKey('todo_list.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    role = db.Column(db.String(10), nullable=False, default=Role.VIEWER)
+
+
+class Label(db.Model):
+    """
+    Метка задач. Метки принадлежат пользователю и видны только ему.
+
+    :param id: Идентификатор метки.
+    :type id: int
+    :param user_id: Идентификатор пользователя, которому принадлежит метка.
+    :type user_id: int
+    :param name: Название метки.
+    :type name: str
+    """
+    __tablename__ = 'label'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'name', name='uq_label_user_name'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    tasks = db.relationship('Task', backref='todo_list', lazy=True, cascade='all, delete-orphan')
\ No newline at end of file
+    name = db.Column(db.String(50), nullable=False)
+
+
+class TaskLabel(db.Model):
+    """
+    Связь задачи с меткой.
+
+    Первичный ключ ``(task_id, label_id)`` служит для выборки меток задачи,
+    индекс ``ix_task_label_label`` - для выборки задач по метке.
+
+    :param task_id: Идентификатор задачи.
+    :type task_id: int
+    :param label_id: Идентификатор метки.
+    :type label_id: int
+    """
+    __tablename__ = 'task_label'
+    __table_args__ = (
+        db.Index('ix_task_label_label', 'label_id', 'task_id'),
+    )
+    task_id = db.Column(db.Integer, db.ForeignKey('task.id'), primary_key=True)
+    label_id = db.Column(db.Integer, db.ForeignKey('label.id'), primary_key=True)
+
+
+class TaskRevision(db.Model):
+    """
+    Ревизия задачи: изменения полей одной правки (см. ``todo_list.revisions``).
+
+    Хранятся только изменившиеся поля в виде ``{поле: [было, стало]}``, а не
+    копия строки задачи. Номера ревизий задачи возрастают; уникальный индекс
+    ``ix_task_revision_task`` служит и для чтения истории, и для удаления
+    ревизий сверх ``TASK_REVISION_LIMIT``.
+
+    :param id: Идентификатор ревизии.
+    :type id: int
+    :param task_id: Идентификатор задачи.
+    :type task_id: int
+    :param revision: Номер ревизии задачи.
+    :type revision: int
+    :param user_id: Идентификатор пользователя, внесшего правку.
+    :type user_id: int, optional
+    :param changes: Изменения полей ``{поле: [было, стало]}``.
+    :type changes: dict
+    :param created_at: Дата и время правки.
+    :type created_at: datetime
+    """
+    __tablename__ = 'task_revision'
+    __table_args__ = (
+        db.Index('ix_task_revision_task', 'task_id', 'revision', unique=True),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    task_id = db.Column(db.Integer, db.ForeignKey('task.id'), nullable=False)
+    revision = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    changes = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
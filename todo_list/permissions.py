@@ -0,0 +1,155 @@
+"""Права доступа к спискам задач."""
+
+from functools import wraps
+
+from flask import abort, g
+from flask_login import current_user
+from sqlalchemy import and_, select, union_all
+
+from cache import cache
+from database import db
+from todo_list.models import Role, TodoList, TodoMember
+
+NO_ACCESS = ''
+
+
+def accessible_todo_ids(user_id):
+    """
+    Возвращает подзапрос идентификаторов списков, доступных пользователю.
+
+    Доступны собственные списки и списки, в которых пользователь - участник;
+    обе части выбираются по индексам ``todo_list.user_id`` и ``ix_todo_member_user``.
+    Части объединяются UNION ALL: подзапрос используется только в ``IN (...)``,
+    где повторы не мешают, а UNION строил бы временное B-дерево для их удаления.
+
+    :param user_id: Идентификатор пользователя.
+    :type user_id: int
+    :return: Запрос с одной колонкой ``id``.
+    :rtype: sqlalchemy.sql.Select
+    """
+    return union_all(
+        select(TodoList.id).where(TodoList.user_id == user_id),
+        select(TodoMember.todo_id).where(TodoMember.user_id == user_id),
+    )
+
+
+def access_pairs(user_filter):
+    """
+    Возвращает подзапрос пар ``(user_id, todo_id)`` с доступом к списку для отобранных пользователей.
+
+    Используется в агрегатах с GROUP BY user_id, чтобы общие списки учитывались
+    у всех участников без отдельной проверки прав для каждого списка.
+
+    :param user_filter: Функция, строящая условие по колонке идентификатора пользователя,
+        например ``lambda column: column.in_(user_ids)``.
+    :type user_filter: callable
+    :return: Подзапрос с колонками ``user_id`` и ``todo_id``.
+    :rtype: sqlalchemy.sql.Subquery
+    """
+    return union_all(
+        select(TodoList.user_id.label('user_id'), TodoList.id.label('todo_id'))
+        .where(user_filter(TodoList.user_id)),
+        select(TodoMember.user_id.label('user_id'), TodoMember.todo_id.label('todo_id'))
+        .where(user_filter(TodoMember.user_id)),
+    ).subquery('access')
+
+
+class PermissionService:
+    """
+    Сервис проверки прав доступа к спискам задач.
+    """
+
+    @staticmethod
+    def _load_role(todo_id, user_id):
+        """Читает роль пользователя в списке одним запросом."""
+        row = db.session.execute(
+            select(TodoList.user_id, TodoMember.role)
+            .outerjoin(TodoMember, and_(TodoMember.todo_id == TodoList.id, TodoMember.user_id == user_id))
+            .where(TodoList.id == todo_id)
+        ).first()
+        if row is None:
+            return None
+        if row.user_id == user_id:
+            return Role.OWNER
+        return row.role or NO_ACCESS
+
+    @staticmethod
+    def get_role(todo_id, user_id):
+        """
+        Возвращает роль пользователя в списке задач.
+
+        Роль кэшируется до изменения состава участников списка, только если кэш
+        общий для всех процессов (``CACHE_BACKEND = 'redis'``): сброс кэша в одном
+        воркере не виден в памяти других, и отозванная роль продолжала бы
+        действовать до истечения срока записи. С кэшем в памяти процесса роль
+        читается из базы одним запросом по первичным ключам.
+
+        :param todo_id: Идентификатор списка задач.
+        :type todo_id: int
+        :param user_id: Идентификатор пользователя.
+        :type user_id: int
+        :return: Роль (см. ``Role``), ``NO_ACCESS``, если доступа нет, или None, если списка нет.
+        :rtype: str or None
+        """
+        if not cache.backend.shared:
+            return PermissionService._load_role(todo_id, user_id)
+        return cache.get_or_set(f'todo_role:{todo_id}:{user_id}',
+                                lambda: PermissionService._load_role(todo_id, user_id))
+
+    @staticmethod
+    def get_user_ids(todo_id):
+        """
+        Возвращает идентификаторы всех пользователей с доступом к списку: владельца и участников.
+
+        :param todo_id: Идентификатор списка задач.
+        :type todo_id: int
+        :return: Идентификаторы пользователей.
+        :rtype: list[int]
+        """
+        def load():
+            owner_id = db.session.scalar(select(TodoList.user_id).where(TodoList.id == todo_id))
+            if owner_id is None:
+                return None
+            members = db.session.scalars(select(TodoMember.user_id).where(TodoMember.todo_id == todo_id)).all()
+            return [owner_id, *members]
+
+        return cache.get_or_set(f'todo_users:{todo_id}', load) or []
+
+    @staticmethod
+    def invalidate(todo_id, *user_ids):
+        """
+        Сбрасывает кэш прав на список задач.
+
+        :param todo_id: Идентификатор списка задач.
+        :type todo_id: int
+        :param user_ids: Пользователи, чьи роли изменились.
+        :type user_ids: int
+        """
+        cache.delete(f'todo_users:{todo_id}', *(f'todo_role:{todo_id}:{user_id}' for user_id in user_ids))
+
+
+def todo_permission(required):
+    """
+    Декоратор маршрута списка задач: проверяет роль текущего пользователя.
+
+    Идентификатор списка берется из параметра маршрута ``todo_id``. Роль
+    определяется один раз на запрос и сохраняется в ``g.todo_role``.
+    Если списка нет, возвращается 404, если прав недостаточно - 403.
+
+    :param required: Минимальная требуемая роль (см. ``Role``).
+    :type required: str
+    :return: Декоратор.
+    :rtype: callable
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            role = PermissionService.get_role(kwargs['todo_id'], current_user.id)
+            if role is None:
+                abort(404)
+            if not Role.allows(role, required):
+                abort(403)
+            g.todo_role = role
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
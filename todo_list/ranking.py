@@ -0,0 +1,217 @@
+"""
+Ключи ручного порядка задач (дробная индексация).
+
+Порядок задач в списке задается строковым ключом ``Task.rank``: задачи
+сортируются по ключу побайтно, а для любых двух соседних ключей можно
+получить новый ключ строго между ними. Поэтому перемещение задачи меняет
+одну строку - ее собственный ключ, - а не позиции всех задач после нее.
+
+Ключ состоит из целой части и необязательной дробной. Первый символ целой
+части кодирует ее длину: ``a``-``z`` - неотрицательные числа из 1-26 цифр,
+``A``-``Z`` - отрицательные; ``a0`` - ноль. Цифры - 62 символа ``0-9A-Za-z``
+в порядке ASCII. Дробная часть не заканчивается нулем, иначе между ключами
+``x`` и ``x0`` не нашлось бы места.
+
+Добавление в конец или в начало списка меняет только целую часть и почти
+не удлиняет ключи; вставки в одно и то же место удлиняют дробную часть
+примерно на символ за каждые шесть вставок. Слишком длинные ключи
+списка переписываются заново (см. ``keys_between`` и ``todo_list.rebalancer``).
+"""
+
+DIGITS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+ZERO = 'a0'
+SMALLEST_INTEGER = 'A' + DIGITS[0] * 26
+
+
+def _integer_length(head):
+    """
+    Возвращает длину целой части ключа по ее первому символу.
+
+    :param head: Первый символ ключа.
+    :type head: str
+    :return: Длина целой части вместе с первым символом.
+    :rtype: int
+    :raises ValueError: Если символ не может начинать ключ.
+    """
+    if 'a' <= head <= 'z':
+        return ord(head) - ord('a') + 2
+    if 'A' <= head <= 'Z':
+        return ord('Z') - ord(head) + 2
+    raise ValueError(f'Недопустимое начало ключа: {head!r}')
+
+
+def _split(key):
+    """
+    Делит ключ на целую и дробную части, проверяя его формат.
+
+    :param key: Ключ.
+    :type key: str
+    :return: Целая и дробная части.
+    :rtype: tuple[str, str]
+    :raises ValueError: Если ключ имеет неверный формат.
+    """
+    if not key:
+        raise ValueError('Пустой ключ.')
+    length = _integer_length(key[0])
+    if length > len(key) or key == SMALLEST_INTEGER:
+        raise ValueError(f'Недопустимый ключ: {key!r}')
+    if any(char not in DIGITS for char in key[1:]):
+        raise ValueError(f'Недопустимый символ в ключе: {key!r}')
+    fraction = key[length:]
+    if fraction.endswith(DIGITS[0]):
+        raise ValueError(f'Дробная часть ключа заканчивается нулем: {key!r}')
+    return key[:length], fraction
+
+
+def _increment_integer(integer):
+    """
+    Возвращает следующую целую часть или None, если она уже наибольшая.
+
+    :param integer: Целая часть ключа.
+    :type integer: str
+    :rtype: str or None
+    """
+    head, digits = integer[0], list(integer[1:])
+    for position in reversed(range(len(digits))):
+        digit = DIGITS.index(digits[position]) + 1
+        if digit < len(DIGITS):
+            digits[position] = DIGITS[digit]
+            return head + ''.join(digits)
+        digits[position] = DIGITS[0]
+    if head == 'Z':
+        return ZERO
+    if head == 'z':
+        return None
+    head = chr(ord(head) + 1)
+    if head > 'a':
+        digits.append(DIGITS[0])
+    else:
+        digits.pop()
+    return head + ''.join(digits)
+
+
+def _decrement_integer(integer):
+    """
+    Возвращает предыдущую целую часть или None, если она уже наименьшая.
+
+    :param integer: Целая часть ключа.
+    :type integer: str
+    :rtype: str or None
+    """
+    head, digits = integer[0], list(integer[1:])
+    for position in reversed(range(len(digits))):
+        digit = DIGITS.index(digits[position]) - 1
+        if digit >= 0:
+            digits[position] = DIGITS[digit]
+            return head + ''.join(digits)
+        digits[position] = DIGITS[-1]
+    if head == 'a':
+        return 'Z' + DIGITS[-1]
+    if head == 'A':
+        return None
+    head = chr(ord(head) - 1)
+    if head < 'Z':
+        digits.append(DIGITS[-1])
+    else:
+        digits.pop()
+    return head + ''.join(digits)
+
+
+def _midpoint(lower, upper):
+    """
+    Возвращает дробную часть строго между двумя дробными частями.
+
+    :param lower: Меньшая дробная часть (может быть пустой).
+    :type lower: str
+    :param upper: Большая дробная часть; None - без ограничения сверху.
+    :type upper: str or None
+    :rtype: str
+    """
+    if upper is not None:
+        common = 0
+        while (lower[common] if common < len(lower) else DIGITS[0]) == upper[common]:
+            common += 1
+        if common:
+            return upper[:common] + _midpoint(lower[common:], upper[common:])
+    digit_lower = DIGITS.index(lower[0]) if lower else 0
+    digit_upper = DIGITS.index(upper[0]) if upper is not None else len(DIGITS)
+    if digit_upper - digit_lower > 1:
+        return DIGITS[(digit_lower + digit_upper + 1) // 2]
+    if upper is not None and len(upper) > 1:
+        return upper[0]
+    return DIGITS[digit_lower] + _midpoint(lower[1:], None)
+
+
+def key_between(lower, upper):
+    """
+    Возвращает ключ строго между двумя ключами.
+
+    :param lower: Ключ слева; None - начало списка.
+    :type lower: str or None
+    :param upper: Ключ справа; None - конец списка.
+    :type upper: str or None
+    :return: Новый ключ.
+    :rtype: str
+    :raises ValueError: Если ключи имеют неверный формат или ``lower >= upper``.
+    """
+    if lower is not None and upper is not None and lower >= upper:
+        raise ValueError(f'Ключ {lower!r} не меньше ключа {upper!r}.')
+    if lower is None:
+        if upper is None:
+            return ZERO
+        integer, fraction = _split(upper)
+        if integer == SMALLEST_INTEGER:
+            return integer + _midpoint('', fraction)
+        if integer < upper:
+            return integer
+        decremented = _decrement_integer(integer)
+        if decremented is None:
+            raise ValueError('Достигнут наименьший ключ.')
+        return decremented
+    integer, fraction = _split(lower)
+    if upper is None:
+        incremented = _increment_integer(integer)
+        return integer + _midpoint(fraction, None) if incremented is None else incremented
+    upper_integer, upper_fraction = _split(upper)
+    if integer == upper_integer:
+        return integer + _midpoint(fraction, upper_fraction)
+    incremented = _increment_integer(integer)
+    if incremented is not None and incremented < upper:
+        return incremented
+    return integer + _midpoint(fraction, None)
+
+
+def keys_between(lower, upper, count):
+    """
+    Возвращает ``count`` возрастающих ключей между двумя ключами.
+
+    Без ограничений с обеих сторон это последовательные целые ключи
+    ``a0, a1, ...`` - самые короткие из возможных; так ключи списка
+    переписываются при перебалансировке.
+
+    :param lower: Ключ слева; None - начало списка.
+    :type lower: str or None
+    :param upper: Ключ справа; None - конец списка.
+    :type upper: str or None
+    :param count: Количество ключей.
+    :type count: int
+    :return: Ключи по возрастанию.
+    :rtype: list[str]
+    """
+    if count <= 0:
+        return []
+    if count == 1:
+        return [key_between(lower, upper)]
+    if upper is None:
+        keys = [key_between(lower, None)]
+        while len(keys) < count:
+            keys.append(key_between(keys[-1], None))
+        return keys
+    if lower is None:
+        keys = [key_between(None, upper)]
+        while len(keys) < count:
+            keys.append(key_between(None, keys[-1]))
+        return keys[::-1]
+    middle = count // 2
+    key = key_between(lower, upper)
+    return keys_between(lower, key, middle) + [key] + keys_between(key, upper, count - middle - 1)
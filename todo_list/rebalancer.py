@@ -0,0 +1,143 @@
+"""Перебалансировка ключей ручного порядка задач, ставших слишком длинными."""
+
+from functools import partial
+from threading import Lock
+
+import click
+from flask import request_finished
+from flask.cli import with_appcontext
+from sqlalchemy import func, select, update
+
+from cache import cache
+from database import db
+from todo_list import ranking
+from todo_list.models import Task
+
+
+class RankRebalancer:
+    """
+    Перебалансировщик ключей порядка.
+
+    Ключи списка переписываются последовательными короткими ключами
+    ``a0, a1, ...`` с сохранением порядка задач; обновляются только строки,
+    ключ которых изменился. Списки, в которых перемещение дало ключ длиннее
+    ``max_length``, запоминаются (``schedule``) и перебалансируются после
+    отправки ответа, в отдельной сессии базы данных: ошибка перебалансировки
+    записывается в журнал приложения и не влияет ни на один ответ. Очередь
+    хранится в памяти процесса, поэтому списки, не перебалансированные из-за
+    ошибки или перезапуска воркера, находит команда ``flask rebalance-ranks``.
+
+    :param max_length: Длина ключа, после которой ключи списка переписываются; 0 - никогда.
+    :type max_length: int
+    """
+
+    def __init__(self, max_length=24):
+        self.max_length = max_length
+        self._pending = set()
+        self._lock = Lock()
+
+    def init_app(self, app):
+        """
+        Подключает перебалансировку к приложению.
+
+        Длина берется из ``RANK_REBALANCE_LENGTH``; значение ``0`` отключает
+        перебалансировку после запросов (остается команда ``flask rebalance-ranks``).
+
+        :param app: Экземпляр приложения.
+        :type app: Flask
+        """
+        self.max_length = app.config.get('RANK_REBALANCE_LENGTH', self.max_length)
+        if self.max_length:
+            request_finished.connect(self._request_finished, app)
+        app.cli.add_command(rebalance_ranks_command)
+
+    def schedule(self, todo_id):
+        """
+        Запоминает список для перебалансировки после отправки ответа.
+
+        :param todo_id: Идентификатор списка задач.
+        :type todo_id: int
+        """
+        with self._lock:
+            self._pending.add(todo_id)
+
+    def rebalance(self, todo_id):
+        """
+        Переписывает ключи порядка задач списка, сохраняя порядок.
+
+        :param todo_id: Идентификатор списка задач.
+        :type todo_id: int
+        :return: Количество задач, ключ которых изменился.
+        :rtype: int
+        """
+        rows = db.session.execute(
+            select(Task.id, Task.rank).where(Task.todo_id == todo_id)
+            .order_by(Task.rank, Task.id).with_for_update()).all()
+        keys = ranking.keys_between(None, None, len(rows))
+        changed = [{'id': task_id, 'rank': key} for (task_id, rank), key in zip(rows, keys) if rank != key]
+        if changed:
+            db.session.execute(update(Task), changed)
+        db.session.commit()
+        if changed:
+            cache.invalidate_entity(Task, *(row['id'] for row in changed))
+        return len(changed)
+
+    def rebalance_pending(self):
+        """
+        Перебалансирует запомненные списки.
+
+        :return: Количество задач, ключ которых изменился.
+        :rtype: int
+        """
+        with self._lock:
+            todo_ids, self._pending = self._pending, set()
+        return sum(self.rebalance(todo_id) for todo_id in sorted(todo_ids))
+
+    def find_long(self):
+        """
+        Находит списки, в которых есть ключи длиннее ``max_length``.
+
+        Запрос читает все ключи таблицы, поэтому используется только командой обслуживания.
+
+        :return: Идентификаторы списков.
+        :rtype: list[int]
+        """
+        return db.session.scalars(
+            select(Task.todo_id).group_by(Task.todo_id)
+            .having(func.max(func.length(Task.rank)) > self.max_length)
+            .order_by(Task.todo_id)).all()
+
+    def _request_finished(self, sender, response, **extra):
+        """Откладывает перебалансировку запомненных списков до закрытия отправленного ответа."""
+        if self._pending:
+            response.call_on_close(partial(self._rebalance_after_response, sender))
+
+    def _rebalance_after_response(self, app):
+        """
+        Перебалансирует запомненные списки в собственном контексте приложения.
+
+        :param app: Экземпляр приложения.
+        :type app: Flask
+        """
+        with app.app_context():
+            try:
+                self.rebalance_pending()
+            except Exception:
+                db.session.rollback()
+                app.logger.exception('Ошибка перебалансировки ключей порядка задач')
+            finally:
+                db.session.remove()
+
+
+rank_rebalancer = RankRebalancer()
+
+
+@click.command('rebalance-ranks')
+@click.option('--todo-id', type=int, multiple=True, help='Список задач (можно повторять); по умолчанию - '
+                                                          'все списки с ключами длиннее RANK_REBALANCE_LENGTH.')
+@with_appcontext
+def rebalance_ranks_command(todo_id):
+    """Переписывает ключи ручного порядка задач короткими ключами."""
+    todo_ids = todo_id or rank_rebalancer.find_long()
+    changed = sum(rank_rebalancer.rebalance(list_id) for list_id in todo_ids)
+    click.echo(f'Списков перебалансировано: {len(todo_ids)}, ключей изменено: {changed}')
@@ -0,0 +1,100 @@
+"""
+История правок задач в виде ревизий с изменениями полей.
+
+Каждая правка заголовка или описания задачи записывается ревизией
+``task_revision`` с изменениями только тех полей, которые изменились:
+``{поле: [было, стало]}``. У задачи хранится не больше ``TASK_REVISION_LIMIT``
+последних ревизий: более старые удаляются при записи новой. Отмена правки
+применяет обратные изменения последней ревизии и удаляет ее (см.
+``TaskService.undo_task``), поэтому повторная отмена возвращает задачу еще на
+шаг назад.
+"""
+
+from flask import current_app
+from sqlalchemy import delete, func, select
+
+from database import db
+from todo_list.models import TaskRevision
+
+REVISION_FIELDS = ('title', 'description')
+
+
+def record(task_id, changes, user_id=None):
+    """
+    Записывает ревизию задачи и удаляет ревизии сверх ``TASK_REVISION_LIMIT`` (без фиксации).
+
+    Изменения нужно получить (``events.services.changes``) до вызова: запрос
+    номера последней ревизии отправляет изменения сессии в базу.
+
+    :param task_id: Идентификатор задачи.
+    :type task_id: int
+    :param changes: Изменения полей ``{поле: [было, стало]}``.
+    :type changes: dict
+    :param user_id: Идентификатор пользователя, внесшего правку.
+    :type user_id: int, optional
+    :return: Номер ревизии или None, если поля не изменились.
+    :rtype: int or None
+    """
+    if not changes:
+        return None
+    revision = (db.session.scalar(
+        select(func.max(TaskRevision.revision)).where(TaskRevision.task_id == task_id)) or 0) + 1
+    db.session.add(TaskRevision(task_id=task_id, revision=revision, user_id=user_id, changes=changes))
+    limit = current_app.config.get('TASK_REVISION_LIMIT', 20)
+    if limit and revision > limit:
+        db.session.execute(delete(TaskRevision).where(TaskRevision.task_id == task_id,
+                                                      TaskRevision.revision <= revision - limit))
+    return revision
+
+
+def latest(task_id):
+    """
+    Возвращает последнюю ревизию задачи.
+
+    :param task_id: Идентификатор задачи.
+    :type task_id: int
+    :rtype: TaskRevision or None
+    """
+    return db.session.scalars(
+        select(TaskRevision).where(TaskRevision.task_id == task_id)
+        .order_by(TaskRevision.revision.desc()).limit(1)).first()
+
+
+def history(task_id, before=None, limit=20):
+    """
+    Возвращает ревизии задачи, последние - первыми.
+
+    :param task_id: Идентификатор задачи.
+    :type task_id: int
+    :param before: Номер ревизии, с которой продолжается чтение (не включая ее).
+    :type before: int, optional
+    :param limit: Максимальное количество ревизий.
+    :type limit: int
+    :rtype: list[TaskRevision]
+    """
+    statement = select(TaskRevision).where(TaskRevision.task_id == task_id)
+    if before is not None:
+        statement = statement.where(TaskRevision.revision < before)
+    return db.session.scalars(statement.order_by(TaskRevision.revision.desc()).limit(limit)).all()
+
+
+def inverse(changes):
+    """
+    Возвращает изменения, отменяющие ревизию.
+
+    :param changes: Изменения полей ``{поле: [было, стало]}``.
+    :type changes: dict
+    :rtype: dict
+    """
+    return {field: [new, old] for field, (old, new) in changes.items()}
+
+
+def delete_for(task_ids):
+    """
+    Удаляет ревизии задач (вызывается при удалении задач, без фиксации).
+
+    :param task_ids: Идентификаторы задач или запрос, который их выбирает.
+    :type task_ids: list[int] or sqlalchemy.sql.Select
+    """
+    db.session.execute(delete(TaskRevision).where(TaskRevision.task_id.in_(task_ids))
+                       .execution_options(synchronize_session=False))
@@ -1,12 +1,56 @@
 """Маршруты для приложения todo_list."""
 
-from flask import Blueprint, render_template, request, redirect, url_for, abort, flash
+import json
+from datetime import date, timedelta
+
+from flask import (Blueprint, Response, current_app, render_template, request, redirect, url_for, flash, jsonify, g,
+                   stream_with_context)
 from flask_login import current_user, login_required
-from todo_list.services import TaskService, TodoService
-from todo_list.forms import TaskCreateForm, TaskUpdateForm, TodoCreateForm
+from pubsub import hub, format_sse
+from todo_list.models import Role, Task, TodoList
+from todo_list.permissions import PermissionService, todo_permission
+from todo_list.services import (TaskService, TodoService, NextUpService, CalendarService, MemberService,
+                                LabelService, todo_channel, get_data_version)
+from todo_list.forms import (TaskCreateForm, TaskUpdateForm, TodoCreateForm, CalendarRangeForm, MemberForm,
+                             LabelForm, LabelFilterForm, TaskLabelsForm, TaskMoveForm, TaskReorderForm,
+                             TaskUndoForm, TaskIdForm)
+from users.services import UserService
+from validation import parse_form, parse_many, parse_request, format_errors
+from serialization import FieldSet, api_response, rows_payload
+from streaming import stream_page
+from events.projections import SearchService
+from archive.services import ArchiveService
 
 todo_list_bp = Blueprint('todo_list', __name__, url_prefix='/todo_list')
 
+NEXT_UP_MAX_K = 100
+SEARCH_MAX_LIMIT = 100
+CALENDAR_STREAM_DAYS = 62
+HISTORY_MAX_LIMIT = 100
+ACCESS_REVOKED_EVENT = {'type': 'access_revoked'}
+
+# Через сколько секунд клиенту повторить подключение к потоку событий, если все места заняты
+STREAM_BUSY_RETRY = 5
+
+TODO_LIST_FIELDS = FieldSet({
+    'id': TodoList.id,
+    'title': TodoList.title,
+    'user_id': TodoList.user_id,
+})
+TASK_FIELDS = FieldSet({
+    'id': Task.id,
+    'todo_id': Task.todo_id,
+    'title': Task.title,
+    'description': Task.description,
+    'is_complete': Task.is_complete,
+    'status': Task.status,
+    'priority': Task.priority,
+    'deadline_date': Task.deadline_date,
+    'created_at': Task.created_at,
+    'completed_at': Task.completed_at,
+    'parent_id': Task.parent_id,
+})
+
 
 @todo_list_bp.errorhandler(404)
 def page_not_found(e):
@@ -32,6 +76,18 @@ def forbidden(e):
     return redirect(url_for('todo_list.index'))
 
 
+@todo_list_bp.errorhandler(409)
+def conflict(e):
+    """
+    Обработчик ошибки 409 (задача изменилась после правки, которую отменяют).
+
+    :param e: Исключение.
+    :type e: Exception
+    """
+    flash('Задача изменилась, правку нельзя отменить.', 'error')
+    return redirect(url_for('todo_list.index'))
+
+
 @todo_list_bp.get('/')
 @login_required
 def index():
@@ -42,10 +98,218 @@ def index():
     :rtype: flask.Response
     """
     todo_lists = TodoService.get_all_todo(current_user.id)
-    return render_template('todo_list/index.html', todo_lists=todo_lists, title='Ваши списки задач')
+    return render_template('todo_list/index.html', todo_lists=todo_lists,
+                           labels=LabelService.get_labels(current_user.id), title='Ваши списки задач')
+
+
+@todo_list_bp.get('/next-up')
+@login_required
+def next_up():
+    """
+    Отображает ближайшие незавершенные задачи пользователя по всем спискам.
+
+    :return: HTML-страница с ближайшими задачами.
+    :rtype: flask.Response
+    """
+    k = request.args.get('k', 10, type=int)
+    tasks = NextUpService.get_next_up(current_user.id, max(1, min(k, NEXT_UP_MAX_K)))
+    return render_template('todo_list/next_up.html', tasks=tasks, title='Ближайшие задачи')
+
+
+@todo_list_bp.get('/api/next-up')
+@login_required
+def next_up_api():
+    """
+    Возвращает ближайшие незавершенные задачи пользователя в формате JSON.
+
+    Параметр запроса ``k`` задает количество задач (от 1 до 100, по умолчанию 10).
+
+    :return: JSON со списком задач.
+    :rtype: flask.Response
+    """
+    k = request.args.get('k', 10, type=int)
+    return jsonify(tasks=NextUpService.get_next_up(current_user.id, max(1, min(k, NEXT_UP_MAX_K))))
+
+
+@todo_list_bp.get('/api/search')
+@login_required
+def search_api():
+    """
+    Ищет задачи пользователя по словам из заголовка и описания.
+
+    Параметры запроса: ``q`` (слова для поиска), ``limit`` (до 100, по умолчанию 50),
+    ``labels`` (идентификаторы меток, можно повторять) и ``match`` (``any`` или ``all``).
+    Поиск выполняется по индексу, который строится из журнала событий
+    командой ``flask events project --loop``; запрос индекс не обновляет.
+
+    :return: JSON со списком найденных задач или список ошибок.
+    :rtype: flask.Response
+    """
+    query = request.args.get('q', '').strip()
+    form, errors = parse_form(LabelFilterForm, request.args, labels=request.args.getlist('labels'))
+    if errors:
+        return jsonify(errors=errors), 400
+    if not query and not form.labels:
+        return jsonify(tasks=[])
+    limit = max(1, min(request.args.get('limit', 50, type=int), SEARCH_MAX_LIMIT))
+    entries = SearchService.search(current_user.id, query, limit, form.labels, form.match)
+    return jsonify(tasks=[
+        {'id': entry.task_id, 'todo_id': entry.todo_id, 'title': entry.title, 'description': entry.description}
+        for entry in entries
+    ])
+
+
+@todo_list_bp.get('/api/lists')
+@login_required
+def lists_api():
+    """
+    Возвращает списки задач, доступные пользователю.
+
+    Параметр ``fields`` задает поля ответа через запятую (``id``, ``title``, ``user_id``);
+    из базы данных выбираются только они. Кодировка ответа выбирается по
+    заголовку ``Accept`` (см. ``serialization``).
+
+    :return: Списки задач или список ошибок.
+    :rtype: flask.Response
+    """
+    columns, errors = TODO_LIST_FIELDS.parse(request.args.get('fields'))
+    if errors:
+        return api_response({'errors': errors}, 400)
+    return api_response({'lists': rows_payload(TodoService.select_todo_lists(current_user.id, columns))})
+
+
+@todo_list_bp.get('/api/lists/<int:todo_id>/tasks')
+@login_required
+@todo_permission(Role.VIEWER)
+def tasks_api(todo_id):
+    """
+    Возвращает задачи списка.
+
+    Параметр ``fields`` задает поля ответа через запятую (см. ``TASK_FIELDS``);
+    из базы данных выбираются только они.
+
+    :param todo_id: Идентификатор списка задач.
+    :type todo_id: int
+    :return: Задачи списка или список ошибок.
+    :rtype: flask.Response
+    """
+    columns, errors = TASK_FIELDS.parse(request.args.get('fields'))
+    if errors:
+        return api_response({'errors': errors}, 400)
+    return api_response({'tasks': rows_payload(TaskService.select_tasks(todo_id, columns))})
+
+
+@todo_list_bp.get('/api/lists/<int:todo_id>/tasks/<int:task_id>')
+@login_required
+@todo_permission(Role.VIEWER)
+def task_api(todo_id, task_id):
+    """
+    Возвращает одну задачу списка.
+
+    Параметр ``fields`` задает поля ответа через запятую (см. ``TASK_FIELDS``).
+
+    :param todo_id: Идентификатор списка задач.
+    :type todo_id: int
+    :param task_id: Идентификатор задачи.
+    :type task_id: int
+    :return: Задача, список ошибок или 404, если в списке нет такой задачи.
+    :rtype: flask.Response
+    """
+    columns, errors = TASK_FIELDS.parse(request.args.get('fields'))
+    if errors:
+        return api_response({'errors': errors}, 400)
+    rows = rows_payload(TaskService.select_tasks(todo_id, columns, task_id))
+    if not rows:
+        return api_response({'errors': [{'field': 'task_id', 'message': 'Task not found', 'type': 'not_found'}]},
+                            404)
+    return api_response({'task': rows[0]})
+
+
+@todo_list_bp.get('/calendar')
+@login_required
+def calendar():
+    """
+    Отображает календарь задач пользователя по дням дедлайна.
+
+    Без параметров показывает текущий месяц.
+
+    :return: HTML-страница календаря.
+    :rtype: flask.Response
+    """
+    today = date.today()
+    month_start = today.replace(day=1)
+    month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    form, errors = parse_form(CalendarRangeForm, request.args, **{
+        key: value for key, value in (('start', month_start), ('end', month_end))
+        if not request.args.get(key)
+    })
+    if errors:
+        flash(format_errors(errors), 'error')
+        form = CalendarRangeForm(start=month_start, end=month_end)
+    days = CalendarService.get_calendar(current_user.id, form.start, form.end)
+    return render_template('todo_list/calendar.html', days=days, start=form.start, end=form.end,
+                           title='Календарь задач')
+
+
+@todo_list_bp.get('/api/calendar')
+@login_required
+def calendar_api():
+    """
+    Возвращает задачи пользователя, сгруппированные по дням дедлайна, в формате JSON.
+
+    Параметры запроса: ``start`` и ``end`` (даты ISO, включительно) и ``tasks``
+    (``false`` - только счетчики). Ответ снабжается ETag по версии данных
+    пользователя; диапазоны длиннее ``CALENDAR_STREAM_DAYS`` дней отдаются потоком.
+
+    :return: JSON с днями календаря или список ошибок.
+    :rtype: flask.Response
+    """
+    form, errors = parse_form(CalendarRangeForm, request.args)
+    if errors:
+        return jsonify(errors=errors), 400
+    etag = f'{current_user.id}-{form.start}-{form.end}-{int(form.tasks)}-{get_data_version(current_user.id)}'
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    elif form.tasks and (form.end - form.start).days + 1 > CALENDAR_STREAM_DAYS:
+        response = Response(stream_with_context(_stream_calendar(current_user.id, form.start, form.end)),
+                            mimetype='application/json')
+    else:
+        days = CalendarService.get_calendar(current_user.id, form.start, form.end, form.tasks)
+        response = jsonify(start=form.start.isoformat(), end=form.end.isoformat(), days=days)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _stream_calendar(user_id, start, end):
+    """
+    Формирует JSON календаря по частям: по одному дню за раз.
+
+    :param user_id: Идентификатор пользователя.
+    :type user_id: int
+    :param start: Первый день диапазона.
+    :type start: date
+    :param end: Последний день диапазона (включительно).
+    :type end: date
+    :return: Фрагменты JSON-документа.
+    :rtype: Iterator[str]
+    """
+    counts = CalendarService.get_day_counts(user_id, start, end)
+    tasks = CalendarService.iter_tasks(user_id, start, end)
+    yield f'{{"start":"{start.isoformat()}","end":"{end.isoformat()}","days":['
+    pending = next(tasks, None)
+    for index, day in enumerate(counts):
+        day_tasks = []
+        while pending is not None and pending[0] <= day['date']:
+            if pending[0] == day['date']:
+                day_tasks.append(pending[1])
+            pending = next(tasks, None)
+        yield (',' if index else '') + json.dumps({**day, 'tasks': day_tasks}, ensure_ascii=False)
+    yield ']}'
 
 
 @todo_list_bp.route('/add', methods=['POST'])
+@login_required
 def todo_add():
     """
     Добавляет новый список задач.
@@ -53,15 +317,17 @@ def todo_add():
     :return: HTML-страница с обновленным списком задач или форма для создания нового списка.
     :rtype: flask.Response
     """
-    form_data = request.form
-    form = TodoCreateForm(**form_data)
-    if form.model_validate(form):
-        TodoService.create_todo(**form.model_dump(), user_id=current_user.id)
+    form, errors = parse_request(TodoCreateForm, request)
+    if errors:
+        flash(format_errors(errors), 'error')
         return redirect(url_for('todo_list.index'))
-    return render_template('todo_list.index.html')
+    TodoService.create_todo(**form.model_dump(), user_id=current_user.id)
+    return redirect(url_for('todo_list.index'))
 
 
 @todo_list_bp.route('/update/<int:todo_id>', methods=['POST'])
+@login_required
+@todo_permission(Role.EDITOR)
 def todo_update(todo_id):
     """
     Обновляет заголовок списка задач.
@@ -71,14 +337,17 @@ def todo_update(todo_id):
     :return: Редирект на главную страницу со списками задач.
     :rtype: flask.Response
     """
-    form_data = request.form
-    form = TodoCreateForm(**form_data)
-    if form.model_validate(form):
+    form, errors = parse_request(TodoCreateForm, request)
+    if errors:
+        flash(format_errors(errors), 'error')
+    else:
         TodoService.update_todo(todo_id, form.title)
     return redirect(url_for('todo_list.index'))
 
 
 @todo_list_bp.route('/delete/<int:todo_id>', methods=['POST'])
+@login_required
+@todo_permission(Role.OWNER)
 def todo_delete(todo_id):
     """
     Удаляет список задач.
@@ -93,30 +362,140 @@ def todo_delete(todo_id):
 
 
 @todo_list_bp.get('/<int:todo_id>')
+@login_required
+@todo_permission(Role.VIEWER)
 def get_todo(todo_id):
     """
     Отображает список задач по его идентификатору.
 
+    Параметры запроса ``labels`` (идентификаторы меток, можно повторять) и
+    ``match`` (``any`` или ``all``) оставляют только задачи с этими метками.
+
+    Страница отдается потоком (см. ``streaming.stream_page``): заголовок и
+    счетчики уходят клиенту сразу, а задачи читаются из базы пачками по
+    ``STREAM_BATCH_SIZE`` во время отрисовки.
+
     :param todo_id: Идентификатор списка задач.
     :type todo_id: int
     :return: HTML-страница со списком задач.
     :rtype: flask.Response
     """
     todo_list = TodoService.get_todo(todo_id)
-    if current_user.id != todo_list.user_id:
-        abort(403)
     all_tasks, active_tasks, completed_tasks = TodoService.count_tasks(todo_id)
+    form, errors = parse_form(LabelFilterForm, request.args, labels=request.args.getlist('labels'))
+    if errors:
+        flash(format_errors(errors), 'error')
+        form = LabelFilterForm()
+    tasks = TaskService.iter_tasks(todo_id, current_app.config.get('STREAM_BATCH_SIZE', 500))
+    task_count = all_tasks
+    if form.labels:
+        selected = set(LabelService.filter_tasks(todo_id, form.labels, form.match))
+        tasks = (task for task in tasks if task.id in selected)
+        task_count = len(selected)
+    labels, task_labels = LabelService.get_list_labels(todo_id, current_user.id)
     context = {
         'title': 'Мои задачи',
         'todo_list': todo_list,
+        'tasks': tasks,
+        'task_count': task_count,
+        'labels': labels,
+        'task_labels': task_labels,
+        'label_filter': form,
         'active_tasks': active_tasks,
         'completed_tasks': completed_tasks,
-        'all_tasks': all_tasks
+        'all_tasks': all_tasks,
+        'progress': TaskService.get_progress(todo_id),
+        'archived_tasks': ArchiveService.count(todo_id),
+        'role': g.todo_role,
+        'members': MemberService.get_members(todo_id) if g.todo_role == Role.OWNER else [],
     }
-    return render_template('todo_list/todo_list.html', **context)
+    return stream_page('todo_list/todo_list.html', **context)
+
+
+@todo_list_bp.get('/<int:todo_id>/archive')
+@login_required
+@todo_permission(Role.VIEWER)
+def todo_archive(todo_id):
+    """
+    Отображает архивные задачи списка, последние завершенные - первыми.
+
+    Параметры запроса: ``q`` (слова для поиска в заголовке и описании) и ``page``
+    (номер страницы по ``ARCHIVE_PAGE_SIZE`` задач).
+
+    :param todo_id: Идентификатор списка задач.
+    :type todo_id: int
+    :return: HTML-страница с архивом списка.
+    :rtype: flask.Response
+    """
+    todo_list = TodoService.get_todo(todo_id)
+    query = request.args.get('q', '').strip()
+    page = max(1, request.args.get('page', 1, type=int))
+    tasks, has_next = ArchiveService.get_tasks(todo_id, query, page, current_app.config.get('ARCHIVE_PAGE_SIZE', 50))
+    return render_template('todo_list/archive.html', title='Архив', todo_list=todo_list, tasks=tasks, query=query,
+                           page=page, has_next=has_next, archived_tasks=ArchiveService.count(todo_id))
+
+
+@todo_list_bp.get('/<int:todo_id>/events')
+@login_required
+@todo_permission(Role.VIEWER)
+def todo_events(todo_id):
+    """
+    Поток Server-Sent Events с изменениями списка задач.
+
+    Права проверяются не только при подключении: поток закрывается событием
+    ``access_revoked``, когда пользователя удаляют из участников списка
+    (событие ``member_removed``), а перед каждым keep-alive роль читается
+    заново - на случай, если событие об удалении не дошло.
+
+    Поток занимает поток воркера на все время соединения, поэтому в процессе
+    открывается не больше ``SSE_MAX_STREAMS`` потоков; сверх этого отвечает 503
+    с ``Retry-After`` и полем ``retry:``, и клиент подключается повторно позже.
+
+    :param todo_id: Идентификатор списка задач.
+    :type todo_id: int
+    :return: Поток событий ``text/event-stream``.
+    :rtype: flask.Response
+    """
+    channel = todo_channel(todo_id)
+    app = current_app._get_current_object()
+    user_id = current_user.id
+    keepalive = app.config.get('SSE_KEEPALIVE_INTERVAL', 15)
+    if not hub.acquire_stream(app.config.get('SSE_MAX_STREAMS', 0)):
+        return Response(f'retry: {STREAM_BUSY_RETRY * 1000}\n\n', status=503, mimetype='text/event-stream',
+                        headers={'Retry-After': str(STREAM_BUSY_RETRY), 'Cache-Control': 'no-cache'})
+
+    def has_access():
+        with app.app_context():
+            return Role.allows(PermissionService.get_role(todo_id, user_id), Role.VIEWER)
+
+    def stream():
+        with hub.subscribe(channel) as subscription:
+            yield 'retry: 3000\n\n'
+            while True:
+                event = subscription.get(timeout=keepalive)
+                if event is None:
+                    if not has_access():
+                        yield format_sse(ACCESS_REVOKED_EVENT)
+                        return
+                    yield ': keep-alive\n\n'
+                    continue
+                if event['type'] == 'member_removed':
+                    if event['member_id'] == user_id:
+                        yield format_sse(ACCESS_REVOKED_EVENT)
+                        return
+                    continue
+                yield format_sse(event)
+
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    response = Response(stream(), mimetype='text/event-stream', headers=headers)
+    # Место освобождается при закрытии ответа, даже если поток так и не начал читаться
+    response.call_on_close(hub.release_stream)
+    return response
 
 
 @todo_list_bp.route('/<int:todo_id>/task-add', methods=['POST'])
+@login_required
+@todo_permission(Role.EDITOR)
 def task_add(todo_id):
     """
     Добавляет новую задачу в список задач.
@@ -126,15 +505,41 @@ def task_add(todo_id):
     :return: Редирект на страницу списка задач.
     :rtype: flask.Response
     """
-    form_data = request.form
-    form = TaskCreateForm(**form_data, todo_id=todo_id)
-    if form.model_validate(form):
-        TaskService.add_task(form.title, form.description, form.deadline_date, todo_id)
-        return redirect(url_for('todo_list.get_todo', todo_id=todo_id))
-    return render_template('todo_list/todo_list.html', form=form)
+    form, errors = parse_request(TaskCreateForm, request, todo_id=todo_id)
+    if errors:
+        flash(format_errors(errors), 'error')
+    else:
+        TaskService.add_task(form.title, form.description, form.deadline_date, todo_id, form.priority,
+                             form.parent_id)
+    return redirect(url_for('todo_list.get_todo', todo_id=todo_id))
+
+
+@todo_list_bp.route('/<int:todo_id>/tasks/batch', methods=['POST'])
+@login_required
+@todo_permission(Role.EDITOR)
+def task_batch_add(todo_id):
+    """
+    Добавляет несколько задач в список задач одним запросом.
+
+    Тело запроса - JSON-массив задач с полями ``title``, ``description``, ``deadline_date``
+    и необязательным ``parent_id`` (родительская задача того же списка).
+    Если хотя бы одна задача не проходит проверку, ни одна задача не добавляется.
+
+    :param todo_id: Идентификатор списка задач.
+    :type todo_id: int
+    :return: JSON с идентификаторами созданных задач или со списком ошибок.
+    :rtype: flask.Response
+    """
+    forms, errors = parse_many(TaskCreateForm, request.get_data(), todo_id=todo_id)
+    if errors:
+        return jsonify(errors=errors), 400
+    task_ids = TaskService.add_tasks(forms, todo_id)
+    return jsonify(ids=task_ids), 201
 
 
 @todo_list_bp.route('/<int:todo_id>/task-update', methods=['POST'])
+@login_required
+@todo_permission(Role.EDITOR)
 def task_update(todo_id):
     """
     Обновляет информацию о задаче.
@@ -144,14 +549,73 @@ def task_update(todo_id):
     :return: Редирект на страницу списка задач.
     :rtype: flask.Response
     """
-    form_data = request.form
-    form = TaskUpdateForm(**form_data)
-    if form.model_validate(form):
-        TaskService.update_task(form.id, form.title, form.description)
+    form, errors = parse_request(TaskUpdateForm, request)
+    if errors:
+        flash(format_errors(errors), 'error')
+    else:
+        TaskService.update_task(form.id, form.title, form.description, todo_id, current_user.id)
     return redirect(url_for('todo_list.get_todo', todo_id=todo_id))
 
 
+@todo_list_bp.route('/<int:todo_id>/task-undo', methods=['POST'])
+@login_required
+@todo_permission(Role.EDITOR)
+def task_undo(todo_id):
+    """
+    Отменяет последнюю правку заголовка и описания задачи.
+
+    Запрос с JSON-телом получает JSON с примененными изменениями (404, если
+    отменять нечего), запрос из формы - редирект на страницу списка.
+
+    :param todo_id: Идентификатор списка задач.
+    :type todo_id: int
+    :return: JSON с изменениями, JSON со списком ошибок или редирект на страницу списка задач.
+    :rtype: flask.Response
+    """
+    form, errors = parse_request(TaskUndoForm, request)
+    if request.is_json:
+        if errors:
+            return jsonify(errors=errors), 400
+        restored = TaskService.undo_task(form.task_id, todo_id)
+        if restored is None:
+            return jsonify(errors=['Нет правок для отмены.']), 404
+        return jsonify(changes=restored)
+    if errors:
+        flash(format_errors(errors), 'error')
+    elif TaskService.undo_task(form.task_id, todo_id) is None:
+        flash('Нет правок для отмены.', 'error')
+    return redirect(url_for('todo_list.get_todo', todo_id=todo_id))
+
+
+@todo_list_bp.get('/<int:todo_id>/tasks/<int:task_id>/history')
+@login_required
+@todo_permission(Role.VIEWER)
+def task_history(todo_id, task_id):
+    """
+    Возвращает историю правок задачи в формате JSON, последние правки - первыми.
+
+    Параметры запроса: ``limit`` (до 100, по умолчанию 20) и ``before`` (номер
+    ревизии из ``next_before`` предыдущей страницы).
+
+    :param todo_id: Идентификатор списка задач.
+    :type todo_id: int
+    :param task_id: Идентификатор задачи.
+    :type task_id: int
+    :return: JSON со списком ревизий и номером для следующей страницы.
+    :rtype: flask.Response
+    """
+    limit = max(1, min(request.args.get('limit', 20, type=int), HISTORY_MAX_LIMIT))
+    history = TaskService.get_task_history(task_id, todo_id, request.args.get('before', type=int), limit)
+    return jsonify(revisions=[
+        {'revision': item.revision, 'user_id': item.user_id, 'created_at': item.created_at.isoformat(),
+         'changes': item.changes}
+        for item in history
+    ], next_before=history[-1].revision if len(history) == limit else None)
+
+
 @todo_list_bp.route('/<int:todo_id>/task-completed', methods=['POST'])
+@login_required
+@todo_permission(Role.EDITOR)
 def task_completed(todo_id):
     """
     Помечает задачу как завершенную.
@@ -161,12 +625,17 @@ def task_completed(todo_id):
     :return: Редирект на страницу списка задач.
     :rtype: flask.Response
     """
-    task_id = request.form.get('task_id')
-    TaskService.complete_task(task_id)
+    form, errors = parse_request(TaskIdForm, request)
+    if errors:
+        flash(format_errors(errors), 'error')
+    else:
+        TaskService.complete_task(form.task_id, todo_id)
     return redirect(url_for('todo_list.get_todo', todo_id=todo_id))
 
 
 @todo_list_bp.route('/<int:todo_id>/task-delete', methods=['POST'])
+@login_required
+@todo_permission(Role.EDITOR)
 def task_delete(todo_id):
     """
     Удаляет задачу из списка задач.
@@ -176,6 +645,159 @@ def task_delete(todo_id):
     :return: Редирект на страницу списка задач.
     :rtype: flask.Response
     """
-    task_id = request.form.get('task_id')
-    TaskService.delete_task(task_id)
-    return redirect(url_for('todo_list.get_todo', todo_id=todo_id))
\ No newline at end of file
+    form, errors = parse_request(TaskIdForm, request)
+    if errors:
+        flash(format_errors(errors), 'error')
+    else:
+        TaskService.delete_task(form.task_id, todo_id)
+    return redirect(url_for('todo_list.get_todo', todo_id=todo_id))
+
+
+@todo_list_bp.route('/<int:todo_id>/task-move', methods=['POST'])
+@login_required
+@todo_permission(Role.EDITOR)
+def task_move(todo_id):
+    """
+    Переносит задачу вместе с подзадачами под другую задачу списка или на верхний уровень.
+
+    :param todo_id: Идентификатор списка задач.
+    :type todo_id: int
+    :return: Редирект на страницу списка задач.
+    :rtype: flask.Response
+    """
+    form, errors = parse_request(TaskMoveForm, request)
+    if errors:
+        flash(format_errors(errors), 'error')
+    else:
+        TaskService.move_task(form.task_id, form.parent_id, todo_id)
+    return redirect(url_for('todo_list.get_todo', todo_id=todo_id))
+
+
+@todo_list_bp.route('/<int:todo_id>/task-reorder', methods=['POST'])
+@login_required
+@todo_permission(Role.EDITOR)
+def task_reorder(todo_id):
+    """
+    Ставит задачу после другой задачи списка или в начало списка (перетаскивание карточек).
+
+    Запрос с JSON-телом получает JSON с новым ключом порядка задачи,
+    запрос из формы - редирект на страницу списка.
+
+    :param todo_id: Идентификатор списка задач.
+    :type todo_id: int
+    :return: JSON с ключом порядка, JSON со списком ошибок или редирект на страницу списка задач.
+    :rtype: flask.Response
+    """
+    form, errors = parse_request(TaskReorderForm, request)
+    if request.is_json:
+        if errors:
+            return jsonify(errors=errors), 400
+        return jsonify(rank=TaskService.reorder_task(form.task_id, form.after_id, todo_id))
+    if errors:
+        flash(format_errors(errors), 'error')
+    else:
+        TaskService.reorder_task(form.task_id, form.after_id, todo_id)
+    return redirect(url_for('todo_list.get_todo', todo_id=todo_id))
+
+
+@todo_list_bp.route('/<int:todo_id>/members', methods=['POST'])
+@login_required
+@todo_permission(Role.OWNER)
+def member_set(todo_id):
+    """
+    Открывает список задач пользователю или меняет его роль.
+
+    :param todo_id: Идентификатор списка задач.
+    :type todo_id: int
+    :return: Редирект на страницу списка задач.
+    :rtype: flask.Response
+    """
+    form, errors = parse_request(MemberForm, request)
+    if errors:
+        flash(format_errors(errors), 'error')
+        return redirect(url_for('todo_list.get_todo', todo_id=todo_id))
+    user = UserService.get_user(form.username)
+    if user is None:
+        flash('Пользователь не найден.', 'error')
+        return redirect(url_for('todo_list.get_todo', todo_id=todo_id))
+    try:
+        MemberService.set_member(todo_id, user.id, form.role)
+    except ValueError as exc:
+        flash(str(exc), 'error')
+    return redirect(url_for('todo_list.get_todo', todo_id=todo_id))
+
+
+@todo_list_bp.route('/<int:todo_id>/members/<int:user_id>/delete', methods=['POST'])
+@login_required
+@todo_permission(Role.OWNER)
+def member_delete(todo_id, user_id):
+    """
+    Закрывает пользователю доступ к списку задач.
+
+    :param todo_id: Идентификатор списка задач.
+    :type todo_id: int
+    :param user_id: Идентификатор пользователя.
+    :type user_id: int
+    :return: Редирект на страницу списка задач.
+    :rtype: flask.Response
+    """
+    MemberService.remove_member(todo_id, user_id)
+    return redirect(url_for('todo_list.get_todo', todo_id=todo_id))
+
+
+@todo_list_bp.route('/labels', methods=['POST'])
+@login_required
+def label_add():
+    """
+    Создает метку текущего пользователя.
+
+    :return: Редирект на страницу списка задач, с которой создана метка, или на главную страницу.
+    :rtype: flask.Response
+    """
+    form, errors = parse_request(LabelForm, request)
+    if errors:
+        flash(format_errors(errors), 'error')
+        return redirect(url_for('todo_list.index'))
+    try:
+        LabelService.create_label(current_user.id, form.name)
+    except ValueError as exc:
+        flash(str(exc), 'error')
+    if form.todo_id is not None:
+        return redirect(url_for('todo_list.get_todo', todo_id=form.todo_id))
+    return redirect(url_for('todo_list.index'))
+
+
+@todo_list_bp.route('/labels/<int:label_id>/delete', methods=['POST'])
+@login_required
+def label_delete(label_id):
+    """
+    Удаляет метку текущего пользователя.
+
+    :param label_id: Идентификатор метки.
+    :type label_id: int
+    :return: Редирект на главную страницу со списками задач.
+    :rtype: flask.Response
+    """
+    LabelService.delete_label(current_user.id, label_id)
+    return redirect(url_for('todo_list.index'))
+
+
+@todo_list_bp.route('/<int:todo_id>/task-labels', methods=['POST'])
+@login_required
+@todo_permission(Role.EDITOR)
+def task_labels(todo_id):
+    """
+    Назначает задаче метки текущего пользователя.
+
+    :param todo_id: Идентификатор списка задач.
+    :type todo_id: int
+    :return: Редирект на страницу списка задач.
+    :rtype: flask.Response
+    """
+    extra = {} if request.is_json else {'labels': request.form.getlist('labels')}
+    form, errors = parse_request(TaskLabelsForm, request, **extra)
+    if errors:
+        flash(format_errors(errors), 'error')
+    else:
+        LabelService.set_task_labels(form.task_id, todo_id, current_user.id, form.labels)
+    return redirect(url_for('todo_list.get_todo', todo_id=todo_id))
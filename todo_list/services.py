@@ -1,6 +1,147 @@
 """Сервисы для работы с данными приложения todo_list."""
-from todo_list.models import TodoList, Task
+import heapq
+import uuid
+from datetime import datetime, time, timedelta
+from itertools import islice
+from flask import abort
+from sqlalchemy import func, case, select, delete, insert, update
+from todo_list.models import TodoList, TodoMember, Task, TaskClosure, TaskStatus, Role, Label, TaskLabel
+from todo_list import ranking, revisions, tree
+from todo_list.rebalancer import rank_rebalancer
+from todo_list.permissions import PermissionService, accessible_todo_ids
 from database import db
+from pubsub import hub
+from cache import cache, row_of, attach_row
+from users.models import User
+from unit_of_work import unit_of_work
+from events.models import EventType
+from events.services import EventLog, TODO_FIELDS, changes, snapshot
+from archive.services import ArchiveService
+
+
+def todo_channel(todo_id):
+    """
+    Возвращает имя канала шины событий для списка задач.
+
+    :param todo_id: Идентификатор списка задач.
+    :type todo_id: int
+    :return: Имя канала.
+    :rtype: str
+    """
+    return f'todo:{todo_id}'
+
+
+def _isoformat(value):
+    """Возвращает дату в формате ISO 8601 или None."""
+    return value.isoformat() if value is not None else None
+
+
+def task_payload(task):
+    """
+    Возвращает компактное представление задачи для событий об изменениях.
+
+    :param task: Задача.
+    :type task: Task
+    :return: Словарь с полями задачи.
+    :rtype: dict
+    """
+    return {
+        'id': task.id,
+        'title': task.title,
+        'description': task.description,
+        'is_complete': bool(task.is_complete),
+        'status': task.status,
+        'priority': task.priority,
+        'deadline_date': _isoformat(task.deadline_date),
+        'completed_at': _isoformat(task.completed_at),
+        'parent_id': task.parent_id,
+    }
+
+
+def _identifier(value):
+    """
+    Приводит идентификатор из URL или формы к целому числу.
+
+    :param value: Идентификатор.
+    :type value: int or str
+    :return: Идентификатор.
+    :rtype: int
+    :raises NotFound: Если значение не является числом.
+    """
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        abort(404)
+
+
+def _new_version():
+    """Возвращает новую случайную метку версии."""
+    return uuid.uuid4().hex[:16]
+
+
+def _data_version_key(user_id):
+    """Возвращает ключ кэша версии данных пользователя в текущем поколении версий."""
+    generation = cache.get_or_set('data_version:generation', _new_version)
+    return f'data_version:{generation}:{user_id}'
+
+
+def get_data_version(user_id):
+    """
+    Возвращает версию данных пользователя.
+
+    Версия - случайная метка, которая меняется при каждом изменении задач или
+    списков пользователя; она входит в ключи производных кэшей (ближайшие задачи,
+    календарь) и в ETag ответов, поэтому их не нужно удалять по отдельности.
+
+    :param user_id: Идентификатор пользователя.
+    :type user_id: int
+    :return: Версия данных.
+    :rtype: str
+    """
+    return cache.get_or_set(_data_version_key(user_id), _new_version)
+
+
+def invalidate_user_caches(user_id):
+    """
+    Меняет версию данных пользователя, делая недействительными зависящие от нее кэши.
+
+    :param user_id: Идентификатор пользователя.
+    :type user_id: int
+    """
+    cache.delete(_data_version_key(user_id))
+
+
+def invalidate_all_user_caches():
+    """Меняет версии данных всех пользователей сразу, начиная новое поколение версий."""
+    cache.set('data_version:generation', _new_version())
+
+
+def notify_change(todo_id, event_type, user_ids=None, **payload):
+    """
+    Сообщает об изменении списка задач.
+
+    Публикует событие в канал списка и сбрасывает зависящие от него кэши всех
+    пользователей с доступом к списку. Внутри единицы работы запроса это
+    происходит только после фиксации транзакции.
+
+    :param todo_id: Идентификатор списка задач.
+    :type todo_id: int
+    :param event_type: Тип события (``task_created``, ``task_deleted`` и т.д.).
+    :type event_type: str
+    :param user_ids: Пользователи с доступом к списку, если они уже известны.
+    :type user_ids: list[int], optional
+    """
+    if user_ids is None:
+        user_ids = PermissionService.get_user_ids(todo_id)
+    event = {'type': event_type, **payload}
+
+    def publish():
+        for user_id in user_ids:
+            invalidate_user_caches(user_id)
+        cache.delete(f'label_index:{todo_id}')
+        hub.publish(todo_channel(todo_id), event)
+
+    unit_of_work.after_commit(publish)
 
 class TodoService:
     """
@@ -19,32 +160,82 @@ class TodoService:
         """
         new_todo = TodoList(title=title, user_id=user_id)
         db.session.add(new_todo)
-        db.session.commit()
+        db.session.flush()
+        EventLog.append(EventType.TODO_CREATED, user_id, new_todo.id, data=snapshot(new_todo, TODO_FIELDS))
+        unit_of_work.commit()
+        unit_of_work.after_commit(lambda: cache.delete(f'todo_lists:{user_id}'))
+        unit_of_work.after_commit(lambda: PermissionService.invalidate(new_todo.id, user_id))
+        unit_of_work.after_commit(lambda: invalidate_user_caches(user_id))
 
     @staticmethod
-    def get_todo(todo_id):
+    def get_todo(todo_id, for_update=False):
         """
         Возвращает список задач по его идентификатору.
 
+        Для чтения запись берется из кэша. Методы, изменяющие список, читают
+        строку из базы с блокировкой (``for_update``): кэш другого процесса
+        может хранить устаревшие значения.
+
         :param todo_id: Идентификатор списка задач.
         :type todo_id: int
+        :param for_update: Прочитать строку из базы с блокировкой ``FOR UPDATE``, минуя кэш.
+        :type for_update: bool
         :return: Список задач.
         :rtype: TodoList
+        :raises NotFound: Если список задач не найден.
         """
-        return TodoList.query.get_or_404(todo_id)
+        if for_update:
+            todo_list = db.session.get(TodoList, _identifier(todo_id), with_for_update=True, populate_existing=True)
+        else:
+            todo_list = cache.get_entity(TodoList, _identifier(todo_id))
+        if todo_list is None:
+            abort(404)
+        return todo_list
     
+    @staticmethod
+    def get_owner_id(todo_id):
+        """
+        Возвращает идентификатор владельца списка задач.
+
+        :param todo_id: Идентификатор списка задач.
+        :type todo_id: int
+        :return: Идентификатор пользователя или None, если список не найден.
+        :rtype: int or None
+        """
+        todo_list = cache.get_entity(TodoList, _identifier(todo_id))
+        return todo_list.user_id if todo_list is not None else None
+
     @staticmethod
     def get_all_todo(user_id):
         """
-        Возвращает все списки задач для указанного пользователя.
+        Возвращает все списки задач, доступные пользователю: собственные и общие.
 
         :param user_id: Идентификатор пользователя.
         :type user_id: int
         :return: Список всех списков задач пользователя.
         :rtype: list[TodoList]
         """
-        return TodoList.query.filter_by(user_id=user_id).all()
+        rows = cache.get_or_set(
+            f'todo_lists:{user_id}',
+            lambda: [row_of(todo_list) for todo_list in TodoList.query.filter(
+                TodoList.id.in_(accessible_todo_ids(user_id))).order_by(TodoList.id).all()])
+        return [attach_row(TodoList, row) for row in rows]
     
+    @staticmethod
+    def select_todo_lists(user_id, columns):
+        """
+        Выбирает указанные колонки всех списков задач, доступных пользователю.
+
+        :param user_id: Идентификатор пользователя.
+        :type user_id: int
+        :param columns: Колонки ``TodoList`` (см. ``serialization.FieldSet``).
+        :type columns: list
+        :return: Строки с выбранными колонками по возрастанию идентификатора списка.
+        :rtype: list[sqlalchemy.engine.Row]
+        """
+        return db.session.execute(
+            select(*columns).where(TodoList.id.in_(accessible_todo_ids(user_id))).order_by(TodoList.id)).all()
+
     @staticmethod
     def update_todo(todo_id, title):
         """
@@ -55,9 +246,16 @@ class TodoService:
         :param title: Новый заголовок списка задач.
         :type title: str
         """
-        todo_list = TodoList.query.filter_by(id=todo_id).first()
-        todo_list.title = title 
-        db.session.commit()
+        todo_list = TodoService.get_todo(todo_id, for_update=True)
+        user_ids = PermissionService.get_user_ids(todo_list.id)
+        todo_list.title = title
+        data = changes(todo_list, TODO_FIELDS)
+        if data:
+            EventLog.append(EventType.TODO_UPDATED, todo_list.user_id, todo_list.id, data=data)
+        unit_of_work.commit()
+        unit_of_work.after_commit(lambda: cache.invalidate_entity(TodoList, todo_list.id))
+        unit_of_work.after_commit(lambda: cache.delete(*(f'todo_lists:{user_id}' for user_id in user_ids)))
+        notify_change(todo_id, 'todo_updated', user_ids=user_ids, title=title)
 
     @staticmethod
     def delete_todo(todo_id):
@@ -67,9 +265,25 @@ class TodoService:
         :param todo_id: Идентификатор списка задач.
         :type todo_id: int
         """
-        todo = TodoList.query.get_or_404(todo_id)
+        todo = TodoService.get_todo(todo_id, for_update=True)
+        owner_id = todo.user_id
+        user_ids = PermissionService.get_user_ids(todo.id)
+        task_ids = [task.id for task in todo.tasks]
+        for task in todo.tasks:
+            EventLog.task_deleted(task, owner_id)
+        EventLog.append(EventType.TODO_DELETED, owner_id, todo.id,
+                        data={**snapshot(todo, TODO_FIELDS), 'members': [member.user_id for member in todo.members]})
+        db.session.execute(delete(TaskLabel).where(TaskLabel.task_id.in_(task_ids)))
+        db.session.execute(delete(TaskClosure).where(TaskClosure.todo_id == todo.id))
+        revisions.delete_for(task_ids)
+        ArchiveService.delete_list(todo.id)
         db.session.delete(todo)
-        db.session.commit()       
+        unit_of_work.commit()
+        unit_of_work.after_commit(lambda: cache.invalidate_entity(TodoList, todo.id))
+        unit_of_work.after_commit(lambda: cache.invalidate_entity(Task, *task_ids))
+        unit_of_work.after_commit(lambda: cache.delete(*(f'todo_lists:{user_id}' for user_id in user_ids)))
+        unit_of_work.after_commit(lambda: PermissionService.invalidate(todo.id, *user_ids))
+        notify_change(todo_id, 'todo_deleted', user_ids=user_ids)
 
     @staticmethod
     def count_tasks(todo_id):
@@ -81,10 +295,29 @@ class TodoService:
         :return: Количество всех задач, активных задач и завершенных задач в списке.
         :rtype: tuple[int, int, int]
         """
-        all_tasks = Task.query.filter_by(todo_id=todo_id).count()
-        active_tasks = Task.query.filter_by(todo_id=todo_id, is_complete=False).count()
-        completed_tasks = Task.query.filter_by(todo_id=todo_id, is_complete=True).count()
-        return all_tasks, active_tasks, completed_tasks
+        counts = dict(
+            db.session.query(Task.status, func.count())
+            .filter(Task.todo_id == todo_id)
+            .group_by(Task.status)
+            .all()
+        )
+        completed_tasks = counts.get(TaskStatus.COMPLETED, 0)
+        all_tasks = sum(counts.values())
+        return all_tasks, all_tasks - completed_tasks, completed_tasks
+
+    @staticmethod
+    def get_tasks_by_status(todo_id, status):
+        """
+        Возвращает задачи списка в указанном состоянии.
+
+        :param todo_id: Идентификатор списка задач.
+        :type todo_id: int
+        :param status: Состояние задачи (см. ``TaskStatus``).
+        :type status: str
+        :return: Задачи списка в указанном состоянии.
+        :rtype: list[Task]
+        """
+        return Task.query.filter_by(todo_id=todo_id, status=status).all()
     
     @staticmethod
     def get_tasks_from_todo_list(todo_id):
@@ -96,7 +329,7 @@ class TodoService:
         :return: Список всех задач в указанном списке задач.
         :rtype: list[Task]
         """
-        tasks = Task.query.filter_by(todo_list_id=todo_id).all()
+        tasks = Task.query.filter_by(todo_id=todo_id).order_by(Task.rank, Task.id).all()
         return tasks
 
     
@@ -105,19 +338,72 @@ class TaskService:
     Сервис для работы с задачами.
     """
     @staticmethod
-    def get_task(task_id):
+    def get_task(task_id, todo_id=None, for_update=False):
         """
         Возвращает задачу по ее идентификатору.
 
+        Для чтения запись берется из кэша. Методы, изменяющие задачу, читают
+        строку из базы с блокировкой (``for_update``): кэш другого процесса
+        может хранить устаревшие значения.
+
         :param task_id: Идентификатор задачи.
         :type task_id: int
+        :param todo_id: Идентификатор списка, которому должна принадлежать задача.
+        :type todo_id: int, optional
+        :param for_update: Прочитать строку из базы с блокировкой ``FOR UPDATE``, минуя кэш.
+        :type for_update: bool
         :return: Задача.
         :rtype: Task
+        :raises NotFound: Если задача не найдена или принадлежит другому списку.
         """
-        return Task.query.get_or_404(task_id)
+        if for_update:
+            task = db.session.get(Task, _identifier(task_id), with_for_update=True, populate_existing=True)
+        else:
+            task = cache.get_entity(Task, _identifier(task_id))
+        if task is None or (todo_id is not None and task.todo_id != _identifier(todo_id)):
+            abort(404)
+        return task
     
     @staticmethod
-    def add_task(title, description, deadline_date, todo_id):
+    def select_tasks(todo_id, columns, task_id=None):
+        """
+        Выбирает указанные колонки задач списка.
+
+        :param todo_id: Идентификатор списка задач.
+        :type todo_id: int
+        :param columns: Колонки ``Task`` (см. ``serialization.FieldSet``).
+        :type columns: list
+        :param task_id: Идентификатор задачи, если нужна одна задача.
+        :type task_id: int, optional
+        :return: Строки с выбранными колонками в порядке задач списка.
+        :rtype: list[sqlalchemy.engine.Row]
+        """
+        statement = select(*columns).where(Task.todo_id == todo_id)
+        if task_id is not None:
+            statement = statement.where(Task.id == task_id)
+        return db.session.execute(statement.order_by(Task.rank, Task.id)).all()
+
+    @staticmethod
+    def iter_tasks(todo_id, batch_size=500):
+        """
+        Перебирает задачи списка, не загружая их все в память.
+
+        Задачи читаются из базы пачками по ``batch_size`` в порядке задач списка
+        (по индексу ``ix_task_todo_rank``); прочитанные задачи не удерживаются сессией.
+
+        :param todo_id: Идентификатор списка задач.
+        :type todo_id: int
+        :param batch_size: Количество задач, читаемых из базы за раз.
+        :type batch_size: int
+        :return: Задачи списка.
+        :rtype: Iterator[Task]
+        """
+        query = select(Task).where(Task.todo_id == todo_id).order_by(Task.rank, Task.id) \
+            .execution_options(yield_per=batch_size)
+        yield from db.session.scalars(query)
+
+    @staticmethod
+    def add_task(title, description, deadline_date, todo_id, priority=0, parent_id=None):
         """
         Добавляет новую задачу в список задач.
 
@@ -129,30 +415,110 @@ class TaskService:
         :type deadline_date: datetime
         :param todo_id: Идентификатор списка задач, к которому принадлежит задача.
         :type todo_id: int
+        :param priority: Приоритет задачи.
+        :type priority: int
+        :param parent_id: Идентификатор родительской задачи того же списка.
+        :type parent_id: int, optional
+        :raises NotFound: Если список задач или родительская задача не найдены.
         """
+        owner_id = TodoService.get_owner_id(todo_id)
+        if owner_id is None:
+            abort(404)
+        if parent_id is not None:
+            TaskService.get_task(parent_id, todo_id)
         new_task = Task(title=title,
                         description=description,
                         deadline_date=deadline_date,
-                        todo_id=todo_id)
+                        priority=priority,
+                        todo_id=todo_id,
+                        parent_id=parent_id)
         db.session.add(new_task)
-        db.session.commit()
+        db.session.flush()
+        if parent_id is not None:
+            tree.attach(new_task.id, parent_id, todo_id)
+        EventLog.task_created(new_task, owner_id)
+        unit_of_work.commit()
+        notify_change(todo_id, 'task_created', task=task_payload(new_task))
 
     @staticmethod
-    def complete_task(task_id):
+    def add_tasks(forms, todo_id):
+        """
+        Добавляет несколько задач в список задач одной транзакцией.
+
+        :param forms: Проверенные формы создания задач.
+        :type forms: list[TaskCreateForm]
+        :param todo_id: Идентификатор списка задач, к которому принадлежат задачи.
+        :type todo_id: int
+        :return: Идентификаторы созданных задач.
+        :rtype: list[int]
+        :raises NotFound: Если список задач или родительская задача не найдены.
+        """
+        owner_id = TodoService.get_owner_id(todo_id)
+        if owner_id is None:
+            abort(404)
+        for parent_id in {form.parent_id for form in forms} - {None}:
+            TaskService.get_task(parent_id, todo_id)
+        new_tasks = [Task(title=form.title,
+                          description=form.description,
+                          deadline_date=form.deadline_date,
+                          priority=form.priority,
+                          todo_id=todo_id,
+                          parent_id=form.parent_id)
+                     for form in forms]
+        db.session.add_all(new_tasks)
+        db.session.flush()
+        for task in new_tasks:
+            if task.parent_id is not None:
+                tree.attach(task.id, task.parent_id, todo_id)
+            EventLog.task_created(task, owner_id)
+        unit_of_work.commit()
+        for task in new_tasks:
+            notify_change(todo_id, 'task_created', task=task_payload(task))
+        return [task.id for task in new_tasks]
+
+    @staticmethod
+    def complete_task(task_id, todo_id=None):
         """
         Помечает задачу как завершенную или отменяет это действие, если она уже завершена.
 
+        Флаг переключается одним ``UPDATE`` от значения в базе, а не от
+        прочитанного ранее: два одновременных переключения не завершают задачу
+        дважды. Время завершения и состояние вычисляются тем же запросом.
+
         :param task_id: Идентификатор задачи.
         :type task_id: int
+        :param todo_id: Идентификатор списка, которому должна принадлежать задача.
+        :type todo_id: int, optional
         """
-        task = TaskService.get_task(task_id)
-        task.is_complete = not task.is_complete 
-        db.session.commit()
+        task = TaskService.get_task(task_id, todo_id, for_update=True)
+        owner_id = TodoService.get_owner_id(task.todo_id)
+        old = {'is_complete': bool(task.is_complete), 'status': task.status}
+        now = datetime.now()
+        is_complete, status = db.session.execute(
+            update(Task).where(Task.id == task.id).values(
+                is_complete=~Task.is_complete,
+                completed_at=case((Task.is_complete, None), else_=now),
+                status=case((~Task.is_complete, TaskStatus.COMPLETED),
+                            (Task.deadline_date <= now, TaskStatus.OVERDUE),
+                            else_=TaskStatus.ACTIVE))
+            .returning(Task.is_complete, Task.status),
+            execution_options={'synchronize_session': False}).one()
+        db.session.expire(task, ['is_complete', 'completed_at', 'status'])
+        new = {'is_complete': bool(is_complete), 'status': status}
+        data = {field: [old[field], value] for field, value in new.items() if old[field] != value}
+        EventLog.append(EventType.TASK_COMPLETED if is_complete else EventType.TASK_UPDATED,
+                        owner_id, task.todo_id, task.id, data)
+        unit_of_work.commit()
+        unit_of_work.after_commit(lambda: cache.invalidate_entity(Task, task.id))
+        notify_change(task.todo_id, 'task_updated', task=task_payload(task))
 
     @staticmethod
-    def update_task(id, title, description):
+    def update_task(id, title, description, todo_id=None, user_id=None):
         """
-        Обновляет информацию о задаче.
+        Обновляет информацию о задаче и записывает правку в историю задачи.
+
+        Прежние значения полей для ревизии берутся из строки, прочитанной из
+        базы с блокировкой, а не из кэша, который может быть устаревшим.
 
         :param id: Идентификатор задачи.
         :type id: int
@@ -160,20 +526,630 @@ class TaskService:
         :type title: str
         :param description: Новое описание задачи.
         :type description: str
+        :param todo_id: Идентификатор списка, которому должна принадлежать задача.
+        :type todo_id: int, optional
+        :param user_id: Идентификатор пользователя, вносящего правку.
+        :type user_id: int, optional
         """
-        task = TaskService.get_task(id)
+        task = TaskService.get_task(id, todo_id, for_update=True)
+        owner_id = TodoService.get_owner_id(task.todo_id)
         task.title = title
         task.description = description
-        db.session.commit()
+        revision = changes(task, revisions.REVISION_FIELDS)
+        EventLog.task_changed(task, owner_id)
+        revisions.record(task.id, revision, user_id)
+        unit_of_work.commit()
+        unit_of_work.after_commit(lambda: cache.invalidate_entity(Task, task.id))
+        notify_change(task.todo_id, 'task_updated', task=task_payload(task))
+
+    @staticmethod
+    def undo_task(task_id, todo_id=None):
+        """
+        Отменяет последнюю правку задачи.
+
+        Обратные изменения последней ревизии применяются одним условным
+        UPDATE: строка меняется, только если поля задачи все еще содержат
+        значения из ревизии. Ревизия удаляется в той же транзакции.
+
+        :param task_id: Идентификатор задачи.
+        :type task_id: int
+        :param todo_id: Идентификатор списка, которому должна принадлежать задача.
+        :type todo_id: int, optional
+        :return: Примененные изменения ``{поле: [было, стало]}`` или None, если отменять нечего.
+        :rtype: dict or None
+        :raises Conflict: Если задача изменилась после записи ревизии.
+        """
+        task = TaskService.get_task(task_id, todo_id, for_update=True)
+        revision = revisions.latest(task.id)
+        if revision is None:
+            return None
+        restored = revisions.inverse(revision.changes)
+        result = db.session.execute(
+            update(Task)
+            .where(Task.id == task.id, *(getattr(Task, field) == current for field, (current, _) in restored.items()))
+            .values({field: value for field, (_, value) in restored.items()}))
+        if result.rowcount != 1:
+            abort(409)
+        db.session.delete(revision)
+        EventLog.append(EventType.TASK_UPDATED, TodoService.get_owner_id(task.todo_id), task.todo_id, task.id, restored)
+        unit_of_work.commit()
+        unit_of_work.after_commit(lambda: cache.invalidate_entity(Task, task.id))
+        notify_change(task.todo_id, 'task_updated', task=task_payload(task))
+        return restored
+
+    @staticmethod
+    def get_task_history(task_id, todo_id=None, before=None, limit=20):
+        """
+        Возвращает ревизии задачи, последние - первыми.
+
+        :param task_id: Идентификатор задачи.
+        :type task_id: int
+        :param todo_id: Идентификатор списка, которому должна принадлежать задача.
+        :type todo_id: int, optional
+        :param before: Номер ревизии, с которой продолжается чтение (не включая ее).
+        :type before: int, optional
+        :param limit: Максимальное количество ревизий.
+        :type limit: int
+        :rtype: list[TaskRevision]
+        """
+        task = TaskService.get_task(task_id, todo_id)
+        return revisions.history(task.id, before, limit)
+
+    @staticmethod
+    def delete_task(task_id, todo_id=None):
+        """
+        Удаляет задачу вместе со всеми ее подзадачами.
+
+        Поддерево удаляется запросами над множеством идентификаторов из таблицы
+        замыкания; задачи поддерева читаются одним запросом только для журнала событий.
+
+        :param task_id: Идентификатор задачи.
+        :type task_id: int
+        :param todo_id: Идентификатор списка, которому должна принадлежать задача.
+        :type todo_id: int, optional
+        """
+        task = TaskService.get_task(task_id, todo_id, for_update=True)
+        task_id, todo_id = task.id, task.todo_id
+        owner_id = TodoService.get_owner_id(todo_id)
+        subtree = tree.subtree_ids(task_id)
+        tasks = db.session.scalars(select(Task).where(Task.id.in_(subtree)).order_by(Task.id)).all()
+        task_ids = [task.id for task in tasks]
+        for task in tasks:
+            EventLog.task_deleted(task, owner_id)
+        db.session.execute(delete(TaskLabel).where(TaskLabel.task_id.in_(subtree))
+                           .execution_options(synchronize_session=False))
+        revisions.delete_for(subtree)
+        db.session.execute(delete(Task).where(Task.id.in_(subtree)))
+        tree.delete_subtree(task_id)
+        unit_of_work.commit()
+        unit_of_work.after_commit(lambda: cache.invalidate_entity(Task, *task_ids))
+        for deleted_id in task_ids:
+            notify_change(todo_id, 'task_deleted', id=deleted_id)
+
+    @staticmethod
+    def move_task(task_id, parent_id, todo_id=None):
+        """
+        Переносит задачу вместе с подзадачами под другую задачу того же списка или на верхний уровень.
+
+        :param task_id: Идентификатор задачи.
+        :type task_id: int
+        :param parent_id: Идентификатор нового родителя; None - верхний уровень.
+        :type parent_id: int or None
+        :param todo_id: Идентификатор списка, которому должна принадлежать задача.
+        :type todo_id: int, optional
+        :raises NotFound: Если задача или новый родитель не найдены в списке.
+        :raises BadRequest: Если новый родитель - сама задача или ее подзадача.
+        """
+        task = TaskService.get_task(task_id, todo_id, for_update=True)
+        if parent_id is not None:
+            parent_id = TaskService.get_task(parent_id, task.todo_id, for_update=True).id
+            if tree.is_in_subtree(parent_id, task.id):
+                abort(400)
+        old_parent_id = task.parent_id
+        if parent_id == old_parent_id:
+            return
+        owner_id = TodoService.get_owner_id(task.todo_id)
+        tree.move(task.id, parent_id, task.todo_id)
+        db.session.execute(update(Task).where(Task.id == task.id).values(parent_id=parent_id))
+        EventLog.append(EventType.TASK_UPDATED, owner_id, task.todo_id, task.id,
+                        {'parent_id': [old_parent_id, parent_id]})
+        unit_of_work.commit()
+        unit_of_work.after_commit(lambda: cache.invalidate_entity(Task, task.id))
+        notify_change(task.todo_id, 'task_updated', task=task_payload(task))
+
+    @staticmethod
+    def reorder_task(task_id, after_id=None, todo_id=None):
+        """
+        Ставит задачу в списке сразу после другой задачи или в начало списка.
+
+        Задача получает ключ порядка между ключом ``after_id`` и следующим за ним
+        ключом списка, поэтому меняется одна строка. Если ключ получился длиннее
+        ``RANK_REBALANCE_LENGTH``, ключи списка переписываются позже (см. ``todo_list.rebalancer``).
+
+        :param task_id: Идентификатор задачи.
+        :type task_id: int
+        :param after_id: Идентификатор задачи, после которой встает задача; None - начало списка.
+        :type after_id: int, optional
+        :param todo_id: Идентификатор списка, которому должна принадлежать задача.
+        :type todo_id: int, optional
+        :return: Новый ключ порядка задачи.
+        :rtype: str
+        :raises NotFound: Если задача или задача ``after_id`` не найдены в списке.
+        :raises BadRequest: Если задачу просят поставить после самой себя.
+        """
+        task = TaskService.get_task(task_id, todo_id, for_update=True)
+        others = select(Task.rank).where(Task.todo_id == task.todo_id, Task.id != task.id)
+        lower = None
+        if after_id is not None:
+            after_id = _identifier(after_id)
+            if after_id == task.id:
+                abort(400)
+            lower = db.session.scalar(others.where(Task.id == after_id))
+            if lower is None:
+                abort(404)
+            others = others.where(Task.rank > lower)
+        upper = db.session.scalar(others.order_by(Task.rank).limit(1))
+        rank = ranking.key_between(lower, upper)
+        db.session.execute(update(Task).where(Task.id == task.id).values(rank=rank))
+        unit_of_work.commit()
+        unit_of_work.after_commit(lambda: cache.invalidate_entity(Task, task.id))
+        if rank_rebalancer.max_length and len(rank) > rank_rebalancer.max_length:
+            unit_of_work.after_commit(lambda: rank_rebalancer.schedule(task.todo_id))
+        notify_change(task.todo_id, 'task_reordered', id=task.id, after_id=after_id)
+        return rank
+
+    @staticmethod
+    def get_progress(todo_id):
+        """
+        Возвращает сводный прогресс подзадач для задач списка, у которых они есть.
+
+        :param todo_id: Идентификатор списка задач.
+        :type todo_id: int
+        :return: Словарь ``{идентификатор задачи: (подзадач всего, из них выполнено)}``.
+        :rtype: dict[int, tuple[int, int]]
+        """
+        return tree.progress(todo_id)
+
+
+class MemberService:
+    """
+    Сервис участников общих списков задач.
+    """
+
+    @staticmethod
+    def get_members(todo_id):
+        """
+        Возвращает участников списка задач с именами пользователей.
+
+        :param todo_id: Идентификатор списка задач.
+        :type todo_id: int
+        :return: Пары (участник, имя пользователя).
+        :rtype: list[tuple[TodoMember, str]]
+        """
+        return db.session.execute(
+            select(TodoMember, User.username)
+            .join(User, User.id == TodoMember.user_id)
+            .where(TodoMember.todo_id == todo_id)
+            .order_by(User.username)
+        ).all()
+
+    @staticmethod
+    def set_member(todo_id, user_id, role):
+        """
+        Открывает список пользователю с указанной ролью или меняет его роль.
+
+        :param todo_id: Идентификатор списка задач.
+        :type todo_id: int
+        :param user_id: Идентификатор пользователя.
+        :type user_id: int
+        :param role: Роль (см. ``Role``).
+        :type role: str
+        :raises ValueError: Если пользователь - создатель списка.
+        """
+        todo_list = TodoService.get_todo(todo_id, for_update=True)
+        if todo_list.user_id == user_id:
+            raise ValueError('Создатель списка всегда является его владельцем.')
+        member = db.session.get(TodoMember, (todo_list.id, user_id))
+        if member is None:
+            db.session.add(TodoMember(todo_id=todo_list.id, user_id=user_id, role=role))
+        elif member.role == role:
+            return
+        else:
+            member.role = role
+        EventLog.append(EventType.MEMBER_ADDED, todo_list.user_id, todo_list.id,
+                        data={'member_id': user_id, 'role': role})
+        unit_of_work.commit()
+        MemberService._membership_changed(todo_list.id, user_id)
+
+    @staticmethod
+    def remove_member(todo_id, user_id):
+        """
+        Закрывает пользователю доступ к списку задач.
+
+        :param todo_id: Идентификатор списка задач.
+        :type todo_id: int
+        :param user_id: Идентификатор пользователя.
+        :type user_id: int
+        """
+        todo_list = TodoService.get_todo(todo_id, for_update=True)
+        member = db.session.get(TodoMember, (todo_list.id, user_id))
+        if member is None:
+            return
+        db.session.delete(member)
+        EventLog.append(EventType.MEMBER_REMOVED, todo_list.user_id, todo_list.id, data={'member_id': user_id})
+        unit_of_work.commit()
+        MemberService._membership_changed(todo_list.id, user_id)
+        # Открытые потоки событий удаленного участника закрываются по этому событию (см. todo_events)
+        notify_change(todo_list.id, 'member_removed', member_id=user_id)
+
+    @staticmethod
+    def _membership_changed(todo_id, user_id):
+        """Сбрасывает кэши прав, списков и производных данных участника после фиксации."""
+        def invalidate():
+            PermissionService.invalidate(todo_id, user_id)
+            cache.delete(f'todo_lists:{user_id}')
+            invalidate_user_caches(user_id)
+
+        unit_of_work.after_commit(invalidate)
+
+
+def _bit_positions(mask):
+    """
+    Перебирает номера установленных битов маски по возрастанию.
+
+    :param mask: Битовая маска.
+    :type mask: int
+    :return: Номера битов.
+    :rtype: Iterator[int]
+    """
+    while mask:
+        lowest = mask & -mask
+        yield lowest.bit_length() - 1
+        mask ^= lowest
+
+
+class LabelService:
+    """
+    Сервис меток задач.
+
+    Для фильтрации по меткам каждому списку строится индекс: идентификаторы
+    задач списка по возрастанию и для каждой метки битовая маска, в которой
+    бит ``i`` означает, что метка стоит на ``i``-й задаче. Индекс строится
+    одним запросом, кэшируется до изменения списка, а фильтры «любая из
+    меток» и «все метки» и счетчики задач по меткам считаются по маскам
+    без обращения к базе данных.
+    """
 
     @staticmethod
-    def delete_task(task_id):
+    def get_labels(user_id):
         """
-        Удаляет задачу.
+        Возвращает метки пользователя.
+
+        :param user_id: Идентификатор пользователя.
+        :type user_id: int
+        :return: Метки по алфавиту.
+        :rtype: list[Label]
+        """
+        return Label.query.filter_by(user_id=user_id).order_by(Label.name).all()
+
+    @staticmethod
+    def create_label(user_id, name):
+        """
+        Создает метку пользователя.
+
+        :param user_id: Идентификатор пользователя.
+        :type user_id: int
+        :param name: Название метки.
+        :type name: str
+        :return: Созданная метка.
+        :rtype: Label
+        :raises ValueError: Если у пользователя уже есть метка с таким названием.
+        """
+        if Label.query.filter_by(user_id=user_id, name=name).first() is not None:
+            raise ValueError('Метка с таким названием уже есть.')
+        label = Label(user_id=user_id, name=name)
+        db.session.add(label)
+        unit_of_work.commit()
+        return label
+
+    @staticmethod
+    def delete_label(user_id, label_id):
+        """
+        Удаляет метку пользователя и снимает ее со всех задач.
+
+        :param user_id: Идентификатор пользователя.
+        :type user_id: int
+        :param label_id: Идентификатор метки.
+        :type label_id: int
+        :raises NotFound: Если метка не найдена или принадлежит другому пользователю.
+        """
+        label = db.session.get(Label, _identifier(label_id))
+        if label is None or label.user_id != user_id:
+            abort(404)
+        todo_ids = db.session.scalars(
+            select(Task.todo_id).join(TaskLabel, TaskLabel.task_id == Task.id)
+            .where(TaskLabel.label_id == label.id).distinct()).all()
+        db.session.execute(delete(TaskLabel).where(TaskLabel.label_id == label.id))
+        db.session.delete(label)
+        unit_of_work.commit()
+        unit_of_work.after_commit(lambda: cache.delete(*(f'label_index:{todo_id}' for todo_id in todo_ids)))
+
+    @staticmethod
+    def set_task_labels(task_id, todo_id, user_id, label_ids):
+        """
+        Заменяет метки пользователя на задаче; метки других участников списка не меняются.
 
         :param task_id: Идентификатор задачи.
         :type task_id: int
+        :param todo_id: Идентификатор списка, которому должна принадлежать задача.
+        :type todo_id: int
+        :param user_id: Идентификатор пользователя.
+        :type user_id: int
+        :param label_ids: Идентификаторы меток пользователя.
+        :type label_ids: list[int]
+        :raises NotFound: Если задача не найдена или среди меток есть чужие.
+        """
+        task = TaskService.get_task(task_id, todo_id)
+        label_ids = set(label_ids)
+        own = select(Label.id).where(Label.user_id == user_id)
+        if label_ids and len(db.session.scalars(own.where(Label.id.in_(label_ids))).all()) != len(label_ids):
+            abort(404)
+        db.session.execute(delete(TaskLabel).where(TaskLabel.task_id == task.id, TaskLabel.label_id.in_(own))
+                           .execution_options(synchronize_session=False))
+        if label_ids:
+            db.session.execute(insert(TaskLabel), [
+                {'task_id': task.id, 'label_id': label_id} for label_id in sorted(label_ids)])
+        unit_of_work.commit()
+        unit_of_work.after_commit(lambda: cache.delete(f'label_index:{task.todo_id}'))
+
+    @staticmethod
+    def _build_index(todo_id):
+        """Строит индекс меток списка одним запросом по задачам списка и их связям с метками."""
+        task_ids, masks = [], {}
+        rows = db.session.execute(
+            select(Task.id, TaskLabel.label_id)
+            .outerjoin(TaskLabel, TaskLabel.task_id == Task.id)
+            .where(Task.todo_id == todo_id)
+            .order_by(Task.id))
+        for task_id, label_id in rows:
+            if not task_ids or task_ids[-1] != task_id:
+                task_ids.append(task_id)
+            if label_id is not None:
+                masks[label_id] = masks.get(label_id, 0) | 1 << (len(task_ids) - 1)
+        return {'task_ids': task_ids, 'masks': masks}
+
+    @staticmethod
+    def get_index(todo_id):
+        """
+        Возвращает индекс меток списка задач.
+
+        :param todo_id: Идентификатор списка задач.
+        :type todo_id: int
+        :return: Словарь с ключами ``task_ids`` (идентификаторы задач по возрастанию)
+            и ``masks`` (битовая маска задач по идентификатору метки).
+        :rtype: dict
+        """
+        return cache.get_or_set(f'label_index:{todo_id}', lambda: LabelService._build_index(todo_id))
+
+    @staticmethod
+    def filter_tasks(todo_id, label_ids, match='any'):
+        """
+        Возвращает идентификаторы задач списка, отмеченных любой или всеми указанными метками.
+
+        :param todo_id: Идентификатор списка задач.
+        :type todo_id: int
+        :param label_ids: Идентификаторы меток.
+        :type label_ids: list[int]
+        :param match: ``any`` - хотя бы одна из меток, ``all`` - все метки.
+        :type match: str
+        :return: Идентификаторы задач по возрастанию.
+        :rtype: list[int]
+        """
+        index = LabelService.get_index(todo_id)
+        masks = [index['masks'].get(label_id, 0) for label_id in label_ids]
+        if not masks:
+            return list(index['task_ids'])
+        selected = masks[0]
+        for mask in masks[1:]:
+            selected = selected & mask if match == 'all' else selected | mask
+        return [index['task_ids'][position] for position in _bit_positions(selected)]
+
+    @staticmethod
+    def get_list_labels(todo_id, user_id):
+        """
+        Возвращает метки пользователя со счетчиками задач списка и метки каждой задачи.
+
+        Счетчики и метки задач берутся из индекса меток списка.
+
+        :param todo_id: Идентификатор списка задач.
+        :type todo_id: int
+        :param user_id: Идентификатор пользователя.
+        :type user_id: int
+        :return: Пары (метка, количество задач) и идентификаторы меток по идентификатору задачи.
+        :rtype: tuple[list[tuple[Label, int]], dict[int, list[int]]]
+        """
+        index = LabelService.get_index(todo_id)
+        labels = LabelService.get_labels(user_id)
+        task_labels = {}
+        for label in labels:
+            for position in _bit_positions(index['masks'].get(label.id, 0)):
+                task_labels.setdefault(index['task_ids'][position], []).append(label.id)
+        return [(label, index['masks'].get(label.id, 0).bit_count()) for label in labels], task_labels
+
+
+class NextUpService:
+    """
+    Сервис ближайших задач пользователя по всем его спискам.
+    """
+
+    @staticmethod
+    def _stream(todo_id, limit, with_deadline):
+        """
+        Возвращает незавершенные задачи одного списка в порядке индекса ``ix_task_next_up``.
+
+        :param todo_id: Идентификатор списка задач.
+        :type todo_id: int
+        :param limit: Максимальное количество задач.
+        :type limit: int
+        :param with_deadline: Выбирать задачи с дедлайном (иначе - без дедлайна).
+        :type with_deadline: bool
+        :return: Задачи списка.
+        :rtype: list[Task]
+        """
+        query = Task.query.filter(Task.todo_id == todo_id, Task.is_complete == False)
+        if with_deadline:
+            query = query.filter(Task.deadline_date.isnot(None)).order_by(
+                Task.deadline_date, Task.priority.desc())
+        else:
+            query = query.filter(Task.deadline_date.is_(None)).order_by(Task.priority.desc())
+        return query.limit(limit).all()
+
+    @staticmethod
+    def _compute(user_id, k):
+        """
+        Выбирает k ближайших незавершенных задач слиянием отсортированных потоков по спискам.
+
+        Каждый поток - индексный запрос с ``LIMIT k`` по одному списку, поэтому
+        читается не больше ``k`` задач на список. Задачи без дедлайна идут после
+        задач с дедлайном и читаются, только если первых не хватило.
+
+        :param user_id: Идентификатор пользователя.
+        :type user_id: int
+        :param k: Количество задач.
+        :type k: int
+        :return: Задачи в виде словарей.
+        :rtype: list[dict]
+        """
+        todo_lists = dict(
+            db.session.query(TodoList.id, TodoList.title).filter(TodoList.id.in_(accessible_todo_ids(user_id))).all()
+        )
+        streams = [NextUpService._stream(todo_id, k, True) for todo_id in todo_lists]
+        tasks = list(islice(heapq.merge(
+            *streams, key=lambda task: (task.deadline_date, -task.priority, task.id)), k))
+        if len(tasks) < k:
+            rest = k - len(tasks)
+            streams = [NextUpService._stream(todo_id, rest, False) for todo_id in todo_lists]
+            tasks.extend(islice(heapq.merge(
+                *streams, key=lambda task: (-task.priority, task.id)), rest))
+        return [
+            {**task_payload(task), 'todo_id': task.todo_id, 'todo_title': todo_lists[task.todo_id]}
+            for task in tasks
+        ]
+
+    @staticmethod
+    def get_next_up(user_id, k=10):
         """
-        task = Task.query.get_or_404(task_id)
-        db.session.delete(task)
-        db.session.commit()
\ No newline at end of file
+        Возвращает k ближайших незавершенных задач пользователя по всем спискам.
+
+        Задачи упорядочены по дедлайну, затем по убыванию приоритета. Результат
+        кэшируется по версии данных пользователя, то есть до следующего изменения его задач.
+
+        :param user_id: Идентификатор пользователя.
+        :type user_id: int
+        :param k: Количество задач.
+        :type k: int
+        :return: Задачи в виде словарей.
+        :rtype: list[dict]
+        """
+        return cache.get_or_set(f'next_up:{user_id}:{k}:{get_data_version(user_id)}',
+                                lambda: NextUpService._compute(user_id, k))
+
+
+class CalendarService:
+    """
+    Сервис календаря задач пользователя.
+    """
+
+    @staticmethod
+    def _bounds(start, end):
+        """Возвращает полуинтервал дедлайнов ``[start 00:00, end+1 00:00)``."""
+        return datetime.combine(start, time.min), datetime.combine(end + timedelta(days=1), time.min)
+
+    @staticmethod
+    def get_day_counts(user_id, start, end):
+        """
+        Возвращает счетчики задач по дням дедлайна.
+
+        Группировка выполняется в SQL одним запросом по диапазону индекса
+        ``ix_task_todo_deadline``.
+
+        :param user_id: Идентификатор пользователя.
+        :type user_id: int
+        :param start: Первый день диапазона.
+        :type start: date
+        :param end: Последний день диапазона (включительно).
+        :type end: date
+        :return: Словари ``{'date', 'total', 'done', 'overdue'}`` в порядке дат.
+        :rtype: list[dict]
+        """
+        lower, upper = CalendarService._bounds(start, end)
+        day = func.date(Task.deadline_date).label('day')
+        rows = db.session.query(
+            day,
+            func.count(Task.id),
+            func.sum(case((Task.is_complete == True, 1), else_=0)),
+            func.sum(case((Task.status == TaskStatus.OVERDUE, 1), else_=0)),
+        ).filter(
+            Task.todo_id.in_(accessible_todo_ids(user_id)),
+            Task.deadline_date >= lower,
+            Task.deadline_date < upper,
+        ).group_by(day).order_by(day)
+        return [
+            {'date': row[0], 'total': row[1], 'done': row[2], 'overdue': row[3]}
+            for row in rows
+        ]
+
+    @staticmethod
+    def iter_tasks(user_id, start, end, batch_size=500):
+        """
+        Перебирает задачи пользователя с дедлайном в диапазоне, не загружая их все в память.
+
+        :param user_id: Идентификатор пользователя.
+        :type user_id: int
+        :param start: Первый день диапазона.
+        :type start: date
+        :param end: Последний день диапазона (включительно).
+        :type end: date
+        :param batch_size: Количество задач, читаемых из базы за раз.
+        :type batch_size: int
+        :return: Пары (день дедлайна в формате ISO, задача в виде словаря).
+        :rtype: Iterator[tuple[str, dict]]
+        """
+        lower, upper = CalendarService._bounds(start, end)
+        query = select(Task).where(
+            Task.todo_id.in_(accessible_todo_ids(user_id)),
+            Task.deadline_date >= lower,
+            Task.deadline_date < upper,
+        ).order_by(Task.deadline_date, Task.id).execution_options(yield_per=batch_size)
+        for task in db.session.scalars(query):
+            yield task.deadline_date.date().isoformat(), {**task_payload(task), 'todo_id': task.todo_id}
+
+    @staticmethod
+    def get_calendar(user_id, start, end, with_tasks=True):
+        """
+        Возвращает календарь задач пользователя, сгруппированный по дням дедлайна.
+
+        Результат кэшируется по ключу (пользователь, диапазон, версия данных).
+
+        :param user_id: Идентификатор пользователя.
+        :type user_id: int
+        :param start: Первый день диапазона.
+        :type start: date
+        :param end: Последний день диапазона (включительно).
+        :type end: date
+        :param with_tasks: Включать ли задачи каждого дня.
+        :type with_tasks: bool
+        :return: Дни со счетчиками и (при ``with_tasks``) задачами.
+        :rtype: list[dict]
+        """
+        def load():
+            days = [dict(counts, tasks=[]) if with_tasks else counts
+                    for counts in CalendarService.get_day_counts(user_id, start, end)]
+            if with_tasks:
+                by_date = {day['date']: day for day in days}
+                for day, task in CalendarService.iter_tasks(user_id, start, end):
+                    by_date[day]['tasks'].append(task)
+            return days
+
+        key = f'calendar:{user_id}:{start}:{end}:{int(with_tasks)}:{get_data_version(user_id)}'
+        return cache.get_or_set(key, load)
@@ -0,0 +1,155 @@
+"""Периодический перевод задач с истекшим дедлайном в состояние «просрочена»."""
+
+import time
+from datetime import datetime
+from threading import Lock
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import select, update
+
+from cache import cache
+from database import db
+from events.models import EventType
+from events.services import EventLog
+from pubsub import hub
+from todo_list.models import Task, TaskStatus, TodoList, TodoMember
+
+
+class OverdueSweeper:
+    """
+    Обходчик просроченных задач.
+
+    Каждый проход выполняет одно ``UPDATE`` по индексу ``(status, deadline_date)``
+    и затрагивает только дедлайны, истекшие с момента предыдущего прохода.
+    Переходы состояния записываются в журнал событий той же транзакцией.
+    Первый проход после запуска процесса охватывает весь диапазон до текущего момента.
+
+    Проходы выполняет отдельный процесс ``flask sweep-overdue --loop``; проходы
+    перед запросами (``OVERDUE_SWEEP_ON_REQUEST``) оставлены для разработки без
+    него, так как запрос, на который пришелся проход, платит за ``UPDATE`` и фиксацию.
+
+    :param interval: Минимальный интервал между проходами в секундах.
+    :type interval: int
+    """
+
+    def __init__(self, interval=60):
+        self.interval = interval
+        self.last_sweep = None
+        self._last_run = 0.0
+        self._lock = Lock()
+
+    def init_app(self, app):
+        """
+        Подключает обходчик к приложению.
+
+        Интервал берется из ``OVERDUE_SWEEP_INTERVAL``. Проходы перед запросами
+        подключаются только при ``OVERDUE_SWEEP_ON_REQUEST`` и ненулевом интервале.
+
+        :param app: Экземпляр приложения.
+        :type app: Flask
+        """
+        self.interval = app.config.get('OVERDUE_SWEEP_INTERVAL', self.interval)
+        if self.interval and app.config.get('OVERDUE_SWEEP_ON_REQUEST', False):
+            app.before_request(self._before_request)
+        app.cli.add_command(sweep_overdue_command)
+
+    def sweep(self, now=None):
+        """
+        Переводит активные задачи с истекшим дедлайном в состояние «просрочена».
+
+        После фиксации сбрасываются кэши только пользователей с доступом к
+        затронутым спискам, а в каналы этих списков публикуется ``task_updated``.
+
+        :param now: Верхняя граница диапазона дедлайнов.
+        :type now: datetime, optional
+        :return: Количество обновленных задач.
+        :rtype: int
+        """
+        now = now or datetime.now()
+        query = update(Task).where(
+            Task.status == TaskStatus.ACTIVE,
+            Task.deadline_date <= now)
+        if self.last_sweep is not None:
+            query = query.where(Task.deadline_date > self.last_sweep)
+        rows = db.session.execute(
+            query.values(status=TaskStatus.OVERDUE).returning(Task.id, Task.todo_id),
+            execution_options={'synchronize_session': False}).all()
+        task_ids = [task_id for task_id, _ in rows]
+        todo_ids = {todo_id for _, todo_id in rows}
+        if rows:
+            owners = dict(db.session.execute(
+                select(TodoList.id, TodoList.user_id).where(TodoList.id.in_(todo_ids))).all())
+            EventLog.append_many([
+                {'type': EventType.TASK_UPDATED, 'user_id': owners[todo_id], 'todo_id': todo_id,
+                 'task_id': task_id, 'data': {'status': [TaskStatus.ACTIVE, TaskStatus.OVERDUE]}}
+                for task_id, todo_id in rows
+            ])
+        db.session.commit()
+        self.last_sweep = now
+        if task_ids:
+            self._notify(task_ids, todo_ids, set(owners.values()))
+        return len(task_ids)
+
+    @staticmethod
+    def _notify(task_ids, todo_ids, owner_ids):
+        """
+        Сбрасывает кэши затронутых задач и пользователей и сообщает об изменениях подписчикам списков.
+
+        :param task_ids: Идентификаторы просроченных задач.
+        :type task_ids: list[int]
+        :param todo_ids: Идентификаторы их списков.
+        :type todo_ids: set[int]
+        :param owner_ids: Владельцы этих списков.
+        :type owner_ids: set[int]
+        """
+        from todo_list.services import invalidate_user_caches, task_payload, todo_channel
+
+        cache.invalidate_entity(Task, *task_ids)
+        members = db.session.scalars(select(TodoMember.user_id).where(TodoMember.todo_id.in_(todo_ids)))
+        for user_id in owner_ids.union(members):
+            invalidate_user_caches(user_id)
+        for task in db.session.scalars(select(Task).where(Task.id.in_(task_ids))):
+            hub.publish(todo_channel(task.todo_id), {'type': 'task_updated', 'task': task_payload(task)})
+
+    def sweep_if_due(self):
+        """
+        Выполняет проход, если с предыдущего прошло не меньше ``interval`` секунд.
+
+        :return: Количество обновленных задач или None, если проход не выполнялся.
+        :rtype: int or None
+        """
+        if time.monotonic() - self._last_run < self.interval:
+            return None
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            self._last_run = time.monotonic()
+            return self.sweep()
+        finally:
+            self._lock.release()
+
+    def _before_request(self):
+        """Запускает проход перед обработкой запроса, не подменяя ответ."""
+        self.sweep_if_due()
+
+
+overdue_sweeper = OverdueSweeper()
+
+
+@click.command('sweep-overdue')
+@click.option('--loop', is_flag=True, help='Работать постоянно, выполняя проход каждые --interval секунд.')
+@click.option('--interval', type=click.FloatRange(0), default=None,
+              help='Пауза между проходами в режиме --loop (в секундах; по умолчанию OVERDUE_SWEEP_INTERVAL).')
+@with_appcontext
+def sweep_overdue_command(loop, interval):
+    """Помечает задачи с истекшим дедлайном как просроченные."""
+    if interval is None:
+        interval = overdue_sweeper.interval or 60
+    while True:
+        updated = overdue_sweeper.sweep()
+        if updated or not loop:
+            click.echo(f'Просроченных задач отмечено: {updated}')
+        if not loop:
+            break
+        time.sleep(interval)
@@ -0,0 +1,134 @@
+"""
+Дерево подзадач на таблице замыкания ``task_closure``.
+
+Для каждой пары (предок, потомок) хранится строка с расстоянием между ними,
+поэтому поддерево задачи, ее предки и сводный прогресс списка читаются одним
+индексированным запросом, а перемещение и удаление поддерева выполняются
+несколькими запросами над множествами строк независимо от глубины дерева.
+Пары задачи с самой собой не хранятся: в запросах задача добавляется к своему
+поддереву явно.
+"""
+
+from sqlalchemy import case, delete, func, insert, literal, select, true, union_all
+
+from database import db
+from todo_list.models import Task, TaskClosure
+
+
+def subtree_ids(task_id):
+    """
+    Возвращает запрос идентификаторов задачи и всех ее подзадач на любой глубине.
+
+    :param task_id: Идентификатор корня поддерева.
+    :type task_id: int
+    :return: Запрос с одной колонкой идентификаторов.
+    :rtype: sqlalchemy.sql.Select
+    """
+    return union_all(select(literal(task_id)),
+                     select(TaskClosure.descendant_id).where(TaskClosure.ancestor_id == task_id))
+
+
+def is_in_subtree(task_id, root_id):
+    """
+    Проверяет, что задача - корень поддерева или одна из его подзадач.
+
+    :param task_id: Идентификатор проверяемой задачи.
+    :type task_id: int
+    :param root_id: Идентификатор корня поддерева.
+    :type root_id: int
+    :rtype: bool
+    """
+    if task_id == root_id:
+        return True
+    return db.session.scalar(select(TaskClosure.depth).where(
+        TaskClosure.ancestor_id == root_id, TaskClosure.descendant_id == task_id)) is not None
+
+
+def attach(task_id, parent_id, todo_id):
+    """
+    Записывает новую задачу без подзадач потомком ``parent_id`` и всех его предков.
+
+    :param task_id: Идентификатор новой задачи.
+    :type task_id: int
+    :param parent_id: Идентификатор родительской задачи.
+    :type parent_id: int
+    :param todo_id: Идентификатор списка задач.
+    :type todo_id: int
+    """
+    ancestors = union_all(
+        select(literal(parent_id), literal(task_id), literal(1), literal(todo_id)),
+        select(TaskClosure.ancestor_id, literal(task_id), TaskClosure.depth + 1, literal(todo_id))
+        .where(TaskClosure.descendant_id == parent_id))
+    db.session.execute(insert(TaskClosure).from_select(
+        ['ancestor_id', 'descendant_id', 'depth', 'todo_id'], ancestors))
+
+
+def move(task_id, parent_id, todo_id):
+    """
+    Переносит поддерево задачи под нового родителя (None - на верхний уровень).
+
+    Связи поддерева с прежними предками удаляются одним запросом, связи с
+    новыми предками добавляются одним запросом-произведением множеств
+    (предки нового родителя) x (поддерево). Связи внутри поддерева не меняются.
+    Родитель не должен входить в поддерево (см. ``is_in_subtree``).
+
+    :param task_id: Идентификатор корня поддерева.
+    :type task_id: int
+    :param parent_id: Идентификатор нового родителя.
+    :type parent_id: int or None
+    :param todo_id: Идентификатор списка задач.
+    :type todo_id: int
+    """
+    old_ancestors = select(TaskClosure.ancestor_id).where(TaskClosure.descendant_id == task_id)
+    db.session.execute(delete(TaskClosure).where(
+        TaskClosure.descendant_id.in_(subtree_ids(task_id)),
+        TaskClosure.ancestor_id.in_(old_ancestors)).execution_options(synchronize_session=False))
+    if parent_id is None:
+        return
+    above = union_all(
+        select(literal(parent_id).label('node'), literal(0).label('depth')),
+        select(TaskClosure.ancestor_id, TaskClosure.depth).where(TaskClosure.descendant_id == parent_id)
+    ).subquery('above')
+    below = union_all(
+        select(literal(task_id).label('node'), literal(0).label('depth')),
+        select(TaskClosure.descendant_id, TaskClosure.depth).where(TaskClosure.ancestor_id == task_id)
+    ).subquery('below')
+    pairs = select(above.c.node, below.c.node, above.c.depth + below.c.depth + 1, literal(todo_id)) \
+        .select_from(above.join(below, true()))
+    db.session.execute(insert(TaskClosure).from_select(
+        ['ancestor_id', 'descendant_id', 'depth', 'todo_id'], pairs))
+
+
+def delete_subtree(task_id):
+    """
+    Удаляет связи поддерева задачи: с его предками и внутри него.
+
+    Сами задачи удаляются вызывающим кодом (по тому же ``subtree_ids``) до
+    вызова этой функции, пока связи еще существуют.
+
+    :param task_id: Идентификатор корня поддерева.
+    :type task_id: int
+    """
+    db.session.execute(delete(TaskClosure).where(TaskClosure.descendant_id.in_(subtree_ids(task_id)))
+                       .execution_options(synchronize_session=False))
+
+
+def progress(todo_id):
+    """
+    Возвращает сводный прогресс подзадач всех задач списка, у которых есть подзадачи.
+
+    Считается одним запросом по индексу ``ix_task_closure_todo``: строки
+    замыкания списка группируются по предку, состояние потомков берется из
+    ``task`` по первичному ключу.
+
+    :param todo_id: Идентификатор списка задач.
+    :type todo_id: int
+    :return: Словарь ``{идентификатор задачи: (подзадач всего, из них выполнено)}``.
+    :rtype: dict[int, tuple[int, int]]
+    """
+    rows = db.session.execute(
+        select(TaskClosure.ancestor_id, func.count(), func.sum(case((Task.is_complete, 1), else_=0)))
+        .join(Task, Task.id == TaskClosure.descendant_id)
+        .where(TaskClosure.todo_id == todo_id)
+        .group_by(TaskClosure.ancestor_id))
+    return {ancestor_id: (total, completed) for ancestor_id, total, completed in rows}
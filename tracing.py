@@ -0,0 +1,554 @@
+"""
+Трассировка запросов: интервалы (spans) запроса, методов сервисов, SQL-запросов и шаблонов.
+
+Для выбранного запроса (доля ``TRACING_SAMPLE_RATE`` или решение вызывающей
+стороны из заголовка W3C ``traceparent``) в ``g`` заводится трасса. Пока она
+есть, интервалы записываются для:
+
+* всего запроса (от сигнала ``request_started`` до ``teardown_request``, то
+  есть вместе с ``before_request``, загрузкой пользователя и потоковой отдачей);
+* каждого вызова статического метода классов ``*Service`` из ``TRACED_MODULES``;
+* каждого SQL-запроса (события ``Engine``);
+* каждой отрисовки шаблона (сигналы Flask);
+* функций, отмеченных декоратором ``traced``.
+
+Запросы, не попавшие в выборку, трассу не получают, и обработчики сводятся к
+проверке ``g``. Завершенная трасса передается экспортеру в формате OTLP/JSON
+(OpenTelemetry): ``local`` - в память процесса, ``file`` - строкой JSON в файл,
+``otlp`` - в коллектор по HTTP из фонового потока. Сводка по трассе
+добавляется к ответу заголовком ``Server-Timing``, а при ``TRACING_TOOLBAR`` -
+панелью внизу HTML-страницы.
+"""
+
+import functools
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+from collections import deque
+from importlib import import_module
+
+from flask import (before_render_template, current_app, g, has_app_context, request, request_started,
+                   template_rendered)
+from markupsafe import escape
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+STATUS_ERROR = 2
+
+TRACED_MODULES = ('users.services', 'todo_list.services', 'todo_list.permissions', 'archive.services',
+                  'events.projections', 'notifications.services')
+TRACEPARENT = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+STATEMENT_MAX_LENGTH = 1000
+TOOLBAR_MAX_SPANS = 200
+
+
+class Span:
+    """
+    Интервал трассы.
+
+    :param trace_id: Идентификатор трассы (32 шестнадцатеричных символа).
+    :type trace_id: str
+    :param parent_id: Идентификатор родительского интервала.
+    :type parent_id: str, optional
+    :param name: Название интервала.
+    :type name: str
+    :param kind: Вид интервала (``SPAN_KIND_*``).
+    :type kind: int
+    :param category: Категория для сводки: ``request``, ``service``, ``sql``, ``template`` или ``function``.
+    :type category: str
+    :param attributes: Атрибуты интервала.
+    :type attributes: dict
+    """
+
+    __slots__ = ('trace_id', 'span_id', 'parent_id', 'name', 'kind', 'category', 'attributes', 'start', 'end',
+                 'error', 'depth')
+
+    def __init__(self, trace_id, parent_id, name, kind, category, attributes, depth=0):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.category = category
+        self.attributes = attributes
+        self.start = time.time_ns()
+        self.end = None
+        self.error = None
+        self.depth = depth
+
+    @property
+    def duration(self):
+        """Длительность интервала в миллисекундах (для незавершенного - до текущего момента)."""
+        return ((self.end or time.time_ns()) - self.start) / 1e6
+
+
+class Trace:
+    """
+    Трасса одного запроса: все интервалы в порядке открытия и стек открытых (``stack``).
+
+    :param trace_id: Идентификатор трассы; по умолчанию - новый.
+    :type trace_id: str, optional
+    :param parent_id: Идентификатор интервала вызывающей стороны (из ``traceparent``).
+    :type parent_id: str, optional
+    """
+
+    def __init__(self, trace_id=None, parent_id=None):
+        self.trace_id = trace_id or os.urandom(16).hex()
+        self.parent_id = parent_id
+        self.spans = []
+        self.stack = []
+
+    def start(self, name, kind=SPAN_KIND_INTERNAL, category='function', **attributes):
+        """
+        Открывает интервал, вложенный в последний открытый.
+
+        :param name: Название интервала.
+        :type name: str
+        :param kind: Вид интервала.
+        :type kind: int
+        :param category: Категория для сводки.
+        :type category: str
+        :return: Открытый интервал.
+        :rtype: Span
+        """
+        parent = self.stack[-1].span_id if self.stack else self.parent_id
+        span = Span(self.trace_id, parent, name, kind, category, attributes, len(self.stack))
+        self.spans.append(span)
+        self.stack.append(span)
+        return span
+
+    def end(self, span, error=None):
+        """
+        Закрывает интервал.
+
+        :param span: Интервал.
+        :type span: Span
+        :param error: Исключение, которым завершилась операция.
+        :type error: BaseException, optional
+        """
+        span.end = time.time_ns()
+        if error is not None:
+            span.error = f'{type(error).__name__}: {error}'
+        if span in self.stack:
+            self.stack.remove(span)
+
+    def summary(self):
+        """
+        Возвращает количество и суммарную длительность интервалов по категориям.
+
+        :return: Словарь ``{категория: (количество, миллисекунды)}``.
+        :rtype: dict
+        """
+        result = {}
+        for span in self.spans:
+            count, total = result.get(span.category, (0, 0.0))
+            result[span.category] = (count + 1, total + span.duration)
+        return result
+
+
+def current_trace():
+    """
+    Возвращает трассу текущего запроса.
+
+    :rtype: Trace or None
+    """
+    return g.get('_trace') if has_app_context() else None
+
+
+def traced(name=None, category='function'):
+    """
+    Декоратор: вызов функции записывается интервалом, если у запроса есть трасса.
+
+    :param name: Название интервала; по умолчанию - полное имя функции.
+    :type name: str, optional
+    :param category: Категория для сводки.
+    :type category: str
+    :return: Декоратор.
+    :rtype: callable
+    """
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            trace = current_trace()
+            if trace is None:
+                return func(*args, **kwargs)
+            span = trace.start(span_name, category=category, **{'code.function': func.__qualname__})
+            try:
+                result = func(*args, **kwargs)
+            except BaseException as error:
+                trace.end(span, error)
+                raise
+            trace.end(span)
+            return result
+
+        wrapper.__traced__ = True
+        return wrapper
+    return decorator
+
+
+def instrument(cls):
+    """
+    Оборачивает статические методы класса сервиса декоратором ``traced``.
+
+    Повторный вызов для того же класса ничего не меняет.
+
+    :param cls: Класс сервиса.
+    :type cls: type
+    :return: Тот же класс.
+    :rtype: type
+    """
+    for attribute, value in list(vars(cls).items()):
+        if isinstance(value, staticmethod) and not getattr(value.__func__, '__traced__', False):
+            setattr(cls, attribute, staticmethod(traced(category='service')(value.__func__)))
+    return cls
+
+
+def _attribute(key, value):
+    """Возвращает атрибут в виде OTLP/JSON ``KeyValue``."""
+    if isinstance(value, bool):
+        typed = {'boolValue': value}
+    elif isinstance(value, int):
+        typed = {'intValue': str(value)}
+    elif isinstance(value, float):
+        typed = {'doubleValue': value}
+    else:
+        typed = {'stringValue': str(value)}
+    return {'key': key, 'value': typed}
+
+
+def otlp_payload(traces, service_name):
+    """
+    Возвращает трассы в формате OTLP/JSON (``ExportTraceServiceRequest``).
+
+    :param traces: Завершенные трассы.
+    :type traces: list[Trace]
+    :param service_name: Имя сервиса (атрибут ресурса ``service.name``).
+    :type service_name: str
+    :rtype: dict
+    """
+    spans = []
+    for trace in traces:
+        for span in trace.spans:
+            item = {
+                'traceId': span.trace_id,
+                'spanId': span.span_id,
+                'name': span.name,
+                'kind': span.kind,
+                'startTimeUnixNano': str(span.start),
+                'endTimeUnixNano': str(span.end or span.start),
+                'attributes': [_attribute(key, value) for key, value in span.attributes.items()],
+            }
+            if span.parent_id:
+                item['parentSpanId'] = span.parent_id
+            if span.error:
+                item['status'] = {'code': STATUS_ERROR, 'message': span.error}
+            spans.append(item)
+    return {'resourceSpans': [{
+        'resource': {'attributes': [_attribute('service.name', service_name)]},
+        'scopeSpans': [{'scope': {'name': __name__}, 'spans': spans}],
+    }]}
+
+
+class LocalExporter:
+    """
+    Экспортер в память процесса: хранит последние трассы (для отладки и тестов).
+
+    :param maxsize: Количество хранимых трасс.
+    :type maxsize: int
+    :param service_name: Имя сервиса.
+    :type service_name: str
+    """
+
+    def __init__(self, maxsize=100, service_name='task-scheduler'):
+        self.service_name = service_name
+        self.traces = deque(maxlen=maxsize)
+
+    def export(self, trace):
+        """
+        Сохраняет трассу.
+
+        :param trace: Завершенная трасса.
+        :type trace: Trace
+        """
+        self.traces.append(trace)
+
+
+class FileExporter:
+    """
+    Экспортер в файл: каждая трасса - одна строка OTLP/JSON.
+
+    :param path: Путь к файлу.
+    :type path: str
+    :param service_name: Имя сервиса.
+    :type service_name: str
+    """
+
+    def __init__(self, path, service_name='task-scheduler'):
+        self.path = path
+        self.service_name = service_name
+        self._lock = threading.Lock()
+
+    def export(self, trace):
+        """
+        Дописывает трассу в файл.
+
+        :param trace: Завершенная трасса.
+        :type trace: Trace
+        """
+        line = json.dumps(otlp_payload([trace], self.service_name), ensure_ascii=False)
+        with self._lock, open(self.path, 'a', encoding='utf-8') as file:
+            file.write(line + '\n')
+
+
+class OtlpHttpExporter:
+    """
+    Экспортер в коллектор OpenTelemetry по OTLP/HTTP (JSON).
+
+    Трассы ставятся в ограниченную очередь и отправляются пачками из фонового
+    потока, поэтому запрос не ждет коллектор; при переполнении очереди новые
+    трассы отбрасываются.
+
+    :param endpoint: Адрес приема трасс, например ``http://localhost:4318/v1/traces``.
+    :type endpoint: str
+    :param service_name: Имя сервиса.
+    :type service_name: str
+    :param timeout: Таймаут отправки в секундах.
+    :type timeout: float
+    :param maxsize: Размер очереди трасс.
+    :type maxsize: int
+    :param batch_size: Максимальное количество трасс в одной отправке.
+    :type batch_size: int
+    """
+
+    def __init__(self, endpoint, service_name='task-scheduler', timeout=5, maxsize=1000, batch_size=50):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def export(self, trace):
+        """
+        Ставит трассу в очередь отправки.
+
+        :param trace: Завершенная трасса.
+        :type trace: Trace
+        """
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_thread(self):
+        """Запускает фоновый поток отправки (после fork - заново в каждом процессе)."""
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name='otlp-exporter', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        """Забирает трассы из очереди и отправляет их пачками."""
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.send(batch)
+            except OSError:
+                self.dropped += len(batch)
+
+    def send(self, traces):
+        """
+        Отправляет трассы в коллектор.
+
+        :param traces: Завершенные трассы.
+        :type traces: list[Trace]
+        """
+        body = json.dumps(otlp_payload(traces, self.service_name)).encode()
+        http_request = urllib.request.Request(self.endpoint, data=body, method='POST',
+                                              headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(http_request, timeout=self.timeout):
+            pass
+
+
+class Tracer:
+    """
+    Трассировка запросов приложения.
+    """
+
+    def init_app(self, app):
+        """
+        Подключает трассировку к приложению.
+
+        Включается настройкой ``TRACING_ENABLED``; экспортер выбирается
+        ``TRACING_EXPORTER`` (``local``, ``file`` или ``otlp``). Методы сервисов
+        оборачиваются один раз на процесс. Расширение подключается после
+        сжатия ответов, чтобы панель попадала в страницу до сжатия; поэтому
+        фиксация транзакции единицей работы в сводку ответа не входит, но
+        экспортируется вместе с трассой.
+
+        :param app: Экземпляр приложения.
+        :type app: Flask
+        """
+        if not app.config.get('TRACING_ENABLED', False):
+            return
+        service_name = app.config.get('TRACING_SERVICE_NAME', 'task-scheduler')
+        exporter = app.config.get('TRACING_EXPORTER', 'local')
+        if exporter == 'file':
+            exporter = FileExporter(app.config['TRACING_FILE'], service_name)
+        elif exporter == 'otlp':
+            exporter = OtlpHttpExporter(app.config['TRACING_OTLP_ENDPOINT'], service_name)
+        else:
+            exporter = LocalExporter(service_name=service_name)
+        app.extensions['tracing'] = exporter
+
+        for module_name in TRACED_MODULES:
+            module = import_module(module_name)
+            for name, value in vars(module).items():
+                if isinstance(value, type) and name.endswith('Service') and value.__module__ == module_name:
+                    instrument(value)
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            event.listen(Engine, 'handle_error', _handle_error)
+            before_render_template.connect(_before_render_template)
+            template_rendered.connect(_template_rendered)
+
+        request_started.connect(self._begin, app)
+        app.after_request(self._summarize)
+        app.teardown_request(self._finish)
+
+    def _begin(self, app, **extra):
+        """Решает, трассировать ли запрос, и открывает интервал запроса."""
+        g.pop('_trace', None)
+        parent = TRACEPARENT.match(request.headers.get('traceparent', ''))
+        if parent:
+            if not int(parent.group(3), 16) & 1:
+                return
+            trace = Trace(parent.group(1), parent.group(2))
+        elif random.random() < app.config.get('TRACING_SAMPLE_RATE', 1.0):
+            trace = Trace()
+        else:
+            return
+        g._trace = trace
+        trace.start(f'{request.method} {request.url_rule or request.path}', SPAN_KIND_SERVER, 'request',
+                    **{'http.request.method': request.method, 'url.path': request.path,
+                       'client.address': request.remote_addr or ''})
+
+    def _summarize(self, response):
+        """Добавляет к ответу заголовок ``Server-Timing`` и, если включена, панель трассы."""
+        trace = current_trace()
+        if trace is None or not trace.spans:
+            return response
+        root = trace.spans[0]
+        root.attributes['http.response.status_code'] = response.status_code
+        if request.endpoint:
+            root.attributes['flask.endpoint'] = request.endpoint
+        metrics = [f'total;dur={root.duration:.2f}']
+        for category, (count, total) in sorted(trace.summary().items()):
+            if category != 'request':
+                metrics.append(f'{category};desc="{category} x{count}";dur={total:.2f}')
+        response.headers['Server-Timing'] = ', '.join(metrics)
+        response.headers['X-Trace-Id'] = trace.trace_id
+        if (current_app.config.get('TRACING_TOOLBAR', False) and response.mimetype == 'text/html'
+                and not response.is_streamed and not response.direct_passthrough):
+            body = response.get_data(as_text=True)
+            position = body.rfind('</body>')
+            if position != -1:
+                response.set_data(body[:position] + toolbar(trace) + body[position:])
+        return response
+
+    def _finish(self, error=None):
+        """Закрывает интервал запроса и передает трассу экспортеру."""
+        trace = g.pop('_trace', None)
+        if trace is None or not trace.spans:
+            return
+        trace.end(trace.spans[0], error)
+        current_app.extensions['tracing'].export(trace)
+
+
+def toolbar(trace):
+    """
+    Возвращает HTML-панель со сводкой и деревом интервалов трассы.
+
+    :param trace: Трасса запроса.
+    :type trace: Trace
+    :rtype: str
+    """
+    summary = ' · '.join(f'{escape(category)}: {count} / {total:.1f} мс'
+                         for category, (count, total) in sorted(trace.summary().items()) if category != 'request')
+    rows = []
+    for span in trace.spans[:TOOLBAR_MAX_SPANS]:
+        rows.append(f'<tr><td style="padding-left:{span.depth}em">{escape(span.name)}</td>'
+                    f'<td>{escape(span.category)}</td><td class="text-right">{span.duration:.2f}</td></tr>')
+    return (f'<details id="trace-toolbar" class="fixed-bottom bg-light border-top small p-2" '
+            f'style="max-height:50vh;overflow:auto"><summary>Трасса {trace.trace_id}: '
+            f'{trace.spans[0].duration:.1f} мс · {summary}</summary>'
+            f'<table class="table table-sm mb-0"><tr><th>Интервал</th><th>Категория</th><th>мс</th></tr>'
+            f'{"".join(rows)}</table></details>')
+
+
+def _before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+    """Открывает интервал SQL-запроса."""
+    trace = current_trace()
+    if trace is not None and context is not None:
+        context._trace_span = trace.start(
+            statement.split(None, 1)[0].upper() if statement.strip() else 'SQL', SPAN_KIND_CLIENT, 'sql',
+            **{'db.system': connection.dialect.name, 'db.query.text': statement[:STATEMENT_MAX_LENGTH]})
+
+
+def _after_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+    """Закрывает интервал SQL-запроса."""
+    span = getattr(context, '_trace_span', None)
+    trace = current_trace()
+    if span is not None and trace is not None:
+        if cursor.rowcount is not None and cursor.rowcount >= 0:
+            span.attributes['db.response.returned_rows'] = cursor.rowcount
+        trace.end(span)
+
+
+def _handle_error(exception_context):
+    """Закрывает интервал SQL-запроса, завершившегося ошибкой."""
+    span = getattr(exception_context.execution_context, '_trace_span', None)
+    trace = current_trace()
+    if span is not None and trace is not None:
+        trace.end(span, exception_context.original_exception)
+
+
+def _before_render_template(sender, template, context, **extra):
+    """Открывает интервал отрисовки шаблона."""
+    trace = current_trace()
+    if trace is not None:
+        trace.start(f'render {template.name}', category='template', **{'template.name': template.name or ''})
+
+
+def _template_rendered(sender, template, context, **extra):
+    """Закрывает последний открытый интервал отрисовки этого шаблона."""
+    trace = current_trace()
+    if trace is None:
+        return
+    for span in reversed(trace.stack):
+        if span.category == 'template' and span.attributes.get('template.name') == (template.name or ''):
+            trace.end(span)
+            return
+
+
+tracer = Tracer()
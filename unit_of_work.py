@@ -0,0 +1,200 @@
+"""Единица работы: одна фиксация транзакции на запрос."""
+
+import logging
+from contextlib import contextmanager
+
+from flask import has_request_context
+from sqlalchemy import event
+
+from database import db
+
+STATE_KEY = 'unit_of_work'
+
+logger = logging.getLogger('unit_of_work')
+
+
+class _State:
+    """
+    Состояние единицы работы текущего запроса.
+
+    :param enabled: Копить изменения до конца запроса (False - фиксировать сразу).
+    :type enabled: bool
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.staged = False
+        self.callbacks = []
+
+
+class UnitOfWork:
+    """
+    Единица работы, охватывающая HTTP-запрос.
+
+    Пока запрос обрабатывается, ``commit`` сервисов только отправляет изменения
+    в базу (``flush``), а транзакция фиксируется один раз после формирования
+    ответа. Если обработчик завершился исключением или ответом с кодом ошибки,
+    все изменения запроса откатываются. Действия, которые должны видеть только
+    зафиксированные данные (сброс кэша, публикация событий), регистрируются через
+    ``after_commit`` и выполняются после фиксации. Ошибка такого действия
+    (например, недоступен Redis) записывается в журнал и не прерывает остальные
+    действия: изменения уже зафиксированы, и клиент не должен получить ошибку.
+
+    Вне запроса (команды CLI, фоновые задачи) и внутри ``autocommit`` каждый
+    вызов ``commit`` фиксирует транзакцию сразу.
+    """
+
+    def init_app(self, app):
+        """
+        Подключает единицу работы к приложению.
+
+        Режим включается настройкой ``UNIT_OF_WORK``.
+
+        :param app: Экземпляр приложения.
+        :type app: Flask
+        """
+        if not event.contains(db.session, 'before_flush', _mark_staged):
+            event.listen(db.session, 'before_flush', _mark_staged)
+            event.listen(db.session, 'do_orm_execute', _mark_staged_statement)
+        if app.config.get('UNIT_OF_WORK', True):
+            app.before_request(self._begin)
+            app.after_request(self._finish)
+            app.teardown_request(self._teardown)
+        app.extensions['unit_of_work'] = self
+
+    @property
+    def _state(self):
+        """Состояние единицы работы текущего запроса или None."""
+        if not has_request_context():
+            return None
+        return db.session.info.get(STATE_KEY)
+
+    @property
+    def active(self):
+        """Копятся ли изменения до конца запроса."""
+        state = self._state
+        return state is not None and state.enabled
+
+    def commit(self):
+        """
+        Фиксирует изменения сервиса.
+
+        Внутри единицы работы изменения только отправляются в базу, чтобы
+        получить идентификаторы новых записей и сразу обнаружить нарушения
+        ограничений; фиксация откладывается до конца запроса.
+        """
+        if self.active:
+            db.session.flush()
+        else:
+            db.session.commit()
+
+    def after_commit(self, callback):
+        """
+        Регистрирует действие, выполняемое после фиксации транзакции.
+
+        Вне единицы работы действие выполняется сразу (транзакция уже
+        зафиксирована предшествующим ``commit``). При откате действия отбрасываются.
+        Ошибка действия записывается в журнал и не передается вызывающему коду.
+
+        :param callback: Функция без аргументов.
+        :type callback: callable
+        """
+        state = self._state
+        if state is None or not state.enabled:
+            _run_callbacks([callback])
+        else:
+            state.callbacks.append(callback)
+
+    @contextmanager
+    def autocommit(self):
+        """
+        Отключает накопление изменений: каждый ``commit`` фиксирует транзакцию сразу.
+
+        Предназначен для долгих операций, которые не должны держать транзакцию
+        открытой до конца запроса. Уже накопленные изменения фиксируются при входе.
+        Можно использовать и как декоратор обработчика.
+        """
+        state = self._state
+        if state is None:
+            yield
+            return
+        if state.enabled:
+            self._commit_staged(state)
+        previous, state.enabled = state.enabled, False
+        try:
+            yield
+        finally:
+            state.enabled = previous
+
+    def _begin(self):
+        """Открывает единицу работы в начале запроса."""
+        db.session.info[STATE_KEY] = _State()
+
+    def _finish(self, response):
+        """Фиксирует или откатывает изменения запроса в зависимости от кода ответа."""
+        state = db.session.info.get(STATE_KEY)
+        if state is None or not state.enabled:
+            return response
+        if response.status_code >= 400:
+            self._rollback(state)
+        else:
+            self._commit_staged(state)
+        return response
+
+    def _teardown(self, exc):
+        """Откатывает изменения, если обработчик завершился исключением, и закрывает единицу работы."""
+        state = db.session.info.pop(STATE_KEY, None)
+        if state is not None and (state.staged or state.callbacks):
+            self._rollback(state)
+
+    def _commit_staged(self, state):
+        """Фиксирует накопленные изменения и выполняет отложенные действия."""
+        if state.staged:
+            try:
+                db.session.commit()
+            except Exception:
+                self._rollback(state)
+                raise
+        state.staged = False
+        callbacks, state.callbacks = state.callbacks, []
+        _run_callbacks(callbacks)
+
+    def _rollback(self, state):
+        """Откатывает накопленные изменения и отбрасывает отложенные действия."""
+        db.session.rollback()
+        state.staged = False
+        state.callbacks = []
+
+
+def _run_callbacks(callbacks):
+    """Выполняет действия после фиксации; ошибка одного действия не отменяет остальные."""
+    for callback in callbacks:
+        try:
+            callback()
+        except Exception:
+            logger.exception('Ошибка действия после фиксации %r', callback)
+
+
+def _mark_staged(session, flush_context, instances):
+    """
+    Отмечает, что в транзакции запроса есть неподтвержденные изменения.
+
+    Присваивание атрибуту прежнего значения изменением не считается, поэтому
+    запрос, повторно записавший те же данные, не фиксирует транзакцию.
+    """
+    state = session.info.get(STATE_KEY)
+    if state is not None and not state.staged:
+        state.staged = bool(session.new or session.deleted
+                            or any(session.is_modified(obj) for obj in session.dirty))
+
+
+
+def _mark_staged_statement(orm_execute_state):
+    """Отмечает изменения, выполненные массовыми INSERT/UPDATE/DELETE в обход flush."""
+    state = orm_execute_state.session.info.get(STATE_KEY)
+    if state is not None and (orm_execute_state.is_insert or orm_execute_state.is_update
+                              or orm_execute_state.is_delete):
+        state.staged = True
+
+
+unit_of_work = UnitOfWork()
@@ -0,0 +1,102 @@
+"""Команды CLI приложения users."""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import create_engine, select
+
+from database import db
+from events.projections import ProjectionService
+from events.services import EventLog
+from users.models import User
+from users.services import StatisticService
+
+_engine = None
+
+
+def _init_worker(database_url):
+    """
+    Готовит процесс пула: создает собственный движок базы данных.
+
+    :param database_url: Адрес базы данных.
+    :type database_url: str
+    """
+    global _engine
+    _engine = create_engine(database_url)
+
+
+def _aggregate_chunk(first_id, last_id):
+    """
+    Считает статистику диапазона пользователей и их списков в процессе пула.
+
+    :param first_id: Первый идентификатор пользователя диапазона.
+    :type first_id: int
+    :param last_id: Последний идентификатор пользователя диапазона.
+    :type last_id: int
+    :return: Строки статистики пользователей и строки счетчиков списков.
+    :rtype: tuple[list[dict], list[dict]]
+    """
+    with _engine.connect() as connection:
+        return (StatisticService.aggregate_users(connection, first_id, last_id),
+                StatisticService.aggregate_lists(connection, first_id, last_id))
+
+
+def user_id_chunks(chunk_size):
+    """
+    Разбивает пользователей на диапазоны идентификаторов.
+
+    :param chunk_size: Количество пользователей в диапазоне.
+    :type chunk_size: int
+    :return: Пары ``(первый, последний)`` идентификаторов.
+    :rtype: list[tuple[int, int]]
+    """
+    user_ids = db.session.scalars(select(User.id).order_by(User.id)).all()
+    return [(user_ids[i], user_ids[min(i + chunk_size, len(user_ids)) - 1])
+            for i in range(0, len(user_ids), chunk_size)]
+
+
+@click.command('recompute-stats')
+@click.option('--workers', default=os.cpu_count() or 1, show_default=True,
+              help='Количество процессов; 0 - считать в текущем процессе.')
+@click.option('--chunk-size', default=1000, show_default=True, help='Количество пользователей в пачке.')
+@with_appcontext
+def recompute_stats_command(workers, chunk_size):
+    """
+    Пересчитывает статистику всех пользователей.
+
+    Пачки пользователей агрегируются параллельно в пуле процессов, а результаты
+    записываются в ``user_stats`` и ``todo_list_stats`` пакетно по мере готовности. Контрольная точка
+    проекции статистики переносится на конец журнала, прочитанный до начала
+    пересчета; запускайте команду, когда изменения задач приостановлены.
+    """
+    started = time.perf_counter()
+    last_seq = EventLog.last_seq()
+    chunks = user_id_chunks(chunk_size)
+    users = 0
+
+    def save(result):
+        user_rows, list_rows = result
+        StatisticService.save_user_stats(user_rows)
+        StatisticService.save_list_stats(list_rows)
+        db.session.commit()
+        return len(user_rows)
+
+    if workers:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(db.engine.url.render_as_string(hide_password=False),)) as pool:
+            futures = [pool.submit(_aggregate_chunk, first_id, last_id) for first_id, last_id in chunks]
+            for future in as_completed(futures):
+                users += save(future.result())
+    else:
+        with db.engine.connect() as connection:
+            for first_id, last_id in chunks:
+                users += save((StatisticService.aggregate_users(connection, first_id, last_id),
+                               StatisticService.aggregate_lists(connection, first_id, last_id)))
+
+    ProjectionService.set_checkpoint('stats', last_seq)
+    elapsed = time.perf_counter() - started
+    click.echo(f'Пересчитана статистика {users} пользователей ({len(chunks)} пачек) за {elapsed:.2f} с, '
+               f'{users / elapsed if elapsed else 0:.0f} пользователей/с.')
@@ -16,3 +16,22 @@ class ChangePasswordForm(BaseModel):
     current_password: str = Field(..., title="Current Password", max_length=100)
     new_password: str = Field(..., title="New Password", max_length=100)
     confirm_password: str = Field(..., title="Confirm Password", max_length=100)
+
+
+class NotificationSettingsForm(BaseModel):
+    """
+    Форма настроек уведомлений пользователя.
+
+    :param email: Получать уведомления по электронной почте.
+    :type email: bool
+    :param task_changes: Уведомлять об изменениях задач в доступных списках.
+    :type task_changes: bool
+    :param deadline_reminders: Напоминать о приближении дедлайна.
+    :type deadline_reminders: bool
+    :param remind_before_hours: За сколько часов до дедлайна напоминать.
+    :type remind_before_hours: int
+    """
+    email: bool = False
+    task_changes: bool = False
+    deadline_reminders: bool = False
+    remind_before_hours: int = Field(24, ge=1, le=168)
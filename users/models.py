@@ -56,7 +56,7 @@ class UserStats(db.Model):
     __tablename__ = 'user_stats'
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     total_todo = db.Column(db.Integer, default=0)
     total_tasks = db.Column(db.Integer, default=0)
     active_tasks = db.Column(db.Integer, default=0)
@@ -4,25 +4,59 @@ from flask import Blueprint, render_template, redirect, url_for, request, flash
 from flask_login import login_required, current_user
 from users import login_manager
 from users.utils import hash_password, verify_password
-from users.services import UserService, StatisticService
-from users.forms import ChangePasswordForm
+from users.models import UserStats
+from users.services import UserService
+from users.forms import ChangePasswordForm, NotificationSettingsForm
+from notifications.services import notification_settings
+from validation import parse_request, format_errors
+from serialization import FieldSet, api_response, rows_payload
+from tracing import traced
 
 user_blueprint = Blueprint('user', __name__, url_prefix='/profile')
 
+STATS_FIELDS = FieldSet({name: getattr(UserStats, name) for name in (
+    'total_todo', 'total_tasks', 'active_tasks', 'completed_tasks', 'incomplete_tasks', 'completion_percentage')})
+
 @user_blueprint.route('/')
 @login_required
 def profile():
     """
     Обработчик маршрута для отображения профиля пользователя.
 
+    Статистика берется из проекции журнала событий как есть: проекцию
+    догоняет ``flask events project --loop``, а не запрос на чтение.
+
     :return: Шаблон профиля пользователя.
     :rtype: flask.Response
     """
-    collect_statistics_data(current_user.id)
-    user_stats = UserService.get_user_stats(current_user.id)
-    return render_template('users/profile.html', user_stats=user_stats)
+    user_stats = UserService.get_user_stats(current_user.id) or UserStats(
+        user_id=current_user.id, total_todo=0, total_tasks=0, active_tasks=0,
+        completed_tasks=0, incomplete_tasks=0, completion_percentage=0)
+    return render_template('users/profile.html', user_stats=user_stats,
+                           notification_settings=notification_settings(current_user.notification_settings))
+
+@user_blueprint.get('/api/stats')
+@login_required
+def stats_api():
+    """
+    Возвращает статистику текущего пользователя.
+
+    Параметр ``fields`` задает поля ответа через запятую (см. ``STATS_FIELDS``);
+    из базы данных выбираются только они. Кодировка ответа выбирается по
+    заголовку ``Accept`` (см. ``serialization``).
+
+    :return: Статистика или список ошибок.
+    :rtype: flask.Response
+    """
+    columns, errors = STATS_FIELDS.parse(request.args.get('fields'))
+    if errors:
+        return api_response({'errors': errors}, 400)
+    row = UserService.select_user_stats(current_user.id, columns)
+    stats = rows_payload([row])[0] if row is not None else {column.name: 0 for column in columns}
+    return api_response({'stats': stats})
 
 @login_manager.user_loader
+@traced('login_manager.user_loader')
 def load_user(user_id):
     """
     Функция для загрузки пользователя.
@@ -43,10 +77,9 @@ def change_password():
     :return: Редирект на страницу профиля.
     :rtype: flask.Response
     """
-    form_data = request.form
-    form = ChangePasswordForm(**form_data)
-    
-    if form.model_validate(form):
+    form, errors = parse_request(ChangePasswordForm, request)
+
+    if not errors:
         current_password = form.current_password
         new_password = form.new_password
         confirm_password = form.confirm_password
@@ -60,38 +93,24 @@ def change_password():
         else:
             flash('Current password is incorrect!', 'error')
     else:
-        flash('Invalid form data!', 'error')
+        flash(f'Invalid form data! {format_errors(errors)}', 'error')
 
-    return redirect(url_for('user.change_password'))
+    return redirect(url_for('user.profile'))
 
-def collect_statistics_data(user_id):
+
+@user_blueprint.route('/notifications', methods=['POST'])
+@login_required
+def notifications():
     """
-    Сбор статистических данных пользователя.
+    Обработчик маршрута для изменения настроек уведомлений.
 
-    :param user_id: Идентификатор пользователя.
-    :type user_id: int
+    :return: Редирект на страницу профиля.
+    :rtype: flask.Response
     """
-    total_todo = StatisticService.get_user_total_todo_lists(current_user.id)
-    total_tasks = StatisticService.get_user_total_tasks(current_user.id)
-    completed_tasks = StatisticService.get_user_completed_tasks(current_user.id)
-    active_tasks = StatisticService.get_user_active_tasks(current_user.id)
-    incomplete_tasks = StatisticService.get_user_incompleted_tasks(current_user.id)
-    completion_percentage = StatisticService.calculate_completion_percentage(current_user.id)
-
-    user_stats = UserService.get_user_stats(user_id)
-    if user_stats:
-        UserService.user_stats_update(
-            current_user.id, total_todo, total_tasks, 
-            completed_tasks, active_tasks, incomplete_tasks,
-            completion_percentage
-            )
+    form, errors = parse_request(NotificationSettingsForm, request)
+    if errors:
+        flash(f'Invalid form data! {format_errors(errors)}', 'error')
     else:
-        UserService.user_stats_create(
-            user_id=user_id,
-            total_todo=total_todo,
-            total_tasks=total_tasks,
-            completed_tasks=completed_tasks,
-            active_tasks=active_tasks,
-            incomplete_tasks=incomplete_tasks,
-            completion_percentage=completion_percentage
-        )
\ No newline at end of file
+        UserService.update_notification_settings(current_user.id, form.model_dump())
+        flash('Notification settings have been updated!', 'success')
+    return redirect(url_for('user.profile'))
@@ -1,10 +1,14 @@
 """Сервисы для работы с пользователями и статистикой."""
 
-from datetime import datetime
-from sqlalchemy import func, case
+from sqlalchemy import func, case, select, update, insert, delete
 from .models import User, UserStats
-from todo_list.models import Task, TodoList
+from events.models import TodoListStats
+from archive.models import ArchivedListStats
+from todo_list.models import Task, TodoList, TaskStatus
+from todo_list.permissions import accessible_todo_ids, access_pairs
 from database import db
+from unit_of_work import unit_of_work
+from cache import cache
 
 class UserService:
     """
@@ -52,7 +56,7 @@ class UserService:
         """
         new_user = User(email=email, username=username, password=password)
         db.session.add(new_user)
-        db.session.commit()
+        unit_of_work.commit()
 
     @staticmethod
     def authenticate_user(username: str, password: str):
@@ -83,7 +87,22 @@ class UserService:
         """
         user = UserService.get_user_by_id(user_id)
         user.password = password
-        db.session.commit()
+        unit_of_work.commit()
+
+    @staticmethod
+    def update_notification_settings(user_id, settings):
+        """
+        Обновить настройки уведомлений пользователя.
+
+        :param user_id: Идентификатор пользователя.
+        :type user_id: int
+        :param settings: Новые настройки (см. ``NotificationSettingsForm``).
+        :type settings: dict
+        """
+        user = UserService.get_user_by_id(user_id)
+        user.notification_settings = dict(settings)
+        unit_of_work.commit()
+        unit_of_work.after_commit(lambda: cache.delete(f'notification_settings:{user_id}'))
 
     @staticmethod
     def get_user_stats(user_id):
@@ -98,6 +117,20 @@ class UserService:
         user = UserStats.query.filter_by(user_id=user_id).first()
         return user
 
+    @staticmethod
+    def select_user_stats(user_id, columns):
+        """
+        Выбирает указанные колонки статистики пользователя.
+
+        :param user_id: Идентификатор пользователя.
+        :type user_id: int
+        :param columns: Колонки ``UserStats`` (см. ``serialization.FieldSet``).
+        :type columns: list
+        :return: Строка статистики или None, если статистики еще нет.
+        :rtype: sqlalchemy.engine.Row or None
+        """
+        return db.session.execute(select(*columns).where(UserStats.user_id == user_id)).first()
+
     @staticmethod
     def user_stats_create(user_id, total_todo, total_tasks, completed_tasks,
                            active_tasks ,incomplete_tasks, completion_percentage):
@@ -129,7 +162,7 @@ class UserService:
                             incomplete_tasks=incomplete_tasks,
                             completion_percentage=completion_percentage)
         db.session.add(user_stats)
-        db.session.commit()
+        unit_of_work.commit()
         return user_stats
 
     @staticmethod
@@ -162,7 +195,7 @@ class UserService:
         user_stats.completed_tasks = completed_tasks
         user_stats.incomplete_tasks = incomplete_tasks
         user_stats.completion_percentage = completion_percentage
-        db.session.commit()
+        unit_of_work.commit()
         return user_stats
 
 class StatisticService:
@@ -182,80 +215,263 @@ class StatisticService:
         :return: Общее количество списков задач пользователя.
         :rtype: int
         """
-        return TodoList.query.filter(TodoList.user_id == user_id).count()
+        return TodoList.query.filter(TodoList.id.in_(accessible_todo_ids(user_id))).count()
+
+    @staticmethod
+    def get_user_archived_tasks(user_id):
+        """
+        Получить количество архивных задач пользователя по сохраненным счетчикам списков.
+
+        Все архивные задачи завершены (см. ``archive.services``).
+
+        :param user_id: Идентификатор пользователя.
+        :type user_id: int
+        :return: Количество архивных задач пользователя.
+        :rtype: int
+        """
+        return db.session.scalar(
+            select(func.coalesce(func.sum(ArchivedListStats.total), 0))
+            .where(ArchivedListStats.todo_id.in_(accessible_todo_ids(user_id))))
 
     @staticmethod
     def get_user_total_tasks(user_id):
         """
-        Получить общее количество задач пользователя.
+        Получить общее количество задач пользователя, включая архивные.
 
         :param user_id: Идентификатор пользователя.
         :type user_id: int
         :return: Общее количество задач пользователя.
         :rtype: int
         """
-        tasks = Task.query.join(TodoList).filter(TodoList.user_id == user_id).count()
-        return tasks
+        tasks = Task.query.filter(Task.todo_id.in_(accessible_todo_ids(user_id))).count()
+        return tasks + StatisticService.get_user_archived_tasks(user_id)
 
     @staticmethod
     def get_user_active_tasks(user_id):
         """
         Получить количество активных задач пользователя.
 
+        Активными считаются незавершенные задачи, дедлайн которых еще не истек
+        или не задан.
+
         :param user_id: Идентификатор пользователя.
         :type user_id: int
         :return: Количество активных задач пользователя.
         :rtype: int
         """
-        tasks = Task.query.join(TodoList).filter(
-            TodoList.user_id == user_id,
-            Task.is_complete == False,
-            Task.deadline_date > datetime.now()).count()
+        tasks = Task.query.filter(
+            Task.todo_id.in_(accessible_todo_ids(user_id)),
+            Task.status == TaskStatus.ACTIVE).count()
         return tasks
 
     @staticmethod
     def get_user_completed_tasks(user_id):
         """
-        Получить количество завершенных задач пользователя.
+        Получить количество завершенных задач пользователя, включая архивные.
 
         :param user_id: Идентификатор пользователя.
         :type user_id: int
         :return: Количество завершенных задач пользователя.
         :rtype: int
         """
-        tasks = Task.query.join(TodoList).filter(TodoList.user_id == user_id, Task.is_complete == True).count()
-        return tasks
+        tasks = Task.query.filter(
+            Task.todo_id.in_(accessible_todo_ids(user_id)),
+            Task.status == TaskStatus.COMPLETED).count()
+        return tasks + StatisticService.get_user_archived_tasks(user_id)
 
     @staticmethod
     def get_user_incompleted_tasks(user_id):
         """
         Получить количество незавершенных задач пользователя.
 
+        Незавершенными считаются просроченные задачи; состояние поддерживает
+        ``todo_list.sweeper.OverdueSweeper``.
+
         :param user_id: Идентификатор пользователя.
         :type user_id: int
         :return: Количество незавершенных задач пользователя.
         :rtype: int
         """
-        tasks = Task.query.join(TodoList).filter(
-            TodoList.user_id == user_id,
-            Task.is_complete == False,
-            Task.deadline_date < datetime.now()).count()
+        tasks = Task.query.filter(
+            Task.todo_id.in_(accessible_todo_ids(user_id)),
+            Task.status == TaskStatus.OVERDUE).count()
         return tasks
 
     @staticmethod
     def calculate_completion_percentage(user_id):
         """
-        Рассчитать процент завершения задач пользователя.
+        Рассчитать процент завершения задач пользователя с учетом архивных задач.
 
         :param user_id: Идентификатор пользователя.
         :type user_id: int
         :return: Процент завершения задач пользователя.
         :rtype: float
         """
-        completion_percentage = db.session.query(
-            func.round(func.avg(func.cast(Task.is_complete, db.Integer)) * 100, 2)
-        ).join(TodoList).filter(
-            TodoList.user_id == user_id
-        ).scalar()
+        total, completed = db.session.query(
+            func.count(Task.id), func.coalesce(func.sum(func.cast(Task.is_complete, db.Integer)), 0)
+        ).filter(
+            Task.todo_id.in_(accessible_todo_ids(user_id))
+        ).one()
+        archived = StatisticService.get_user_archived_tasks(user_id)
+        total, completed = total + archived, completed + archived
+
+        return round(completed * 100 / total, 2) if total else 0
+
+    @staticmethod
+    def aggregate_users(connection, first_id, last_id):
+        """
+        Рассчитать статистику для диапазона пользователей набором запросов с GROUP BY user_id.
+
+        Вместо отдельных запросов на каждого пользователя выполняются четыре
+        запроса на весь диапазон. Списки учитываются у владельца и у всех
+        участников, архивные задачи - по сохраненным счетчикам списков.
+        Пользователи без списков и задач получают нулевую статистику.
+
+        :param connection: Соединение с базой данных.
+        :type connection: sqlalchemy.engine.Connection
+        :param first_id: Первый идентификатор пользователя диапазона.
+        :type first_id: int
+        :param last_id: Последний идентификатор пользователя диапазона (включительно).
+        :type last_id: int
+        :return: Строки статистики с полями модели ``UserStats``.
+        :rtype: list[dict]
+        """
+        user_ids = connection.scalars(
+            select(User.id).where(User.id.between(first_id, last_id))).all()
+        access = access_pairs(lambda column: column.between(first_id, last_id))
+        todo_counts = dict(connection.execute(
+            select(access.c.user_id, func.count()).group_by(access.c.user_id)).all())
+        task_counts = {row.user_id: row for row in connection.execute(
+            select(access.c.user_id,
+                   func.count(Task.id).label('total'),
+                   func.sum(case((Task.status == TaskStatus.ACTIVE, 1), else_=0)).label('active'),
+                   func.sum(case((Task.status == TaskStatus.COMPLETED, 1), else_=0)).label('completed'),
+                   func.sum(case((Task.status == TaskStatus.OVERDUE, 1), else_=0)).label('overdue'))
+            .join(Task, Task.todo_id == access.c.todo_id)
+            .group_by(access.c.user_id))}
+        archived = dict(connection.execute(
+            select(access.c.user_id, func.sum(ArchivedListStats.total))
+            .join(ArchivedListStats, ArchivedListStats.todo_id == access.c.todo_id)
+            .group_by(access.c.user_id)).all())
+        rows = []
+        for user_id in user_ids:
+            tasks = task_counts.get(user_id)
+            total = (tasks.total if tasks else 0) + archived.get(user_id, 0)
+            completed = (tasks.completed if tasks else 0) + archived.get(user_id, 0)
+            rows.append({
+                'user_id': user_id,
+                'total_todo': todo_counts.get(user_id, 0),
+                'total_tasks': total,
+                'active_tasks': tasks.active if tasks else 0,
+                'completed_tasks': completed,
+                'incomplete_tasks': tasks.overdue if tasks else 0,
+                'completion_percentage': round(completed * 100 / total, 2) if total else 0,
+            })
+        return rows
 
-        return completion_percentage or 0
\ No newline at end of file
+    @staticmethod
+    def save_user_stats(rows):
+        """
+        Сохранить статистику пользователей пакетно: обновить существующие строки и добавить недостающие.
+
+        :param rows: Строки статистики (см. ``aggregate_users``).
+        :type rows: list[dict]
+        """
+        if not rows:
+            return
+        existing = dict(db.session.execute(
+            select(UserStats.user_id, UserStats.id)
+            .where(UserStats.user_id.in_([row['user_id'] for row in rows]))).all())
+        updates = [{'id': existing[row['user_id']], **row} for row in rows if row['user_id'] in existing]
+        inserts = [row for row in rows if row['user_id'] not in existing]
+        if updates:
+            db.session.execute(update(UserStats), updates)
+        if inserts:
+            db.session.execute(insert(UserStats), inserts)
+
+    @staticmethod
+    def summarize_list_stats(user_ids):
+        """
+        Рассчитать статистику пользователей по счетчикам доступных им списков одним запросом.
+
+        :param user_ids: Идентификаторы пользователей.
+        :type user_ids: set[int]
+        :return: Строки статистики с полями модели ``UserStats``; пользователи без списков получают нули.
+        :rtype: list[dict]
+        """
+        access = access_pairs(lambda column: column.in_(user_ids))
+        totals = {row.user_id: row for row in db.session.execute(
+            select(access.c.user_id,
+                   func.count(TodoListStats.todo_id).label('todo'),
+                   func.sum(TodoListStats.total).label('total'),
+                   func.sum(TodoListStats.active).label('active'),
+                   func.sum(TodoListStats.completed).label('completed'),
+                   func.sum(TodoListStats.overdue).label('overdue'))
+            .join(TodoListStats, TodoListStats.todo_id == access.c.todo_id)
+            .group_by(access.c.user_id))}
+        rows = []
+        for user_id in user_ids:
+            row = totals.get(user_id)
+            total = row.total if row else 0
+            completed = row.completed if row else 0
+            rows.append({
+                'user_id': user_id,
+                'total_todo': row.todo if row else 0,
+                'total_tasks': total,
+                'active_tasks': row.active if row else 0,
+                'completed_tasks': completed,
+                'incomplete_tasks': row.overdue if row else 0,
+                'completion_percentage': round(completed * 100 / total, 2) if total else 0,
+            })
+        return rows
+
+    @staticmethod
+    def aggregate_lists(connection, first_id, last_id):
+        """
+        Рассчитать счетчики задач списков, принадлежащих диапазону пользователей, одним запросом.
+
+        Группировка по ``(user_id, id)`` совпадает с порядком индекса ``todo_list.user_id``,
+        поэтому диапазон читается по индексу без полного обхода таблицы и сортировки.
+        Архивные задачи добавляются к счетчикам вторым запросом по ``archived_list_stats``.
+
+        :param connection: Соединение с базой данных.
+        :type connection: sqlalchemy.engine.Connection
+        :param first_id: Первый идентификатор владельца диапазона.
+        :type first_id: int
+        :param last_id: Последний идентификатор владельца диапазона (включительно).
+        :type last_id: int
+        :return: Строки с полями модели ``TodoListStats``.
+        :rtype: list[dict]
+        """
+        rows = [dict(row._mapping) for row in connection.execute(
+            select(TodoList.id.label('todo_id'),
+                   func.count(Task.id).label('total'),
+                   func.coalesce(func.sum(case((Task.status == TaskStatus.ACTIVE, 1), else_=0)), 0).label('active'),
+                   func.coalesce(func.sum(case((Task.status == TaskStatus.COMPLETED, 1), else_=0)), 0)
+                   .label('completed'),
+                   func.coalesce(func.sum(case((Task.status == TaskStatus.OVERDUE, 1), else_=0)), 0).label('overdue'))
+            .outerjoin(Task, Task.todo_id == TodoList.id)
+            .where(TodoList.user_id.between(first_id, last_id))
+            .group_by(TodoList.user_id, TodoList.id))]
+        archived = dict(connection.execute(
+            select(ArchivedListStats.todo_id, ArchivedListStats.total)
+            .join(TodoList, TodoList.id == ArchivedListStats.todo_id)
+            .where(TodoList.user_id.between(first_id, last_id))).all())
+        for row in rows:
+            row['total'] += archived.get(row['todo_id'], 0)
+            row['completed'] += archived.get(row['todo_id'], 0)
+        return rows
+
+    @staticmethod
+    def save_list_stats(rows):
+        """
+        Сохранить счетчики списков пакетно, заменив прежние строки.
+
+        :param rows: Строки счетчиков (см. ``aggregate_lists``).
+        :type rows: list[dict]
+        """
+        if not rows:
+            return
+        db.session.execute(delete(TodoListStats).where(
+            TodoListStats.todo_id.in_([row['todo_id'] for row in rows])))
+        db.session.execute(insert(TodoListStats), rows)
@@ -0,0 +1,145 @@
+"""Единый слой валидации данных форм и JSON-запросов."""
+
+import json
+from functools import lru_cache
+
+from pydantic import TypeAdapter, ValidationError
+from werkzeug.datastructures import MultiDict
+
+
+@lru_cache(maxsize=None)
+def get_adapter(target):
+    """
+    Возвращает скомпилированный валидатор для типа.
+
+    Валидаторы создаются один раз на тип и переиспользуются во всех запросах.
+
+    :param target: Модель формы или составной тип, например ``list[TaskCreateForm]``.
+    :type target: type
+    :return: Валидатор pydantic.
+    :rtype: pydantic.TypeAdapter
+    """
+    return TypeAdapter(target)
+
+
+def _error_list(exc):
+    """
+    Преобразует ошибку валидации в список структурированных ошибок.
+
+    :param exc: Ошибка валидации pydantic.
+    :type exc: pydantic.ValidationError
+    :return: Список ошибок вида ``{'field': ..., 'message': ..., 'type': ...}``.
+    :rtype: list[dict]
+    """
+    return [
+        {
+            'field': '.'.join(str(part) for part in error['loc']),
+            'message': error['msg'],
+            'type': error['type'],
+        }
+        for error in exc.errors(include_url=False, include_input=False)
+    ]
+
+
+def _form_dict(data):
+    """
+    Приводит данные HTML-формы к словарю.
+
+    Пустые поля формы считаются незаполненными.
+
+    :param data: Данные формы.
+    :type data: MultiDict
+    :return: Словарь с непустыми значениями полей.
+    :rtype: dict
+    """
+    return {key: value for key, value in data.items() if value != ''}
+
+
+def parse_form(model, data, **extra):
+    """
+    Проверяет данные формы или JSON за один проход.
+
+    :param model: Модель формы.
+    :type model: type[pydantic.BaseModel]
+    :param data: Данные формы, словарь или JSON-документ (``str``/``bytes``).
+    :type data: MultiDict or dict or str or bytes
+    :param extra: Дополнительные поля, не приходящие от клиента (например, идентификатор из URL);
+        добавляются, только если данные - объект, иначе возвращается ошибка ``model_type``.
+    :return: Экземпляр формы и пустой список ошибок либо None и список ошибок.
+    :rtype: tuple[pydantic.BaseModel or None, list[dict]]
+    """
+    adapter = get_adapter(model)
+    try:
+        if isinstance(data, (str, bytes)):
+            if not extra:
+                return adapter.validate_json(data), []
+            data = json.loads(data)
+        elif isinstance(data, MultiDict):
+            data = _form_dict(data)
+        if extra and isinstance(data, dict):
+            data = {**data, **extra}
+        return adapter.validate_python(data), []
+    except ValidationError as exc:
+        return None, _error_list(exc)
+    except ValueError:
+        return None, [{'field': '', 'message': 'Malformed JSON', 'type': 'json_invalid'}]
+
+
+def parse_many(model, items, **extra):
+    """
+    Проверяет список элементов для пакетных запросов одним валидатором.
+
+    :param model: Модель одного элемента.
+    :type model: type[pydantic.BaseModel]
+    :param items: Список словарей или JSON-массив (``str``/``bytes``).
+    :type items: list[dict] or str or bytes
+    :param extra: Дополнительные поля, добавляемые к каждому элементу.
+    :return: Список экземпляров формы и пустой список ошибок либо None и список ошибок;
+        поле ошибки начинается с индекса элемента, например ``0.title``.
+    :rtype: tuple[list[pydantic.BaseModel] or None, list[dict]]
+    """
+    adapter = get_adapter(list[model])
+    try:
+        if isinstance(items, (str, bytes)):
+            if not extra:
+                return adapter.validate_json(items), []
+            items = json.loads(items)
+        if extra and isinstance(items, list):
+            items = [{**item, **extra} if isinstance(item, dict) else item for item in items]
+        return adapter.validate_python(items), []
+    except ValidationError as exc:
+        return None, _error_list(exc)
+    except ValueError:
+        return None, [{'field': '', 'message': 'Malformed JSON', 'type': 'json_invalid'}]
+
+
+def parse_request(model, request, **extra):
+    """
+    Проверяет тело запроса: JSON, если он передан, иначе данные формы.
+
+    :param model: Модель формы.
+    :type model: type[pydantic.BaseModel]
+    :param request: Текущий запрос.
+    :type request: flask.Request
+    :param extra: Дополнительные поля, не приходящие от клиента.
+    :return: Экземпляр формы и список ошибок (см. ``parse_form``).
+    :rtype: tuple[pydantic.BaseModel or None, list[dict]]
+    """
+    if request.is_json:
+        return parse_form(model, request.get_data(), **extra)
+    return parse_form(model, request.form, **extra)
+
+
+def format_errors(errors):
+    """
+    Формирует текст сообщения для пользователя из списка ошибок.
+
+    :param errors: Список структурированных ошибок.
+    :type errors: list[dict]
+    :return: Сообщение об ошибках.
+    :rtype: str
+    """
+    return '; '.join(
+        f"{error['field']}: {error['message']}" if error['field'] else error['message']
+        for error in errors
+    )
@@ -0,0 +1,28 @@
+"""
+Точка входа для production WSGI-сервера.
+
+Пример запуска::
+
+    flask --app wsgi init-db
+    gunicorn -c gunicorn.conf.py
+"""
+import os
+
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from app import create_app
+from config import ProductionConfig
+from database import dispose_engines
+
+app = create_app(ProductionConfig)
+
+# Приложение работает за обратным прокси (gunicorn слушает 127.0.0.1), поэтому адрес клиента
+# для лимитов запросов и схема берутся из X-Forwarded-*. Значение - количество доверенных
+# прокси перед приложением; 0 отключает разбор заголовка (без прокси его может подделать клиент).
+app.wsgi_app = ProxyFix(app.wsgi_app,
+                        x_for=int(os.environ.get('PROXY_FIX_X_FOR', 1)),
+                        x_proto=int(os.environ.get('PROXY_FIX_X_PROTO', 1)))
+
+# Воркеры preforking-сервера не должны делить пул соединений SQLite с мастером.
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=lambda: dispose_engines(app))